@@ -13,22 +13,34 @@ from fastapi import (
     Depends,
 )
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from services.chunking_service import ChunkingService
 from services.embedding_service import EmbeddingService, EmbeddingConfig
 from services.vector_store_service import VectorStoreService, VectorDBConfig
 from services.search_service import SearchService
+from services.search_cache import search_cache
+from services.semantic_cache import semantic_cache
+from services.evaluation_service import evaluation_service
+from services.index_tuning_service import IndexTuningService
+from services.catalog_service import collection_catalog
+from services.indexing_job_service import indexing_job_manager
+from services.snapshot_service import SnapshotService
+from services.retention_service import RetentionService
 from services.parsing_service import ParsingService
 from services.loading_service import LoadingService
 from services.web_scraping_service import WebScrapingService
 import logging
 from enum import Enum
-from utils.config import VectorDBProvider
+from utils.config import VectorDBProvider, EVALUATION_CONFIG
+from utils.sidecar_client import sidecar_enabled, get_sidecar_client
+from utils.executors import run_io, event_loop_monitor, shutdown_executors
 import pandas as pd
 from pathlib import Path
 from services.generation_service import GenerationService
 from typing import List, Dict, Optional
 from utils.logger import logger
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+import shutil
 
 # 设置日志
 os.makedirs("logs", exist_ok=True)
@@ -57,11 +69,15 @@ app.add_middleware(
 async def startup_event():
     logger.info("=== RAG System Backend Starting ===")
     logger.info("FastAPI application is starting up...")
+    event_loop_monitor.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("FastAPI application is shutting down...")
+    indexing_job_manager.shutdown()
+    event_loop_monitor.stop()
+    shutdown_executors()
     logger.info("=== RAG System Backend Stopped ===")
 
 
@@ -410,14 +426,25 @@ async def index_embeddings(data: dict):
     - fileId: 嵌入文件ID
     - vectorDb: 向量数据库类型（如milvus、chroma等）
     - indexMode: 索引模式
+    - tags: 集合标签列表（可选），用于多集合搜索
+    - collectionName: 目标集合名称（可选），指定时文档写入该集合中属于它的分区，
+      多个文档可共享同一集合；不指定时为文档新建集合
+    - upsert: 是否增量写入（可选，默认False），按稳定块ID只插入新增块、更新变化块、删除已移除的块
+    - shards: 分片数（可选，仅Milvus），指定时集合拆分为多个独立的数据文件，按块ID哈希分配
+    - background: 是否以后台任务方式执行（可选，默认False）。为True时立即返回任务信息，
+      通过 /index/jobs/{job_id} 查询进度；为False时等待任务完成后返回索引结果
     
     返回：
-    - 索引操作结果信息
+    - 索引操作结果信息，后台模式下为任务信息
+    
+    索引始终在独立的索引线程池中执行，不会阻塞事件循环和搜索请求
     """
     try:
         file_id = data.get("fileId")
         vector_db = data.get("vectorDb")
         index_mode = data.get("indexMode")
+        tags = data.get("tags")
+        collection_name = data.get("collectionName")
 
         if not all([file_id, vector_db, index_mode]):
             raise ValueError("Missing required fields")
@@ -427,15 +454,73 @@ async def index_embeddings(data: dict):
             raise FileNotFoundError(f"Embedding file not found: {file_id}")
 
         config = VectorDBConfig(provider=vector_db, index_mode=index_mode)
-        vector_store_service = VectorStoreService()
-        result = vector_store_service.index_embeddings(embedding_file, config)
+        job = indexing_job_manager.submit(
+            embedding_file, config, tags=tags, collection_name=collection_name,
+            upsert=bool(data.get("upsert", False)),
+            shards=int(data["shards"]) if data.get("shards") else None
+        )
+        if data.get("background", False):
+            return job
 
-        return result
+        job = await run_in_threadpool(indexing_job_manager.wait, job["job_id"])
+        if job["status"] != "completed":
+            raise HTTPException(status_code=500, detail=job["error"] or f"Indexing {job['status']}")
+        return job["result"]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during indexing: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/index/jobs")
+async def list_index_jobs():
+    """
+    列出索引任务
+
+    返回：
+    - jobs: 任务列表（按创建时间倒序），包含状态、进度和结果
+    """
+    return {"jobs": indexing_job_manager.list()}
+
+
+@app.get("/index/jobs/{job_id}")
+async def get_index_job(job_id: str):
+    """
+    查询索引任务状态
+
+    参数：
+    - job_id: 任务ID
+
+    返回：
+    - 任务信息：status（pending/running/completed/failed/cancelled）、
+      progress（已处理块数、总块数、百分比）、result、error
+    """
+    job = indexing_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Indexing job not found: {job_id}")
+    return job
+
+
+@app.delete("/index/jobs/{job_id}")
+async def cancel_index_job(job_id: str):
+    """
+    取消索引任务
+
+    功能：未开始的任务直接取消，运行中的任务在当前批次写完后停止
+
+    参数：
+    - job_id: 任务ID
+
+    返回：
+    - 任务信息
+    """
+    job = indexing_job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Indexing job not found: {job_id}")
+    return job
+
+
 @app.get("/providers")
 async def get_providers():
     """
@@ -479,6 +564,60 @@ async def get_collections(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _get_fanout_targets(
+    search_service: SearchService, provider_str: str, body: dict
+) -> Optional[List[str]]:
+    """
+    解析多集合搜索的目标集合
+
+    支持 collection_ids（列表）、collection_id 传入列表、collection_pattern（glob模式）和 tag（集合标签）。
+    未指定多集合参数时返回 None，表示走单集合搜索
+    """
+    collection_ids = body.get("collection_ids") or []
+    if isinstance(body.get("collection_id"), list):
+        collection_ids = list(collection_ids) + body["collection_id"]
+    collection_pattern = body.get("collection_pattern")
+    tag = body.get("tag")
+
+    if not (collection_ids or collection_pattern or tag):
+        return None
+
+    targets = search_service.resolve_collections(
+        provider_str,
+        collection_ids=collection_ids,
+        collection_pattern=collection_pattern,
+        tag=tag,
+    )
+    if not targets:
+        raise HTTPException(status_code=404, detail="No collections matched the request")
+    return targets
+
+
+def _sse_response(events) -> StreamingResponse:
+    """
+    把事件迭代器（同步或异步，每个事件为带event字段的字典）编码为Server-Sent Events响应
+    """
+    def encode(event: dict) -> str:
+        return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+    if hasattr(events, "__aiter__"):
+        async def body():
+            async for event in events:
+                yield encode(event)
+    else:
+        # 同步迭代器由StreamingResponse在线程池中迭代，阻塞的模型调用不占用事件循环
+        def body():
+            for event in events:
+                yield encode(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，事件到达即转发
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/search")
 async def search_with_query_param(
     body: dict = Body(...), provider: str = Query(None)  # 添加URL查询参数
@@ -491,14 +630,31 @@ async def search_with_query_param(
     参数：
     - query: 搜索查询文本
     - collection_id: 集合ID
+    - collection_ids: 集合ID列表（可选，多集合并发搜索）
+    - collection_pattern: 集合名称glob模式（可选，如 "manual_*"）
+    - tag: 集合标签（可选）
     - provider: 向量数据库提供商（可通过URL参数传递）
     - top_k: 返回结果数量（默认3）
     - threshold: 相似度阈值（默认0.5）
     - word_count_threshold: 最小字数阈值（默认30）
+    - filters: 结构化过滤条件（可选），如 {"document_name": ["a.pdf"], "page_number": "3", "word_count": {"gte": 30}}
     - save_results: 是否保存搜索结果（默认false）
+    - mode: 检索模式（默认vector）；hybrid 为BM25关键词检索与向量检索按RRF融合，仅支持单集合
+    - rerank: 是否用交叉编码器对候选重排序（默认false，仅支持单集合）
+    - rerank_k: 重排序的候选数（可选，默认 top_k 的若干倍）
+    - mmr: 是否按最大边际相关（MMR）返回多样化的结果（默认false，仅支持单集合的向量检索，不与重排序同用）
+    - mmr_lambda: MMR的相关性权重，0~1（可选，默认0.5）
+    - mmr_k: MMR的候选数（可选，默认 top_k 的若干倍）
+    - expand_neighbors: 为每个命中补充同一文档中前后各多少个块作为上下文（默认0不扩展，最多5，仅支持单集合）
+    - range_search: 是否返回相似度阈值以上的全部结果（默认false，忽略top_k，最多100个；仅支持单集合的向量检索，不与重排序、MMR同用）
+    - stream: 是否以Server-Sent Events流式返回（默认false，仅支持单集合）：依次为阶段事件
+      （embedded、candidates、reranked / diversified）、每条结果一个result事件，最后为done事件
     
     返回：
-    - results: 搜索结果列表，包含文本内容、元数据和相似度分数
+    - results: 搜索结果列表，包含文本内容、元数据和相似度分数；
+      多集合搜索时还包含每个集合的延迟信息（collections），混合检索时还包含两路检索的信息（legs），
+      重排序时还包含重排序统计（rerank）和各阶段耗时（timings），MMR时还包含MMR参数（mmr）和各阶段耗时，
+      扩展邻近块时还包含合并去重后的上下文（contexts）和扩展统计（neighbors）
     """
     try:
         # 从请求体中提取参数
@@ -508,7 +664,17 @@ async def search_with_query_param(
         top_k = body.get("top_k", 3)
         threshold = body.get("threshold", 0.5)  # 相似度阈值默认50%
         word_count_threshold = body.get("word_count_threshold", 30)  # 最小字数默认30
+        filters = body.get("filters")  # 结构化过滤条件，下推到数据库执行
         save_results = body.get("save_results", False)
+        mode = body.get("mode", "vector")
+        rerank = body.get("rerank", False)
+        rerank_k = body.get("rerank_k")
+        mmr = body.get("mmr", False)
+        mmr_lambda = body.get("mmr_lambda")
+        mmr_k = body.get("mmr_k")
+        expand_neighbors = body.get("expand_neighbors", 0)
+        range_search = body.get("range_search", False)
+        stream = body.get("stream", False)
 
         # 优先使用URL中的提供商参数，其次是请求体中的提供商参数
         provider_str = provider or body_provider
@@ -518,8 +684,8 @@ async def search_with_query_param(
             f"Search request with query param - Raw Provider: {provider_str}, Query: {query}, Collection: {collection_id}, Top K: {top_k}, Threshold: {threshold}, Word Count Threshold: {word_count_threshold}"
         )
 
-        # 验证集合ID是否为字符串
-        if not isinstance(collection_id, str):
+        # 验证集合ID是否为字符串（列表形式由多集合搜索处理）
+        if not isinstance(collection_id, (str, list)):
             collection_id = str(collection_id)
             logger.warning(f"Converted collection_id to string: {collection_id}")
 
@@ -547,9 +713,47 @@ async def search_with_query_param(
 
         search_service = SearchService()
 
+        # 多集合并发搜索
+        # 按模式或标签解析集合时需要列出集合，在I/O线程池中执行
+        targets = await run_io(_get_fanout_targets, search_service, provider_str, body)
+        if targets is not None:
+            if mode != "vector" or rerank or mmr or expand_neighbors or range_search or stream:
+                raise HTTPException(status_code=400, detail="Hybrid search, reranking, MMR, neighbour expansion, range search and streaming are only supported on a single collection")
+            results = await search_service.search_collections(
+                provider=provider_str,
+                query=query,
+                collection_ids=targets,
+                top_k=top_k,
+                threshold=threshold,
+                word_count_threshold=word_count_threshold,
+                filters=filters,
+                save_results=save_results,
+            )
+            return {"results": results}
+
         # Log before calling the search function
         logger.info("Calling search service...")
 
+        if stream:
+            return _sse_response(search_service.search_stream(
+                provider=provider_str,
+                query=query,
+                collection_id=collection_id,
+                top_k=top_k,
+                threshold=threshold,
+                word_count_threshold=word_count_threshold,
+                filters=filters,
+                save_results=save_results,
+                mode=mode,
+                rerank=rerank,
+                rerank_k=rerank_k,
+                mmr=mmr,
+                mmr_lambda=mmr_lambda,
+                mmr_k=mmr_k,
+                expand_neighbors=expand_neighbors,
+                range_search=range_search,
+            ))
+
         results = await search_service.search(
             provider=provider_str,  # 直接传递字符串，不转换为枚举值
             query=query,
@@ -557,18 +761,107 @@ async def search_with_query_param(
             top_k=top_k,
             threshold=threshold,
             word_count_threshold=word_count_threshold,
+            filters=filters,
             save_results=save_results,
+            mode=mode,
+            rerank=rerank,
+            rerank_k=rerank_k,
+            mmr=mmr,
+            mmr_lambda=mmr_lambda,
+            mmr_k=mmr_k,
+            expand_neighbors=expand_neighbors,
+            range_search=range_search,
         )
 
         # Log the search results
         logger.info(f"Search response: {results}")
 
         return {"results": results}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error performing search: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/search/cache")
+async def get_search_cache_stats():
+    """
+    获取搜索结果缓存统计
+
+    返回：
+    - 缓存统计：hit_rate、hits、misses（其中 stale 为集合版本变化导致、expired 为过期导致）、
+      evictions、entries、memory_bytes
+    - semantic: 语义查询缓存统计：hit_rate、按抽样审计估计的 false_hit_rate、audits、false_hits，
+      以及最近的审计记录 recent_audits
+    """
+    return {**search_cache.stats(), "semantic": semantic_cache.stats()}
+
+
+@app.delete("/search/cache")
+async def clear_search_cache():
+    """
+    清空搜索结果缓存和语义查询缓存
+
+    返回：
+    - 清空后的缓存统计
+    """
+    search_cache.clear()
+    semantic_cache.clear()
+    return {**search_cache.stats(), "semantic": semantic_cache.stats()}
+
+
+@app.post("/search/batch")
+async def search_batch(body: dict = Body(...)):
+    """
+    批量执行向量相似性搜索
+
+    功能：对同一集合执行多个查询，只打开一次集合，所有查询在一次嵌入调用中编码，并在一次多向量搜索中检索
+
+    参数：
+    - queries: 搜索查询文本列表
+    - collection_id: 集合ID
+    - provider: 向量数据库提供商（默认milvus）
+    - top_k: 每个查询返回的结果数量（默认3）
+    - threshold: 相似度阈值（默认0.5）
+    - word_count_threshold: 最小字数阈值（默认30）
+    - filters: 结构化过滤条件（可选），对所有查询生效
+
+    返回：
+    - results: 与 queries 一一对应的列表，每项包含 query 和该查询的 results
+    - timings: 各阶段耗时（open_ms、embedding_ms、search_ms、total_ms）及平均每个查询的耗时 per_query_ms
+    """
+    queries = body.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list of strings")
+    collection_id = body.get("collection_id", "")
+    if not collection_id:
+        raise HTTPException(status_code=400, detail="collection_id is required")
+    provider_str = str(body.get("provider", VectorDBProvider.MILVUS.value)).lower().strip()
+
+    try:
+        search_service = SearchService()
+        response = await search_service.search_batch(
+            provider=provider_str,
+            queries=[str(query) for query in queries],
+            collection_id=str(collection_id),
+            top_k=body.get("top_k", 3),
+            threshold=body.get("threshold", 0.5),
+            word_count_threshold=body.get("word_count_threshold", 30),
+            filters=body.get("filters"),
+        )
+        if response.get("error"):
+            raise HTTPException(status_code=400, detail=response["error"])
+        return response
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error performing batch search: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/collections/{provider}")
 async def get_provider_collections(provider: str):
     """
@@ -614,6 +907,351 @@ async def get_collection_info(provider: str, collection_name: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/collections/{provider}/{collection_name}/tune")
+async def tune_collection_index(provider: str, collection_name: str, data: dict = Body({})):
+    """
+    自动调优集合的索引参数
+
+    功能：以暴力检索为基准，在参数网格上评估候选索引的召回率、构建时间、内存和QPS，
+    并将帕累托最优配置写回为该集合的推荐配置
+
+    参数：
+    - provider: 向量数据库提供商名称
+    - collection_name: 集合名称
+    - sample_queries: 采样查询数量（可选）
+    - top_k: 计算recall@k时的k（可选）
+    - target_recall: 目标召回率（可选）
+    - grid: 参数网格（可选，默认使用TUNING_CONFIG）
+    - apply: 是否用推荐参数重建索引（默认false）
+
+    返回：
+    - 调优报告，包括候选结果、帕累托前沿和推荐配置
+    """
+    try:
+        tuning_service = IndexTuningService()
+        report = await run_in_threadpool(
+            tuning_service.tune,
+            provider=provider,
+            collection_name=collection_name,
+            sample_queries=data.get("sample_queries"),
+            top_k=data.get("top_k"),
+            target_recall=data.get("target_recall"),
+            grid=data.get("grid"),
+            apply=data.get("apply", False),
+        )
+        return report
+    except Exception as e:
+        logger.error(f"Error tuning collection index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/collections/{provider}/{collection_name}/benchmark-metrics")
+async def benchmark_collection_metrics(provider: str, collection_name: str, data: dict = Body({})):
+    """
+    对比余弦与内积度量的搜索延迟
+
+    功能：用集合中的向量（归一化后）分别以COSINE和IP度量执行内置暴力检索和向量库检索，
+    报告平均单次查询延迟和加速比
+
+    参数：
+    - provider: 向量数据库提供商名称
+    - collection_name: 集合名称
+    - sample_queries: 采样查询数量（可选）
+    - top_k: 每次查询返回的数量（可选）
+
+    返回：
+    - 基准报告
+    """
+    try:
+        tuning_service = IndexTuningService()
+        return await run_in_threadpool(
+            tuning_service.benchmark_metrics,
+            provider=provider,
+            collection_name=collection_name,
+            sample_queries=data.get("sample_queries"),
+            top_k=data.get("top_k"),
+        )
+    except Exception as e:
+        logger.error(f"Error benchmarking collection metrics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.put("/collections/{provider}/{collection_name}/tags")
+async def set_collection_tags(provider: str, collection_name: str, data: dict = Body(...)):
+    """
+    设置集合标签
+
+    功能：更新集合目录中的标签，多集合搜索可通过 tag 参数选择集合
+
+    参数：
+    - provider: 向量数据库提供商名称
+    - collection_name: 集合名称
+    - tags: 标签列表
+
+    返回：
+    - 更新后的集合目录条目
+    """
+    try:
+        tags = data.get("tags", [])
+        if not isinstance(tags, list):
+            raise HTTPException(status_code=400, detail="tags must be a list")
+        return collection_catalog.update(provider, collection_name, tags=tags)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error setting collection tags: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/collections/{provider}/{collection_name}/load")
+async def load_collection_documents(provider: str, collection_name: str, data: dict = Body(...)):
+    """
+    加载集合中指定文档的分区
+
+    功能：以分区为粒度将文档数据加载到内存，其他文档的加载状态不变
+
+    参数：
+    - provider: 向量数据库提供商名称
+    - collection_name: 集合名称
+    - documents: 文档名称列表
+
+    返回：
+    - 已加载的分区及未找到分区的文档
+    """
+    return await _set_documents_loaded(provider, collection_name, data, loaded=True)
+
+
+@app.post("/collections/{provider}/{collection_name}/release")
+async def release_collection_documents(provider: str, collection_name: str, data: dict = Body(...)):
+    """
+    释放集合中指定文档的分区
+
+    功能：以分区为粒度从内存中释放文档数据，释放后的文档在重新加载前不参与按文档过滤的搜索
+
+    参数：
+    - provider: 向量数据库提供商名称
+    - collection_name: 集合名称
+    - documents: 文档名称列表
+
+    返回：
+    - 已释放的分区及未找到分区的文档
+    """
+    return await _set_documents_loaded(provider, collection_name, data, loaded=False)
+
+
+async def _set_documents_loaded(provider: str, collection_name: str, data: dict, loaded: bool):
+    """
+    加载/释放文档分区的公共处理逻辑
+    """
+    try:
+        documents = data.get("documents")
+        if not isinstance(documents, list) or not documents:
+            raise HTTPException(status_code=400, detail="documents must be a non-empty list")
+        vector_store_service = VectorStoreService()
+        return await run_in_threadpool(
+            vector_store_service.set_documents_loaded, provider, collection_name, documents, loaded
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error {'loading' if loaded else 'releasing'} collection documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/collections/{provider}/{collection_name}/shards")
+async def get_collection_shards(provider: str, collection_name: str):
+    """
+    获取分片集合的分片状态
+
+    参数：
+    - provider: 向量数据库提供商名称（仅支持milvus）
+    - collection_name: 集合名称
+
+    返回：
+    - shards: 各分片的数据文件、实体数量和加载状态
+    """
+    try:
+        vector_store_service = VectorStoreService()
+        shards = await run_in_threadpool(vector_store_service.get_shard_info, collection_name)
+        return {"collection_name": collection_name, "shards": shards}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting collection shards: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/collections/{provider}/{collection_name}/shards/rebalance")
+async def rebalance_collection_shards(provider: str, collection_name: str, data: dict = Body(...)):
+    """
+    重新分片
+
+    功能：把分片集合的所有行按新的分片数重新分配到新的分片文件，完成后删除旧分片
+
+    参数：
+    - provider: 向量数据库提供商名称（仅支持milvus）
+    - collection_name: 集合名称
+    - num_shards: 新的分片数
+
+    返回：
+    - 新的分片信息和迁移的行数
+    """
+    try:
+        num_shards = data.get("num_shards")
+        if not isinstance(num_shards, int):
+            raise HTTPException(status_code=400, detail="num_shards must be an integer")
+        vector_store_service = VectorStoreService()
+        return await run_in_threadpool(vector_store_service.rebalance_shards, collection_name, num_shards)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rebalancing collection shards: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/collections/{provider}/{collection_name}/shards/{action}")
+async def set_collection_shards_loaded(provider: str, collection_name: str, action: str, data: dict = Body(...)):
+    """
+    加载或释放分片
+
+    功能：释放的分片不占用内存，搜索时会被跳过；重新加载后恢复参与搜索
+
+    参数：
+    - provider: 向量数据库提供商名称（仅支持milvus）
+    - collection_name: 集合名称
+    - action: load 或 release
+    - shards: 分片序号列表
+
+    返回：
+    - 更新后的分片信息
+    """
+    try:
+        if action not in ("load", "release"):
+            raise HTTPException(status_code=404, detail=f"Unknown shard action: {action}")
+        shards = data.get("shards")
+        if not isinstance(shards, list) or not shards:
+            raise HTTPException(status_code=400, detail="shards must be a non-empty list")
+        vector_store_service = VectorStoreService()
+        return await run_in_threadpool(
+            vector_store_service.set_shards_loaded, collection_name, shards, action == "load"
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating collection shards: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/collections/{provider}/{collection_name}/snapshot")
+async def export_collection_snapshot(provider: str, collection_name: str):
+    """
+    导出集合快照
+
+    功能：将集合的向量（float32矩阵）、标量字段（按列存储）和索引参数导出为二进制快照包，
+    可通过 /snapshots/{snapshot_name} 下载，并在其他节点上用 /snapshots/import 重建集合
+
+    参数：
+    - provider: 向量数据库提供商名称
+    - collection_name: 集合名称
+
+    返回：
+    - 快照信息：snapshot_name、count、size_bytes、elapsed_seconds
+    """
+    try:
+        snapshot_service = SnapshotService()
+        return await run_in_threadpool(snapshot_service.export_snapshot, provider, collection_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error exporting collection snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/snapshots")
+async def list_snapshots():
+    """
+    列出本节点的集合快照
+
+    返回：
+    - snapshots: 快照文件列表
+    """
+    try:
+        return {"snapshots": SnapshotService().list_snapshots()}
+    except Exception as e:
+        logger.error(f"Error listing snapshots: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/snapshots/{snapshot_name}")
+async def download_snapshot(snapshot_name: str):
+    """
+    下载集合快照文件
+
+    参数：
+    - snapshot_name: 快照文件名
+
+    返回：
+    - 快照zip文件
+    """
+    try:
+        path = SnapshotService().get_snapshot_path(snapshot_name)
+        return FileResponse(path, media_type="application/zip", filename=snapshot_name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/snapshots/import")
+async def import_snapshot(
+    file: UploadFile = File(None),
+    snapshot_name: str = Form(None),
+    collection_name: str = Form(None),
+    overwrite: bool = Form(False),
+):
+    """
+    从快照导入集合
+
+    功能：上传快照文件或指定本节点已有的快照，批量重建集合（含分区、索引参数和集合目录信息）
+
+    参数：
+    - file: 上传的快照文件（与snapshot_name二选一）
+    - snapshot_name: 快照目录中已有的快照文件名
+    - collection_name: 目标集合名称（可选），默认使用快照中的集合名称
+    - overwrite: 目标集合已存在时是否删除后重建
+
+    返回：
+    - 导入结果信息
+    """
+    try:
+        snapshot_service = SnapshotService()
+        if file is not None:
+            snapshot_path = os.path.join(snapshot_service.snapshot_dir, os.path.basename(file.filename))
+            with open(snapshot_path, "wb") as buffer:
+                await run_in_threadpool(shutil.copyfileobj, file.file, buffer)
+        elif snapshot_name:
+            snapshot_path = snapshot_service.get_snapshot_path(snapshot_name)
+        else:
+            raise HTTPException(status_code=400, detail="Either file or snapshot_name is required")
+
+        return await run_in_threadpool(
+            snapshot_service.import_snapshot, snapshot_path, collection_name, overwrite
+        )
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.delete("/collections/{provider}/{collection_name}")
 async def delete_collection(provider: str, collection_name: str):
     """
@@ -1361,163 +1999,88 @@ async def chunk_document(data: dict = Body(...)):
 async def evaluate_search(
     file: UploadFile = File(...),
     collection_id: str = Form(...),
+    provider: str = Form(VectorDBProvider.MILVUS.value),
     top_k: int = Form(10),
     threshold: float = Form(0.7),
+    word_count_threshold: int = Form(30),
+    batch_size: int = Form(EVALUATION_CONFIG["batch_size"]),
+    concurrency: int = Form(EVALUATION_CONFIG["concurrency"]),
+    stream: bool = Form(False),
 ):
     """
     评估搜索效果
     
-    功能：使用CSV文件中的查询和标签评估搜索系统的准确性
+    功能：使用CSV文件中的查询和标签评估搜索系统的准确性。查询按批嵌入和搜索，多个批次并发执行
     
     参数：
     - file: 包含查询和标签的CSV文件
     - collection_id: 要搜索的集合ID
+    - provider: 向量数据库提供商（默认milvus）
     - top_k: 每个查询返回的结果数量（默认10）
     - threshold: 相似度阈值（默认0.7）
+    - word_count_threshold: 最小字数阈值（默认30）
+    - batch_size: 每批查询数，每批共用一次嵌入调用和一次搜索（默认32）
+    - concurrency: 同时执行的批次数上限（默认4）
+    - stream: 是否以NDJSON流返回进度（默认false）；为true时每完成一批输出一行progress事件，
+      最后输出一行result事件
     
     返回：
-    - results: 每个查询的详细评估结果
-    - average_scores: 平均分数（score_hit和score_find）
+    - results: 每个查询的详细评估结果（含 recall、precision、hit、mrr、ndcg）
+    - average_scores: 平均分数（score_hit、score_find、recall@k、precision@k、hit_rate@k、mrr、ndcg@k）
+    - per_label: 按期望页码统计的命中率
+    - latency: 各阶段延迟的 mean/p50/p95/p99/max，以及总耗时和吞吐
     - total_queries: 有效查询总数
+    - failed_queries: 搜索失败的查询数
     - parameters: 评估参数
     """
     try:
         # 读取CSV文件
         df = pd.read_csv(file.file)
-
-        # 只合并前四列的文本内容
-        df["combined_text"] = df.apply(
-            lambda row: " ".join(
-                str(val)
-                for i, val in enumerate(row)
-                if i < 4 and pd.notna(val) and val != "[]"
-            ),
-            axis=1,
+        cases = await run_in_threadpool(evaluation_service.parse_cases, df)
+        if not cases:
+            raise HTTPException(status_code=400, detail="No valid queries found in the CSV file")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading evaluation file: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    provider_str = provider.lower().strip()
+    events = evaluation_service.evaluate(
+        cases,
+        provider=provider_str,
+        collection_id=collection_id,
+        top_k=top_k,
+        threshold=threshold,
+        word_count_threshold=word_count_threshold,
+        batch_size=batch_size,
+        concurrency=concurrency,
+    )
+
+    async def finish(event: dict) -> dict:
+        event["evaluation"]["output_files"] = await run_in_threadpool(
+            evaluation_service.save, event["evaluation"]
         )
+        return event
 
-        # 初始化SearchService
-        search_service = SearchService()
-
-        results = []
-        total_score_hit = 0
-        total_score_find = 0
-        valid_queries = 0
-
-        # 处理每个查询
-        for _, row in df.iterrows():
-            # 跳过没有标签的行
-            if pd.isna(row["LABEL"]) or row["LABEL"] == "[]":
-                continue
-
+    if stream:
+        async def event_lines():
             try:
-                # 解析标签页码列表
-                label_str = str(row["LABEL"]).strip("[]").replace(" ", "")
-                if label_str:
-                    expected_pages = [
-                        int(x.strip()) for x in label_str.split(",") if x.strip()
-                    ]
-                else:
-                    continue
-
-                # 执行搜索
-                search_results = await search_service.search(
-                    query=row["combined_text"],
-                    collection_id=collection_id,
-                    top_k=top_k,
-                    threshold=threshold,
-                )
-
-                # 提取找到的页码
-                found_pages = [
-                    int(result["metadata"]["page"]) for result in search_results
-                ]
-
-                # 计算分数
-                hits = sum(1 for page in found_pages if page in expected_pages)
-                score_hit = hits / len(found_pages) if found_pages else 0
-                score_find = len(set(found_pages) & set(expected_pages)) / len(
-                    expected_pages
-                )
-
-                # 添加到结果列表，包括所有top_k结果的文本
-                result_entry = {
-                    "query": row["combined_text"],
-                    "expected_pages": expected_pages,
-                    "found_pages": found_pages,
-                    "score_hit": score_hit,
-                    "score_find": score_find,
-                }
-
-                # 添加每个top_k结果的文本作为单独的字段
-                for i, result in enumerate(search_results, 1):
-                    result_entry[f"text_{i}"] = result["text"]
-                    result_entry[f"page_{i}"] = result["metadata"]["page"]
-                    result_entry[f"score_{i}"] = result["score"]
-
-                results.append(result_entry)
-
-                total_score_hit += score_hit
-                total_score_find += score_find
-                valid_queries += 1
-
+                async for event in events:
+                    if event["event"] == "result":
+                        event = await finish(event)
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
             except Exception as e:
-                logger.warning(f"Error processing row: {str(e)}")
-                continue
-
-        if valid_queries == 0:
-            raise ValueError("No valid queries found in the CSV file")
-
-        # 计算平均分数
-        average_scores = {
-            "score_hit": total_score_hit / valid_queries,
-            "score_find": total_score_find / valid_queries,
-        }
-
-        # 保存结果
-        output_dir = Path("06-evaluation-result")
-        output_dir.mkdir(exist_ok=True)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # 保存详细的JSON结果
-        output_path = output_dir / f"evaluation_results_{timestamp}.json"
-        evaluation_results = {
-            "results": results,
-            "average_scores": average_scores,
-            "total_queries": valid_queries,
-            "parameters": {
-                "collection_id": collection_id,
-                "top_k": top_k,
-                "threshold": threshold,
-            },
-        }
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(evaluation_results, f, indent=2)
-
-        # 保存CSV格式的结果，每个top_k结果单独一列
-        results_df = pd.DataFrame(results)
-
-        # 重新排列列的顺序，使其更有逻辑性
-        column_order = [
-            "query",
-            "expected_pages",
-            "found_pages",
-            "score_hit",
-            "score_find",
-        ]
-        for i in range(1, top_k + 1):
-            column_order.extend([f"page_{i}", f"score_{i}", f"text_{i}"])
+                logger.error(f"Error during evaluation: {str(e)}")
+                yield json.dumps({"event": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
 
-        # 只选择存在的列
-        existing_columns = [col for col in column_order if col in results_df.columns]
-        results_df = results_df[existing_columns]
-
-        csv_path = output_dir / f"evaluation_results_{timestamp}.csv"
-        results_df.to_csv(csv_path, index=False)
-
-        return evaluation_results
+        return StreamingResponse(event_lines(), media_type="application/x-ndjson")
 
+    try:
+        async for event in events:
+            if event["event"] == "result":
+                return (await finish(event))["evaluation"]
+            logger.info(f"Evaluation progress: {event['processed']}/{event['total']}")
     except Exception as e:
         logger.error(f"Error during evaluation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1583,6 +2146,7 @@ async def generate_response(
     model_name: str = Body(...),
     search_results: List[Dict] = Body(...),
     api_key: Optional[str] = Body(None),
+    stream: bool = Body(False),
 ):
     """
     基于搜索结果生成回答
@@ -1595,12 +2159,22 @@ async def generate_response(
     - model_name: 生成模型名称
     - search_results: 搜索结果列表
     - api_key: API密钥（可选）
+    - stream: 是否以Server-Sent Events流式返回（默认false）：模型产出的文本片段到达即发送token事件，
+      DeepSeek推理模型的思维过程为reasoning事件，最后为包含完整回答和保存路径的done事件
     
     返回：
     - 生成的回答内容
     """
     try:
         generation_service = GenerationService()
+        if stream:
+            return _sse_response(generation_service.generate_stream(
+                provider=provider,
+                model_name=model_name,
+                query=query,
+                search_results=search_results,
+                api_key=api_key,
+            ))
         result = generation_service.generate(
             provider=provider,
             model_name=model_name,
@@ -1692,10 +2266,22 @@ async def search_with_path_param(provider: str, body: dict = Body(...)):
     参数（请求体）：
     - query: 搜索查询文本
     - collection_id: 集合ID
+    - collection_ids / collection_pattern / tag: 多集合并发搜索（可选）
     - top_k: 返回结果数量（默认3）
     - threshold: 相似度阈值（默认0.5）
     - word_count_threshold: 最小字数阈值（默认30）
+    - filters: 结构化过滤条件（可选），如 {"document_name": ["a.pdf"], "page_number": "3", "word_count": {"gte": 30}}
     - save_results: 是否保存搜索结果（默认false）
+    - mode: 检索模式（默认vector）；hybrid 为BM25关键词检索与向量检索按RRF融合，仅支持单集合
+    - rerank: 是否用交叉编码器对候选重排序（默认false，仅支持单集合）
+    - rerank_k: 重排序的候选数（可选，默认 top_k 的若干倍）
+    - mmr: 是否按最大边际相关（MMR）返回多样化的结果（默认false，仅支持单集合的向量检索，不与重排序同用）
+    - mmr_lambda: MMR的相关性权重，0~1（可选，默认0.5）
+    - mmr_k: MMR的候选数（可选，默认 top_k 的若干倍）
+    - expand_neighbors: 为每个命中补充同一文档中前后各多少个块作为上下文（默认0不扩展，最多5，仅支持单集合）
+    - range_search: 是否返回相似度阈值以上的全部结果（默认false，忽略top_k，最多100个；仅支持单集合的向量检索，不与重排序、MMR同用）
+    - stream: 是否以Server-Sent Events流式返回（默认false，仅支持单集合）：依次为阶段事件
+      （embedded、candidates、reranked / diversified）、每条结果一个result事件，最后为done事件
     
     返回：
     - results: 搜索结果列表，包含文本内容、元数据和相似度分数
@@ -1707,15 +2293,25 @@ async def search_with_path_param(provider: str, body: dict = Body(...)):
         top_k = body.get("top_k", 3)
         threshold = body.get("threshold", 0.5)  # 相似度阈值默认50%
         word_count_threshold = body.get("word_count_threshold", 30)  # 最小字数默认30
+        filters = body.get("filters")  # 结构化过滤条件，下推到数据库执行
         save_results = body.get("save_results", False)
+        mode = body.get("mode", "vector")
+        rerank = body.get("rerank", False)
+        rerank_k = body.get("rerank_k")
+        mmr = body.get("mmr", False)
+        mmr_lambda = body.get("mmr_lambda")
+        mmr_k = body.get("mmr_k")
+        expand_neighbors = body.get("expand_neighbors", 0)
+        range_search = body.get("range_search", False)
+        stream = body.get("stream", False)
 
         # Log the incoming search request details
         logger.info(
             f"Search request with path param - Raw Provider: {provider}, Query: {query}, Collection: {collection_id}, Top K: {top_k}, Threshold: {threshold}, Word Count Threshold: {word_count_threshold}"
         )
 
-        # 验证集合ID是否为字符串
-        if not isinstance(collection_id, str):
+        # 验证集合ID是否为字符串（列表形式由多集合搜索处理）
+        if not isinstance(collection_id, (str, list)):
             collection_id = str(collection_id)
             logger.warning(f"Converted collection_id to string: {collection_id}")
 
@@ -1738,9 +2334,47 @@ async def search_with_path_param(provider: str, body: dict = Body(...)):
 
         search_service = SearchService()
 
+        # 多集合并发搜索
+        # 按模式或标签解析集合时需要列出集合，在I/O线程池中执行
+        targets = await run_io(_get_fanout_targets, search_service, provider_str, body)
+        if targets is not None:
+            if mode != "vector" or rerank or mmr or expand_neighbors or range_search or stream:
+                raise HTTPException(status_code=400, detail="Hybrid search, reranking, MMR, neighbour expansion, range search and streaming are only supported on a single collection")
+            results = await search_service.search_collections(
+                provider=provider_str,
+                query=query,
+                collection_ids=targets,
+                top_k=top_k,
+                threshold=threshold,
+                word_count_threshold=word_count_threshold,
+                filters=filters,
+                save_results=save_results,
+            )
+            return {"results": results}
+
         # Log before calling the search function
         logger.info("Calling search service...")
 
+        if stream:
+            return _sse_response(search_service.search_stream(
+                provider=provider_str,
+                query=query,
+                collection_id=collection_id,
+                top_k=top_k,
+                threshold=threshold,
+                word_count_threshold=word_count_threshold,
+                filters=filters,
+                save_results=save_results,
+                mode=mode,
+                rerank=rerank,
+                rerank_k=rerank_k,
+                mmr=mmr,
+                mmr_lambda=mmr_lambda,
+                mmr_k=mmr_k,
+                expand_neighbors=expand_neighbors,
+                range_search=range_search,
+            ))
+
         results = await search_service.search(
             provider=provider_str,
             query=query,
@@ -1748,13 +2382,24 @@ async def search_with_path_param(provider: str, body: dict = Body(...)):
             top_k=top_k,
             threshold=threshold,
             word_count_threshold=word_count_threshold,
+            filters=filters,
             save_results=save_results,
+            mode=mode,
+            rerank=rerank,
+            rerank_k=rerank_k,
+            mmr=mmr,
+            mmr_lambda=mmr_lambda,
+            mmr_k=mmr_k,
+            expand_neighbors=expand_neighbors,
+            range_search=range_search,
         )
 
         # Log the search results
         logger.info(f"Search response: {results}")
 
         return {"results": results}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error performing search: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -2033,6 +2678,48 @@ async def web_scraping_status():
         }
 
 
+@app.post("/maintenance/gc")
+async def run_garbage_collection(data: dict = Body(default={})):
+    """
+    执行保留策略和垃圾回收
+
+    功能：每个来源只保留最新的N份产物文件和时间戳集合，删除被取代的部分，
+    压缩向量库并报告回收的字节数。也可通过 `python -m services.retention_service` 定时执行
+
+    参数：
+    - dry_run: 只报告将被删除的内容（可选，默认False）
+    - policy: 覆盖默认保留策略的字段（可选），如 {"collections_keep_latest": 1}
+
+    返回：
+    - 回收报告：deleted_files、deleted_collections、compaction、reclaimed_bytes
+    """
+    try:
+        policy = data.get("policy") or {}
+        if not isinstance(policy, dict):
+            raise HTTPException(status_code=400, detail="policy must be an object")
+        retention_service = RetentionService(policy)
+        return await run_in_threadpool(retention_service.run, bool(data.get("dry_run", False)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running garbage collection: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics/event-loop")
+async def get_event_loop_metrics():
+    """
+    获取事件循环延迟统计
+    
+    功能：按固定间隔采样事件循环的唤醒延迟，用于确认搜索中的模型推理和数据库调用没有阻塞事件循环
+    
+    返回：
+    - 最近窗口内延迟的均值、p50/p95/p99和最大值（毫秒）、启动以来的最大值
+    - executors: 推理线程池、I/O线程池的大小和同时执行的搜索数上限
+    """
+    return event_loop_monitor.stats()
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -2041,10 +2728,18 @@ async def health_check():
     功能：检查系统运行状态
     
     返回：
-    - status: 系统状态（healthy）
+    - status: 系统状态（healthy；启用了向量库sidecar但无法连接时为degraded）
     - timestamp: 检查时间戳
-    """
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    - sidecar: 向量库sidecar状态（仅在启用时返回）
+    """
+    health = {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    if sidecar_enabled():
+        try:
+            health["sidecar"] = await run_in_threadpool(get_sidecar_client().call, "ping")
+        except Exception as e:
+            health["status"] = "degraded"
+            health["sidecar"] = {"error": str(e)}
+    return health
 
 
 if __name__ == "__main__":
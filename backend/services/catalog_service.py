@@ -0,0 +1,233 @@
+import os
+import copy
+import json
+import time
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+from utils.config import CATALOG_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionCatalog:
+    """
+    集合目录类，以JSON文件持久化每个集合的集合级信息（如推荐索引参数）
+    """
+    def __init__(self, uri: str = CATALOG_CONFIG["uri"]):
+        """
+        初始化集合目录
+
+        参数:
+            uri: 目录文件路径
+        """
+        self.uri = uri
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        # 已解析的目录内容及其对应的文件签名，文件被替换后才重新解析
+        self._cache: Optional[tuple] = None
+
+    @staticmethod
+    def _key(provider: str, collection_name: str) -> str:
+        """
+        生成目录条目的键
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            形如 provider/collection_name 的键
+        """
+        return f"{str(provider).lower().strip()}/{collection_name}"
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        持有目录文件的进程间排他锁（API worker、sidecar和后台任务都会写目录），
+        读-改-写必须在锁内完成，否则并发写入会互相覆盖条目；同一线程内可重入
+        """
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            os.makedirs(os.path.dirname(self.uri) or ".", exist_ok=True)
+            with open(f"{self.uri}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _signature(stat: os.stat_result) -> tuple:
+        """
+        文件签名：写入总是替换为新文件，inode与修改时间、大小一起判断文件是否变化
+        """
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> Dict[str, Any]:
+        """
+        读取目录内容，文件未变化时直接返回已解析的内容；调用方不能修改返回的字典
+
+        返回:
+            目录内容字典，文件不存在时返回空字典
+
+        异常:
+            ValueError: 目录文件损坏；此时不能当作空目录，否则下一次写入会抹掉所有集合的条目
+        """
+        with self._lock:
+            try:
+                signature = self._signature(os.stat(self.uri))
+            except FileNotFoundError:
+                return {}
+            if self._cache and self._cache[0] == signature:
+                return self._cache[1]
+            try:
+                with open(self.uri, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except json.JSONDecodeError as e:
+                logger.error(f"Error reading collection catalog {self.uri}: {str(e)}")
+                raise ValueError(f"Collection catalog {self.uri} is corrupt: {str(e)}")
+            self._cache = (signature, data)
+            return data
+
+    def _write(self, data: Dict[str, Any]):
+        """
+        原子地写入目录文件（先写同目录下的唯一临时文件再替换），调用方需持有文件锁
+
+        参数:
+            data: 目录内容字典
+        """
+        directory = os.path.dirname(self.uri) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.uri)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.uri)
+            self._cache = (self._signature(os.stat(self.uri)), data)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, provider: str, collection_name: str) -> Dict[str, Any]:
+        """
+        获取集合的目录条目
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            目录条目字典，不存在时返回空字典
+        """
+        with self._lock:
+            return copy.deepcopy(self._read().get(self._key(provider, collection_name), {}))
+
+    def update(self, provider: str, collection_name: str, **fields) -> Dict[str, Any]:
+        """
+        合并更新集合的目录条目
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            fields: 需要写入的字段
+
+        返回:
+            更新后的目录条目
+        """
+        with self._file_lock():
+            data = dict(self._read())
+            key = self._key(provider, collection_name)
+            entry = copy.deepcopy(data.get(key) or {
+                "provider": str(provider).lower().strip(),
+                "collection_name": collection_name,
+                "created_at": datetime.now().isoformat()
+            })
+            entry.update(copy.deepcopy(fields))
+            entry["updated_at"] = datetime.now().isoformat()
+            data[key] = entry
+            self._write(data)
+            return copy.deepcopy(entry)
+
+    def bump_version(self, provider: str, collection_name: str) -> int:
+        """
+        集合数据或搜索行为发生变化后递增集合版本，用于使搜索结果缓存失效；
+        版本取纳秒时间戳与原版本+1中的较大者，集合删除后以同名重建也不会与旧版本重复
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            新版本号
+        """
+        with self._file_lock():
+            version = max(time.time_ns(), int(self.get(provider, collection_name).get("version", 0)) + 1)
+            self.update(provider, collection_name, version=version)
+            return version
+
+    def version(self, provider: str, collection_name: str) -> int:
+        """
+        获取集合的当前版本，集合不在目录中时返回0
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            版本号
+        """
+        return int(self.get(provider, collection_name).get("version", 0))
+
+    def remove(self, provider: str, collection_name: str) -> bool:
+        """
+        删除集合的目录条目
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            是否删除了条目
+        """
+        with self._file_lock():
+            data = dict(self._read())
+            if data.pop(self._key(provider, collection_name), None) is None:
+                return False
+            self._write(data)
+            return True
+
+    def list(self, provider: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        列出目录条目
+
+        参数:
+            provider: 向量数据库提供商，为None时列出全部
+
+        返回:
+            目录条目列表
+        """
+        with self._lock:
+            entries = copy.deepcopy(list(self._read().values()))
+        if provider:
+            provider = str(provider).lower().strip()
+            entries = [e for e in entries if e.get("provider") == provider]
+        return entries
+
+
+# 创建全局目录实例
+collection_catalog = CollectionCatalog()
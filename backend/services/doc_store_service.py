@@ -0,0 +1,296 @@
+import os
+import json
+import mmap
+import shutil
+import zlib
+import threading
+from typing import Dict, Any, List, Iterable, Optional
+import logging
+import numpy as np
+from utils.config import DOC_STORE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 索引文件中每条记录的结构：行ID、在数据文件中的偏移和压缩后的长度，按行ID升序排列
+INDEX_DTYPE = np.dtype([("id", "<i8"), ("offset", "<i8"), ("length", "<i4")])
+
+
+class ChunkTextStore:
+    """
+    块文本存储类：按集合把块文本等行级大字段压缩后追加写入数据文件，
+    通过按行ID排序的索引文件定位，读取时内存映射两个文件，只解压被请求的行
+
+    每个集合对应一个目录：
+        data.bin   zlib压缩的JSON记录，只追加
+        index.npy  行ID -> (偏移, 长度) 的有序数组
+    更新或删除行只改写索引，旧记录留在数据文件中，由compact回收
+    """
+
+    def __init__(self, uri: str = DOC_STORE_CONFIG["uri"]):
+        """
+        初始化块文本存储
+
+        参数:
+            uri: 存储根目录
+        """
+        self.uri = uri
+        self._lock = threading.RLock()
+        # 已打开的内存映射，按索引文件的修改时间失效
+        self._readers: Dict[str, tuple] = {}
+
+    def _collection_dir(self, provider: str, collection_name: str) -> str:
+        """
+        获取集合的存储目录
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            目录路径
+        """
+        return os.path.join(self.uri, str(provider).lower().strip(), collection_name)
+
+    def exists(self, provider: str, collection_name: str) -> bool:
+        """
+        集合是否有块文本存储
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            是否存在
+        """
+        return os.path.exists(os.path.join(self._collection_dir(provider, collection_name), "index.npy"))
+
+    def _load_index(self, directory: str) -> np.ndarray:
+        """
+        读取集合的完整索引（写入时使用，不做内存映射）
+
+        参数:
+            directory: 集合存储目录
+
+        返回:
+            索引数组，不存在时返回空数组
+        """
+        path = os.path.join(directory, "index.npy")
+        if not os.path.exists(path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.load(path)
+
+    def _write_index(self, directory: str, index: np.ndarray):
+        """
+        原子地写入索引文件（先写临时文件再替换），已打开的读者继续使用旧文件
+
+        参数:
+            directory: 集合存储目录
+            index: 按行ID排序的索引数组
+        """
+        tmp_path = os.path.join(directory, "index.tmp.npy")
+        np.save(tmp_path, index)
+        os.replace(tmp_path, os.path.join(directory, "index.npy"))
+
+    def put(self, provider: str, collection_name: str, records: Dict[int, Dict[str, Any]]) -> int:
+        """
+        写入或覆盖行记录
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            records: 行ID -> 记录字典
+
+        返回:
+            写入的记录数
+        """
+        if not records:
+            return 0
+        directory = self._collection_dir(provider, collection_name)
+        level = DOC_STORE_CONFIG["compression_level"]
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            entries = np.empty(len(records), dtype=INDEX_DTYPE)
+            with open(os.path.join(directory, "data.bin"), "ab") as f:
+                offset = f.tell()
+                for i, (row_id, record) in enumerate(records.items()):
+                    blob = zlib.compress(json.dumps(record, ensure_ascii=False).encode("utf-8"), level)
+                    f.write(blob)
+                    entries[i] = (int(row_id), offset, len(blob))
+                    offset += len(blob)
+            # 新记录覆盖同ID的旧记录
+            index = self._load_index(directory)
+            index = index[~np.isin(index["id"], entries["id"])]
+            index = np.concatenate([index, entries])
+            index.sort(order="id")
+            self._write_index(directory, index)
+        return len(records)
+
+    def delete(self, provider: str, collection_name: str, row_ids: Iterable[int]) -> int:
+        """
+        删除行记录（只从索引中移除，空间由compact回收）
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            row_ids: 行ID列表
+
+        返回:
+            删除的记录数
+        """
+        row_ids = np.fromiter((int(r) for r in row_ids), dtype="<i8")
+        directory = self._collection_dir(provider, collection_name)
+        if not len(row_ids) or not os.path.isdir(directory):
+            return 0
+        with self._lock:
+            index = self._load_index(directory)
+            keep = ~np.isin(index["id"], row_ids)
+            self._write_index(directory, index[keep])
+        return int((~keep).sum())
+
+    def _reader(self, directory: str) -> Optional[tuple]:
+        """
+        获取集合的内存映射读者，索引文件更新后重新打开
+
+        参数:
+            directory: 集合存储目录
+
+        返回:
+            (索引数组, 数据文件映射)，集合没有存储或为空时返回None
+        """
+        index_path = os.path.join(directory, "index.npy")
+        try:
+            mtime = os.stat(index_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._readers.get(directory)
+            if cached and cached[0] == mtime:
+                return cached[1], cached[2]
+            try:
+                index = np.load(index_path, mmap_mode="r")
+            except ValueError:
+                # 空数组无法内存映射
+                index = np.load(index_path)
+            data = None
+            if len(index):
+                with open(os.path.join(directory, "data.bin"), "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._readers[directory] = (mtime, index, data)
+            return index, data
+
+    def get(self, provider: str, collection_name: str, row_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        读取行记录，只解压被请求的行
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            row_ids: 行ID列表
+
+        返回:
+            行ID -> 记录字典，不存在的行不出现在结果中
+        """
+        reader = self._reader(self._collection_dir(provider, collection_name))
+        if not reader or reader[1] is None or not row_ids:
+            return {}
+        index, data = reader
+        wanted = np.asarray([int(r) for r in row_ids], dtype="<i8")
+        positions = np.searchsorted(index["id"], wanted)
+        records = {}
+        for row_id, pos in zip(wanted.tolist(), positions.tolist()):
+            if pos >= len(index) or int(index["id"][pos]) != row_id:
+                continue
+            offset, length = int(index["offset"][pos]), int(index["length"][pos])
+            records[row_id] = json.loads(zlib.decompress(data[offset:offset + length]).decode("utf-8"))
+        return records
+
+    def iter_records(self, provider: str, collection_name: str, batch_size: int = 1000):
+        """
+        按行ID顺序分批遍历集合的全部记录
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            batch_size: 每批记录数
+
+        返回:
+            生成器，每次产出一个 行ID -> 记录字典
+        """
+        reader = self._reader(self._collection_dir(provider, collection_name))
+        if not reader:
+            return
+        ids = reader[0]["id"].tolist()
+        for start in range(0, len(ids), batch_size):
+            yield self.get(provider, collection_name, ids[start:start + batch_size])
+
+    def compact(self, provider: str, collection_name: str) -> Dict[str, int]:
+        """
+        压缩存储：只保留索引中仍然引用的记录，重写数据文件
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            压缩前后数据文件的字节数
+        """
+        directory = self._collection_dir(provider, collection_name)
+        data_path = os.path.join(directory, "data.bin")
+        if not os.path.exists(data_path):
+            return {"size_before": 0, "size_after": 0}
+        with self._lock:
+            size_before = os.path.getsize(data_path)
+            index = self._load_index(directory)
+            new_index = index.copy()
+            tmp_path = os.path.join(directory, "data.tmp.bin")
+            with open(data_path, "rb") as src, open(tmp_path, "wb") as dst:
+                offset = 0
+                for i, (_, old_offset, length) in enumerate(index.tolist()):
+                    src.seek(old_offset)
+                    dst.write(src.read(length))
+                    new_index["offset"][i] = offset
+                    offset += length
+            # 先替换数据文件再替换索引；替换期间的读者持有旧文件的映射，不受影响
+            os.replace(tmp_path, data_path)
+            self._write_index(directory, new_index)
+            self._readers.pop(directory, None)
+        return {"size_before": size_before, "size_after": os.path.getsize(data_path)}
+
+    def list_collections(self) -> List[tuple]:
+        """
+        列出有块文本存储的集合
+
+        返回:
+            (provider, 集合名称) 列表
+        """
+        result = []
+        if not os.path.isdir(self.uri):
+            return result
+        for provider in sorted(os.listdir(self.uri)):
+            provider_dir = os.path.join(self.uri, provider)
+            if os.path.isdir(provider_dir):
+                result.extend((provider, name) for name in sorted(os.listdir(provider_dir)))
+        return result
+
+    def drop(self, provider: str, collection_name: str) -> bool:
+        """
+        删除集合的块文本存储
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            是否删除了存储
+        """
+        directory = self._collection_dir(provider, collection_name)
+        with self._lock:
+            self._readers.pop(directory, None)
+            if not os.path.isdir(directory):
+                return False
+            shutil.rmtree(directory)
+            return True
+
+
+# 创建全局块文本存储实例
+chunk_text_store = ChunkTextStore()
@@ -2,9 +2,12 @@ import os
 import dotenv
 dotenv.load_dotenv()
 import json
+import math
+import logging
 from datetime import datetime
 from enum import Enum
 from langchain_community.embeddings import OpenAIEmbeddings, HuggingFaceEmbeddings
+from services.model_registry import model_registry
 
 class EmbeddingProvider(str, Enum):
     """
@@ -113,9 +116,34 @@ class EmbeddingService:
                 }
                 results.append(embedding_result)
         
+        if results:
+            self._register_model(config, embedding_function, results[0]["embedding"])
+        
         # 返回结果和空的metadata（因为metadata已经包含在每个embedding中）
         return results, {}
 
+    @staticmethod
+    def _register_model(config: EmbeddingConfig, embedding_function, vector: list):
+        """
+        在模型登记表中登记模型实际输出的维度、是否归一化和最大token数，搜索据此在加载模型前校验维度
+        
+        参数:
+            config: 嵌入配置对象
+            embedding_function: 生成该向量的嵌入函数
+            vector: 模型输出的一个向量
+        """
+        try:
+            norm = math.sqrt(sum(float(x) * float(x) for x in vector))
+            # HuggingFace嵌入函数持有SentenceTransformer实例，可直接读取其最大序列长度
+            max_tokens = getattr(getattr(embedding_function, "client", None), "max_seq_length", None)
+            model_registry.register(
+                config.provider, config.model_name, len(vector),
+                max_tokens=int(max_tokens) if isinstance(max_tokens, int) else None,
+                normalized=abs(norm - 1.0) < 1e-3
+            )
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Could not register embedding model {config.model_name}: {str(e)}")
+
     def save_embeddings(self, doc_name: str, embeddings: list) -> str:
         """
         保存嵌入向量到JSON文件
@@ -199,6 +227,24 @@ class EmbeddingService:
         embedding_function = self.embedding_factory.create_embedding_function(config)
         return embedding_function.embed_query(text)
 
+    def create_query_embeddings(self, texts: list, provider: str, model: str) -> list:
+        """
+        批量创建多个查询文本的嵌入向量，所有文本在一次批量调用中编码
+
+        参数:
+            texts: 需要嵌入的文本列表
+            provider: 嵌入提供商
+            model: 嵌入模型名称
+
+        返回:
+            与texts一一对应的嵌入向量列表
+        """
+        if not texts:
+            return []
+        config = EmbeddingConfig(provider=provider, model_name=model)
+        embedding_function = self.embedding_factory.create_embedding_function(config)
+        return embedding_function.embed_documents(list(texts))
+
     def get_document_embedding_config(self, collection_name: str) -> EmbeddingConfig:
         """
         从已存在的文档中获取嵌入配置
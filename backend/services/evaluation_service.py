@@ -0,0 +1,332 @@
+import json
+import math
+import time
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, AsyncIterator
+import logging
+import numpy as np
+import pandas as pd
+from services.search_service import SearchService
+from utils.config import EVALUATION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationService:
+    """
+    检索评估服务类：用带页码标签的查询集评估搜索效果
+
+    查询按批执行（每批一次嵌入调用和一次多向量搜索），批次在并发上限内同时执行；
+    每完成一批产生一个进度事件，全部完成后产生包含IR指标和各阶段延迟分位数的结果事件
+    """
+
+    LATENCY_STAGES = ("open_ms", "embedding_ms", "search_ms", "total_ms", "per_query_ms")
+
+    def __init__(self, search_service: Optional[SearchService] = None):
+        """
+        初始化评估服务
+
+        参数:
+            search_service: 搜索服务实例，默认新建
+        """
+        self.search_service = search_service or SearchService()
+
+    @staticmethod
+    def parse_cases(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        从评估CSV中解析查询和期望页码
+
+        查询文本为前四列非空内容的拼接，LABEL列为期望页码列表（如 "[3, 4]"），没有标签的行被跳过
+
+        参数:
+            df: 评估CSV的DataFrame
+
+        返回:
+            查询列表，每项包含query和expected_pages
+        """
+        if "LABEL" not in df.columns:
+            raise ValueError("Evaluation CSV must contain a LABEL column")
+        label_index = df.columns.get_loc("LABEL")
+        cases = []
+        for row in df.itertuples(index=False):
+            values = list(row)
+            label = values[label_index]
+            if pd.isna(label) or label == "[]":
+                continue
+            label_str = str(label).strip("[]").replace(" ", "")
+            try:
+                expected_pages = [int(x) for x in label_str.split(",") if x.strip()]
+            except ValueError:
+                logger.warning(f"Skipping row with invalid LABEL: {label}")
+                continue
+            if not expected_pages:
+                continue
+            query = " ".join(
+                str(val) for val in values[:4] if pd.notna(val) and val != "[]"
+            )
+            cases.append({"query": query, "expected_pages": expected_pages})
+        return cases
+
+    @staticmethod
+    def _page_of(hit: Dict[str, Any]) -> Optional[int]:
+        """
+        读取搜索结果的页码，无法解析时返回None
+        """
+        try:
+            return int(hit["metadata"]["page"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def score_query(found_pages: List[Optional[int]], expected_pages: List[int], top_k: int) -> Dict[str, float]:
+        """
+        计算单个查询的检索指标（以页码为相关性单位，二元相关）
+
+        同一页在结果中重复出现时只有首次出现计为相关，避免重叠分块抬高 nDCG
+
+        参数:
+            found_pages: 按排名排列的结果页码
+            expected_pages: 期望页码
+            top_k: 截断位置k
+
+        返回:
+            recall（即原 score_find）、precision（即原 score_hit）、hit、mrr、ndcg
+        """
+        expected = set(expected_pages)
+        ranked = found_pages[:top_k]
+        seen = set()
+        dcg = 0.0
+        first_rank = None
+        for rank, page in enumerate(ranked, 1):
+            if page in expected and page not in seen:
+                seen.add(page)
+                dcg += 1.0 / math.log2(rank + 1)
+                if first_rank is None:
+                    first_rank = rank
+        ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(expected), top_k) + 1))
+        return {
+            "recall": len(seen) / len(expected),
+            "precision": sum(1 for page in ranked if page in expected) / len(ranked) if ranked else 0.0,
+            "hit": 1.0 if first_rank else 0.0,
+            "mrr": 1.0 / first_rank if first_rank else 0.0,
+            "ndcg": dcg / ideal if ideal else 0.0,
+        }
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, float]:
+        """
+        计算延迟的均值、p50/p95/p99和最大值
+        """
+        if not values:
+            return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        data = np.asarray(values, dtype=np.float64)
+        p50, p95, p99 = np.percentile(data, [50, 95, 99])
+        return {
+            "mean": round(float(data.mean()), 2),
+            "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2),
+            "p99": round(float(p99), 2),
+            "max": round(float(data.max()), 2),
+        }
+
+    async def evaluate(self,
+                       cases: List[Dict[str, Any]],
+                       provider: str,
+                       collection_id: str,
+                       top_k: int = 10,
+                       threshold: float = 0.7,
+                       word_count_threshold: int = 30,
+                       filters: Optional[Dict[str, Any]] = None,
+                       batch_size: int = EVALUATION_CONFIG["batch_size"],
+                       concurrency: int = EVALUATION_CONFIG["concurrency"]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        执行评估，以事件流的形式报告进度和结果
+
+        参数:
+            cases: parse_cases 解析出的查询列表
+            provider: 向量数据库提供商
+            collection_id: 要搜索的集合ID
+            top_k: 每个查询返回的结果数量
+            threshold: 相似度阈值
+            word_count_threshold: 最小字数阈值
+            filters: 结构化过滤条件
+            batch_size: 每批的查询数
+            concurrency: 同时执行的批次数上限
+
+        返回:
+            异步事件迭代器：每完成一批产生 {"event": "progress", ...}，
+            最后产生 {"event": "result", "evaluation": {...}}
+        """
+        if not cases:
+            raise ValueError("No valid queries found in the CSV file")
+        batch_size = max(1, int(batch_size))
+        semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+        batches = [cases[i:i + batch_size] for i in range(0, len(cases), batch_size)]
+        start_time = time.perf_counter()
+
+        async def run_batch(batch_index: int, batch: List[Dict[str, Any]]) -> tuple:
+            async with semaphore:
+                try:
+                    response = await self.search_service.search_batch(
+                        provider=provider,
+                        queries=[case["query"] for case in batch],
+                        collection_id=collection_id,
+                        top_k=top_k,
+                        threshold=threshold,
+                        word_count_threshold=word_count_threshold,
+                        filters=filters
+                    )
+                    if response.get("error"):
+                        raise ValueError(response["error"])
+                    return batch_index, batch, response, None
+                except Exception as e:
+                    logger.warning(f"Evaluation batch of {len(batch)} queries failed: {str(e)}")
+                    return batch_index, batch, None, str(e)
+
+        batch_results: Dict[int, List[Dict[str, Any]]] = {}
+        stage_latencies = {stage: [] for stage in self.LATENCY_STAGES}
+        failed = 0
+        processed = 0
+        for finished in asyncio.as_completed([run_batch(i, batch) for i, batch in enumerate(batches)]):
+            batch_index, batch, response, error = await finished
+            processed += len(batch)
+            if error is not None:
+                failed += len(batch)
+            else:
+                for stage in self.LATENCY_STAGES:
+                    if stage in response["timings"]:
+                        stage_latencies[stage].append(response["timings"][stage])
+                results = batch_results[batch_index] = []
+                for case, item in zip(batch, response["results"]):
+                    hits = item["results"]
+                    found_pages = [self._page_of(hit) for hit in hits]
+                    result_entry = {
+                        "query": case["query"],
+                        "expected_pages": case["expected_pages"],
+                        "found_pages": found_pages,
+                        **self.score_query(found_pages, case["expected_pages"], top_k),
+                    }
+                    # 兼容原有字段：score_hit 为命中结果占比，score_find 为期望页被找到的比例
+                    result_entry["score_hit"] = result_entry["precision"]
+                    result_entry["score_find"] = result_entry["recall"]
+                    # 每个top_k结果的文本作为单独的字段
+                    for i, hit in enumerate(hits, 1):
+                        result_entry[f"text_{i}"] = hit.get("text")
+                        result_entry[f"page_{i}"] = (hit.get("metadata") or {}).get("page")
+                        result_entry[f"score_{i}"] = hit.get("score")
+                    results.append(result_entry)
+            yield {
+                "event": "progress",
+                "processed": processed,
+                "total": len(cases),
+                "failed": failed,
+                "percent": round(processed / len(cases) * 100, 1),
+                "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 2),
+            }
+
+        # 批次按完成顺序处理，结果按CSV中的顺序输出
+        results = [result for i in sorted(batch_results) for result in batch_results[i]]
+        if not results:
+            raise ValueError("All evaluation queries failed")
+        wall_ms = (time.perf_counter() - start_time) * 1000
+        yield {
+            "event": "result",
+            "evaluation": {
+                "results": results,
+                "average_scores": self._aggregate(results, top_k),
+                "per_label": self._per_label(results),
+                "latency": {
+                    # 分位数按批统计，per_query_ms 为每批总耗时按查询数分摊
+                    "batches": len(stage_latencies["total_ms"]),
+                    **{stage: self._percentiles(values) for stage, values in stage_latencies.items()},
+                    "wall_ms": round(wall_ms, 2),
+                    "queries_per_second": round(len(results) / (wall_ms / 1000), 2) if wall_ms else 0.0,
+                },
+                "total_queries": len(results),
+                "failed_queries": failed,
+                "parameters": {
+                    "provider": provider,
+                    "collection_id": collection_id,
+                    "top_k": top_k,
+                    "threshold": threshold,
+                    "word_count_threshold": word_count_threshold,
+                    "filters": filters,
+                    "batch_size": batch_size,
+                    "concurrency": concurrency,
+                },
+            }
+        }
+
+    @staticmethod
+    def _aggregate(results: List[Dict[str, Any]], top_k: int) -> Dict[str, float]:
+        """
+        计算所有查询的平均指标
+        """
+        count = len(results)
+
+        def mean(field: str) -> float:
+            return sum(result[field] for result in results) / count
+
+        return {
+            "score_hit": mean("score_hit"),
+            "score_find": mean("score_find"),
+            f"recall@{top_k}": mean("recall"),
+            f"precision@{top_k}": mean("precision"),
+            f"hit_rate@{top_k}": mean("hit"),
+            "mrr": mean("mrr"),
+            f"ndcg@{top_k}": mean("ndcg"),
+        }
+
+    @staticmethod
+    def _per_label(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        按期望页码统计命中率：某页作为标签的查询中，结果包含该页的比例
+        """
+        per_label: Dict[int, Dict[str, Any]] = {}
+        for result in results:
+            found = set(result["found_pages"])
+            for page in set(result["expected_pages"]):
+                stats = per_label.setdefault(page, {"queries": 0, "hits": 0})
+                stats["queries"] += 1
+                stats["hits"] += 1 if page in found else 0
+        return {
+            str(page): {**stats, "hit_rate": stats["hits"] / stats["queries"]}
+            for page, stats in sorted(per_label.items())
+        }
+
+    def save(self, evaluation: Dict[str, Any]) -> Dict[str, str]:
+        """
+        保存评估结果：JSON包含全部信息，CSV每个查询一行、每个top_k结果单独一列
+
+        参数:
+            evaluation: evaluate 产生的评估结果
+
+        返回:
+            JSON和CSV文件路径
+        """
+        output_dir = Path(EVALUATION_CONFIG["output_dir"])
+        output_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        json_path = output_dir / f"evaluation_results_{timestamp}.json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(evaluation, f, indent=2)
+
+        results_df = pd.DataFrame(evaluation["results"])
+        column_order = [
+            "query", "expected_pages", "found_pages", "score_hit", "score_find",
+            "recall", "precision", "hit", "mrr", "ndcg",
+        ]
+        for i in range(1, evaluation["parameters"]["top_k"] + 1):
+            column_order.extend([f"page_{i}", f"score_{i}", f"text_{i}"])
+        results_df = results_df[[col for col in column_order if col in results_df.columns]]
+
+        csv_path = output_dir / f"evaluation_results_{timestamp}.csv"
+        results_df.to_csv(csv_path, index=False)
+        return {"json": str(json_path), "csv": str(csv_path)}
+
+
+# 创建全局评估服务实例
+evaluation_service = EvaluationService()
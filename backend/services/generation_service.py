@@ -1,10 +1,11 @@
 import os
 import json
 from datetime import datetime
-from typing import List, Dict, Optional
+from threading import Thread
+from typing import List, Dict, Optional, Iterator, Tuple
 import logging
 from pathlib import Path
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer
 import torch
 from openai import OpenAI
 import requests
@@ -65,6 +66,20 @@ class GenerationService:
             logger.error(f"Error loading HuggingFace model: {str(e)}")
             raise
 
+    @staticmethod
+    def _huggingface_prompt(query: str, context: str) -> str:
+        """
+        构建本地模型的提示
+        """
+        return f"""请基于以下上下文回答问题。如果上下文中没有相关信息，请说明无法回答。
+
+                        问题：{query}
+
+                        上下文：
+                        {context}
+
+                        回答："""
+
     def _generate_with_huggingface(
         self,
         model_name: str,
@@ -86,16 +101,7 @@ class GenerationService:
         """
         try:
             model, tokenizer = self._load_huggingface_model(model_name)
-            
-            # 构建提示
-            prompt = f"""请基于以下上下文回答问题。如果上下文中没有相关信息，请说明无法回答。
-
-                        问题：{query}
-
-                        上下文：
-                        {context}
-
-                        回答："""
+            prompt = self._huggingface_prompt(query, context)
         
             inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
             outputs = model.generate(
@@ -113,6 +119,91 @@ class GenerationService:
             logger.error(f"Error generating with HuggingFace: {str(e)}")
             raise
 
+    def _stream_with_huggingface(
+        self,
+        model_name: str,
+        query: str,
+        context: str,
+        max_length: int = 512
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        使用HuggingFace模型流式生成回答：generate在后台线程中执行，TextIteratorStreamer逐段产出解码后的文本
+        
+        参数:
+            model_name: 模型名称
+            query: 用户查询
+            context: 上下文信息
+            max_length: 生成文本的最大长度
+            
+        返回:
+            ("token", 文本片段) 的迭代器
+        """
+        model, tokenizer = self._load_huggingface_model(model_name)
+        inputs = tokenizer(self._huggingface_prompt(query, context), return_tensors="pt").to(model.device)
+        # skip_prompt：只产出新生成的部分，无需再按"回答："切分
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+
+        def generate():
+            # generate失败时streamer不会收到结束标记，需手动结束，否则消费方会一直阻塞
+            try:
+                model.generate(
+                    **inputs,
+                    max_length=max_length,
+                    num_return_sequences=1,
+                    temperature=0.7,
+                    do_sample=True,
+                    streamer=streamer
+                )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+
+        worker = Thread(target=generate, daemon=True)
+        worker.start()
+        try:
+            for text in streamer:
+                if text:
+                    yield "token", text
+        finally:
+            worker.join()
+        if errors:
+            raise errors[0]
+
+    def _stream_chat_completion(self, client: OpenAI, model: str, query: str, context: str) -> Iterator[Tuple[str, str]]:
+        """
+        以 stream=True 调用OpenAI兼容的对话接口（OpenAI、DeepSeek），逐个产出增量
+        
+        参数:
+            client: API客户端
+            model: 接口使用的模型名称
+            query: 用户查询
+            context: 上下文信息
+            
+        返回:
+            ("token", 文本片段) 的迭代器；推理模型的思维过程产出为 ("reasoning", 文本片段)
+        """
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant. Use the provided context to answer the question accurately and concisely."},
+            {"role": "user", "content": f"Context: {self._sanitize_content(context, 6000)}\n\nQuestion: {self._sanitize_content(query, 1000)}"}
+        ]
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=512,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            reasoning = getattr(delta, "reasoning_content", None)
+            if reasoning:
+                yield "reasoning", reasoning
+            if delta.content:
+                yield "token", delta.content
+
     def _sanitize_content(self, text: str, max_length: int = 8000) -> str:
         """
         清理和过滤内容，移除可能触发内容安全检查的文本
@@ -341,11 +432,7 @@ class GenerationService:
             包含生成回答和保存路径的字典
         """
         try:
-            # 准备上下文
-            context = "\n\n".join([
-                f"[Source {i+1}]: {result['text']}"
-                for i, result in enumerate(search_results)
-            ])
+            context = self._build_context(search_results)
             
             # 根据不同提供商生成回答
             if provider == "huggingface":
@@ -363,33 +450,123 @@ class GenerationService:
             else:
                 raise ValueError(f"Unsupported provider: {provider}")
                 
-            # 准备保存的结果
-            result = {
-                "query": query,
-                "timestamp": datetime.now().isoformat(),
-                "provider": provider,
-                "model": model_name,
-                "response": response,
-                "context": search_results
-            }
-            
-            # 生成文件名并保存
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            filename = f"generation_{provider}_{model_name}_{timestamp}.json"
-            filepath = os.path.join("05-generation-results", filename)
-            
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
-                
             return {
                 "response": response,
-                "saved_filepath": filepath
+                "saved_filepath": self._save_result(provider, model_name, query, response, search_results)
             }
             
         except Exception as e:
             logger.error(f"Error in generation: {str(e)}")
             raise
 
+    def generate_stream(
+        self,
+        provider: str,
+        model_name: str,
+        query: str,
+        search_results: List[Dict],
+        api_key: Optional[str] = None,
+        show_reasoning: bool = True
+    ) -> Iterator[Dict]:
+        """
+        流式生成回答：模型产出的文本片段到达即产生事件，完成后保存结果
+        
+        参数:
+            与generate相同
+            
+        返回:
+            事件迭代器：每个文本片段一个 {"event": "token", "text"}，DeepSeek推理模型的思维过程为
+            {"event": "reasoning", "text"}（show_reasoning为False时不产生），
+            最后为 {"event": "done", "response", "saved_filepath"}；失败时为 {"event": "error", "error"}
+        """
+        try:
+            context = self._build_context(search_results)
+            if provider == "huggingface":
+                deltas = self._stream_with_huggingface(model_name, query, context)
+            elif provider == "openai":
+                api_key = api_key or config.OPENAI_API_KEY
+                if not api_key:
+                    raise ValueError("OpenAI API key is required")
+                deltas = self._stream_chat_completion(
+                    OpenAI(api_key=api_key), self.models["openai"][model_name], query, context
+                )
+            elif provider == "deepseek":
+                api_key = api_key or config.DEEPSEEK_API_KEY
+                if not api_key:
+                    raise ValueError("Deepseek API key is required")
+                deltas = self._stream_chat_completion(
+                    OpenAI(api_key=api_key, base_url="https://api.deepseek.com"),
+                    self.models["deepseek"][model_name], query, context
+                )
+            else:
+                raise ValueError(f"Unsupported provider: {provider}")
+            
+            answer, reasoning = [], []
+            for kind, text in deltas:
+                if kind == "reasoning":
+                    reasoning.append(text)
+                    if not show_reasoning:
+                        continue
+                else:
+                    answer.append(text)
+                yield {"event": kind, "text": text}
+            
+            # 与非流式生成保存相同格式的回答
+            response = "".join(answer).strip()
+            if show_reasoning and reasoning:
+                response = f"【思维过程】\n{''.join(reasoning)}\n\n【最终答案】\n{response}"
+            yield {
+                "event": "done",
+                "response": response,
+                "saved_filepath": self._save_result(provider, model_name, query, response, search_results)
+            }
+        except Exception as e:
+            logger.error(f"Error in streaming generation: {str(e)}")
+            yield {"event": "error", "error": str(e)}
+
+    @staticmethod
+    def _build_context(search_results: List[Dict]) -> str:
+        """
+        把搜索结果拼接为生成使用的上下文
+        """
+        return "\n\n".join([
+            f"[Source {i+1}]: {result['text']}"
+            for i, result in enumerate(search_results)
+        ])
+
+    def _save_result(self, provider: str, model_name: str, query: str,
+                     response: str, search_results: List[Dict]) -> str:
+        """
+        保存生成结果
+        
+        参数:
+            provider: 模型提供商
+            model_name: 模型名称
+            query: 用户查询
+            response: 生成的回答
+            search_results: 作为上下文的搜索结果
+            
+        返回:
+            保存的文件路径
+        """
+        result = {
+            "query": query,
+            "timestamp": datetime.now().isoformat(),
+            "provider": provider,
+            "model": model_name,
+            "response": response,
+            "context": search_results
+        }
+        
+        # 生成文件名并保存
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        filename = f"generation_{provider}_{model_name}_{timestamp}.json"
+        filepath = os.path.join("05-generation-results", filename)
+        
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        return filepath
+
     def get_available_models(self) -> Dict:
         """
         获取可用的模型列表
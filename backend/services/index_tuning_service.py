@@ -0,0 +1,664 @@
+import os
+import time
+import itertools
+from contextlib import ExitStack
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+import numpy as np
+from pymilvus import utility
+from pymilvus import Collection, DataType, FieldSchema, CollectionSchema
+from services.vector_store_service import VectorStoreService
+from services.catalog_service import collection_catalog
+from utils.milvus_connection import milvus_connection, is_milvus_lite
+from utils.sidecar_client import sidecar_enabled, get_sidecar_client
+from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG, TUNING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class IndexTuningService:
+    """
+    索引参数自动调优服务：基于已索引集合的向量，
+    以暴力检索结果为基准，在参数网格上评估召回率、构建时间、内存和QPS，
+    并将帕累托最优配置写回集合目录作为推荐配置
+    """
+    def __init__(self):
+        """
+        初始化调优服务
+        """
+        self.vector_store = VectorStoreService()
+
+    def tune(self,
+             provider: str,
+             collection_name: str,
+             sample_queries: Optional[int] = None,
+             top_k: Optional[int] = None,
+             target_recall: Optional[float] = None,
+             grid: Optional[Dict[str, Dict[str, List[Any]]]] = None,
+             apply: bool = False) -> Dict[str, Any]:
+        """
+        对指定集合执行索引参数调优
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 已索引的集合名称
+            sample_queries: 采样查询数量
+            top_k: 计算recall@k时的k
+            target_recall: 推荐配置需要达到的最低召回率
+            grid: 参数网格，形如 {"HNSW": {"M": [...], "efConstruction": [...], "ef": [...]}}
+            apply: 是否使用推荐参数重建该集合的索引（仅Milvus支持）
+
+        返回:
+            调优报告字典，包含全部候选结果、帕累托前沿和推荐配置
+        """
+        provider = str(provider).lower().strip()
+        if provider == VectorDBProvider.MILVUS.value and sidecar_enabled():
+            # 读取向量、构建临时候选集合和重建索引都需要访问sidecar独占的数据文件
+            return get_sidecar_client().call(
+                "tune_index", collection_name=collection_name, sample_queries=sample_queries,
+                top_k=top_k, target_recall=target_recall, grid=grid, apply=apply
+            )
+        sample_queries = sample_queries or TUNING_CONFIG["sample_queries"]
+        top_k = top_k or TUNING_CONFIG["top_k"]
+        target_recall = target_recall if target_recall is not None else TUNING_CONFIG["target_recall"]
+        grid = grid or TUNING_CONFIG["grids"].get(provider)
+        if not grid:
+            raise ValueError(f"Unsupported vector database provider: {provider}")
+        if provider == VectorDBProvider.MILVUS.value and (
+                is_milvus_lite(MILVUS_CONFIG["uri"]) or collection_catalog.get(provider, collection_name).get("shards")):
+            # 候选集合建在主数据文件中，推荐配置要能在集合（分片都是Milvus Lite文件）上重建
+            grid = self._lite_grid(grid)
+
+        start_time = datetime.now()
+        logger.info(f"Starting index tuning for {provider}/{collection_name}")
+
+        # 读取集合中的全部向量并采样查询
+        vectors = self._load_vectors(provider, collection_name)
+        if len(vectors) == 0:
+            raise ValueError(f"Collection {collection_name} is empty")
+        top_k = min(top_k, len(vectors))
+        rng = np.random.default_rng(42)
+        query_idx = rng.choice(len(vectors), size=min(sample_queries, len(vectors)), replace=False)
+        queries = vectors[query_idx]
+        metric, normalized = self._collection_metric(provider, collection_name)
+
+        # 暴力检索得到基准结果
+        ground_truth = self._brute_force_top_k(vectors, queries, top_k, normalized=normalized)
+        logger.info(f"Computed brute-force ground truth for {len(queries)} queries, k={top_k}")
+
+        # 在参数网格上评估候选索引
+        candidates = []
+        for index_type, build_params, search_param_list in self._expand_grid(provider, grid):
+            try:
+                candidates.extend(self._evaluate_candidate(
+                    provider, collection_name, vectors, queries, ground_truth, top_k,
+                    index_type, build_params, search_param_list, metric=metric
+                ))
+            except Exception as e:
+                logger.error(f"Error evaluating {index_type} {build_params}: {str(e)}")
+
+        if not candidates:
+            raise ValueError("No index candidate could be evaluated")
+
+        pareto = self._pareto_front(candidates)
+        recommended = self._recommend(pareto, target_recall)
+
+        report = {
+            "provider": provider,
+            "collection_name": collection_name,
+            "num_vectors": int(len(vectors)),
+            "dimension": int(vectors.shape[1]),
+            "sample_queries": int(len(queries)),
+            "top_k": top_k,
+            "target_recall": target_recall,
+            "metric": metric,
+            "candidates": candidates,
+            "pareto_front": pareto,
+            "recommended": recommended,
+            "processing_time": (datetime.now() - start_time).total_seconds()
+        }
+
+        collection_catalog.update(provider, collection_name, recommended_index={
+            **recommended,
+            "top_k": top_k,
+            "num_vectors": int(len(vectors)),
+            "tuned_at": datetime.now().isoformat()
+        })
+        # 推荐的搜索参数改变了搜索结果，已缓存的结果失效
+        collection_catalog.bump_version(provider, collection_name)
+        logger.info(f"Recommended index config for {collection_name}: {recommended}")
+
+        if apply:
+            report["applied"] = self._apply(provider, collection_name, recommended, metric)
+
+        return report
+
+    @staticmethod
+    def _lite_grid(grid: Dict[str, Dict[str, List[Any]]]) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        去掉参数网格中Milvus Lite无法构建的索引类型
+
+        参数:
+            grid: 参数网格
+
+        返回:
+            只包含Milvus Lite支持的索引类型的参数网格
+
+        Raises:
+            ValueError: 网格中没有Milvus Lite支持的索引类型
+        """
+        supported = set(TUNING_CONFIG["lite_index_types"])
+        skipped = [index_type for index_type in grid if index_type.upper() not in supported]
+        if skipped:
+            logger.info(f"Milvus Lite cannot build {skipped} indexes, skipping them")
+        grid = {index_type: params for index_type, params in grid.items() if index_type.upper() in supported}
+        if not grid:
+            raise ValueError(f"Milvus Lite only supports {sorted(supported)} indexes")
+        return grid
+
+    def _expand_grid(self, provider: str, grid: Dict[str, Dict[str, List[Any]]]):
+        """
+        将参数网格展开为(索引类型, 构建参数, 搜索参数列表)三元组
+
+        参数:
+            provider: 向量数据库提供商
+            grid: 参数网格
+
+        返回:
+            三元组生成器
+        """
+        # 搜索期参数不需要重建索引；Chroma的efSearch在建集合时确定，因此视为构建参数
+        search_keys = {"ef", "nprobe"} if provider == VectorDBProvider.MILVUS.value else set()
+        for index_type, params in grid.items():
+            build_keys = [k for k in params if k not in search_keys]
+            search_values = [params[k] for k in params if k in search_keys]
+            search_names = [k for k in params if k in search_keys]
+            search_param_list = [dict(zip(search_names, combo)) for combo in itertools.product(*search_values)]
+            for combo in itertools.product(*[params[k] for k in build_keys]):
+                yield index_type.upper(), dict(zip(build_keys, combo)), search_param_list
+
+    def benchmark_metrics(self,
+                          provider: str,
+                          collection_name: str,
+                          sample_queries: Optional[int] = None,
+                          top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        对比同一批归一化向量在余弦度量和内积度量下的搜索延迟：
+        内置的numpy暴力检索（余弦需在查询时计算范数）以及向量库中的FLAT/HNSW临时集合
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 提供向量的集合名称
+            sample_queries: 采样查询数量
+            top_k: 每次查询返回的数量
+
+        返回:
+            基准报告，包含各路径在两种度量下的平均单次查询延迟（毫秒）和加速比
+        """
+        provider = str(provider).lower().strip()
+        if provider == VectorDBProvider.MILVUS.value and sidecar_enabled():
+            return get_sidecar_client().call(
+                "benchmark_metrics", collection_name=collection_name, sample_queries=sample_queries, top_k=top_k
+            )
+        sample_queries = sample_queries or TUNING_CONFIG["sample_queries"]
+        top_k = top_k or TUNING_CONFIG["top_k"]
+
+        vectors = self._load_vectors(provider, collection_name)
+        if len(vectors) == 0:
+            raise ValueError(f"Collection {collection_name} is empty")
+        vectors = self._normalize_rows(vectors)
+        top_k = min(top_k, len(vectors))
+        rng = np.random.default_rng(42)
+        queries = vectors[rng.choice(len(vectors), size=min(sample_queries, len(vectors)), replace=False)]
+
+        def timed(search):
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            return round((time.perf_counter() - start) / len(queries) * 1000, 4)
+
+        def cosine_search(query):
+            # 未归一化的路径：每次查询都要计算库中向量和查询向量的范数
+            sims = (vectors @ query) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+            return np.argpartition(-sims, top_k - 1)[:top_k]
+
+        def ip_search(query):
+            return np.argpartition(-(vectors @ query), top_k - 1)[:top_k]
+
+        latencies = {"builtin": {"COSINE": timed(cosine_search), "IP": timed(ip_search)}}
+
+        latencies[provider] = {}
+        for metric in ("COSINE", "IP"):
+            temp_name = f"{collection_name[:40]}_bench_{metric.lower()}_{datetime.now().strftime('%H%M%S%f')}"
+            if provider == VectorDBProvider.MILVUS.value:
+                _, (search, drop) = self._build_milvus_candidate(temp_name, vectors, "FLAT", {}, metric)
+            else:
+                _, (search, drop) = self._build_chroma_candidate(temp_name, vectors, {}, metric)
+            try:
+                latencies[provider][metric] = timed(lambda query: search(query, top_k, {}))
+            finally:
+                drop()
+
+        report = {
+            "provider": provider,
+            "collection_name": collection_name,
+            "num_vectors": int(len(vectors)),
+            "dimension": int(vectors.shape[1]),
+            "sample_queries": int(len(queries)),
+            "top_k": top_k,
+            "latency_ms": latencies,
+            "speedup": {
+                path: round(values["COSINE"] / values["IP"], 3) if values["IP"] else None
+                for path, values in latencies.items()
+            }
+        }
+        logger.info(f"Metric benchmark for {collection_name}: {report['latency_ms']}")
+        return report
+
+    def _collection_metric(self, provider: str, collection_name: str) -> Tuple[str, bool]:
+        """
+        读取集合使用的度量以及向量是否已归一化
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            (度量类型, 是否已归一化)
+        """
+        entry = collection_catalog.get(provider, collection_name)
+        metric = entry.get("metric")
+        if not metric and provider == VectorDBProvider.CHROMA.value:
+            collection = self._get_chroma_client().get_collection(name=collection_name)
+            metric = str((collection.metadata or {}).get("hnsw:space", "l2")).upper()
+        # 早期集合没有登记度量，Milvus集合均使用COSINE
+        return metric or "COSINE", bool(entry.get("normalized", False))
+
+    def _load_vectors(self, provider: str, collection_name: str) -> np.ndarray:
+        """
+        读取集合中的全部向量
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            float32向量矩阵
+        """
+        max_vectors = TUNING_CONFIG["max_vectors"]
+        vectors = []
+        if provider == VectorDBProvider.MILVUS.value:
+            # 分片集合依次读取各分片，直到读满max_vectors
+            found = False
+            for connection in self.vector_store.collection_connections(collection_name):
+                if len(vectors) >= max_vectors:
+                    break
+                with connection as alias:
+                    if not utility.has_collection(collection_name, using=alias):
+                        continue
+                    found = True
+                    collection = Collection(collection_name, using=alias)
+                    collection.load()
+                    primary_field = collection.schema.primary_field.name
+                    iterator = collection.query_iterator(
+                        batch_size=1000,
+                        expr=f"{primary_field} >= 0",
+                        output_fields=["vector"]
+                    )
+                    while len(vectors) < max_vectors:
+                        batch = iterator.next()
+                        if not batch:
+                            break
+                        vectors.extend(row["vector"] for row in batch)
+                    iterator.close()
+            if not found:
+                raise ValueError(f"Collection {collection_name} not found")
+        elif provider == VectorDBProvider.CHROMA.value:
+            collection = self._get_chroma_client().get_collection(name=collection_name)
+            offset = 0
+            while len(vectors) < max_vectors:
+                batch = collection.get(include=["embeddings"], limit=1000, offset=offset)
+                if not batch["ids"]:
+                    break
+                vectors.extend(batch["embeddings"])
+                offset += len(batch["ids"])
+        else:
+            raise ValueError(f"Unsupported vector database provider: {provider}")
+
+        logger.info(f"Loaded {len(vectors)} vectors from {collection_name}")
+        return np.asarray(vectors[:max_vectors], dtype=np.float32)
+
+    @staticmethod
+    def _normalize_rows(m: np.ndarray) -> np.ndarray:
+        """
+        把矩阵的每一行归一化为单位长度（零向量保持不变）
+        """
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return m / norms
+
+    def _brute_force_top_k(self, vectors: np.ndarray, queries: np.ndarray, top_k: int,
+                           normalized: bool = False) -> List[set]:
+        """
+        用余弦相似度暴力计算每个查询的真实top_k
+
+        参数:
+            vectors: 全部向量
+            queries: 查询向量
+            top_k: 返回数量
+            normalized: 向量是否已在索引时归一化，是则直接用内积，无需再计算范数
+
+        返回:
+            每个查询的top_k行号集合
+        """
+        base = vectors if normalized else self._normalize_rows(vectors)
+        results = []
+        # 分块计算，避免一次性生成过大的相似度矩阵
+        for start in range(0, len(queries), 256):
+            batch = queries[start:start + 256]
+            sims = (batch if normalized else self._normalize_rows(batch)) @ base.T
+            top = np.argpartition(-sims, top_k - 1, axis=1)[:, :top_k]
+            results.extend(set(row.tolist()) for row in top)
+        return results
+
+    def _evaluate_candidate(self,
+                            provider: str,
+                            collection_name: str,
+                            vectors: np.ndarray,
+                            queries: np.ndarray,
+                            ground_truth: List[set],
+                            top_k: int,
+                            index_type: str,
+                            build_params: Dict[str, Any],
+                            search_param_list: List[Dict[str, Any]],
+                            metric: str = "COSINE") -> List[Dict[str, Any]]:
+        """
+        构建一个候选索引并在各搜索参数下测量召回率与QPS
+
+        返回:
+            每组搜索参数对应的一条测量结果
+        """
+        temp_name = f"{collection_name[:40]}_tune_{datetime.now().strftime('%H%M%S%f')}"
+        logger.info(f"Evaluating candidate {index_type} {build_params} in temp collection {temp_name}")
+        if provider == VectorDBProvider.MILVUS.value:
+            build_time, searchers = self._build_milvus_candidate(temp_name, vectors, index_type, build_params, metric)
+        else:
+            build_time, searchers = self._build_chroma_candidate(temp_name, vectors, build_params, metric)
+
+        search, drop = searchers
+        measurements = []
+        try:
+            for search_params in (search_param_list or [{}]):
+                retrieved = []
+                start = time.perf_counter()
+                for query in queries:
+                    retrieved.append(search(query, top_k, search_params))
+                elapsed = time.perf_counter() - start
+
+                recall = float(np.mean([
+                    len(set(found) & truth) / len(truth) for found, truth in zip(retrieved, ground_truth)
+                ]))
+                measurements.append({
+                    "index_type": index_type,
+                    "params": build_params,
+                    "search_params": search_params,
+                    "recall": round(recall, 4),
+                    "qps": round(len(queries) / elapsed, 2) if elapsed > 0 else 0.0,
+                    "build_time": round(build_time, 4),
+                    "memory_bytes": self._estimate_memory(index_type, build_params, vectors.shape)
+                })
+        finally:
+            drop()
+        return measurements
+
+    def _build_milvus_candidate(self, name: str, vectors: np.ndarray, index_type: str,
+                                build_params: Dict[str, Any], metric: str = "COSINE") -> Tuple[float, tuple]:
+        """
+        在Milvus中构建临时候选集合
+
+        返回:
+            (构建耗时, (搜索函数, 删除函数))
+        """
+        # 连接在候选集合删除时释放
+        connection = ExitStack()
+        connection.enter_context(milvus_connection(MILVUS_CONFIG["uri"]))
+
+        def drop():
+            try:
+                if utility.has_collection(name):
+                    utility.drop_collection(name)
+            finally:
+                connection.close()
+
+        try:
+            schema = CollectionSchema(fields=[
+                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+                FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=int(vectors.shape[1]))
+            ], description=f"Index tuning candidate {name}")
+            collection = Collection(name=name, schema=schema)
+            for start in range(0, len(vectors), 1000):
+                batch = vectors[start:start + 1000]
+                collection.insert([list(range(start, start + len(batch))), batch.tolist()])
+            collection.flush()
+
+            start = time.perf_counter()
+            collection.create_index(field_name="vector", index_params={
+                "metric_type": metric,
+                "index_type": index_type,
+                "params": build_params
+            })
+            utility.wait_for_index_building_complete(name)
+            collection.load()
+            build_time = time.perf_counter() - start
+        except BaseException:
+            # 构建失败时删除已写入向量副本的临时集合
+            drop()
+            raise
+
+        def search(query, k, search_params):
+            hits = collection.search(
+                data=[query.tolist()],
+                anns_field="vector",
+                param={"metric_type": metric, "params": search_params},
+                limit=k
+            )
+            return [hit.id for hit in hits[0]]
+
+        return build_time, (search, drop)
+
+    def _build_chroma_candidate(self, name: str, vectors: np.ndarray,
+                                build_params: Dict[str, Any], metric: str = "COSINE") -> Tuple[float, tuple]:
+        """
+        在Chroma中构建临时候选集合
+
+        返回:
+            (构建耗时, (搜索函数, 删除函数))
+        """
+        client = self._get_chroma_client()
+        metadata = {"hnsw:space": metric.lower()}
+        if "M" in build_params:
+            metadata["hnsw:M"] = int(build_params["M"])
+        if "efConstruction" in build_params:
+            metadata["hnsw:construction_ef"] = int(build_params["efConstruction"])
+        if "efSearch" in build_params:
+            metadata["hnsw:search_ef"] = int(build_params["efSearch"])
+
+        start = time.perf_counter()
+        collection = client.create_collection(name=name, metadata=metadata)
+        # Chroma在写入时增量构建HNSW，因此构建时间包含写入时间
+        for offset in range(0, len(vectors), 1000):
+            batch = vectors[offset:offset + 1000]
+            collection.add(
+                ids=[str(i) for i in range(offset, offset + len(batch))],
+                embeddings=batch.tolist()
+            )
+        build_time = time.perf_counter() - start
+
+        def search(query, k, search_params):
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            return [int(i) for i in result["ids"][0]]
+
+        def drop():
+            client.delete_collection(name)
+
+        return build_time, (search, drop)
+
+    @staticmethod
+    def _estimate_memory(index_type: str, build_params: Dict[str, Any], shape: Tuple[int, int]) -> int:
+        """
+        估算索引常驻内存（向量数据 + HNSW图的邻接表）
+
+        参数:
+            index_type: 索引类型
+            build_params: 构建参数
+            shape: 向量矩阵形状 (数量, 维度)
+
+        返回:
+            估算的字节数
+        """
+        num, dim = shape
+        raw_bytes = num * dim * 4
+        if index_type == "IVF_FLAT":
+            # 向量数据加聚类中心
+            return int(raw_bytes + int(build_params.get("nlist", 128)) * dim * 4)
+        if index_type == "HNSW":
+            # 第0层每个节点最多2M个邻居，上层约占额外的1/M，邻居ID按4字节计
+            m = int(build_params.get("M", 16))
+            return int(raw_bytes + num * m * 2 * 4 * (1 + 1 / max(m, 1)))
+        return int(raw_bytes)
+
+    @staticmethod
+    def _pareto_front(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        计算帕累托前沿：召回率和QPS越高越好，构建时间和内存越低越好
+
+        参数:
+            candidates: 全部测量结果
+
+        返回:
+            未被支配的测量结果列表（按召回率降序）
+        """
+        def dominates(a, b):
+            no_worse = (a["recall"] >= b["recall"] and a["qps"] >= b["qps"]
+                        and a["build_time"] <= b["build_time"] and a["memory_bytes"] <= b["memory_bytes"])
+            better = (a["recall"] > b["recall"] or a["qps"] > b["qps"]
+                      or a["build_time"] < b["build_time"] or a["memory_bytes"] < b["memory_bytes"])
+            return no_worse and better
+
+        front = [c for c in candidates if not any(dominates(o, c) for o in candidates if o is not c)]
+        return sorted(front, key=lambda c: (-c["recall"], -c["qps"]))
+
+    @staticmethod
+    def _recommend(pareto: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+        """
+        从帕累托前沿中选择推荐配置：满足目标召回率的最高QPS配置，
+        若无配置达到目标则选择召回率最高的配置
+
+        参数:
+            pareto: 帕累托前沿
+            target_recall: 目标召回率
+
+        返回:
+            推荐配置
+        """
+        qualified = [c for c in pareto if c["recall"] >= target_recall]
+        if qualified:
+            return max(qualified, key=lambda c: c["qps"])
+        logger.warning(f"No candidate reached target recall {target_recall}, recommending the highest recall")
+        return pareto[0]
+
+    def _apply(self, provider: str, collection_name: str, recommended: Dict[str, Any],
+               metric: str = "COSINE") -> bool:
+        """
+        使用推荐参数重建集合的向量索引
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            recommended: 推荐配置
+            metric: 集合使用的度量，重建后保持不变
+
+        返回:
+            是否已应用
+        """
+        if provider != VectorDBProvider.MILVUS.value:
+            # Chroma的HNSW参数在集合创建后不可修改，推荐配置将在下次索引时使用
+            logger.info("Chroma HNSW parameters cannot be changed in place, skipping apply")
+            return False
+        # 分片集合在每个分片上分别重建索引，已释放的分片和分区重建后保持释放
+        entry = collection_catalog.get(provider, collection_name)
+        released = set((entry.get("shards") or {}).get("released", []))
+        released_partitions = set(entry.get("released_partitions", []))
+        for shard, connection in enumerate(self.vector_store.collection_connections(collection_name)):
+            with connection as alias:
+                if not utility.has_collection(collection_name, using=alias):
+                    continue
+                collection = Collection(collection_name, using=alias)
+                collection.release()
+                vector_index = next((idx for idx in collection.indexes if idx.field_name == "vector"), None)
+                if vector_index is not None:
+                    collection.drop_index(index_name=vector_index.index_name)
+                collection.create_index(field_name="vector", index_params={
+                    "metric_type": metric,
+                    "index_type": recommended["index_type"],
+                    "params": recommended["params"]
+                })
+                if shard in released:
+                    continue
+                if released_partitions:
+                    collection.load(partition_names=[p.name for p in collection.partitions if p.name not in released_partitions])
+                else:
+                    collection.load()
+        logger.info(f"Rebuilt index of {collection_name} with {recommended['index_type']} {recommended['params']}")
+        return True
+
+    def _get_chroma_client(self):
+        """
+        创建Chroma持久化客户端
+
+        返回:
+            Chroma客户端
+        """
+        import chromadb
+        from chromadb.config import Settings
+
+        chroma_path = self.vector_store._get_absolute_path(CHROMA_CONFIG["uri"])
+        os.makedirs(chroma_path, exist_ok=True)
+        return chromadb.PersistentClient(path=chroma_path, settings=Settings(anonymized_telemetry=False))
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Tune vector index parameters for an indexed collection")
+    parser.add_argument("provider", choices=[p.value for p in VectorDBProvider])
+    parser.add_argument("collection_name")
+    parser.add_argument("--sample-queries", type=int, default=None)
+    parser.add_argument("--top-k", type=int, default=None)
+    parser.add_argument("--target-recall", type=float, default=None)
+    parser.add_argument("--apply", action="store_true", help="rebuild the collection index with the recommended config")
+    parser.add_argument("--benchmark-metrics", action="store_true",
+                        help="compare COSINE and IP search latency on the normalized vectors instead of tuning")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.benchmark_metrics:
+        report = IndexTuningService().benchmark_metrics(
+            provider=args.provider,
+            collection_name=args.collection_name,
+            sample_queries=args.sample_queries,
+            top_k=args.top_k
+        )
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        report = IndexTuningService().tune(
+            provider=args.provider,
+            collection_name=args.collection_name,
+            sample_queries=args.sample_queries,
+            top_k=args.top_k,
+            target_recall=args.target_recall,
+            apply=args.apply
+        )
+        print(json.dumps({k: report[k] for k in ("pareto_front", "recommended")}, indent=2, ensure_ascii=False))
@@ -0,0 +1,213 @@
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+from services.vector_store_service import VectorStoreService, VectorDBConfig, IndexingCancelled
+from utils.config import INDEXING_JOB_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class IndexingJobManager:
+    """
+    后台索引任务管理类，在独立的工作线程池中执行索引，提供进度查询和取消
+    """
+
+    FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+    def __init__(self, max_workers: int = INDEXING_JOB_CONFIG["max_workers"]):
+        """
+        初始化任务管理器
+
+        参数:
+            max_workers: 索引工作线程数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="indexing")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cancel_events: Dict[str, threading.Event] = {}
+
+    def submit(self, embedding_file: str, config: VectorDBConfig, **index_kwargs) -> Dict[str, Any]:
+        """
+        提交索引任务
+
+        参数:
+            embedding_file: 嵌入向量文件路径
+            config: 向量数据库配置对象
+            index_kwargs: 传给VectorStoreService.index_embeddings的其他参数
+
+        返回:
+            任务信息字典
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "pending",
+            "embedding_file": embedding_file,
+            "provider": config.provider,
+            "progress": {"processed": 0, "total": 0, "percent": 0.0},
+            "result": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        # 在锁内提交，任务对wait()/cancel()可见时一定已带有future
+        with self._lock:
+            self._jobs[job_id] = job
+            self._cancel_events[job_id] = threading.Event()
+            self._prune_finished_jobs()
+            job["future"] = self._executor.submit(self._run, job_id, embedding_file, config, index_kwargs)
+        logger.info(f"Submitted indexing job {job_id} for {embedding_file}")
+        return self.get(job_id)
+
+    def _run(self, job_id: str, embedding_file: str, config: VectorDBConfig, index_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        在工作线程中执行索引任务
+
+        参数:
+            job_id: 任务ID
+            embedding_file: 嵌入向量文件路径
+            config: 向量数据库配置对象
+            index_kwargs: 其他索引参数
+
+        返回:
+            索引结果信息字典，失败或取消时返回None
+        """
+        cancel_event = self._cancel_events[job_id]
+        if cancel_event.is_set():
+            self._finish(job_id, "cancelled")
+            return None
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+
+        def report_progress(processed: int, total: int):
+            self._update(job_id, progress={
+                "processed": processed,
+                "total": total,
+                "percent": round(processed * 100.0 / total, 1) if total else 0.0
+            })
+
+        try:
+            result = VectorStoreService().index_embeddings(
+                embedding_file,
+                config,
+                progress_callback=report_progress,
+                cancel_event=cancel_event,
+                **index_kwargs
+            )
+            self._finish(job_id, "completed", result=result)
+            return result
+        except IndexingCancelled:
+            logger.info(f"Indexing job {job_id} cancelled")
+            self._finish(job_id, "cancelled")
+        except Exception as e:
+            logger.error(f"Indexing job {job_id} failed: {str(e)}")
+            self._finish(job_id, "failed", error=str(e))
+        return None
+
+    def _update(self, job_id: str, **fields):
+        """
+        更新任务字段
+        """
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _finish(self, job_id: str, status: str, result: Dict[str, Any] = None, error: str = None):
+        """
+        将任务标记为结束状态
+        """
+        self._update(job_id, status=status, result=result, error=error, finished_at=datetime.now().isoformat())
+
+    def _prune_finished_jobs(self):
+        """
+        丢弃超出保留数量的最早结束的任务，调用方需持有锁
+        """
+        finished = [j for j in self._jobs.values() if j["status"] in self.FINISHED_STATUSES]
+        excess = len(finished) - INDEXING_JOB_CONFIG["max_finished_jobs"]
+        if excess <= 0:
+            return
+        finished.sort(key=lambda j: j["finished_at"] or "")
+        for job in finished[:excess]:
+            self._jobs.pop(job["job_id"], None)
+            self._cancel_events.pop(job["job_id"], None)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务信息
+
+        参数:
+            job_id: 任务ID
+
+        返回:
+            任务信息字典（不含内部字段），任务不存在时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if k != "future"}
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        列出所有任务，按创建时间倒序
+
+        返回:
+            任务信息列表
+        """
+        with self._lock:
+            job_ids = list(self._jobs)
+        jobs = [job for job in (self.get(job_id) for job_id in job_ids) if job]
+        return sorted(jobs, key=lambda j: j["created_at"], reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        请求取消任务；运行中的任务在当前批次写完后停止
+
+        参数:
+            job_id: 任务ID
+
+        返回:
+            任务信息字典，任务不存在时返回None
+        """
+        with self._lock:
+            if job_id not in self._jobs:
+                return None
+            cancel_event = self._cancel_events.get(job_id)
+        if cancel_event is not None:
+            cancel_event.set()
+            logger.info(f"Cancellation requested for indexing job {job_id}")
+        return self.get(job_id)
+
+    def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        阻塞等待任务结束
+
+        参数:
+            job_id: 任务ID
+
+        返回:
+            结束后的任务信息字典，任务不存在时返回None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job["future"].result()
+        return self.get(job_id)
+
+    def shutdown(self):
+        """
+        取消所有未结束的任务并关闭工作线程池
+        """
+        with self._lock:
+            events = list(self._cancel_events.values())
+        for event in events:
+            event.set()
+        self._executor.shutdown(wait=False)
+
+
+# 创建全局任务管理器实例
+indexing_job_manager = IndexingJobManager()
@@ -0,0 +1,509 @@
+import os
+import re
+import json
+import math
+import zlib
+import heapq
+import bisect
+import shutil
+import hashlib
+import itertools
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+import logging
+import numpy as np
+from services.search_filters import SearchFilters
+from utils.config import LEXICAL_INDEX_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 拉丁字母和数字组成的词，保留型号、版本号等以 . _ - / 连接的标识符；中日韩字符按连续片段匹配
+TOKEN_PATTERN = re.compile(
+    r"(?P<word>[a-z0-9]+(?:[._\-/][a-z0-9]+)*)"
+    r"|(?P<cjk>[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)"
+)
+IDENTIFIER_SEPARATORS = re.compile(r"[._\-/]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    把文本切分为检索词：拉丁文本按词切分，标识符同时保留整体和各组成部分；
+    中日韩文本按相邻两字切分（单字片段保留单字）
+
+    参数:
+        text: 原始文本
+
+    返回:
+        检索词列表（保留重复，用于统计词频）
+    """
+    tokens = []
+    # NFKC把全角字母数字转为半角
+    for match in TOKEN_PATTERN.finditer(unicodedata.normalize("NFKC", text or "").lower()):
+        token = match.group()
+        if match.lastgroup == "cjk":
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+            parts = IDENTIFIER_SEPARATORS.split(token)
+            if len(parts) > 1:
+                tokens.extend(parts)
+    return tokens
+
+
+def _varint_encode(values: np.ndarray) -> tuple:
+    """
+    把非负整数数组编码为变长字节（每字节7位有效数据，最高位表示后面还有字节）
+
+    参数:
+        values: 非负整数数组
+
+    返回:
+        (编码后的uint8数组, 每个值占用的字节数)
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        nbytes += rest > 0
+        rest >>= np.uint64(7)
+    encoded = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    starts = np.cumsum(nbytes) - nbytes
+    for k in range(int(nbytes.max()) if len(values) else 0):
+        mask = nbytes > k
+        byte = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        encoded[starts[mask] + k] = (byte | more).astype(np.uint8)
+    return encoded, nbytes
+
+
+def _varint_decode(data: np.ndarray) -> np.ndarray:
+    """
+    解码_varint_encode产生的字节
+
+    参数:
+        data: 编码后的uint8数组
+
+    返回:
+        整数数组
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    owner = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = ((np.arange(len(data)) - starts[owner]) * 7).astype(np.uint64)
+    payload = (data & 0x7F).astype(np.uint64) << shifts
+    return np.add.reduceat(payload, starts).astype(np.int64)
+
+
+class LexicalIndex:
+    """
+    词法索引类：为每个集合维护BM25倒排索引，提供带MaxScore提前终止的关键词检索
+
+    每个集合对应一个目录，集合中的每个文档是一个段文件，重新索引文档时整体替换该段：
+        manifest.json          文档 -> 段文件、块数、总词数，用于计算全局BM25统计量
+        segments/<hash>.npz    有序词表、每个词的倒排表（变长编码的 文档号增量, 词频 对）、
+                               词的文档频率/最大词频/最短文档长度，以及块的行ID和元数据
+    """
+
+    def __init__(self, uri: str = LEXICAL_INDEX_CONFIG["uri"]):
+        """
+        初始化词法索引
+
+        参数:
+            uri: 索引根目录
+        """
+        self.uri = uri
+        self.k1 = LEXICAL_INDEX_CONFIG["k1"]
+        self.b = LEXICAL_INDEX_CONFIG["b"]
+        self._lock = threading.RLock()
+        # 已加载的段，按段文件的修改时间失效
+        self._segments: Dict[str, tuple] = {}
+
+    def _collection_dir(self, provider: str, collection_name: str) -> str:
+        """
+        获取集合的索引目录
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            目录路径
+        """
+        return os.path.join(self.uri, str(provider).lower().strip(), collection_name)
+
+    def _read_manifest(self, directory: str) -> Dict[str, Any]:
+        """
+        读取集合的索引清单，不存在时返回空清单
+        """
+        path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(path):
+            return {"segments": {}}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, directory: str, manifest: Dict[str, Any]):
+        """
+        原子地写入索引清单
+        """
+        tmp_path = os.path.join(directory, "manifest.tmp.json")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, "manifest.json"))
+
+    def exists(self, provider: str, collection_name: str) -> bool:
+        """
+        集合是否有词法索引
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            是否存在
+        """
+        return bool(self._read_manifest(self._collection_dir(provider, collection_name))["segments"])
+
+    def index_document(self, provider: str, collection_name: str, document_name: str,
+                       rows: List[Dict[str, Any]], embedding: Optional[Dict[str, str]] = None,
+                       store_text: bool = True) -> int:
+        """
+        为文档建立（或替换）倒排索引段
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            document_name: 文档名称
+            rows: 文档的块，每项包含row_id、content以及chunk_id、total_chunks、word_count、
+                page_number、page_range、embedding_timestamp等元数据
+            embedding: 文档使用的嵌入配置（embedding_provider、embedding_model）
+            store_text: 是否在段中保存块文本；集合有块文本存储时不重复保存
+
+        返回:
+            索引的块数
+        """
+        directory = self._collection_dir(provider, collection_name)
+        arrays = self._build_segment(rows, store_text)
+        file_name = f"{hashlib.sha1(document_name.encode('utf-8')).hexdigest()[:16]}.npz"
+        with self._lock:
+            os.makedirs(os.path.join(directory, "segments"), exist_ok=True)
+            tmp_path = os.path.join(directory, "segments", f"{file_name}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, os.path.join(directory, "segments", file_name))
+            manifest = self._read_manifest(directory)
+            manifest["segments"][document_name] = {
+                "file": file_name,
+                "num_docs": len(rows),
+                "total_length": int(arrays["doc_lens"].sum()),
+                "embedding": dict(embedding or {})
+            }
+            self._write_manifest(directory, manifest)
+        logger.info(f"Indexed {len(rows)} chunks of {document_name} into lexical index of {collection_name}")
+        return len(rows)
+
+    def _build_segment(self, rows: List[Dict[str, Any]], store_text: bool) -> Dict[str, np.ndarray]:
+        """
+        构建一个段的数组
+
+        参数:
+            rows: 文档的块
+            store_text: 是否保存块文本
+
+        返回:
+            段数组字典，可直接写入npz
+        """
+        postings: Dict[str, List[tuple]] = {}
+        doc_lens = np.zeros(len(rows), dtype=np.int32)
+        for docno, row in enumerate(rows):
+            counts = Counter(tokenize(row.get("content", "")))
+            doc_lens[docno] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((docno, tf))
+
+        terms = sorted(postings)
+        df = np.array([len(postings[t]) for t in terms], dtype=np.int32)
+        max_tf = np.array([max(tf for _, tf in postings[t]) for t in terms], dtype=np.int32)
+        min_len = np.array([min(doc_lens[d] for d, _ in postings[t]) for t in terms], dtype=np.int32)
+        # 所有词的倒排表连续编码：每个词依次是 (文档号增量, 词频) 对，文档号在词内升序
+        values = []
+        for term in terms:
+            pairs = np.asarray(postings[term], dtype=np.int64)
+            values.append(np.column_stack([np.diff(pairs[:, 0], prepend=0), pairs[:, 1]]).ravel())
+        encoded, nbytes = _varint_encode(np.concatenate(values) if values else np.empty(0, dtype=np.int64))
+        term_bytes = np.add.reduceat(nbytes, np.cumsum(2 * df) - 2 * df) if len(terms) else np.empty(0, dtype=np.int64)
+
+        metadata_fields = ("chunk_id", "total_chunks", "word_count", "page_number", "page_range", "embedding_timestamp")
+        records = [
+            {**{field: row.get(field) for field in metadata_fields}, **({"content": row.get("content", "")} if store_text else {})}
+            for row in rows
+        ]
+        return {
+            "terms": np.array(terms, dtype=f"<U{max((len(t) for t in terms), default=1)}"),
+            "term_offsets": np.concatenate([[0], np.cumsum(term_bytes)]).astype(np.int64),
+            "df": df,
+            "max_tf": max_tf,
+            "min_len": min_len,
+            "postings": encoded,
+            "doc_lens": doc_lens,
+            "row_ids": np.array([int(row["row_id"]) for row in rows], dtype=np.int64),
+            "records": np.frombuffer(zlib.compress(json.dumps(records, ensure_ascii=False).encode("utf-8")), dtype=np.uint8)
+        }
+
+    def _load_segment(self, directory: str, file_name: str) -> Dict[str, Any]:
+        """
+        加载段文件，段文件被替换后重新加载
+
+        参数:
+            directory: 集合索引目录
+            file_name: 段文件名
+
+        返回:
+            段数组字典，records已解压为列表
+        """
+        path = os.path.join(directory, "segments", file_name)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._segments.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            with np.load(path) as data:
+                segment = {name: data[name] for name in data.files}
+            segment["records"] = json.loads(zlib.decompress(segment["records"].tobytes()).decode("utf-8"))
+            self._segments[path] = (mtime, segment)
+            return segment
+
+    def fetch_chunks(self, provider: str, collection_name: str,
+                     chunk_ids: Dict[str, Iterable[int]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        按文档名称和块编号读取块，不访问向量库
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            chunk_ids: 文档名称到块编号集合的映射
+
+        返回:
+            (块列表, 索引中没有的文档名称列表)；块的字段与search的命中相同，score为0
+        """
+        directory = self._collection_dir(provider, collection_name)
+        manifest = self._read_manifest(directory)
+        matches, missing = [], []
+        for document_name, wanted in chunk_ids.items():
+            entry = manifest["segments"].get(document_name)
+            if entry is None:
+                missing.append(document_name)
+                continue
+            wanted = {int(chunk_id) for chunk_id in wanted}
+            segment = self._load_segment(directory, entry["file"])
+            for docno, record in enumerate(segment["records"]):
+                if record.get("chunk_id") is not None and int(record["chunk_id"]) in wanted:
+                    matches.append({
+                        "row_id": int(segment["row_ids"][docno]),
+                        "score": 0.0,
+                        "document_name": document_name,
+                        **entry.get("embedding", {}),
+                        **record
+                    })
+        return matches, missing
+
+    def remove_document(self, provider: str, collection_name: str, document_name: str) -> bool:
+        """
+        删除文档的索引段
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            document_name: 文档名称
+
+        返回:
+            是否删除了段
+        """
+        directory = self._collection_dir(provider, collection_name)
+        with self._lock:
+            manifest = self._read_manifest(directory)
+            entry = manifest["segments"].pop(document_name, None)
+            if entry is None:
+                return False
+            self._write_manifest(directory, manifest)
+            path = os.path.join(directory, "segments", entry["file"])
+            self._segments.pop(path, None)
+            if os.path.exists(path):
+                os.remove(path)
+            return True
+
+    def drop(self, provider: str, collection_name: str) -> bool:
+        """
+        删除集合的词法索引
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+
+        返回:
+            是否删除了索引
+        """
+        directory = self._collection_dir(provider, collection_name)
+        with self._lock:
+            self._segments = {path: seg for path, seg in self._segments.items() if not path.startswith(directory + os.sep)}
+            if not os.path.isdir(directory):
+                return False
+            shutil.rmtree(directory)
+            return True
+
+    def _term_weight(self, tf, doc_len, avg_len):
+        """
+        BM25的词频部分 tf*(k1+1) / (tf + k1*(1-b+b*dl/avgdl))，支持numpy数组
+        """
+        return tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * doc_len / avg_len))
+
+    def search(self, provider: str, collection_name: str, query: str, top_k: int = 10,
+               filters: Optional[SearchFilters] = None) -> List[Dict[str, Any]]:
+        """
+        BM25关键词检索
+
+        各段按得分上界从高到低处理并共享一个top_k堆：段的上界不超过堆中最低分时，其余段整体跳过；
+        段内按文档号顺序遍历（DAAT），使用MaxScore把上界之和不超过堆中最低分的词列为非必要词，
+        只由必要词产生候选，非必要词只对仍可能进入top_k的候选查找
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            query: 查询文本
+            top_k: 返回的最大结果数量
+            filters: 结构化过滤条件，document_name条件用于跳过整段
+
+        返回:
+            按BM25得分降序排列的命中列表，每项包含row_id、score、document_name、嵌入配置和块元数据，
+            段中保存了块文本时包含content
+        """
+        directory = self._collection_dir(provider, collection_name)
+        manifest = self._read_manifest(directory)
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        num_docs = sum(entry["num_docs"] for entry in manifest["segments"].values())
+        if not query_terms or not num_docs or top_k <= 0:
+            return []
+        avg_len = max(sum(entry["total_length"] for entry in manifest["segments"].values()) / num_docs, 1.0)
+
+        # 在所有段中定位查询词，累加全局文档频率（被过滤掉的段也参与IDF统计，保证得分可比）
+        segments = []
+        doc_freq = Counter()
+        for document_name, entry in manifest["segments"].items():
+            segment = self._load_segment(directory, entry["file"])
+            positions = {}
+            for term in query_terms:
+                pos = int(np.searchsorted(segment["terms"], term))
+                if pos < len(segment["terms"]) and segment["terms"][pos] == term:
+                    positions[term] = pos
+                    doc_freq[term] += int(segment["df"][pos])
+            if positions:
+                segments.append((document_name, entry, segment, positions))
+        idf = {term: math.log(1 + (num_docs - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+        allowed_documents = filters.values_for("document_name") if filters else None
+        candidates = []
+        for document_name, entry, segment, positions in segments:
+            if allowed_documents is not None and document_name not in allowed_documents:
+                continue
+            bound = sum(
+                idf[term] * self._term_weight(int(segment["max_tf"][pos]), int(segment["min_len"][pos]), avg_len)
+                for term, pos in positions.items()
+            )
+            candidates.append((bound, document_name, entry, segment, positions))
+        candidates.sort(key=lambda c: -c[0])
+
+        heap: List[tuple] = []
+        sequence = itertools.count()
+        for bound, document_name, entry, segment, positions in candidates:
+            if len(heap) >= top_k and bound <= heap[0][0]:
+                logger.info(f"Lexical search on {collection_name} skipped remaining segments by upper bound")
+                break
+            for score, docno in self._search_segment(segment, positions, idf, avg_len, heap, top_k, filters, document_name):
+                entry_tuple = (score, next(sequence), document_name, docno)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry_tuple)
+                else:
+                    heapq.heapreplace(heap, entry_tuple)
+
+        matches = []
+        for score, _, document_name, docno in sorted(heap, key=lambda e: (-e[0], e[1])):
+            entry = manifest["segments"][document_name]
+            segment = self._load_segment(directory, entry["file"])
+            matches.append({
+                "row_id": int(segment["row_ids"][docno]),
+                "score": float(score),
+                "document_name": document_name,
+                **entry.get("embedding", {}),
+                **segment["records"][docno]
+            })
+        return matches
+
+    def _search_segment(self, segment: Dict[str, Any], positions: Dict[str, int], idf: Dict[str, float],
+                        avg_len: float, heap: List[tuple], top_k: int,
+                        filters: Optional[SearchFilters], document_name: str):
+        """
+        在一个段内执行MaxScore检索，逐个产出可进入top_k的 (得分, 文档号)；调用方负责更新堆
+
+        参数:
+            segment: 段数组字典
+            positions: 查询词 -> 词表中的位置
+            idf: 查询词的全局IDF
+            avg_len: 全局平均文档长度
+            heap: 当前的top_k最小堆，用于读取进入门槛
+            top_k: 返回的最大结果数量
+            filters: 结构化过滤条件
+            document_name: 段对应的文档名称
+        """
+        lists = []
+        for term, pos in positions.items():
+            start, end = int(segment["term_offsets"][pos]), int(segment["term_offsets"][pos + 1])
+            values = _varint_decode(segment["postings"][start:end])
+            docnos = np.cumsum(values[0::2])
+            weights = idf[term] * self._term_weight(values[1::2], segment["doc_lens"][docnos], avg_len)
+            lists.append((float(weights.max()), docnos.tolist(), weights.tolist()))
+        # 按上界升序排列，prefix[i]为前i+1个词的上界之和
+        lists.sort(key=lambda item: item[0])
+        prefix = list(itertools.accumulate(item[0] for item in lists))
+        cursors = [0] * len(lists)
+
+        while True:
+            threshold = heap[0][0] if len(heap) >= top_k else 0.0
+            # 上界之和不超过门槛的前若干个词不能单独让文档进入top_k
+            essential = bisect.bisect_right(prefix, threshold)
+            if essential >= len(lists):
+                return
+            current = [lists[i][1][cursors[i]] for i in range(essential, len(lists)) if cursors[i] < len(lists[i][1])]
+            if not current:
+                return
+            docno = min(current)
+            score = 0.0
+            for i in range(essential, len(lists)):
+                docnos = lists[i][1]
+                if cursors[i] < len(docnos) and docnos[cursors[i]] == docno:
+                    score += lists[i][2][cursors[i]]
+                    cursors[i] += 1
+            for i in range(essential - 1, -1, -1):
+                if score + prefix[i] <= threshold:
+                    break
+                docnos = lists[i][1]
+                cursors[i] = bisect.bisect_left(docnos, docno, cursors[i])
+                if cursors[i] < len(docnos) and docnos[cursors[i]] == docno:
+                    score += lists[i][2][cursors[i]]
+            if score <= threshold:
+                continue
+            if filters is not None and not filters.is_empty():
+                record = segment["records"][docno]
+                if not filters.matches({**record, "document_name": document_name}):
+                    continue
+            yield score, docno
+
+
+# 创建全局词法索引实例
+lexical_index = LexicalIndex()
@@ -0,0 +1,274 @@
+import os
+import glob
+import json
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+from utils.config import MODEL_REGISTRY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    嵌入模型登记表，以JSON文件持久化每个 (提供商, 模型) 的向量维度、最大token数和输出是否归一化
+
+    条目在生成嵌入时登记（维度和归一化以实际输出为准），未登记的模型从内置的已知模型表
+    或本地HuggingFace缓存中的模型配置读取；搜索据此在加载模型之前确认模型与集合维度一致
+    """
+
+    # 无法从本地配置读取的托管模型
+    KNOWN_MODELS = {
+        ("openai", "text-embedding-3-small"): {"dimension": 1536, "max_tokens": 8191, "normalized": True},
+        ("openai", "text-embedding-3-large"): {"dimension": 3072, "max_tokens": 8191, "normalized": True},
+        ("openai", "text-embedding-ada-002"): {"dimension": 1536, "max_tokens": 8191, "normalized": True},
+    }
+
+    def __init__(self, uri: str = MODEL_REGISTRY_CONFIG["uri"],
+                 hf_cache_folder: str = MODEL_REGISTRY_CONFIG["hf_cache_folder"]):
+        """
+        初始化模型登记表
+
+        参数:
+            uri: 登记表文件路径
+            hf_cache_folder: HuggingFace模型的本地缓存目录
+        """
+        self.uri = uri
+        self.hf_cache_folder = hf_cache_folder
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._signature: Optional[tuple] = None
+
+    @staticmethod
+    def _provider_name(provider: Any) -> str:
+        """
+        规范化提供商名称，兼容EmbeddingProvider枚举
+        """
+        return str(getattr(provider, "value", provider) or "").lower().strip()
+
+    @classmethod
+    def _key(cls, provider: str, model: str) -> str:
+        """
+        生成登记表条目的键，形如 provider/model
+        """
+        return f"{cls._provider_name(provider)}/{model}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        读取登记表文件，文件未变化时直接返回已解析的内容（其他进程登记的模型在文件替换后可见），
+        调用方需持有锁
+
+        返回:
+            登记表内容字典，文件不存在或损坏时返回空字典
+        """
+        try:
+            stat = os.stat(self.uri)
+        except FileNotFoundError:
+            if self._entries is None:
+                self._entries = {}
+            return self._entries
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._entries is None or signature != self._signature:
+            self._entries = {}
+            try:
+                with open(self.uri, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading model registry {self.uri}: {str(e)}")
+            self._signature = signature
+        return self._entries
+
+    def _write(self):
+        """
+        原子地写入登记表文件（先写同目录下的唯一临时文件再替换），调用方需持有锁
+        """
+        directory = os.path.dirname(self.uri) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.uri)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.uri)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(self.uri)
+        self._signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def register(self, provider: str, model: str, dimension: int,
+                 max_tokens: Optional[int] = None, normalized: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        登记模型的实际输出特征，与已登记的信息一致时不写文件
+
+        参数:
+            provider: 嵌入提供商
+            model: 嵌入模型名称
+            dimension: 向量维度
+            max_tokens: 最大输入token数，未知时沿用已登记或模型配置中的值
+            normalized: 输出向量是否为单位长度，未知时沿用已登记的值
+
+        返回:
+            登记后的条目
+        """
+        with self._lock:
+            entries = self._load()
+            key = self._key(provider, model)
+            current = entries.get(key) or self._from_model_config(provider, model) or {}
+            entry = {
+                "dimension": int(dimension),
+                "max_tokens": max_tokens if max_tokens is not None else current.get("max_tokens"),
+                "normalized": normalized if normalized is not None else current.get("normalized"),
+            }
+            if any(entries.get(key, {}).get(field) != value for field, value in entry.items()):
+                if current.get("dimension") and int(current["dimension"]) != int(dimension):
+                    logger.warning(f"Model {key} now produces {dimension}-d vectors, registered as {current['dimension']}-d")
+                entries[key] = {**entry, "updated_at": datetime.now().isoformat()}
+                self._write()
+            return entries[key]
+
+    def get(self, provider: str, model: str) -> Optional[Dict[str, Any]]:
+        """
+        获取模型信息：依次查找登记表、已知模型表和本地模型配置
+
+        参数:
+            provider: 嵌入提供商
+            model: 嵌入模型名称
+
+        返回:
+            包含dimension、max_tokens和normalized的字典，无从得知时返回None
+        """
+        with self._lock:
+            entry = self._load().get(self._key(provider, model))
+        return entry or self._from_model_config(provider, model)
+
+    def models_with_dimension(self, dimension: int) -> List[Dict[str, Any]]:
+        """
+        列出已登记的、输出指定维度向量的模型
+
+        参数:
+            dimension: 向量维度
+
+        返回:
+            包含embedding_provider和embedding_model的字典列表
+        """
+        with self._lock:
+            entries = dict(self._load())
+        matches = []
+        for key, entry in sorted(entries.items()):
+            if int(entry.get("dimension") or 0) == int(dimension):
+                provider, model = key.split("/", 1)
+                matches.append({"embedding_provider": provider, "embedding_model": model})
+        return matches
+
+    def resolve(self, provider: Optional[str], model: Optional[str], dimension: Optional[int]) -> Dict[str, Any]:
+        """
+        确定查询使用的嵌入模型：集合记录了模型时校验其维度，未记录时按维度在登记表中唯一确定
+
+        参数:
+            provider: 集合记录的嵌入提供商
+            model: 集合记录的嵌入模型，可能为空
+            dimension: 集合的向量维度，可能为空
+
+        返回:
+            包含embedding_provider、embedding_model和vector_dimension的字典
+
+        异常:
+            ValueError: 模型的维度与集合不一致，或无法唯一确定模型
+        """
+        if model:
+            info = self.get(provider, model)
+            if dimension and info and info.get("dimension") and int(info["dimension"]) != int(dimension):
+                raise ValueError(
+                    f"Embedding model {provider}/{model} produces {info['dimension']}-d vectors "
+                    f"but the collection holds {dimension}-d vectors"
+                )
+            return {"embedding_provider": provider, "embedding_model": model, "vector_dimension": dimension}
+
+        if not dimension:
+            raise ValueError("Collection records neither its embedding model nor its vector dimension")
+        candidates = self.models_with_dimension(dimension)
+        if provider:
+            candidates = [c for c in candidates if c["embedding_provider"] == self._provider_name(provider)] or candidates
+        if len(candidates) != 1:
+            raise ValueError(
+                f"Collection does not record its embedding model and {len(candidates)} registered models "
+                f"produce {dimension}-d vectors: {[c['embedding_model'] for c in candidates]}"
+            )
+        return {**candidates[0], "vector_dimension": dimension}
+
+    def _from_model_config(self, provider: str, model: str) -> Optional[Dict[str, Any]]:
+        """
+        从已知模型表或本地HuggingFace缓存中的sentence-transformers配置读取模型信息（不加载模型）
+
+        参数:
+            provider: 嵌入提供商
+            model: 嵌入模型名称
+
+        返回:
+            模型信息字典，找不到配置时返回None
+        """
+        known = self.KNOWN_MODELS.get((self._provider_name(provider), model))
+        if known:
+            return dict(known)
+        if self._provider_name(provider) != "huggingface":
+            return None
+
+        model_dir = self._find_hf_model_dir(model)
+        if not model_dir:
+            return None
+
+        def read_json(*parts) -> Dict[str, Any]:
+            path = os.path.join(model_dir, *parts)
+            if not os.path.exists(path):
+                return {}
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception:
+                return {}
+
+        modules = read_json("modules.json")
+        modules = modules if isinstance(modules, list) else []
+        dimension = None
+        # 最后一个Dense层决定输出维度，否则为池化层的维度
+        for module in reversed(modules):
+            if module.get("type", "").endswith("Dense"):
+                dimension = read_json(module.get("path", ""), "config.json").get("out_features")
+                break
+        if dimension is None:
+            pooling = next((m for m in modules if m.get("type", "").endswith("Pooling")), None)
+            if pooling:
+                dimension = read_json(pooling.get("path", ""), "config.json").get("word_embedding_dimension")
+        transformer_config = read_json("config.json")
+        dimension = dimension or transformer_config.get("hidden_size")
+        if not dimension:
+            return None
+        return {
+            "dimension": int(dimension),
+            "max_tokens": read_json("sentence_bert_config.json").get("max_seq_length")
+                          or transformer_config.get("max_position_embeddings"),
+            # 本项目的HuggingFace嵌入都以 normalize_embeddings=True 编码
+            "normalized": True,
+        }
+
+    def _find_hf_model_dir(self, model: str) -> Optional[str]:
+        """
+        在本地缓存中查找模型目录，兼容HuggingFace Hub的缓存布局和旧版sentence-transformers的目录命名
+        """
+        names = [model] if "/" in model else [f"sentence-transformers/{model}", model]
+        for name in names:
+            hub_dir = os.path.join(self.hf_cache_folder, "models--" + name.replace("/", "--"), "snapshots", "*")
+            snapshots = sorted(glob.glob(hub_dir), key=os.path.getmtime, reverse=True)
+            if snapshots:
+                return snapshots[0]
+            legacy_dir = os.path.join(self.hf_cache_folder, name.replace("/", "_"))
+            if os.path.isdir(legacy_dir):
+                return legacy_dir
+        return None
+
+
+# 创建全局模型登记表实例
+model_registry = ModelRegistry()
@@ -0,0 +1,133 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import logging
+from utils.config import RERANK_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class RerankService:
+    """
+    重排序服务类：用本地交叉编码器对检索候选重新打分
+
+    模型加载后常驻内存，按模型名称复用；（查询, 块）对的分数按内容摘要缓存，
+    同一批候选中未命中缓存的对在一次前向计算中批量打分
+    """
+
+    def __init__(self, model_name: str = RERANK_CONFIG["model"], cache_size: int = RERANK_CONFIG["cache_size"]):
+        """
+        初始化重排序服务
+
+        参数:
+            model_name: 默认的交叉编码器模型
+            cache_size: 分数缓存的条目数
+        """
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._models: Dict[str, Any] = {}
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _get_model(self, model_name: str):
+        """
+        获取常驻内存的交叉编码器，首次使用时加载
+
+        参数:
+            model_name: 模型名称
+
+        返回:
+            CrossEncoder实例
+        """
+        with self._model_lock:
+            if model_name not in self._models:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError:
+                    raise ImportError("sentence-transformers package is not installed. Please install it with 'pip install sentence-transformers'")
+                logger.info(f"Loading cross-encoder model: {model_name}")
+                self._models[model_name] = CrossEncoder(
+                    model_name,
+                    max_length=RERANK_CONFIG["max_length"],
+                    device=RERANK_CONFIG["device"]
+                )
+            return self._models[model_name]
+
+    @staticmethod
+    def _pair_key(model_name: str, query: str, text: str) -> str:
+        """
+        计算（查询, 块）对的缓存键
+        """
+        return hashlib.sha1(f"{model_name}\x00{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def score_pairs(self, query: str, texts: List[str], model_name: Optional[str] = None) -> tuple:
+        """
+        为查询与一组块打分，先查缓存，未命中的对一次前向计算打分后写入缓存
+
+        参数:
+            query: 查询文本
+            texts: 块文本列表
+            model_name: 交叉编码器模型，默认使用配置中的模型
+
+        返回:
+            (与texts一一对应的分数列表, 统计信息)
+        """
+        model_name = model_name or self.model_name
+        keys = [self._pair_key(model_name, query, text) for text in texts]
+        scores: List[Optional[float]] = [None] * len(texts)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        stats = {"model": model_name, "pairs": len(texts), "cache_hits": len(texts) - len(missing), "load_ms": 0.0, "forward_ms": 0.0}
+        if missing:
+            load_start = time.perf_counter()
+            model = self._get_model(model_name)
+            stats["load_ms"] = round((time.perf_counter() - load_start) * 1000, 2)
+            forward_start = time.perf_counter()
+            predicted = model.predict(
+                [(query, texts[i]) for i in missing],
+                batch_size=len(missing),
+                show_progress_bar=False
+            )
+            stats["forward_ms"] = round((time.perf_counter() - forward_start) * 1000, 2)
+            with self._cache_lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    self._cache[keys[i]] = scores[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores, stats
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], top_k: int,
+               model_name: Optional[str] = None) -> tuple:
+        """
+        对搜索结果重新打分并取top_k；检索阶段的分数保留在retrieval_score中
+
+        参数:
+            query: 查询文本
+            hits: 检索阶段的搜索结果
+            top_k: 返回的最大结果数量
+            model_name: 交叉编码器模型，默认使用配置中的模型
+
+        返回:
+            (按交叉编码器分数降序的top_k结果, 统计信息)
+        """
+        if not hits:
+            return [], {"model": model_name or self.model_name, "pairs": 0, "cache_hits": 0, "load_ms": 0.0, "forward_ms": 0.0}
+        scores, stats = self.score_pairs(query, [hit.get("text") or "" for hit in hits], model_name)
+        for hit, score in zip(hits, scores):
+            hit["retrieval_score"] = hit["score"]
+            hit["score"] = score
+        ranked = sorted(hits, key=lambda hit: hit["score"], reverse=True)[:top_k]
+        return ranked, stats
+
+
+# 创建全局重排序服务实例
+rerank_service = RerankService()
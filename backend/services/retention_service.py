@@ -0,0 +1,277 @@
+import os
+import re
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import logging
+from pymilvus import Collection, utility
+from services.vector_store_service import VectorStoreService
+from services.catalog_service import collection_catalog
+from services.doc_store_service import chunk_text_store
+from utils.milvus_connection import milvus_connection
+from utils.sidecar_client import sidecar_enabled, get_sidecar_client
+from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG, RETENTION_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 产物文件名和集合名末尾的时间戳：20240101120000 或 20240101_120000
+TIMESTAMP_PATTERN = re.compile(r"^(?P<source>.+?)_(?P<timestamp>\d{8}_?\d{6})$")
+
+
+class RetentionService:
+    """
+    保留策略与垃圾回收服务：按来源只保留最新的N份产物和集合，删除被取代的部分，
+    随后压缩向量库并报告回收的空间
+    """
+
+    def __init__(self, policy: Dict[str, Any] = None):
+        """
+        初始化回收服务
+
+        参数:
+            policy: 保留策略，默认使用RETENTION_CONFIG
+        """
+        self.policy = {**RETENTION_CONFIG, **(policy or {})}
+        self.vector_store = VectorStoreService()
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        执行一次垃圾回收
+
+        参数:
+            dry_run: 只报告将被删除的内容，不实际删除
+
+        返回:
+            回收报告，包含删除的文件和集合以及回收的字节数
+        """
+        start_time = datetime.now()
+        vector_store_dir = self.vector_store._get_absolute_path(os.path.dirname(MILVUS_CONFIG["uri"]))
+        store_size_before = self._dir_size(vector_store_dir)
+
+        files = self._collect_artifacts(dry_run)
+        collections = self._collect_collections(dry_run)
+        compaction = self._compact() if self.policy["compact"] and not dry_run else {}
+
+        store_reclaimed = 0 if dry_run else max(store_size_before - self._dir_size(vector_store_dir), 0)
+        file_reclaimed = sum(f["size_bytes"] for f in files)
+        report = {
+            "dry_run": dry_run,
+            "deleted_files": files,
+            "deleted_collections": collections,
+            "compaction": compaction,
+            "reclaimed_bytes": {
+                "artifacts": file_reclaimed,
+                "vector_store": store_reclaimed,
+                "total": file_reclaimed + store_reclaimed
+            },
+            "elapsed_seconds": (datetime.now() - start_time).total_seconds()
+        }
+        logger.info(
+            f"GC finished (dry_run={dry_run}): {len(files)} files, {len(collections)} collections, "
+            f"{report['reclaimed_bytes']['total']} bytes reclaimed"
+        )
+        return report
+
+    @staticmethod
+    def _split_timestamp(name: str) -> Optional[tuple]:
+        """
+        拆分名称末尾的时间戳
+
+        参数:
+            name: 不含扩展名的文件名或集合名
+
+        返回:
+            (来源, 时间戳)，名称不带时间戳时返回None
+        """
+        match = TIMESTAMP_PATTERN.match(name)
+        if not match:
+            return None
+        return match.group("source"), match.group("timestamp").replace("_", "")
+
+    @staticmethod
+    def _superseded(items: List[tuple], keep: int) -> List[Any]:
+        """
+        按来源分组，返回每组中除最新keep个之外的项
+
+        参数:
+            items: (来源, 时间戳, 项) 列表
+            keep: 每个来源保留的数量
+
+        返回:
+            被取代的项列表
+        """
+        groups = defaultdict(list)
+        for source, timestamp, item in items:
+            groups[source].append((timestamp, item))
+        superseded = []
+        for entries in groups.values():
+            entries.sort(key=lambda e: e[0], reverse=True)
+            superseded.extend(item for _, item in entries[keep:])
+        return superseded
+
+    def _collect_artifacts(self, dry_run: bool) -> List[Dict[str, Any]]:
+        """
+        回收各产物目录中被取代的文件
+
+        返回:
+            删除（或将删除）的文件列表
+        """
+        deleted = []
+        for directory, keep in self.policy["artifacts"].items():
+            path = self.vector_store._get_absolute_path(directory)
+            if not os.path.isdir(path):
+                continue
+            items = []
+            for name in os.listdir(path):
+                file_path = os.path.join(path, name)
+                stem, ext = os.path.splitext(name)
+                parsed = self._split_timestamp(stem)
+                if ext != ".json" or parsed is None or not os.path.isfile(file_path):
+                    continue
+                items.append((parsed[0], parsed[1], file_path))
+
+            for file_path in self._superseded(items, keep):
+                size = os.path.getsize(file_path)
+                if not dry_run:
+                    try:
+                        os.remove(file_path)
+                    except OSError as e:
+                        logger.error(f"Error deleting {file_path}: {str(e)}")
+                        continue
+                deleted.append({"path": os.path.join(directory, os.path.basename(file_path)), "size_bytes": size})
+        return deleted
+
+    def _collect_collections(self, dry_run: bool) -> List[Dict[str, Any]]:
+        """
+        回收被取代的时间戳集合：同一 {文件名}_{provider} 只保留最新的N个，
+        带保护标签和按文档分区的共享集合不会被回收
+
+        返回:
+            删除（或将删除）的集合列表
+        """
+        deleted = []
+        protected_tags = set(self.policy["protected_tags"])
+        for provider in (VectorDBProvider.MILVUS.value, VectorDBProvider.CHROMA.value):
+            items = []
+            for collection in self.vector_store.list_collections(provider):
+                name = collection["name"]
+                parsed = self._split_timestamp(name)
+                if parsed is None:
+                    continue
+                entry = collection_catalog.get(provider, name)
+                if protected_tags & set(entry.get("tags", [])) or entry.get("partitions"):
+                    continue
+                items.append((parsed[0], parsed[1], collection))
+
+            for collection in self._superseded(items, self.policy["collections_keep_latest"]):
+                if not dry_run:
+                    try:
+                        self.vector_store.delete_collection(provider, collection["name"])
+                    except Exception as e:
+                        logger.error(f"Error deleting collection {collection['name']}: {str(e)}")
+                        continue
+                deleted.append({"provider": provider, "name": collection["name"], "count": collection.get("count", 0)})
+        return deleted
+
+    def _compact(self) -> Dict[str, Any]:
+        """
+        压缩向量库：对Milvus集合执行compact以清理已删除的行，对Chroma的SQLite文件执行VACUUM，
+        并重写块文本存储的数据文件以回收被更新或删除的记录
+
+        返回:
+            各向量库的压缩结果
+        """
+        result = {}
+        try:
+            if sidecar_enabled():
+                # 数据文件由sidecar独占，由sidecar执行compact
+                compacted = get_sidecar_client().call("compact")
+            else:
+                compacted = self._compact_milvus()
+            result[VectorDBProvider.MILVUS.value] = {"compacted_collections": compacted}
+        except Exception as e:
+            # Milvus Lite 等部署可能不支持手动compact
+            logger.warning(f"Milvus compaction skipped: {str(e)}")
+            result[VectorDBProvider.MILVUS.value] = {"error": str(e)}
+
+        sqlite_path = os.path.join(self.vector_store._get_absolute_path(CHROMA_CONFIG["uri"]), "chroma.sqlite3")
+        if os.path.exists(sqlite_path):
+            try:
+                conn = sqlite3.connect(sqlite_path)
+                try:
+                    conn.execute("VACUUM")
+                finally:
+                    conn.close()
+                result[VectorDBProvider.CHROMA.value] = {"vacuumed": True}
+            except Exception as e:
+                logger.warning(f"Chroma VACUUM skipped: {str(e)}")
+                result[VectorDBProvider.CHROMA.value] = {"error": str(e)}
+
+        doc_store_reclaimed = 0
+        for provider, name in chunk_text_store.list_collections():
+            sizes = chunk_text_store.compact(provider, name)
+            doc_store_reclaimed += sizes["size_before"] - sizes["size_after"]
+        result["doc_store"] = {"reclaimed_bytes": doc_store_reclaimed}
+        return result
+
+    def _compact_milvus(self) -> List[str]:
+        """
+        对Milvus主数据文件中的所有集合以及分片集合的每个分片执行compact
+
+        返回:
+            已压缩的集合名称列表，分片形如 集合名#分片序号
+        """
+        compacted = []
+        with milvus_connection(MILVUS_CONFIG["uri"]):
+            for name in utility.list_collections():
+                collection = Collection(name)
+                collection.compact()
+                collection.wait_for_compaction_completed()
+                compacted.append(name)
+        for entry in collection_catalog.list(VectorDBProvider.MILVUS.value):
+            if not entry.get("shards"):
+                continue
+            name = entry["collection_name"]
+            for shard, connection in enumerate(self.vector_store.collection_connections(name)):
+                with connection as alias:
+                    if not utility.has_collection(name, using=alias):
+                        continue
+                    collection = Collection(name, using=alias)
+                    collection.compact()
+                    collection.wait_for_compaction_completed()
+                    compacted.append(f"{name}#{shard}")
+        return compacted
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        """
+        计算目录下所有文件的总大小
+
+        参数:
+            path: 目录路径
+
+        返回:
+            字节数
+        """
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Garbage-collect superseded collections and artifacts")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = RetentionService().run(dry_run=args.dry_run)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from utils.config import SEARCH_CACHE_CONFIG
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存：进程内LRU缓存，条目带有写入时的集合版本、过期时间和序列化后的大小
+
+    读取时集合版本不一致或已过期的条目视为未命中并删除；超过条目数或内存上限时淘汰最久未使用的条目
+    """
+
+    def __init__(self, ttl_seconds: float = SEARCH_CACHE_CONFIG["ttl_seconds"],
+                 max_entries: int = SEARCH_CACHE_CONFIG["max_entries"],
+                 max_memory_mb: float = SEARCH_CACHE_CONFIG["max_memory_mb"],
+                 enabled: bool = SEARCH_CACHE_CONFIG["enabled"]):
+        """
+        初始化搜索结果缓存
+
+        Args:
+            ttl_seconds (float): 条目有效期（秒）
+            max_entries (int): 最大条目数
+            max_memory_mb (float): 缓存响应的总大小上限（MB）
+            enabled (bool): 是否启用
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = int(max_memory_mb * 1024 * 1024)
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(provider: str, collections: Any, query: str, **params) -> str:
+        """
+        生成缓存键
+
+        Args:
+            provider (str): 向量数据库提供商
+            collections (Any): 集合ID或集合ID列表
+            query (str): 查询文本
+            **params: 其余影响结果的搜索参数（top_k、threshold、filters等）
+
+        Returns:
+            str: 规范化的JSON键
+        """
+        return json.dumps(
+            {"provider": provider, "collections": collections, "query": query, **params},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+
+    def get(self, key: str, version: Any) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的响应
+
+        Args:
+            key (str): 缓存键
+            version (Any): 集合的当前版本
+
+        Returns:
+            Optional[Dict[str, Any]]: 响应的副本，未命中时返回None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            entry_version, expires_at, payload, _ = entry
+            if entry_version != version or time.monotonic() >= expires_at:
+                self._stats["stale" if entry_version != version else "expired"] += 1
+                self._stats["misses"] += 1
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return json.loads(payload)
+
+    def put(self, key: str, version: Any, response: Dict[str, Any]):
+        """
+        写入响应
+
+        Args:
+            key (str): 缓存键
+            version (Any): 搜索开始前读取的集合版本
+            response (Dict[str, Any]): 搜索响应
+        """
+        if not self.enabled:
+            return
+        payload = json.dumps(response, ensure_ascii=False, default=str)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (version, time.monotonic() + self.ttl_seconds, payload, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        """
+        删除条目并更新占用大小，调用方需持有锁
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def clear(self):
+        """
+        清空缓存（统计信息保留）
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 命中率、条目数、占用大小和各类未命中的次数
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_memory_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                **self._stats
+            }
+
+
+# 创建全局搜索结果缓存实例
+search_cache = SearchResultCache()
@@ -0,0 +1,167 @@
+import json
+import operator
+from typing import Dict, Any, List, Optional
+
+
+class SearchFilters:
+    """
+    结构化搜索过滤条件，可下推为Milvus表达式或Chroma的where子句
+
+    支持的写法（每个字段）：
+    - 标量值：等于，如 {"document_name": "manual.pdf"}
+    - 列表：属于，如 {"page_number": ["3", "4"]}
+    - 操作符字典：如 {"word_count": {"gte": 30, "lte": 500}}
+      可用操作符：eq, ne, in, nin, gt, gte, lt, lte（范围操作符仅限数值字段）
+    """
+
+    # 可过滤字段及其在存储中的类型
+    FIELDS = {
+        "document_name": str,
+        "page_number": str,
+        "word_count": int,
+    }
+
+    MILVUS_OPERATORS = {"eq": "==", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+    RANGE_OPERATORS = {"gt", "gte", "lt", "lte"}
+    PYTHON_OPERATORS = {
+        "eq": operator.eq, "ne": operator.ne, "gt": operator.gt,
+        "gte": operator.ge, "lt": operator.lt, "lte": operator.le
+    }
+
+    def __init__(self, filters: Optional[Dict[str, Any]] = None, word_count_threshold: Optional[int] = None):
+        """
+        初始化并校验过滤条件
+
+        Args:
+            filters (Dict[str, Any]): 结构化过滤条件
+            word_count_threshold (int): 最小字数阈值，等价于 word_count >= 阈值
+
+        Raises:
+            ValueError: 字段或操作符不受支持
+        """
+        self.conditions: List[tuple] = []
+        for field, spec in (filters or {}).items():
+            if field not in self.FIELDS:
+                raise ValueError(f"Unsupported filter field: {field}. Supported fields: {list(self.FIELDS)}")
+            if isinstance(spec, dict):
+                for op, value in spec.items():
+                    self._add(field, op, value)
+            elif isinstance(spec, (list, tuple, set)):
+                self._add(field, "in", list(spec))
+            else:
+                self._add(field, "eq", spec)
+
+        if word_count_threshold:
+            self._add("word_count", "gte", word_count_threshold)
+
+    def _add(self, field: str, op: str, value: Any):
+        """
+        添加一个条件，并按字段类型转换取值
+
+        Args:
+            field (str): 字段名
+            op (str): 操作符
+            value (Any): 取值
+        """
+        field_type = self.FIELDS[field]
+        if op not in self.MILVUS_OPERATORS and op not in ("in", "nin"):
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if op in self.RANGE_OPERATORS and field_type is not int:
+            raise ValueError(f"Range operator '{op}' is only supported on numeric fields, got {field}")
+        if op in ("in", "nin"):
+            if not isinstance(value, (list, tuple, set)):
+                value = [value]
+            value = [field_type(v) for v in value]
+        else:
+            value = field_type(value)
+        self.conditions.append((field, op, value))
+
+    def is_empty(self) -> bool:
+        """
+        是否没有任何过滤条件
+        """
+        return not self.conditions
+
+    def values_for(self, field: str) -> Optional[List[Any]]:
+        """
+        获取字段被等值/属于条件限定的取值集合，用于分区裁剪
+
+        Args:
+            field (str): 字段名
+
+        Returns:
+            Optional[List[Any]]: 同时满足所有eq/in条件的取值，字段未被限定时返回None
+        """
+        allowed = None
+        for cond_field, op, value in self.conditions:
+            if cond_field != field or op not in ("eq", "in"):
+                continue
+            values = value if op == "in" else [value]
+            allowed = [v for v in values if allowed is None or v in allowed]
+        return allowed
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        """
+        在内存中判断一条记录是否满足所有条件，用于不经过向量数据库的检索（如词法索引）
+
+        Args:
+            record (Dict[str, Any]): 包含过滤字段的记录
+
+        Returns:
+            bool: 是否满足，记录缺少被过滤的字段时视为不满足
+        """
+        for field, op, value in self.conditions:
+            actual = record.get(field)
+            if actual is None:
+                return False
+            actual = self.FIELDS[field](actual)
+            if op == "in":
+                ok = actual in value
+            elif op == "nin":
+                ok = actual not in value
+            else:
+                ok = self.PYTHON_OPERATORS[op](actual, value)
+            if not ok:
+                return False
+        return True
+
+    def to_milvus_expr(self) -> str:
+        """
+        转换为Milvus布尔表达式
+
+        Returns:
+            str: 表达式，无条件时返回空字符串
+        """
+        parts = []
+        for field, op, value in self.conditions:
+            if op in ("in", "nin"):
+                keyword = "in" if op == "in" else "not in"
+                parts.append(f"{field} {keyword} {self._milvus_literal(value)}")
+            else:
+                parts.append(f"{field} {self.MILVUS_OPERATORS[op]} {self._milvus_literal(value)}")
+        return " and ".join(parts)
+
+    @staticmethod
+    def _milvus_literal(value: Any) -> str:
+        """
+        生成Milvus表达式中的字面量，字符串使用JSON转义避免注入
+        """
+        if isinstance(value, list):
+            return "[" + ", ".join(SearchFilters._milvus_literal(v) for v in value) + "]"
+        if isinstance(value, str):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value)
+
+    def to_chroma_where(self) -> Optional[Dict[str, Any]]:
+        """
+        转换为Chroma的where子句
+
+        Returns:
+            Optional[Dict[str, Any]]: where子句，无条件时返回None
+        """
+        clauses = [{field: {f"${op}": value}} for field, op, value in self.conditions]
+        if not clauses:
+            return None
+        if len(clauses) == 1:
+            return clauses[0]
+        return {"$and": clauses}
@@ -1,16 +1,47 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import logging
+import asyncio
+import fnmatch
+import heapq
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
 from datetime import datetime
-from pymilvus import connections, Collection, utility
+from pymilvus import Collection, utility
 from services.vector_store_service import VectorStoreService
-from services.embedding_service import EmbeddingService, EmbeddingProvider
-from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG
+from services.embedding_service import EmbeddingService
+from services.catalog_service import collection_catalog
+from services.doc_store_service import chunk_text_store
+from services.lexical_index_service import lexical_index
+from services.rerank_service import rerank_service
+from services.search_cache import search_cache
+from services.semantic_cache import semantic_cache
+from services.model_registry import model_registry
+from services.search_filters import SearchFilters
+from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG, LEXICAL_INDEX_CONFIG, RERANK_CONFIG, MMR_CONFIG, NEIGHBOR_CONFIG, RANGE_SEARCH_CONFIG
+from utils.milvus_connection import milvus_connection, is_milvus_lite
+from utils.vector_math import normalize_vector, mmr_select
+from utils.sidecar_client import sidecar_enabled, get_sidecar_client
+from utils.executors import run_inference, run_io, io_context, search_slots
 import os
 import json
 import re
 
 logger = logging.getLogger(__name__)
 
+# 流式搜索时接收阶段事件的队列；由search_stream为其搜索任务设置，其他搜索不产生事件
+_stage_events: ContextVar[Optional[asyncio.Queue]] = ContextVar("search_stage_events", default=None)
+
+
+def _emit_stage(event: str, **data):
+    """
+    向当前流式搜索报告一个阶段事件，需在事件循环线程中调用
+    """
+    queue = _stage_events.get()
+    if queue is not None:
+        queue.put_nowait({"event": event, **data})
+
+
 class SearchService:
     """
     搜索服务类，负责向量数据库的连接和向量搜索功能
@@ -84,33 +115,29 @@ class SearchService:
         logger.info(f"Listing collections for provider: {provider}")
         
         if provider == VectorDBProvider.MILVUS.value:
+            if sidecar_enabled():
+                return get_sidecar_client().call("list_collections")
             try:
-                connections.connect(
-                    alias="default",
-                    uri=self.get_uri(provider)
-                )
-                
-                collections = []
-                collection_names = utility.list_collections()
-                
-                for name in collection_names:
-                    try:
-                        collection = Collection(name)
-                        collections.append({
-                            "id": name,
-                            "name": name,
-                            "count": collection.num_entities
-                        })
-                    except Exception as e:
-                        logger.error(f"Error getting info for collection {name}: {str(e)}")
-                
-                return collections
+                with milvus_connection(self.get_uri(provider)):
+                    collections = []
+                    collection_names = utility.list_collections()
+                    
+                    for name in collection_names:
+                        try:
+                            collection = Collection(name)
+                            collections.append({
+                                "id": name,
+                                "name": name,
+                                "count": collection.num_entities
+                            })
+                        except Exception as e:
+                            logger.error(f"Error getting info for collection {name}: {str(e)}")
+                    
+                    return collections
                 
             except Exception as e:
                 logger.error(f"Error listing Milvus collections: {str(e)}")
                 raise
-            finally:
-                connections.disconnect("default")
         
         elif provider == VectorDBProvider.CHROMA.value:
             try:
@@ -218,9 +245,20 @@ class SearchService:
                    top_k: int = 3, 
                    threshold: float = 0.5,    # 相似度阈值默认50%
                    word_count_threshold: int = 30,    # 最小字数默认30
-                   save_results: bool = False) -> Dict[str, Any]:
+                   filters: Optional[Dict[str, Any]] = None,    # 结构化过滤条件
+                   save_results: bool = False,
+                   mode: str = "vector",
+                   rerank: bool = False,
+                   rerank_k: Optional[int] = None,
+                   mmr: bool = False,
+                   mmr_lambda: Optional[float] = None,
+                   mmr_k: Optional[int] = None,
+                   expand_neighbors: int = 0,
+                   range_search: bool = False) -> Dict[str, Any]:
         """
-        执行向量搜索
+        执行向量搜索，或BM25与向量检索融合的混合搜索，可选用交叉编码器重排序；
+        成功的响应按集合版本缓存，集合被重新索引、增量更新或删除后缓存失效；
+        启用语义缓存时，与已缓存查询的向量足够接近的查询也直接返回缓存的响应
         
         Args:
             provider (str): 向量数据库提供商
@@ -229,14 +267,455 @@ class SearchService:
             top_k (int): 返回的最大结果数量，默认为3
             threshold (float): 相似度阈值，低于此值的结果将被过滤，默认为0.7
             word_count_threshold (int): 文本字数阈值，低于此值的结果将被过滤，默认为20
+            filters (Dict[str, Any]): 结构化过滤条件（document_name、page_number、word_count），下推到数据库执行
             save_results (bool): 是否保存搜索结果，默认为False
+            mode (str): 检索模式，"vector"为向量检索，"hybrid"为BM25关键词检索与向量检索并发执行后按RRF融合
+            rerank (bool): 是否先多取候选，再用交叉编码器重排序后取top_k
+            rerank_k (int): 重排序的候选数，默认为 top_k * candidate_multiplier
+            mmr (bool): 是否按最大边际相关（MMR）从候选中选出多样化的top_k，仅支持向量检索且不与重排序同用
+            mmr_lambda (float): MMR的相关性权重（0~1），默认使用配置
+            mmr_k (int): MMR的候选数，默认为 top_k * candidate_multiplier
+            expand_neighbors (int): 为每个命中补充同一文档中前后各多少个块，0为不扩展
+            range_search (bool): 是否返回相似度阈值以上的全部结果（最多 max_results 个）而不按top_k截断，
+                仅支持向量检索且不与重排序、MMR同用
             
         Returns:
-            Dict[str, Any]: 包含搜索结果的字典，如果保存结果则包含保存路径
+            Dict[str, Any]: 包含搜索结果的字典，如果保存结果则包含保存路径；重排序和MMR时包含各阶段耗时；
+                命中结果缓存时包含 cache_hit: True；命中语义缓存时 cache_hit 为 "semantic"，
+                并在semantic_cache中包含被命中的查询及其余弦距离；扩展邻近块时包含合并后的上下文（contexts）
             
         Raises:
             Exception: 搜索过程中发生错误
         """
+        provider_str = str(provider).lower().strip()
+        if range_search:
+            if mode != "vector" or rerank or mmr:
+                return {"results": [], "error": "Range search is only supported in vector mode without reranking or MMR"}
+            # 阈值已下推到引擎，top_k只作为结果数上限
+            top_k = RANGE_SEARCH_CONFIG["max_results"]
+        # 版本在搜索开始前读取：搜索期间集合被写入时，缓存的旧结果会在下次读取时失效
+        version = collection_catalog.version(provider_str, str(collection_id))
+        params = dict(
+            top_k=top_k, threshold=threshold, word_count_threshold=word_count_threshold,
+            filters=filters, mode=mode, rerank=rerank, rerank_k=rerank_k,
+            mmr=mmr, mmr_lambda=mmr_lambda, mmr_k=mmr_k
+        )
+        expand_neighbors = min(max(int(expand_neighbors or 0), 0), NEIGHBOR_CONFIG["max_window"])
+        cache_key = search_cache.make_key(provider_str, collection_id, query, expand_neighbors=expand_neighbors, **params)
+        response = search_cache.get(cache_key, version)
+        if response is not None:
+            logger.info(f"Search cache hit for {provider_str}/{collection_id}: {query}")
+            response["cache_hit"] = True
+            return self._with_saved_results(response, query, collection_id, save_results)
+        
+        # 精确缓存未命中时查找语义相近的已缓存查询；查询向量会被记住，真实搜索时不再重复嵌入
+        semantic_namespace = search_cache.make_key(provider_str, collection_id, None, expand_neighbors=expand_neighbors, **params)
+        query_embedding = await self._semantic_cache_embedding(provider_str, str(collection_id), query)
+        if query_embedding is not None:
+            match = semantic_cache.lookup(semantic_namespace, version, query_embedding)
+            if match is not None:
+                logger.info(f"Semantic cache hit for {provider_str}/{collection_id}: {query} ~ {match['query']} ({match['distance']})")
+                response = match["response"]
+                response["cache_hit"] = "semantic"
+                response["semantic_cache"] = {"matched_query": match["query"], "distance": match["distance"]}
+                if semantic_cache.should_audit():
+                    asyncio.ensure_future(self._audit_semantic_hit(
+                        provider_str, query, collection_id, params, match, response.get("results", [])
+                    ))
+                return self._with_saved_results(response, query, collection_id, save_results)
+        
+        async with search_slots():
+            response = await self._search(
+                provider=provider_str,
+                query=query,
+                collection_id=collection_id,
+                save_results=save_results,
+                **params
+            )
+        if expand_neighbors and not response.get("error"):
+            response.update(await self._expand_neighbors(provider_str, str(collection_id), response["results"], expand_neighbors))
+        if not response.get("error"):
+            cached = {k: v for k, v in response.items() if k != "saved_filepath"}
+            search_cache.put(cache_key, version, cached)
+            if query_embedding is not None:
+                semantic_cache.put(semantic_namespace, version, query, query_embedding, cached)
+        return response
+
+    async def search_stream(self, **search_params) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式执行search，边执行边产生阶段事件，结果确定后逐条产生
+        
+        Args:
+            **search_params: 与search相同的参数
+            
+        Returns:
+            AsyncIterator[Dict[str, Any]]: 事件迭代器，依次为阶段事件
+                （embedded：查询向量已计算；candidates：向量检索返回候选；reranked / diversified：重排序或MMR完成），
+                每条最终结果一个 {"event": "result", "rank", "result"}，最后为包含其余响应字段的 {"event": "done", ...}；
+                搜索失败时最后为 {"event": "error", "error"}
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        token = _stage_events.set(queue)
+        try:
+            # 任务创建时复制当前上下文，搜索中的阶段事件写入本次请求的队列
+            task = asyncio.ensure_future(self.search(**search_params))
+        finally:
+            _stage_events.reset(token)
+        
+        # 语义缓存查找时已计算过查询向量，真实搜索再次取得同一向量时不重复报告embedded阶段
+        embedded = False
+        
+        def first_time(event: Dict[str, Any]) -> bool:
+            nonlocal embedded
+            if event["event"] != "embedded":
+                return True
+            seen, embedded = embedded, True
+            return not seen
+        
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    if first_time(getter.result()):
+                        yield getter.result()
+                    continue
+                getter.cancel()
+                break
+            while not queue.empty():
+                event = queue.get_nowait()
+                if first_time(event):
+                    yield event
+            try:
+                response = task.result()
+            except Exception as e:
+                logger.error(f"Error in streaming search: {str(e)}", exc_info=True)
+                response = {"results": [], "error": f"Search failed: {str(e)}"}
+        finally:
+            # 客户端断开时停止搜索
+            if not task.done():
+                task.cancel()
+        
+        if response.get("error"):
+            yield {"event": "error", "error": response["error"]}
+            return
+        for rank, result in enumerate(response.get("results", []), 1):
+            yield {"event": "result", "rank": rank, "result": result}
+        yield {"event": "done", **{k: v for k, v in response.items() if k != "results"}}
+
+    def _with_saved_results(self, response: Dict[str, Any], query: str, collection_id: str,
+                            save_results: bool) -> Dict[str, Any]:
+        """
+        为缓存命中的响应按需保存搜索结果
+        
+        Args:
+            response (Dict[str, Any]): 缓存的响应
+            query (str): 搜索查询文本
+            collection_id (str): 集合ID
+            save_results (bool): 是否保存搜索结果
+            
+        Returns:
+            Dict[str, Any]: 保存成功时带有saved_filepath的响应
+        """
+        if save_results and response.get("results"):
+            try:
+                response["saved_filepath"] = self.save_search_results(query, str(collection_id), response["results"])
+            except Exception as e:
+                logger.error(f"Error saving search results: {str(e)}")
+        return response
+
+    async def _semantic_cache_embedding(self, provider: str, collection_id: str, query: str) -> Optional[List[float]]:
+        """
+        为语义缓存查找计算查询向量；只在集合目录中已缓存嵌入配置时计算，避免为此额外打开集合
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            query (str): 搜索查询文本
+            
+        Returns:
+            Optional[List[float]]: 查询向量，语义缓存关闭、配置未缓存或嵌入失败时返回None
+        """
+        if not semantic_cache.enabled:
+            return None
+        embedding_config = self._cached_embedding_config(provider, collection_id)
+        if not embedding_config:
+            return None
+        try:
+            return await self._embed_query(query, embedding_config)
+        except Exception as e:
+            logger.warning(f"Skipping semantic cache lookup: {str(e)}")
+            return None
+
+    async def _audit_semantic_hit(self, provider: str, query: str, collection_id: str,
+                                  params: Dict[str, Any], match: Dict[str, Any],
+                                  cached_results: List[Dict[str, Any]]):
+        """
+        审计一次语义缓存命中：重新执行真实搜索并比较结果，误命中时删除被命中的条目
+        
+        Args:
+            provider (str): 向量数据库提供商
+            query (str): 本次查询
+            collection_id (str): 集合ID
+            params (Dict[str, Any]): 搜索参数
+            match (Dict[str, Any]): 语义缓存的命中信息
+            cached_results (List[Dict[str, Any]]): 返回给调用方的缓存结果
+        """
+        try:
+            async with search_slots():
+                fresh = await self._search(provider=provider, query=query, collection_id=collection_id, **params)
+            if fresh.get("error"):
+                return
+            false_hit = semantic_cache.record_audit(
+                query, match["query"], match["distance"], cached_results, fresh.get("results", [])
+            )
+            if false_hit:
+                logger.warning(f"Semantic cache false hit: {query} ~ {match['query']} ({match['distance']})")
+                semantic_cache.invalidate(match["entry_id"])
+        except Exception as e:
+            logger.warning(f"Semantic cache audit failed: {str(e)}")
+
+    async def _expand_neighbors(self, provider: str, collection_id: str,
+                                hits: List[Dict[str, Any]], window: int) -> Dict[str, Any]:
+        """
+        为命中补充同一文档中前后各window个块作为上下文，同一文档中重叠或相邻的窗口合并为一段
+        
+        所有命中的邻近块编号先汇总去重，再一次读取：优先从词法索引的段中读取（块文本在段中或块文本存储中），
+        词法索引中没有的文档用一次向量库查询读取
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            hits (List[Dict[str, Any]]): 最终的搜索结果
+            window (int): 每侧扩展的块数
+            
+        Returns:
+            Dict[str, Any]: contexts为按最佳命中排名排列的上下文，每段包含来源、块编号范围、其中的命中块、
+                最高分数、逐块内容和拼接后的文本；neighbors为扩展统计
+        """
+        start = time.perf_counter()
+        # 每个文档的窗口：(起始块, 结束块, 命中排名, 命中块, 命中分数)
+        windows: Dict[str, List[tuple]] = {}
+        known: Dict[tuple, Dict[str, Any]] = {}
+        for rank, hit in enumerate(hits):
+            metadata = hit.get("metadata", {})
+            try:
+                chunk = int(metadata.get("chunk"))
+            except (TypeError, ValueError):
+                continue
+            source = metadata.get("source", "")
+            total = int(metadata.get("total_chunks") or 0)
+            last = min(chunk + window, total) if total > 0 else chunk + window
+            windows.setdefault(source, []).append((max(chunk - window, 0), last, rank, chunk, hit["score"]))
+            known.setdefault((source, chunk), hit)
+
+        wanted = {
+            source: {c for lo, hi, *_ in spans for c in range(lo, hi + 1) if (source, c) not in known}
+            for source, spans in windows.items()
+        }
+        wanted = {source: chunk_ids for source, chunk_ids in wanted.items() if chunk_ids}
+        fetched = await run_io(self._fetch_chunks, provider, collection_id, wanted) if wanted else []
+        for chunk_hit in fetched:
+            known.setdefault((chunk_hit["metadata"]["source"], int(chunk_hit["metadata"]["chunk"])), chunk_hit)
+
+        contexts = []
+        for source, spans in windows.items():
+            merged = []
+            for lo, hi, rank, chunk, score in sorted(spans):
+                if merged and lo <= merged[-1]["end"] + 1:
+                    current = merged[-1]
+                    current["end"] = max(current["end"], hi)
+                    current["rank"] = min(current["rank"], rank)
+                    current["score"] = max(current["score"], score)
+                    current["hit_chunks"].add(chunk)
+                else:
+                    merged.append({"start": lo, "end": hi, "rank": rank, "score": score, "hit_chunks": {chunk}})
+            for span in merged:
+                chunks = [
+                    {
+                        "chunk": c,
+                        "page": known[(source, c)]["metadata"].get("page", ""),
+                        "text": known[(source, c)].get("text") or "",
+                        "is_hit": c in span["hit_chunks"]
+                    }
+                    for c in range(span["start"], span["end"] + 1) if (source, c) in known
+                ]
+                contexts.append({
+                    "source": source,
+                    "chunk_range": [chunks[0]["chunk"], chunks[-1]["chunk"]],
+                    "hit_chunks": sorted(span["hit_chunks"]),
+                    "score": span["score"],
+                    "rank": span["rank"],
+                    "chunks": chunks,
+                    "text": "\n".join(chunk["text"] for chunk in chunks)
+                })
+        contexts.sort(key=lambda context: context["rank"])
+        for context in contexts:
+            del context["rank"]
+        return {
+            "contexts": contexts,
+            "neighbors": {
+                "window": window,
+                "requested": sum(len(chunk_ids) for chunk_ids in wanted.values()),
+                "fetched": len(fetched),
+                "contexts": len(contexts),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+            }
+        }
+
+    def _fetch_chunks(self, provider: str, collection_id: str,
+                      chunk_ids: Dict[str, set]) -> List[Dict[str, Any]]:
+        """
+        按文档名称和块编号读取块，返回与搜索结果格式相同的条目（score为0）
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            chunk_ids (Dict[str, set]): 文档名称到块编号集合的映射
+            
+        Returns:
+            List[Dict[str, Any]]: 读取到的块，不存在的块编号被忽略
+        """
+        matches, missing = lexical_index.fetch_chunks(provider, collection_id, chunk_ids)
+        chunks = [self._lexical_hit(match) for match in matches]
+        if missing:
+            remaining = {source: chunk_ids[source] for source in missing}
+            logger.info(f"Fetching neighbour chunks of {missing} from the vector store")
+            if provider == VectorDBProvider.MILVUS.value:
+                chunks.extend(self._milvus_fetch_chunks(collection_id, remaining))
+            elif provider == VectorDBProvider.CHROMA.value:
+                chunks.extend(self._chroma_fetch_chunks(collection_id, remaining))
+        return self._hydrate_chunk_text(provider, collection_id, chunks)
+
+    def _milvus_fetch_chunks(self, collection_id: str, chunk_ids: Dict[str, set]) -> List[Dict[str, Any]]:
+        """
+        用一次表达式查询从Milvus读取块；分片集合在每个分片上各查询一次，启用sidecar时由sidecar查询
+        
+        Args:
+            collection_id (str): 集合ID
+            chunk_ids (Dict[str, set]): 文档名称到块编号集合的映射
+            
+        Returns:
+            List[Dict[str, Any]]: 读取到的块，精简集合的块保留row_id
+        """
+        expr = " or ".join(
+            f"(document_name == {json.dumps(source, ensure_ascii=False)} and chunk_id in {sorted(int(c) for c in ids)})"
+            for source, ids in chunk_ids.items()
+        )
+        shard_info = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_id).get("shards")
+        if shard_info:
+            vector_store = VectorStoreService()
+            active_shards = [s for s in range(shard_info["count"]) if s not in shard_info.get("released", [])]
+
+            chunks = []
+            for shard in active_shards:
+                with vector_store.shard_connection(collection_id, shard_info, shard) as alias:
+                    if utility.has_collection(collection_id, using=alias):
+                        chunks.extend(self._milvus_query_chunks(collection_id, expr, using=alias))
+            return chunks
+        if sidecar_enabled():
+            return get_sidecar_client().call("query_chunks", collection_id=collection_id, expr=expr)
+        with milvus_connection(self.get_uri(VectorDBProvider.MILVUS.value)):
+            return self._milvus_query_chunks(collection_id, expr)
+
+    def _milvus_query_chunks(self, collection_id: str, expr: str, using: str = "default") -> List[Dict[str, Any]]:
+        """
+        按表达式查询Milvus集合中的块（不取向量），调用方需处于对应连接的上下文中
+        
+        Args:
+            collection_id (str): 集合ID
+            expr (str): 过滤表达式
+            using (str): 连接别名
+            
+        Returns:
+            List[Dict[str, Any]]: 搜索结果格式的块，精简集合的块保留row_id
+        """
+        collection = self._open_milvus_collection(collection_id, using=using)
+        slim = self._is_slim_milvus_collection(collection)
+        output_fields = [
+            "content", "document_name", "chunk_id", "total_chunks", "page_number", "page_range",
+            "embedding_provider", "embedding_model", "embedding_timestamp"
+        ]
+        if slim:
+            output_fields = [f for f in output_fields if f not in VectorStoreService.CHUNK_TEXT_FIELDS + VectorStoreService.COLLECTION_LEVEL_FIELDS]
+        chunks = []
+        for row in collection.query(expr=expr, output_fields=output_fields):
+            chunk = {
+                "text": row.get("content"),
+                "score": 0.0,
+                "metadata": {
+                    "source": row.get("document_name"),
+                    "page": row.get("page_number"),
+                    "chunk": row.get("chunk_id"),
+                    "total_chunks": row.get("total_chunks"),
+                    "page_range": row.get("page_range"),
+                    "embedding_provider": row.get("embedding_provider"),
+                    "embedding_model": row.get("embedding_model"),
+                    "embedding_timestamp": row.get("embedding_timestamp")
+                }
+            }
+            if slim:
+                chunk["row_id"] = row["id"]
+            chunks.append(chunk)
+        return chunks
+
+    def _chroma_fetch_chunks(self, collection_id: str, chunk_ids: Dict[str, set]) -> List[Dict[str, Any]]:
+        """
+        用一次按元数据过滤的get从Chroma读取块
+        
+        Args:
+            collection_id (str): 集合ID
+            chunk_ids (Dict[str, set]): 文档名称到块编号集合的映射
+            
+        Returns:
+            List[Dict[str, Any]]: 搜索结果格式的块，精简集合的块保留row_id
+        """
+        conditions = [
+            {"$and": [{"document_name": source}, {"chunk_id": {"$in": sorted(int(c) for c in ids)}}]}
+            for source, ids in chunk_ids.items()
+        ]
+        collection = self._get_chroma_client().get_collection(name=collection_id)
+        results = collection.get(
+            where=conditions[0] if len(conditions) == 1 else {"$or": conditions},
+            include=["documents", "metadatas"]
+        )
+        chunks = []
+        for row_id, doc, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
+            chunks.append({
+                **({"row_id": int(row_id)} if doc is None else {}),
+                "text": doc,
+                "score": 0.0,
+                "metadata": {
+                    "source": metadata.get("document_name", ""),
+                    "page": metadata.get("page_number", ""),
+                    "chunk": metadata.get("chunk_id", 0),
+                    "total_chunks": metadata.get("total_chunks", 0),
+                    "page_range": metadata.get("page_range", ""),
+                    "embedding_provider": metadata.get("embedding_provider", ""),
+                    "embedding_model": metadata.get("embedding_model", ""),
+                    "embedding_timestamp": metadata.get("embedding_timestamp", "")
+                }
+            })
+        return chunks
+
+    async def _search(self, 
+                   provider: str,
+                   query: str, 
+                   collection_id: str, 
+                   top_k: int = 3, 
+                   threshold: float = 0.5,    # 相似度阈值默认50%
+                   word_count_threshold: int = 30,    # 最小字数默认30
+                   filters: Optional[Dict[str, Any]] = None,    # 结构化过滤条件
+                   save_results: bool = False,
+                   mode: str = "vector",
+                   rerank: bool = False,
+                   rerank_k: Optional[int] = None,
+                   mmr: bool = False,
+                   mmr_lambda: Optional[float] = None,
+                   mmr_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        按检索模式和提供商分派搜索，不经过结果缓存；参数与search相同
+        """
         try:
             # 添加参数日志
             logger.info(f"Search parameters:")
@@ -246,7 +725,11 @@ class SearchService:
             logger.info(f"- Top K: {top_k}")
             logger.info(f"- Threshold: {threshold}")
             logger.info(f"- Word Count Threshold: {word_count_threshold}")
+            logger.info(f"- Filters: {filters}")
             logger.info(f"- Save Results: {save_results} (type: {type(save_results)})")
+            logger.info(f"- Mode: {mode}")
+            logger.info(f"- Rerank: {rerank} (candidates: {rerank_k})")
+            logger.info(f"- MMR: {mmr} (lambda: {mmr_lambda}, candidates: {mmr_k})")
 
             logger.info(f"Starting search with parameters - Provider: {provider}, Collection: {collection_id}, Query: {query}, Top K: {top_k}")
             
@@ -264,28 +747,72 @@ class SearchService:
             logger.info(f"Is MILVUS? {is_milvus}")
             logger.info(f"Is CHROMA? {is_chroma}")
             
+            if mode not in ("vector", "hybrid"):
+                return {"results": [], "error": f"Unsupported search mode: '{mode}'"}
+            if mmr:
+                if mode != "vector" or rerank:
+                    return {"results": [], "error": "MMR is only supported in vector mode without reranking"}
+                return await self._search_mmr(
+                    provider=provider_str,
+                    query=query,
+                    collection_id=collection_id,
+                    top_k=top_k,
+                    threshold=threshold,
+                    word_count_threshold=word_count_threshold,
+                    filters=filters,
+                    save_results=save_results,
+                    mmr_lambda=mmr_lambda,
+                    mmr_k=mmr_k
+                )
+            if rerank:
+                return await self._search_reranked(
+                    provider=provider_str,
+                    query=query,
+                    collection_id=collection_id,
+                    top_k=top_k,
+                    threshold=threshold,
+                    word_count_threshold=word_count_threshold,
+                    filters=filters,
+                    save_results=save_results,
+                    mode=mode,
+                    rerank_k=rerank_k
+                )
+            if mode == "hybrid" and (is_milvus or is_chroma):
+                return self._report_candidates(await self._search_hybrid(
+                    provider=provider_str,
+                    query=query,
+                    collection_id=collection_id,
+                    top_k=top_k,
+                    threshold=threshold,
+                    word_count_threshold=word_count_threshold,
+                    filters=filters,
+                    save_results=save_results
+                ))
+            
             if is_milvus:
                 # Milvus搜索逻辑
                 logger.info("Using Milvus search logic")
-                return await self._search_milvus(
+                return self._report_candidates(await self._search_milvus(
                     query=query,
                     collection_id=collection_id,
                     top_k=top_k,
                     threshold=threshold,
                     word_count_threshold=word_count_threshold,
+                    filters=filters,
                     save_results=save_results
-                )
+                ))
             elif is_chroma:
                 # Chroma搜索逻辑
                 logger.info("Using Chroma search logic")
-                return await self._search_chroma(
+                return self._report_candidates(await self._search_chroma(
                     query=query,
                     collection_id=collection_id,
                     top_k=top_k,
                     threshold=threshold,
                     word_count_threshold=word_count_threshold,
+                    filters=filters,
                     save_results=save_results
-                )
+                ))
             else:
                 # 如果前面的比较都不匹配，则提供明确的错误信息
                 logger.error(f"Unsupported vector database provider: '{provider_str}'")
@@ -302,185 +829,1399 @@ class SearchService:
                 "error": f"Search failed: {str(e)}"
             }
             
-    async def _search_milvus(self, 
-                          query: str, 
-                          collection_id: str, 
-                          top_k: int = 3, 
-                          threshold: float = 0.5,    # 相似度阈值默认50%
-                          word_count_threshold: int = 30,    # 最小字数默认30
-                          save_results: bool = False) -> Dict[str, Any]:
+    @staticmethod
+    def _report_candidates(response: Dict[str, Any]) -> Dict[str, Any]:
         """
-        在Milvus中执行向量搜索
+        报告检索阶段返回的候选（重排序时为重排序前的候选），原样返回响应
+        """
+        if not response.get("error"):
+            _emit_stage("candidates", count=len(response.get("results", [])))
+        return response
+
+    async def _search_reranked(self,
+                               provider: str,
+                               query: str,
+                               collection_id: str,
+                               top_k: int = 3,
+                               threshold: float = 0.5,
+                               word_count_threshold: int = 30,
+                               filters: Optional[Dict[str, Any]] = None,
+                               save_results: bool = False,
+                               mode: str = "vector",
+                               rerank_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        两阶段搜索：先按检索模式取rerank_k个候选，再用交叉编码器为（查询, 块）对打分并取top_k；
+        重排序失败时退回检索阶段的前top_k个结果
         
         Args:
+            provider (str): 向量数据库提供商
             query (str): 搜索查询文本
             collection_id (str): 要搜索的集合ID
-            top_k (int): 返回的最大结果数量，默认为3
-            threshold (float): 相似度阈值，低于此值的结果将被过滤，默认为0.7
-            word_count_threshold (int): 文本字数阈值，低于此值的结果将被过滤，默认为20
-            save_results (bool): 是否保存搜索结果，默认为False
+            top_k (int): 返回的最大结果数量
+            threshold (float): 检索阶段的相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            save_results (bool): 是否保存搜索结果
+            mode (str): 检索阶段的检索模式
+            rerank_k (int): 候选数，默认为 top_k * candidate_multiplier，不超过max_candidates
             
         Returns:
-            Dict[str, Any]: 包含搜索结果的字典，如果保存结果则包含保存路径
+            Dict[str, Any]: 检索阶段的响应，results替换为重排序后的结果，并包含rerank统计和timings各阶段耗时
         """
+        candidate_k = rerank_k or top_k * RERANK_CONFIG["candidate_multiplier"]
+        candidate_k = max(min(candidate_k, RERANK_CONFIG["max_candidates"]), top_k)
+        
+        start_time = time.perf_counter()
+        response = await self._search(
+            provider=provider,
+            query=query,
+            collection_id=collection_id,
+            top_k=candidate_k,
+            threshold=threshold,
+            word_count_threshold=word_count_threshold,
+            filters=filters,
+            mode=mode
+        )
+        retrieval_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        candidates = response.get("results", [])
+        
+        rerank_start = time.perf_counter()
         try:
-            # 连接到向量数据库
-            logger.info(f"Connecting to Milvus at {self.get_uri(VectorDBProvider.MILVUS.value)}")
-            connections.connect(
-                alias="default",
-                uri=self.get_uri(VectorDBProvider.MILVUS.value)
-            )
-            
-            # 获取collection
-            logger.info(f"Loading collection: {collection_id}")
-            collection = Collection(collection_id)
-            collection.load()
-            
-            # 记录collection的基本信息
-            logger.info(f"Collection info - Entities: {collection.num_entities}")
-            
-            # 从collection中读取embedding配置
-            logger.info("Querying sample entity for embedding configuration")
-            sample_entity = collection.query(
-                expr="id >= 0", 
-                output_fields=["embedding_provider", "embedding_model"],
-                limit=1
-            )
-            if not sample_entity:
-                logger.error(f"Collection {collection_id} is empty")
-                raise ValueError(f"Collection {collection_id} is empty")
-            
-            logger.info(f"Sample entity configuration: {sample_entity[0]}")
-            
-            # 使用collection中存储的配置创建查询向量
-            logger.info("Creating query embedding")
+            response["results"], stats = await run_inference(rerank_service.rerank, query, candidates, top_k)
+            response["rerank"] = {"candidates": len(candidates), **stats}
+        except Exception as e:
+            logger.error(f"Rerank failed, returning retrieval order: {str(e)}", exc_info=True)
+            response["results"] = candidates[:top_k]
+            response["rerank"] = {"candidates": len(candidates), "error": str(e)}
+        rerank_ms = round((time.perf_counter() - rerank_start) * 1000, 2)
+        _emit_stage("reranked", count=len(response["results"]), rerank_ms=rerank_ms)
+        response["timings"] = {
+            "retrieval_ms": retrieval_ms,
+            "rerank_ms": rerank_ms,
+            "total_ms": round((time.perf_counter() - start_time) * 1000, 2)
+        }
+        logger.info(f"Reranked {len(candidates)} candidates of {collection_id}: {response['timings']}")
+        
+        if save_results and response["results"]:
             try:
-                query_embedding = self.embedding_service.create_single_embedding(
-                    query,
-                    provider=sample_entity[0]["embedding_provider"],
-                    model=sample_entity[0]["embedding_model"]
-                )
-                logger.info(f"Query embedding created with dimension: {len(query_embedding)}")
+                response["saved_filepath"] = self.save_search_results(query, collection_id, response["results"])
             except Exception as e:
-                logger.error(f"Error creating embedding: {str(e)}")
-                # 尝试使用备用模型
-                try:
-                    logger.info("Trying with a backup model...")
-                    query_embedding = self.embedding_service.create_single_embedding(
-                        query,
-                        provider=EmbeddingProvider.HUGGINGFACE.value,
-                        model="paraphrase-multilingual-MiniLM-L12-v2"  # 使用更可靠的备用模型
-                    )
-                    logger.info(f"Backup embedding created with dimension: {len(query_embedding)}")
-                except Exception as backup_error:
-                    logger.error(f"Backup embedding also failed: {str(backup_error)}")
-                    return {
-                        "results": [],
-                        "error": f"Failed to create embedding: {str(e)}. Backup also failed: {str(backup_error)}"
-                    }
-            
-            # 执行搜索
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
-            logger.info(f"Executing search with params: {search_params}")
-            logger.info(f"Word count threshold filter: word_count >= {word_count_threshold}")
-            
-            results = collection.search(
-                data=[query_embedding],
-                anns_field="vector",
-                param=search_params,
-                limit=top_k,
-                expr=f"word_count >= {word_count_threshold}",
-                output_fields=[
-                    "content",
-                    "document_name",
-                    "chunk_id",
-                    "total_chunks",
-                    "word_count",
-                    "page_number",
-                    "page_range",
-                    "embedding_provider",
-                    "embedding_model",
-                    "embedding_timestamp"
-                ]
-            )
-            
-            # 处理结果
-            processed_results = []
-            logger.info(f"Raw search results count: {len(results[0])}")
-            
-            for hits in results:
-                for hit in hits:
-                    logger.info(f"Processing hit - Score: {hit.score}, Word Count: {hit.entity.get('word_count')}")
-                    if hit.score >= threshold:
-                        processed_results.append({
-                            "text": hit.entity.content,
-                            "score": float(hit.score),
-                            "metadata": {
-                                "source": hit.entity.document_name,
-                                "page": hit.entity.page_number,
-                                "chunk": hit.entity.chunk_id,
-                                "total_chunks": hit.entity.total_chunks,
-                                "page_range": hit.entity.page_range,
-                                "embedding_provider": hit.entity.embedding_provider,
-                                "embedding_model": hit.entity.embedding_model,
-                                "embedding_timestamp": hit.entity.embedding_timestamp
-                            }
-                        })
+                logger.error(f"Error saving search results: {str(e)}")
+        return response
 
-            response_data = {"results": processed_results}
-            
-            # 添加详细的保存逻辑日志
-            logger.info(f"Preparing to handle save_results (flag: {save_results})")
-            if save_results:
-                logger.info("Save results is True, attempting to save...")
-                if processed_results:
-                    try:
-                        filepath = self.save_search_results(query, collection_id, processed_results)
-                        logger.info(f"Successfully saved results to: {filepath}")
-                        response_data["saved_filepath"] = filepath
-                    except Exception as e:
-                        logger.error(f"Error saving search results: {str(e)}")
-                else:
-                    logger.info("No results to save, skipping save operation")
+    async def _search_mmr(self,
+                          provider: str,
+                          query: str,
+                          collection_id: str,
+                          top_k: int = 3,
+                          threshold: float = 0.5,
+                          word_count_threshold: int = 30,
+                          filters: Optional[Dict[str, Any]] = None,
+                          save_results: bool = False,
+                          mmr_lambda: Optional[float] = None,
+                          mmr_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        多样化搜索：取mmr_k个候选及其向量，按最大边际相关（MMR）选出top_k，
+        避免重叠分块和同一页的相近文本占满结果
+        
+        Args:
+            provider (str): 向量数据库提供商
+            query (str): 搜索查询文本
+            collection_id (str): 要搜索的集合ID
+            top_k (int): 返回的最大结果数量
+            threshold (float): 候选的相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            save_results (bool): 是否保存搜索结果
+            mmr_lambda (float): 相关性权重（0~1），默认使用配置
+            mmr_k (int): 候选数，默认为 top_k * candidate_multiplier，不超过max_candidates
             
-            return response_data
+        Returns:
+            Dict[str, Any]: 按选择顺序排列的结果（score为原相似度，mmr_score为选择时的MMR分数），
+                mmr参数和候选数，以及timings各阶段耗时
+        """
+        lambda_mult = MMR_CONFIG["lambda"] if mmr_lambda is None else float(mmr_lambda)
+        if not 0.0 <= lambda_mult <= 1.0:
+            return {"results": [], "error": f"mmr_lambda must be between 0 and 1, got {mmr_lambda}"}
+        candidate_k = mmr_k or top_k * MMR_CONFIG["candidate_multiplier"]
+        candidate_k = max(min(candidate_k, MMR_CONFIG["max_candidates"]), top_k)
         
+        start_time = time.perf_counter()
+        try:
+            query_embedding, candidates = await self._search_with_vectors(
+                provider, query, collection_id, top_k=candidate_k, threshold=threshold,
+                word_count_threshold=word_count_threshold, filters=filters
+            )
         except Exception as e:
-            logger.error(f"Error in _search_milvus: {str(e)}", exc_info=True)
-            return {
-                "results": [],
-                "error": f"Search failed: {str(e)}"
+            logger.error(f"Error retrieving MMR candidates: {str(e)}", exc_info=True)
+            return {"results": [], "error": str(e)}
+        retrieval_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        _emit_stage("candidates", count=len(candidates))
+        
+        mmr_start = time.perf_counter()
+        vectors = [hit.pop("vector") for hit in candidates]
+        selected, scores = await run_inference(mmr_select, query_embedding, vectors, top_k, lambda_mult)
+        results = []
+        for index, mmr_score in zip(selected, scores):
+            candidates[index]["mmr_score"] = mmr_score
+            results.append(candidates[index])
+        mmr_ms = round((time.perf_counter() - mmr_start) * 1000, 2)
+        _emit_stage("diversified", count=len(results), mmr_ms=mmr_ms)
+        
+        response = {
+            "results": results,
+            "mmr": {"lambda": lambda_mult, "candidates": len(candidates)},
+            "timings": {
+                "retrieval_ms": retrieval_ms,
+                "mmr_ms": mmr_ms,
+                "total_ms": round((time.perf_counter() - start_time) * 1000, 2)
             }
-        finally:
+        }
+        logger.info(f"MMR selected {len(results)} of {len(candidates)} candidates of {collection_id}: {response['timings']}")
+        
+        if save_results and results:
             try:
-                connections.disconnect("default")
-                logger.info("Disconnected from Milvus")
+                response["saved_filepath"] = self.save_search_results(query, collection_id, results)
             except Exception as e:
-                logger.error(f"Error disconnecting from Milvus: {str(e)}")
-                
-    async def _search_chroma(self, 
-                          query: str, 
-                          collection_id: str, 
-                          top_k: int = 3, 
-                          threshold: float = 0.5,    # 相似度阈值默认50%
-                          word_count_threshold: int = 30,    # 最小字数默认30
-                          save_results: bool = False) -> Dict[str, Any]:
+                logger.error(f"Error saving search results: {str(e)}")
+        return response
+
+    async def _search_with_vectors(self,
+                                   provider: str,
+                                   query: str,
+                                   collection_id: str,
+                                   top_k: int = 3,
+                                   threshold: float = 0.5,
+                                   word_count_threshold: int = 30,
+                                   filters: Optional[Dict[str, Any]] = None) -> tuple:
         """
-        在Chroma中执行向量搜索
+        向量搜索并在每个结果的vector字段中一并返回其向量，候选向量随搜索结果一次取回
         
         Args:
+            provider (str): 向量数据库提供商
             query (str): 搜索查询文本
             collection_id (str): 要搜索的集合ID
-            top_k (int): 返回的最大结果数量，默认为3
-            threshold (float): 相似度阈值，低于此值的结果将被过滤，默认为0.7
-            word_count_threshold (int): 文本字数阈值，低于此值的结果将被过滤，默认为20
-            save_results (bool): 是否保存搜索结果，默认为False
+            top_k (int): 返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
             
         Returns:
-            Dict[str, Any]: 包含搜索结果的字典，如果保存结果则包含保存路径
+            tuple: (查询向量, 带vector字段的搜索结果)
+            
+        Raises:
+            ValueError: 提供商不受支持
+        """
+        if provider == VectorDBProvider.MILVUS.value:
+            shard_info = collection_catalog.get(provider, collection_id).get("shards")
+            if shard_info:
+                embedding_config = await run_io(self._read_shard_embedding_config, collection_id, shard_info)
+                query_embedding = await self._embed_query(query, embedding_config)
+                hits = (await self._search_milvus_shards_batch(
+                    collection_id, shard_info, [query_embedding], top_k=top_k, thresholds=[threshold],
+                    word_count_threshold=word_count_threshold, filters=filters, with_vectors=True
+                ))[0]
+                return query_embedding, hits
+            
+            if sidecar_enabled():
+                _, embedding_config, _ = await run_io(self._open_sidecar_collection_with_config, collection_id, filters)
+                query_embedding = await self._embed_query(query, embedding_config)
+                hits = (await run_io(
+                    get_sidecar_client().call, "search_batch", collection_id=collection_id, query_embeddings=[query_embedding],
+                    top_k=top_k, threshold=threshold, word_count_threshold=word_count_threshold,
+                    filters=filters, with_vectors=True
+                ))[0]
+                return query_embedding, hits
+            
+            async with io_context(milvus_connection(self.get_uri(VectorDBProvider.MILVUS.value))):
+                collection, embedding_config, _ = await run_io(self._open_milvus_collection_with_config, collection_id, filters)
+                query_embedding = await self._embed_query(query, embedding_config)
+                hits = (await run_io(
+                    self._milvus_search_collection_batch,
+                    collection, [query_embedding], top_k=top_k, thresholds=[threshold],
+                    word_count_threshold=word_count_threshold, filters=filters, with_vectors=True
+                ))[0]
+                return query_embedding, hits
+        
+        if provider == VectorDBProvider.CHROMA.value:
+            collection, embedding_config, _ = await run_io(
+                lambda: self._open_chroma_collection_with_config(self._get_chroma_client(), collection_id)
+            )
+            query_embedding = await self._embed_query(query, embedding_config)
+            results = await run_io(
+                collection.query,
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                where=SearchFilters(filters, word_count_threshold=word_count_threshold).to_chroma_where(),
+                include=["metadatas", "documents", "distances", "embeddings"]
+            )
+            return query_embedding, await run_io(self._process_chroma_results, results, threshold, collection.name)
+        
+        raise ValueError(f"Unsupported vector database provider: '{provider}'")
+
+    async def _search_hybrid(self,
+                             provider: str,
+                             query: str,
+                             collection_id: str,
+                             top_k: int = 3,
+                             threshold: float = 0.5,
+                             word_count_threshold: int = 30,
+                             filters: Optional[Dict[str, Any]] = None,
+                             save_results: bool = False) -> Dict[str, Any]:
+        """
+        混合搜索：BM25关键词检索与向量检索并发执行，各取 top_k * candidate_multiplier 个候选，
+        按倒数排名融合（RRF）为最终的top_k
+        
+        Args:
+            provider (str): 向量数据库提供商
+            query (str): 搜索查询文本
+            collection_id (str): 要搜索的集合ID
+            top_k (int): 返回的最大结果数量
+            threshold (float): 向量检索的相似度阈值（关键词检索不使用）
+            word_count_threshold (int): 文本字数阈值，两路检索都生效
+            filters (Dict[str, Any]): 结构化过滤条件，两路检索都生效
+            save_results (bool): 是否保存搜索结果
+            
+        Returns:
+            Dict[str, Any]: 融合后的结果以及两路检索各自的命中数和延迟；
+                结果的score为RRF分数，score_details中包含两路各自的排名和分数
+        """
+        candidate_k = top_k * LEXICAL_INDEX_CONFIG["candidate_multiplier"]
+        vector_search = self._search_milvus if provider == VectorDBProvider.MILVUS.value else self._search_chroma
+        search_filters = SearchFilters(filters, word_count_threshold=word_count_threshold)
+        
+        async def timed(awaitable):
+            leg_start = time.perf_counter()
+            return await awaitable, round((time.perf_counter() - leg_start) * 1000, 2)
+        
+        # 关键词检索先提交到线程池，向量检索随后开始，两路并行
+        (lexical_matches, lexical_latency), (vector_response, vector_latency) = await asyncio.gather(
+            timed(run_io(lexical_index.search, provider, collection_id, query, candidate_k, search_filters)),
+            timed(vector_search(
+                query=query,
+                collection_id=collection_id,
+                top_k=candidate_k,
+                threshold=threshold,
+                word_count_threshold=word_count_threshold,
+                filters=filters
+            ))
+        )
+        vector_hits = vector_response.get("results", [])
+        if not lexical_matches and not await run_io(lexical_index.exists, provider, collection_id):
+            logger.warning(f"Collection {collection_id} has no lexical index, hybrid search uses vector results only")
+        
+        # 融合结果的块文本从块文本存储读取
+        results = await run_io(self._fuse_rrf, provider, collection_id, vector_hits, lexical_matches, top_k)
+        response_data = {
+            "results": results,
+            "mode": "hybrid",
+            "legs": {
+                "vector": {"hits": len(vector_hits), "latency_ms": vector_latency},
+                "lexical": {"hits": len(lexical_matches), "latency_ms": lexical_latency}
+            }
+        }
+        if vector_response.get("error"):
+            response_data["legs"]["vector"]["error"] = vector_response["error"]
+        
+        if save_results and results:
+            try:
+                response_data["saved_filepath"] = self.save_search_results(query, collection_id, results)
+            except Exception as e:
+                logger.error(f"Error saving search results: {str(e)}")
+        return response_data
+
+    def _fuse_rrf(self, provider: str, collection_id: str, vector_hits: List[Dict[str, Any]],
+                  lexical_matches: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        按倒数排名融合两路结果：score = sum(1 / (rrf_k + 排名))，同一块（文档名, 块序号）在两路中的得分相加；
+        只出现在关键词检索中的块由词法索引的元数据构建结果，块文本只为最终的top_k读取
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            vector_hits (List[Dict[str, Any]]): 向量检索结果，按相似度降序
+            lexical_matches (List[Dict[str, Any]]): 词法索引的命中，按BM25得分降序
+            top_k (int): 返回的最大结果数量
+            
+        Returns:
+            List[Dict[str, Any]]: 按RRF分数降序的融合结果
+        """
+        rrf_k = LEXICAL_INDEX_CONFIG["rrf_k"]
+        fused: Dict[tuple, Dict[str, Any]] = {}
+        for rank, hit in enumerate(vector_hits, start=1):
+            key = (hit["metadata"].get("source"), int(hit["metadata"].get("chunk") or 0))
+            fused[key] = {"hit": hit, "rrf": 1.0 / (rrf_k + rank), "vector_rank": rank, "vector_score": hit["score"]}
+        for rank, match in enumerate(lexical_matches, start=1):
+            key = (match["document_name"], int(match.get("chunk_id") or 0))
+            entry = fused.setdefault(key, {"rrf": 0.0})
+            entry["rrf"] += 1.0 / (rrf_k + rank)
+            entry.update({"match": match, "lexical_rank": rank, "bm25_score": match["score"]})
+        
+        results = []
+        for entry in heapq.nlargest(top_k, fused.values(), key=lambda e: e["rrf"]):
+            hit = entry.get("hit") or self._lexical_hit(entry["match"])
+            hit["score"] = entry["rrf"]
+            hit["score_details"] = {
+                field: entry.get(field) for field in ("vector_rank", "vector_score", "lexical_rank", "bm25_score")
+            }
+            results.append(hit)
+        return self._hydrate_chunk_text(provider, collection_id, results)
+
+    @staticmethod
+    def _lexical_hit(match: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        把词法索引的命中转换为统一的搜索结果格式；词法索引未保存块文本时保留row_id，由_hydrate_chunk_text读取
+        """
+        hit = {
+            "text": match.get("content"),
+            "score": match["score"],
+            "metadata": {
+                "source": match["document_name"],
+                "page": match.get("page_number", ""),
+                "chunk": match.get("chunk_id", 0),
+                "total_chunks": match.get("total_chunks", 0),
+                "page_range": match.get("page_range", ""),
+                "embedding_provider": match.get("embedding_provider", ""),
+                "embedding_model": match.get("embedding_model", ""),
+                "embedding_timestamp": match.get("embedding_timestamp", "")
+            }
+        }
+        if "content" not in match:
+            hit["row_id"] = match["row_id"]
+        return hit
+
+    def resolve_collections(self,
+                            provider: str,
+                            collection_ids: Optional[List[str]] = None,
+                            collection_pattern: Optional[str] = None,
+                            tag: Optional[str] = None) -> List[str]:
+        """
+        将集合列表、通配符模式或标签解析为具体的集合名称列表
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_ids (List[str]): 显式指定的集合ID列表
+            collection_pattern (str): 集合名称的glob模式，如 "manual_*"
+            tag (str): 集合标签（索引时写入集合目录）
+            
+        Returns:
+            List[str]: 去重后的集合名称列表，保持指定顺序
+        """
+        provider_str = str(provider).lower().strip()
+        names = list(collection_ids or [])
+        
+        if collection_pattern:
+            available = [c["name"] for c in self.list_collections(provider_str)]
+            names.extend(fnmatch.filter(available, collection_pattern))
+        
+        if tag:
+            names.extend(
+                entry["collection_name"] for entry in collection_catalog.list(provider_str)
+                if tag in entry.get("tags", [])
+            )
+        
+        return list(dict.fromkeys(str(name) for name in names))
+
+    @staticmethod
+    def _normalize_score(score: float, metric: str) -> float:
+        """
+        将不同度量下的相似度分数归一化到[0, 1]，以便跨集合合并排序
+        
+        Args:
+            score (float): 搜索结果中的相似度分数
+            metric (str): 集合使用的度量类型（COSINE、IP、L2）
+            
+        Returns:
+            float: 归一化后的分数
+        """
+        metric = (metric or "COSINE").upper()
+        if metric == "L2":
+            # Chroma的结果分数为 1 - 距离，先还原为距离再映射
+            distance = max(1.0 - score, 0.0)
+            return 1.0 / (1.0 + distance)
+        # COSINE以及归一化向量上的IP取值范围为[-1, 1]
+        return min(max((score + 1.0) / 2.0, 0.0), 1.0)
+
+    async def search_collections(self,
+                                 provider: str,
+                                 query: str,
+                                 collection_ids: List[str],
+                                 top_k: int = 3,
+                                 threshold: float = 0.5,
+                                 word_count_threshold: int = 30,
+                                 filters: Optional[Dict[str, Any]] = None,
+                                 save_results: bool = False) -> Dict[str, Any]:
+        """
+        在多个集合上并发执行向量搜索，并按归一化分数合并为全局top_k
+        
+        Args:
+            provider (str): 向量数据库提供商
+            query (str): 搜索查询文本
+            collection_ids (List[str]): 要搜索的集合ID列表
+            top_k (int): 返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            save_results (bool): 是否保存搜索结果
+            
+        Returns:
+            Dict[str, Any]: 包含合并后的结果和每个集合的延迟信息
+        """
+        provider_str = str(provider).lower().strip()
+        logger.info(f"Fan-out search over {len(collection_ids)} {provider_str} collections, top_k: {top_k}")
+        start_time = time.perf_counter()
+        
+        versions = [collection_catalog.version(provider_str, cid) for cid in collection_ids]
+        cache_key = search_cache.make_key(
+            provider_str, list(collection_ids), query,
+            top_k=top_k, threshold=threshold, word_count_threshold=word_count_threshold, filters=filters
+        )
+        cached = search_cache.get(cache_key, versions)
+        if cached is not None:
+            logger.info(f"Search cache hit for fan-out over {collection_ids}: {query}")
+            cached["cache_hit"] = True
+            if save_results and cached["results"]:
+                try:
+                    cached["saved_filepath"] = self.save_search_results(query, "_".join(collection_ids)[:100], cached["results"])
+                except Exception as e:
+                    logger.error(f"Error saving search results: {str(e)}")
+            return cached
+        
+        if provider_str == VectorDBProvider.MILVUS.value and sidecar_enabled():
+            open_collection = lambda name: self._open_sidecar_collection_with_config(name, filters)
+            search_collection = self._sidecar_search_collection
+        elif provider_str == VectorDBProvider.MILVUS.value:
+            open_collection = lambda name: self._open_milvus_collection_with_config(name, filters)
+            search_collection = self._milvus_search_collection
+        elif provider_str == VectorDBProvider.CHROMA.value:
+            chroma_client = await run_io(self._get_chroma_client)
+            open_collection = lambda name: self._open_chroma_collection_with_config(chroma_client, name)
+            search_collection = self._chroma_search_collection
+        else:
+            return {"results": [], "error": f"Unsupported vector database provider: '{provider_str}'"}
+        
+        # 相同嵌入配置的集合共享同一次查询向量计算
+        embedding_tasks: Dict[tuple, asyncio.Future] = {}
+        
+        async def search_one(collection_id: str):
+            collection_start = time.perf_counter()
+            try:
+                if provider_str == VectorDBProvider.MILVUS.value:
+                    shard_info = collection_catalog.get(provider_str, collection_id).get("shards")
+                    if shard_info:
+                        hits = await self._search_milvus_shards(
+                            query, collection_id, shard_info, top_k=top_k, threshold=threshold,
+                            word_count_threshold=word_count_threshold, filters=filters
+                        )
+                        metric = shard_info.get("metric", "COSINE")
+                        return collection_id, metric, hits, None, time.perf_counter() - collection_start
+                collection, embedding_config, metric = await run_io(open_collection, collection_id)
+                key = (embedding_config["embedding_provider"], embedding_config["embedding_model"])
+                if key not in embedding_tasks:
+                    embedding_tasks[key] = asyncio.ensure_future(
+                        run_inference(self._create_query_embedding, query, *key, embedding_config.get("vector_dimension"))
+                    )
+                query_embedding = await embedding_tasks[key]
+                hits = await run_io(
+                    search_collection, collection, query_embedding,
+                    top_k=top_k, threshold=threshold, word_count_threshold=word_count_threshold,
+                    filters=filters
+                )
+                return collection_id, metric, hits, None, time.perf_counter() - collection_start
+            except Exception as e:
+                logger.error(f"Error searching collection {collection_id}: {str(e)}")
+                return collection_id, None, [], str(e), time.perf_counter() - collection_start
+        
+        # 用大小为top_k的最小堆维护全局top_k，各集合结果返回即合并
+        heap: List[tuple] = []
+        sequence = 0
+        collection_stats = []
+        direct_milvus = provider_str == VectorDBProvider.MILVUS.value and not sidecar_enabled()
+        async with search_slots(), io_context(milvus_connection(self.get_uri(VectorDBProvider.MILVUS.value))) if direct_milvus else nullcontext():
+            for finished in asyncio.as_completed([search_one(cid) for cid in collection_ids]):
+                collection_id, metric, hits, error, latency = await finished
+                stat = {
+                    "collection_id": collection_id,
+                    "metric": metric,
+                    "hits": len(hits),
+                    "latency_ms": round(latency * 1000, 2)
+                }
+                if error:
+                    stat["error"] = error
+                collection_stats.append(stat)
+                
+                for hit in hits:
+                    hit["normalized_score"] = self._normalize_score(hit["score"], metric)
+                    hit["metadata"]["collection_id"] = collection_id
+                    entry = (hit["normalized_score"], sequence, hit)
+                    sequence += 1
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, entry)
+                    elif entry[0] > heap[0][0]:
+                        heapq.heapreplace(heap, entry)
+        
+        merged_results = [entry[2] for entry in sorted(heap, key=lambda e: (-e[0], e[1]))]
+        response_data = {
+            "results": merged_results,
+            "collections": collection_stats,
+            "total_latency_ms": round((time.perf_counter() - start_time) * 1000, 2)
+        }
+        
+        # 部分集合搜索失败时不缓存
+        if not any("error" in stat for stat in collection_stats):
+            search_cache.put(cache_key, versions, response_data)
+        
+        if save_results and merged_results:
+            try:
+                response_data["saved_filepath"] = self.save_search_results(
+                    query, "_".join(collection_ids)[:100], merged_results
+                )
+            except Exception as e:
+                logger.error(f"Error saving search results: {str(e)}")
+        
+        return response_data
+
+    async def search_batch(self,
+                           provider: str,
+                           queries: List[str],
+                           collection_id: str,
+                           top_k: int = 3,
+                           threshold: float = 0.5,
+                           word_count_threshold: int = 30,
+                           filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        在一个集合上批量执行多个查询：读取一次集合和嵌入配置，所有查询在一次批量调用中嵌入，
+        再用一次多向量搜索取回各查询的结果
+        
+        Args:
+            provider (str): 向量数据库提供商
+            queries (List[str]): 查询文本列表
+            collection_id (str): 要搜索的集合ID
+            top_k (int): 每个查询返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            
+        Returns:
+            Dict[str, Any]: results为与queries一一对应的 {"query", "results"} 列表，
+                timings包含打开集合、嵌入、搜索各阶段和总耗时
+        """
+        provider_str = str(provider).lower().strip()
+        logger.info(f"Batch search of {len(queries)} queries on {provider_str}/{collection_id}, top_k: {top_k}")
+        timings = {}
+        start_time = time.perf_counter()
+        
+        def elapsed_ms(since: float) -> float:
+            return round((time.perf_counter() - since) * 1000, 2)
+        
+        def embed(embedding_config: Dict[str, str]) -> List[List[float]]:
+            embed_start = time.perf_counter()
+            resolved = model_registry.resolve(
+                embedding_config["embedding_provider"], embedding_config["embedding_model"],
+                embedding_config.get("vector_dimension")
+            )
+            embeddings = self.embedding_service.create_query_embeddings(
+                queries, resolved["embedding_provider"], resolved["embedding_model"]
+            )
+            if embeddings:
+                self._check_query_dimension(embeddings[0], resolved)
+            timings["embedding_ms"] = elapsed_ms(embed_start)
+            # 归一化集合使用内积度量，查询向量也须是单位长度
+            return [normalize_vector(embedding) for embedding in embeddings]
+        
+        if provider_str == VectorDBProvider.MILVUS.value:
+            shard_info = collection_catalog.get(provider_str, collection_id).get("shards")
+            if shard_info:
+                embedding_config = await run_io(self._read_shard_embedding_config, collection_id, shard_info)
+                timings["open_ms"] = elapsed_ms(start_time)
+                query_embeddings = await run_inference(embed, embedding_config)
+                search_start = time.perf_counter()
+                batch_hits = await self._search_milvus_shards_batch(
+                    collection_id, shard_info, query_embeddings, top_k=top_k,
+                    thresholds=[threshold] * len(queries), word_count_threshold=word_count_threshold, filters=filters
+                )
+                timings["search_ms"] = elapsed_ms(search_start)
+            elif sidecar_enabled():
+                _, embedding_config, _ = await run_io(self._open_sidecar_collection_with_config, collection_id, filters)
+                timings["open_ms"] = elapsed_ms(start_time)
+                query_embeddings = await run_inference(embed, embedding_config)
+                search_start = time.perf_counter()
+                batch_hits = await run_io(
+                    get_sidecar_client().call, "search_batch",
+                    collection_id=collection_id,
+                    query_embeddings=[[float(x) for x in embedding] for embedding in query_embeddings],
+                    top_k=top_k, threshold=threshold, word_count_threshold=word_count_threshold, filters=filters
+                )
+                timings["search_ms"] = elapsed_ms(search_start)
+            else:
+                async with io_context(milvus_connection(self.get_uri(VectorDBProvider.MILVUS.value))):
+                    collection, embedding_config, _ = await run_io(self._open_milvus_collection_with_config, collection_id, filters)
+                    timings["open_ms"] = elapsed_ms(start_time)
+                    query_embeddings = await run_inference(embed, embedding_config)
+                    search_start = time.perf_counter()
+                    batch_hits = await run_io(
+                        self._milvus_search_collection_batch,
+                        collection, query_embeddings, top_k=top_k, thresholds=[threshold] * len(queries),
+                        word_count_threshold=word_count_threshold, filters=filters
+                    )
+                    timings["search_ms"] = elapsed_ms(search_start)
+        elif provider_str == VectorDBProvider.CHROMA.value:
+            collection, embedding_config, _ = await run_io(
+                lambda: self._open_chroma_collection_with_config(self._get_chroma_client(), collection_id)
+            )
+            timings["open_ms"] = elapsed_ms(start_time)
+            query_embeddings = await run_inference(embed, embedding_config)
+            search_start = time.perf_counter()
+
+            def run_chroma() -> List[List[Dict[str, Any]]]:
+                results = collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=top_k,
+                    where=SearchFilters(filters, word_count_threshold=word_count_threshold).to_chroma_where(),
+                    include=["metadatas", "documents", "distances"]
+                )
+                # 按查询拆分为单查询结果的形式，复用单查询的结果处理
+                return [
+                    self._process_chroma_results(
+                        {field: [results[field][i]] for field in ("ids", "documents", "metadatas", "distances")},
+                        threshold, collection.name
+                    )
+                    for i in range(len(queries))
+                ]
+            batch_hits = await run_io(run_chroma)
+            timings["search_ms"] = elapsed_ms(search_start)
+        else:
+            return {"results": [], "error": f"Unsupported vector database provider: '{provider_str}'"}
+        
+        timings["total_ms"] = elapsed_ms(start_time)
+        timings["per_query_ms"] = round(timings["total_ms"] / len(queries), 2) if queries else 0.0
+        logger.info(f"Batch search on {collection_id} finished: {timings}")
+        return {
+            "results": [{"query": query, "results": hits} for query, hits in zip(queries, batch_hits)],
+            "timings": timings
+        }
+
+    async def _search_milvus(self, 
+                          query: str, 
+                          collection_id: str, 
+                          top_k: int = 3, 
+                          threshold: float = 0.5,    # 相似度阈值默认50%
+                          word_count_threshold: int = 30,    # 最小字数默认30
+                          filters: Optional[Dict[str, Any]] = None,    # 结构化过滤条件
+                          save_results: bool = False) -> Dict[str, Any]:
+        """
+        在Milvus中执行向量搜索
+        
+        Args:
+            query (str): 搜索查询文本
+            collection_id (str): 要搜索的集合ID
+            top_k (int): 返回的最大结果数量，默认为3
+            threshold (float): 相似度阈值，低于此值的结果将被过滤，默认为0.7
+            word_count_threshold (int): 文本字数阈值，低于此值的结果将被过滤，默认为20
+            filters (Dict[str, Any]): 结构化过滤条件（document_name、page_number、word_count），下推到数据库执行
+            save_results (bool): 是否保存搜索结果，默认为False
+            
+        Returns:
+            Dict[str, Any]: 包含搜索结果的字典，如果保存结果则包含保存路径
+        """
+        try:
+            shard_info = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_id).get("shards")
+            if shard_info:
+                processed_results = await self._search_milvus_shards(
+                    query, collection_id, shard_info,
+                    top_k=top_k, threshold=threshold,
+                    word_count_threshold=word_count_threshold, filters=filters
+                )
+            elif sidecar_enabled():
+                # 由sidecar进程执行搜索，查询向量在本进程计算
+                collection_id, embedding_config, _ = await run_io(self._open_sidecar_collection_with_config, collection_id, filters)
+                query_embedding = await self._embed_query(query, embedding_config)
+                processed_results = await run_io(
+                    self._sidecar_search_collection,
+                    collection_id,
+                    query_embedding,
+                    top_k=top_k,
+                    threshold=threshold,
+                    word_count_threshold=word_count_threshold,
+                    filters=filters
+                )
+            else:
+                async with io_context(milvus_connection(self.get_uri(VectorDBProvider.MILVUS.value))):
+                    # 获取collection，按文档过滤时只加载对应分区
+                    partition_names = await run_io(self._resolve_milvus_partitions, collection_id, filters)
+                    if partition_names == []:
+                        return {"results": []}
+                    collection = await run_io(self._open_milvus_collection, collection_id, partition_names)
+                
+                    # 从collection中读取embedding配置
+                    embedding_config = await run_io(self._get_milvus_embedding_config, collection, partition_names)
+                
+                    # 使用collection中存储的配置创建查询向量（在推理线程池中执行，不阻塞事件循环）
+                    try:
+                        query_embedding = await self._embed_query(query, embedding_config)
+                    except Exception as e:
+                        return {
+                            "results": [],
+                            "error": str(e)
+                        }
+                
+                    processed_results = await run_io(
+                        self._milvus_search_collection,
+                        collection,
+                        query_embedding,
+                        top_k=top_k,
+                        threshold=threshold,
+                        word_count_threshold=word_count_threshold,
+                        filters=filters
+                    )
+
+            response_data = {"results": processed_results}
+            
+            # 添加详细的保存逻辑日志
+            logger.info(f"Preparing to handle save_results (flag: {save_results})")
+            if save_results:
+                logger.info("Save results is True, attempting to save...")
+                if processed_results:
+                    try:
+                        filepath = self.save_search_results(query, collection_id, processed_results)
+                        logger.info(f"Successfully saved results to: {filepath}")
+                        response_data["saved_filepath"] = filepath
+                    except Exception as e:
+                        logger.error(f"Error saving search results: {str(e)}")
+                else:
+                    logger.info("No results to save, skipping save operation")
+            
+            return response_data
+        
+        except Exception as e:
+            logger.error(f"Error in _search_milvus: {str(e)}", exc_info=True)
+            return {
+                "results": [],
+                "error": f"Search failed: {str(e)}"
+            }
+
+    def _resolve_milvus_partitions(self, collection_id: str,
+                                   filters: Optional[Dict[str, Any]] = None) -> Optional[List[str]]:
+        """
+        根据document_name过滤条件和集合目录中的文档分区映射，确定搜索需要访问的分区
+        
+        Args:
+            collection_id (str): 集合ID
+            filters (Dict[str, Any]): 结构化过滤条件
+            
+        Returns:
+            Optional[List[str]]: 分区名称列表；无法裁剪（未按文档过滤、集合未分区且没有释放的分区）时返回None
+        """
+        if is_milvus_lite(self.get_uri(VectorDBProvider.MILVUS.value)):
+            # Milvus Lite不支持分区，文档过滤条件已在过滤表达式中按document_name裁剪
+            return None
+        entry = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_id)
+        partitions = entry.get("partitions", {})
+        # 通过分区加载/释放接口释放的分区不参与搜索，也不会被搜索重新加载
+        released = set(entry.get("released_partitions", []))
+        documents = SearchFilters(filters).values_for("document_name")
+        if documents is None:
+            if not released:
+                return None
+            partition_names = [p for p in ["_default", *partitions.values()] if p not in released]
+            logger.info(f"Searching resident partitions of {collection_id}: {partition_names}")
+            return partition_names
+        if not partitions:
+            return None
+        # 目录中没有分区的文档不会有数据，直接忽略
+        partition_names = [partitions[d] for d in documents if d in partitions and partitions[d] not in released]
+        logger.info(f"Pruned search on {collection_id} to partitions: {partition_names}")
+        return partition_names
+
+    async def _search_milvus_shards(self,
+                                    query: str,
+                                    collection_id: str,
+                                    shard_info: Dict[str, Any],
+                                    top_k: int = 3,
+                                    threshold: float = 0.5,
+                                    word_count_threshold: int = 30,
+                                    filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        在分片集合上执行scatter-gather搜索：并发搜索所有已加载的分片，再按分数合并为全局top_k
+        
+        Args:
+            query (str): 搜索查询文本
+            collection_id (str): 集合ID
+            shard_info (Dict[str, Any]): 集合目录中的分片信息
+            top_k (int): 返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            
+        Returns:
+            List[Dict[str, Any]]: 合并后的搜索结果，metadata中包含结果所在的分片
+        """
+        embedding_config = await run_io(self._read_shard_embedding_config, collection_id, shard_info)
+        query_embedding = await self._embed_query(query, embedding_config)
+        batch_hits = await self._search_milvus_shards_batch(
+            collection_id, shard_info, [query_embedding], top_k=top_k, thresholds=[threshold],
+            word_count_threshold=word_count_threshold, filters=filters
+        )
+        return batch_hits[0]
+
+    def _read_shard_embedding_config(self, collection_id: str, shard_info: Dict[str, Any]) -> Dict[str, str]:
+        """
+        读取分片集合的嵌入配置：分片可能为空，依次尝试已加载的分片直到读到配置
+        
+        Args:
+            collection_id (str): 集合ID
+            shard_info (Dict[str, Any]): 集合目录中的分片信息
+            
+        Returns:
+            Dict[str, str]: 包含embedding_provider和embedding_model的字典
+        """
+        cached = self._cached_embedding_config(VectorDBProvider.MILVUS.value, collection_id)
+        if cached:
+            return cached
+        vector_store = VectorStoreService()
+        for shard in range(shard_info["count"]):
+            if shard in shard_info.get("released", []):
+                continue
+            with vector_store.shard_connection(collection_id, shard_info, shard) as alias:
+                if not utility.has_collection(collection_id, using=alias):
+                    continue
+                collection = self._open_milvus_collection(collection_id, using=alias)
+                try:
+                    return self._get_milvus_embedding_config(collection)
+                except ValueError:
+                    continue
+        raise ValueError(f"Collection {collection_id} has no loaded shards with data")
+
+    async def _search_milvus_shards_batch(self,
+                                          collection_id: str,
+                                          shard_info: Dict[str, Any],
+                                          query_embeddings: List[List[float]],
+                                          top_k: int = 3,
+                                          thresholds: Optional[List[float]] = None,
+                                          word_count_threshold: int = 30,
+                                          filters: Optional[Dict[str, Any]] = None,
+                                          with_vectors: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        用多个查询向量并发搜索所有已加载的分片（每个分片一次多向量搜索），再按查询分别合并为全局top_k
+        
+        Args:
+            collection_id (str): 集合ID
+            shard_info (Dict[str, Any]): 集合目录中的分片信息
+            query_embeddings (List[List[float]]): 查询向量列表
+            top_k (int): 每个查询返回的最大结果数量
+            thresholds (List[float]): 每个查询的相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            with_vectors (bool): 是否在结果的vector字段中一并返回候选向量
+            
+        Returns:
+            List[List[Dict[str, Any]]]: 与查询向量一一对应的合并结果，metadata中包含结果所在的分片
+        """
+        vector_store = VectorStoreService()
+        active_shards = [s for s in range(shard_info["count"]) if s not in shard_info.get("released", [])]
+        logger.info(f"Scatter-gather search of {len(query_embeddings)} queries over shards {active_shards} of {collection_id}")
+        
+        def search_shard(shard: int) -> List[List[Dict[str, Any]]]:
+            with vector_store.shard_connection(collection_id, shard_info, shard) as alias:
+                if not utility.has_collection(collection_id, using=alias):
+                    return [[] for _ in query_embeddings]
+                collection = self._open_milvus_collection(collection_id, using=alias)
+                batch_hits = self._milvus_search_collection_batch(
+                    collection, query_embeddings, top_k=top_k, thresholds=thresholds,
+                    word_count_threshold=word_count_threshold, filters=filters, hydrate=False,
+                    with_vectors=with_vectors
+                )
+            for hits in batch_hits:
+                for hit in hits:
+                    hit["metadata"]["shard"] = shard
+            return batch_hits
+        
+        shard_hits = await asyncio.gather(*[run_io(search_shard, shard) for shard in active_shards])
+        # 各分片使用相同的度量，分数可直接比较；块文本只为合并后的top_k读取
+        merged = []
+        for i in range(len(query_embeddings)):
+            hits = heapq.nlargest(top_k, (hit for batch_hits in shard_hits for hit in batch_hits[i]), key=lambda hit: hit["score"])
+            merged.append(self._hydrate_chunk_text(VectorDBProvider.MILVUS.value, collection_id, hits))
+        return merged
+
+    def _open_milvus_collection(self, collection_id: str, partition_names: Optional[List[str]] = None,
+                                using: str = "default") -> Collection:
+        """
+        打开并加载Milvus集合，调用方需处于milvus_connection上下文中
+        
+        Args:
+            collection_id (str): 集合ID
+            partition_names (List[str]): 只加载这些分区，为None时加载集合中未被释放的分区
+            using (str): 连接别名，分片集合使用各分片的连接
+            
+        Returns:
+            Collection: 已加载的集合
+        """
+        collection = Collection(collection_id, using=using)
+        if partition_names is None:
+            # 不能整体load，否则会重新加载通过分区释放接口释放的分区
+            partition_names = self._resolve_milvus_partitions(collection_id)
+        if partition_names is None:
+            logger.info(f"Loading collection: {collection_id}")
+            collection.load()
+        elif partition_names:
+            logger.info(f"Loading partitions of {collection_id}: {partition_names}")
+            collection.load(partition_names=partition_names)
+        logger.info(f"Collection info - Entities: {collection.num_entities}")
+        return collection
+
+    def _open_milvus_collection_with_config(self, collection_id: str,
+                                            filters: Optional[Dict[str, Any]] = None) -> tuple:
+        """
+        打开Milvus集合并读取其嵌入配置和度量类型，供多集合搜索使用
+        
+        Args:
+            collection_id (str): 集合ID
+            filters (Dict[str, Any]): 结构化过滤条件，用于分区裁剪
+            
+        Returns:
+            tuple: (集合, 嵌入配置, 度量类型)
+        """
+        partition_names = self._resolve_milvus_partitions(collection_id, filters)
+        if partition_names == []:
+            raise ValueError(f"No documents in {collection_id} match the document filter")
+        collection = self._open_milvus_collection(collection_id, partition_names)
+        embedding_config = self._get_milvus_embedding_config(collection, partition_names)
+        # 度量在创建集合时写入集合目录，旧集合首次读取索引后写入
+        metric = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_id).get("metric")
+        if not metric:
+            metric = "COSINE"
+            try:
+                vector_index = next((idx for idx in collection.indexes if idx.field_name == "vector"), None)
+                if vector_index is not None:
+                    metric = vector_index.params.get("metric_type", metric)
+                    collection_catalog.update(VectorDBProvider.MILVUS.value, collection_id, metric=metric)
+            except Exception as e:
+                logger.warning(f"Could not read metric type of {collection_id}: {str(e)}")
+        return collection, embedding_config, metric
+
+    def _open_sidecar_collection_with_config(self, collection_id: str,
+                                             filters: Optional[Dict[str, Any]] = None) -> tuple:
+        """
+        通过sidecar读取集合的嵌入配置和度量类型，返回值与_open_milvus_collection_with_config一致，
+        其中集合以集合ID表示
+        
+        Args:
+            collection_id (str): 集合ID
+            filters (Dict[str, Any]): 结构化过滤条件，用于分区裁剪
+            
+        Returns:
+            tuple: (集合ID, 嵌入配置, 度量类型)
+        """
+        entry = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_id)
+        if entry.get("metric") and (entry.get("embedding") or {}).get("embedding_model"):
+            # 集合目录中已缓存，无需经sidecar打开集合取样
+            return collection_id, dict(entry["embedding"]), entry["metric"]
+        config = get_sidecar_client().call("collection_config", collection_id=collection_id, filters=filters)
+        return collection_id, config["embedding_config"], config["metric"]
+
+    def _sidecar_search_collection(self,
+                                   collection_id: str,
+                                   query_embedding: List[float],
+                                   top_k: int = 3,
+                                   threshold: float = 0.5,
+                                   word_count_threshold: int = 30,
+                                   filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        通过sidecar执行向量搜索，sidecar会把同一时间窗口内的同类请求合并为一次搜索
+        
+        Args:
+            collection_id (str): 集合ID
+            query_embedding (List[float]): 查询向量
+            top_k (int): 返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            
+        Returns:
+            List[Dict[str, Any]]: 处理后的搜索结果
+        """
+        return get_sidecar_client().call(
+            "search",
+            collection_id=collection_id,
+            query_embedding=[float(x) for x in query_embedding],
+            top_k=top_k,
+            threshold=threshold,
+            word_count_threshold=word_count_threshold,
+            filters=filters
+        )
+
+    def _cached_embedding_config(self, provider: str, collection_id: str,
+                                 vector_dim: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取集合目录中缓存的嵌入配置（索引时写入，或首次搜索时从样本中读取后写入）
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            vector_dim (int): 集合当前的向量维度，与缓存的维度不一致时视为缓存失效
+            
+        Returns:
+            Optional[Dict[str, Any]]: 包含embedding_provider、embedding_model和vector_dimension的字典，
+                未缓存或已失效时返回None
+        """
+        embedding = collection_catalog.get(provider, collection_id).get("embedding")
+        if not embedding or not embedding.get("embedding_model"):
+            return None
+        cached_dim = embedding.get("vector_dimension")
+        if vector_dim and cached_dim and int(cached_dim) != int(vector_dim):
+            logger.warning(
+                f"Cached embedding config of {collection_id} has dimension {cached_dim}, "
+                f"collection has {vector_dim}; re-reading from the collection"
+            )
+            return None
+        return dict(embedding)
+
+    def _remember_embedding_config(self, provider: str, collection_id: str, embedding_config: Dict[str, Any]):
+        """
+        把从样本中读取的嵌入配置写入集合目录，之后的搜索不再取样
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            embedding_config (Dict[str, Any]): 嵌入配置
+        """
+        try:
+            collection_catalog.update(provider, collection_id, embedding=embedding_config)
+        except Exception as e:
+            logger.warning(f"Could not cache embedding config of {collection_id}: {str(e)}")
+
+    @staticmethod
+    def _milvus_vector_dim(collection: Collection) -> Optional[int]:
+        """
+        从集合schema中读取向量维度
+        """
+        dim = next((f.params.get("dim") for f in collection.schema.fields if f.name == "vector"), None)
+        return int(dim) if dim else None
+
+    def _get_milvus_embedding_config(self, collection: Collection,
+                                     partition_names: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        读取集合的嵌入提供商和模型：优先使用集合目录中的缓存，未缓存时从样本实体中读取并写入缓存
+        
+        Args:
+            collection (Collection): Milvus集合
+            partition_names (List[str]): 只在这些分区中取样，为None时在整个集合中取样
+            
+        Returns:
+            Dict[str, str]: 包含embedding_provider、embedding_model和vector_dimension的字典
+            
+        Raises:
+            ValueError: 集合为空
+        """
+        vector_dim = self._milvus_vector_dim(collection)
+        cached = self._cached_embedding_config(VectorDBProvider.MILVUS.value, collection.name, vector_dim)
+        if cached:
+            return cached
+        if self._is_slim_milvus_collection(collection):
+            # 精简集合的行中没有嵌入配置，只能由索引时写入的集合目录提供
+            raise ValueError(f"Collection {collection.name} has no embedding configuration in the catalog")
+        
+        logger.info("Querying sample entity for embedding configuration")
+        sample_entity = collection.query(
+            expr="id >= 0", 
+            output_fields=["embedding_provider", "embedding_model"],
+            partition_names=partition_names or None,
+            limit=1
+        )
+        if not sample_entity:
+            logger.error(f"Collection {collection.name} is empty")
+            raise ValueError(f"Collection {collection.name} is empty")
+        
+        logger.info(f"Sample entity configuration: {sample_entity[0]}")
+        embedding_config = {
+            "embedding_provider": sample_entity[0]["embedding_provider"],
+            "embedding_model": sample_entity[0]["embedding_model"],
+            "vector_dimension": vector_dim
+        }
+        self._remember_embedding_config(VectorDBProvider.MILVUS.value, collection.name, embedding_config)
+        return embedding_config
+
+    async def _embed_query(self, query: str, embedding_config: Dict[str, Any]) -> List[float]:
+        """
+        在推理线程池中按集合的嵌入配置计算查询向量，并报告embedded阶段事件
+        
+        Args:
+            query (str): 搜索查询文本
+            embedding_config (Dict[str, Any]): 集合的嵌入配置
+            
+        Returns:
+            List[float]: 查询向量
+        """
+        embed_start = time.perf_counter()
+        query_embedding = await run_inference(
+            self._create_query_embedding, query,
+            embedding_config["embedding_provider"], embedding_config["embedding_model"],
+            embedding_config.get("vector_dimension")
+        )
+        _emit_stage(
+            "embedded",
+            embedding_provider=embedding_config["embedding_provider"],
+            embedding_model=embedding_config["embedding_model"],
+            dimension=len(query_embedding),
+            embedding_ms=round((time.perf_counter() - embed_start) * 1000, 2)
+        )
+        return query_embedding
+
+    def _create_query_embedding(self, query: str, provider: str, model: str,
+                                vector_dimension: Optional[int] = None) -> List[float]:
+        """
+        用集合的嵌入模型创建查询向量；模型登记表中的维度与集合不一致时在加载模型之前失败
+        
+        Args:
+            query (str): 查询文本
+            provider (str): 嵌入提供商
+            model (str): 嵌入模型
+            vector_dimension (int): 集合的向量维度，未知时不校验
+            
+        Returns:
+            List[float]: 查询向量
+            
+        Raises:
+            ValueError: 模型与集合维度不一致，或创建查询向量失败
+        """
+        resolved = model_registry.resolve(provider, model, vector_dimension)
+        recent = semantic_cache.recent_embedding(resolved["embedding_provider"], resolved["embedding_model"], query)
+        if recent is not None:
+            return recent
+        logger.info(f"Creating query embedding with {resolved['embedding_provider']}/{resolved['embedding_model']}")
+        try:
+            query_embedding = self.embedding_service.create_single_embedding(
+                query,
+                provider=resolved["embedding_provider"],
+                model=resolved["embedding_model"]
+            )
+        except Exception as e:
+            logger.error(f"Error creating embedding: {str(e)}")
+            raise ValueError(f"Failed to create embedding with {resolved['embedding_provider']}/{resolved['embedding_model']}: {str(e)}")
+        logger.info(f"Query embedding created with dimension: {len(query_embedding)}")
+        self._check_query_dimension(query_embedding, resolved)
+        # 归一化集合使用内积度量，查询向量也须是单位长度
+        query_embedding = normalize_vector(query_embedding)
+        semantic_cache.remember_embedding(resolved["embedding_provider"], resolved["embedding_model"], query, query_embedding)
+        return query_embedding
+
+    @staticmethod
+    def _check_query_dimension(query_embedding: List[float], embedding_config: Dict[str, Any]):
+        """
+        校验查询向量维度与集合一致
+        
+        Raises:
+            ValueError: 维度不一致
+        """
+        expected = embedding_config.get("vector_dimension")
+        if expected and len(query_embedding) != int(expected):
+            raise ValueError(
+                f"Embedding model {embedding_config.get('embedding_provider')}/{embedding_config.get('embedding_model')} "
+                f"produced {len(query_embedding)}-d vectors but the collection holds {expected}-d vectors"
+            )
+
+    def _milvus_search_collection(self,
+                                  collection: Collection,
+                                  query_embedding: List[float],
+                                  top_k: int = 3,
+                                  threshold: float = 0.5,
+                                  word_count_threshold: int = 30,
+                                  filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        在已加载的Milvus集合中执行向量搜索并处理结果
+        
+        Args:
+            collection (Collection): 已加载的集合
+            query_embedding (List[float]): 查询向量
+            top_k (int): 返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件，按文档过滤时只搜索对应分区
+            
+        Returns:
+            List[Dict[str, Any]]: 处理后的搜索结果
+        """
+        return self._milvus_search_collection_batch(
+            collection, [query_embedding], top_k=top_k, thresholds=[threshold],
+            word_count_threshold=word_count_threshold, filters=filters
+        )[0]
+
+    def _milvus_search_collection_batch(self,
+                                        collection: Collection,
+                                        query_embeddings: List[List[float]],
+                                        top_k: int = 3,
+                                        thresholds: Optional[List[float]] = None,
+                                        word_count_threshold: int = 30,
+                                        filters: Optional[Dict[str, Any]] = None,
+                                        hydrate: bool = True,
+                                        with_vectors: bool = False) -> List[List[Dict[str, Any]]]:
+        """
+        用一次Milvus调用搜索多个查询向量，各查询共享top_k和过滤条件，相似度阈值可以各不相同
+        
+        Args:
+            collection (Collection): 已加载的集合
+            query_embeddings (List[List[float]]): 查询向量列表
+            top_k (int): 每个查询返回的最大结果数量
+            thresholds (List[float]): 每个查询的相似度阈值，默认不过滤
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件，按文档过滤时只搜索对应分区
+            hydrate (bool): 是否为精简集合的结果读取块文本；为False时结果保留row_id，
+                由调用方合并后再调用_hydrate_chunk_text
+            with_vectors (bool): 是否在结果的vector字段中一并返回候选向量（用于MMR）
+            
+        Returns:
+            List[List[Dict[str, Any]]]: 与查询向量一一对应的处理后搜索结果
+        """
+        thresholds = thresholds or [float("-inf")] * len(query_embeddings)
+        partition_names = self._resolve_milvus_partitions(collection.name, filters)
+        if partition_names == []:
+            logger.info(f"No partitions of {collection.name} match the document filter")
+            return [[] for _ in query_embeddings]
+        
+        # 过滤条件下推为Milvus表达式，由标量索引加速
+        expr = SearchFilters(filters, word_count_threshold=word_count_threshold).to_milvus_expr()
+        
+        # 执行搜索，优先使用调优后写入目录的推荐搜索参数；度量与建索引时登记的一致（早期集合均为COSINE）。
+        # 本仓库只建FLAT/HNSW索引，未调优时不传索引参数，由Milvus使用索引默认值
+        catalog_entry = collection_catalog.get(VectorDBProvider.MILVUS.value, collection.name)
+        recommended = catalog_entry.get("recommended_index", {})
+        search_params = {
+            "metric_type": catalog_entry.get("metric", "COSINE"),
+            "params": dict(recommended.get("search_params") or {})
+        }
+        # 推荐的ef是在调优时的top_k下测得的，HNSW要求ef不小于limit，
+        # 范围搜索、重排/MMR候选池和混合检索的limit都更大，ef随之提高
+        if "ef" in search_params["params"]:
+            search_params["params"]["ef"] = max(int(search_params["params"]["ef"]), int(top_k))
+        # 相似度阈值下推为范围搜索：引擎只返回分数高于radius的结果，不再取满top_k后在Python中丢弃；
+        # 一次调用只能有一个radius，取各查询阈值的最小值，各查询自己的阈值仍在下面逐条检查。
+        # Milvus只返回分数严格大于radius的结果，而阈值语义是score >= threshold：radius略低于阈值
+        # （大于float32分数在[-1, 1]内的精度），恰好等于阈值的结果不会因开启下推而消失
+        radius = min(thresholds)
+        if (RANGE_SEARCH_CONFIG["pushdown"] and search_params["metric_type"] in ("COSINE", "IP")
+                and radius > -1.0 and radius != float("inf")):
+            search_params["params"]["radius"] = float(radius) - RANGE_SEARCH_CONFIG["radius_margin"]
+        logger.info(f"Executing search with params: {search_params}")
+        logger.info(f"Filter expression: {expr}")
+        
+        # 精简集合的块文本和嵌入配置不在向量库中，搜索只取标量字段
+        slim = self._is_slim_milvus_collection(collection)
+        output_fields = [
+            "content",
+            "document_name",
+            "chunk_id",
+            "total_chunks",
+            "word_count",
+            "page_number",
+            "page_range",
+            "embedding_provider",
+            "embedding_model",
+            "embedding_timestamp"
+        ]
+        if slim:
+            output_fields = [f for f in output_fields if f not in VectorStoreService.CHUNK_TEXT_FIELDS + VectorStoreService.COLLECTION_LEVEL_FIELDS]
+        if with_vectors:
+            output_fields.append("vector")
+        
+        results = collection.search(
+            data=query_embeddings,
+            anns_field="vector",
+            param=search_params,
+            limit=top_k,
+            expr=expr or None,
+            partition_names=partition_names,
+            output_fields=output_fields
+        )
+        
+        # 处理结果
+        batch_results = []
+        for hits, threshold in zip(results, thresholds):
+            processed_results = []
+            logger.info(f"Raw search results count: {len(hits)}")
+            for hit in hits:
+                logger.info(f"Processing hit - Score: {hit.score}, Word Count: {hit.entity.get('word_count')}")
+                if hit.score >= threshold:
+                    result = {
+                        "text": hit.entity.get("content"),
+                        "score": float(hit.score),
+                        "metadata": {
+                            "source": hit.entity.document_name,
+                            "page": hit.entity.page_number,
+                            "chunk": hit.entity.chunk_id,
+                            "total_chunks": hit.entity.total_chunks,
+                            "page_range": hit.entity.page_range,
+                            "embedding_provider": hit.entity.get("embedding_provider"),
+                            "embedding_model": hit.entity.get("embedding_model"),
+                            "embedding_timestamp": hit.entity.get("embedding_timestamp")
+                        }
+                    }
+                    if slim:
+                        result["row_id"] = hit.id
+                    if with_vectors:
+                        result["vector"] = [float(x) for x in hit.entity.get("vector")]
+                    processed_results.append(result)
+            if hydrate:
+                self._hydrate_chunk_text(VectorDBProvider.MILVUS.value, collection.name, processed_results)
+            batch_results.append(processed_results)
+        return batch_results
+
+    @staticmethod
+    def _is_slim_milvus_collection(collection: Collection) -> bool:
+        """
+        集合是否使用精简schema（块文本存放在块文本存储中）
+        """
+        return "content" not in {f.name for f in collection.schema.fields}
+
+    def _hydrate_chunk_text(self, provider: str, collection_id: str,
+                            hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        为精简集合的搜索结果从块文本存储读取块文本和嵌入时间戳，并补全集合目录中的嵌入配置；
+        只处理带row_id的结果，完成后移除row_id
+        
+        Args:
+            provider (str): 向量数据库提供商
+            collection_id (str): 集合ID
+            hits (List[Dict[str, Any]]): 最终的搜索结果
+            
+        Returns:
+            List[Dict[str, Any]]: 原地补全后的搜索结果
+        """
+        pending = [hit for hit in hits if "row_id" in hit]
+        if not pending:
+            return hits
+        records = chunk_text_store.get(provider, collection_id, [hit["row_id"] for hit in pending])
+        embedding = collection_catalog.get(provider, collection_id).get("embedding", {})
+        for hit in pending:
+            record = records.get(int(hit.pop("row_id")), {})
+            hit["text"] = record.get("content", "")
+            hit["metadata"]["embedding_provider"] = embedding.get("embedding_provider", "")
+            hit["metadata"]["embedding_model"] = embedding.get("embedding_model", "")
+            hit["metadata"]["embedding_timestamp"] = record.get("embedding_timestamp", "")
+        return hits
+                
+    async def _search_chroma(self, 
+                          query: str, 
+                          collection_id: str, 
+                          top_k: int = 3, 
+                          threshold: float = 0.5,    # 相似度阈值默认50%
+                          word_count_threshold: int = 30,    # 最小字数默认30
+                          filters: Optional[Dict[str, Any]] = None,    # 结构化过滤条件
+                          save_results: bool = False) -> Dict[str, Any]:
+        """
+        在Chroma中执行向量搜索
+        
+        Args:
+            query (str): 搜索查询文本
+            collection_id (str): 要搜索的集合ID
+            top_k (int): 返回的最大结果数量，默认为3
+            threshold (float): 相似度阈值，低于此值的结果将被过滤，默认为0.7
+            word_count_threshold (int): 文本字数阈值，低于此值的结果将被过滤，默认为20
+            filters (Dict[str, Any]): 结构化过滤条件（document_name、page_number、word_count），下推到数据库执行
+            save_results (bool): 是否保存搜索结果，默认为False
+            
+        Returns:
+            Dict[str, Any]: 包含搜索结果的字典，如果保存结果则包含保存路径
         """
         try:
             # 导入chromadb
@@ -491,19 +2232,11 @@ class SearchService:
             original_collection_id = collection_id
             logger.info(f"Original collection ID: '{original_collection_id}'")
             
-            # 获取Chroma路径
-            vector_store = VectorStoreService()
-            chroma_path = vector_store._get_absolute_path(CHROMA_CONFIG["uri"])
-            logger.info(f"Connecting to Chroma at {chroma_path}")
-            
-            # 创建客户端
-            client = chromadb.PersistentClient(
-                path=chroma_path,
-                settings=Settings(anonymized_telemetry=False)
-            )
+            # 创建客户端（Chroma的调用都是阻塞的，在I/O线程池中执行）
+            client = await run_io(self._get_chroma_client)
             
             # 先列出所有集合，检查目标集合是否存在
-            all_collections = client.list_collections()
+            all_collections = await run_io(client.list_collections)
             collection_names = [col.name for col in all_collections]
             
             logger.info(f"Available collections: {collection_names}")
@@ -557,183 +2290,37 @@ class SearchService:
             # 获取指定集合
             try:
                 logger.info(f"Loading collection: '{collection_id}'")
-                collection = client.get_collection(name=collection_id)
+                collection = await run_io(client.get_collection, name=collection_id)
             except Exception as e:
                 logger.error(f"Error getting collection: {str(e)}")
                 return {"results": [], "error": f"Failed to get collection: {str(e)}"}
             
-            # 创建查询嵌入
-            # 由于Chroma需要嵌入，我们需要获取集合的第一个项目来确定使用的嵌入提供商和模型
-            logger.info("Querying sample item for embedding configuration")
-            try:
-                sample_items = collection.peek(limit=1)
-                
-                if not sample_items or len(sample_items["metadatas"]) == 0:
-                    logger.error(f"Collection {collection_id} is empty")
-                    return {"results": [], "error": f"Collection {collection_id} is empty"}
-                
-                sample_metadata = sample_items["metadatas"][0]
-                logger.info(f"Sample metadata: {sample_metadata}")
-                
-                embedding_provider = sample_metadata.get("embedding_provider", "huggingface")
-                embedding_model = sample_metadata.get("embedding_model", "all-MiniLM-L6-v2")
-            except Exception as e:
-                logger.error(f"Error getting sample items: {str(e)}")
-                # 使用默认值
-                embedding_provider = "huggingface"
-                embedding_model = "all-MiniLM-L6-v2"
-                logger.info(f"Using default embedding provider: {embedding_provider}, model: {embedding_model}")
-            
-            logger.info(f"Creating query embedding with provider: {embedding_provider}, model: {embedding_model}")
+            # 创建查询嵌入：使用集合记录的嵌入模型（集合目录中缓存，未缓存时取样读取），
+            # 模型与集合维度不一致时直接返回错误，不再逐个尝试其他模型
             try:
-                query_embedding = self.embedding_service.create_single_embedding(
-                    query,
-                    provider=embedding_provider,
-                    model=embedding_model
-                )
-                logger.info(f"Query embedding created with dimension: {len(query_embedding)}")
+                embedding_config = await run_io(self._get_chroma_embedding_config, collection)
+                logger.info(f"Embedding config: {embedding_config}")
+                query_embedding = await self._embed_query(query, embedding_config)
             except Exception as e:
-                logger.error(f"Error creating embedding: {str(e)}")
-                # 尝试使用备用模型
-                try:
-                    logger.info("Trying with a backup model...")
-                    query_embedding = self.embedding_service.create_single_embedding(
-                        query,
-                        provider=EmbeddingProvider.HUGGINGFACE.value,
-                        model="paraphrase-multilingual-MiniLM-L12-v2"  # 使用更可靠的备用模型
-                    )
-                    logger.info(f"Backup embedding created with dimension: {len(query_embedding)}")
-                except Exception as backup_error:
-                    logger.error(f"Backup embedding also failed: {str(backup_error)}")
-                    return {
-                        "results": [],
-                        "error": f"Failed to create embedding: {str(e)}. Backup also failed: {str(backup_error)}"
-                    }
+                logger.error(f"Error creating query embedding: {str(e)}")
+                return {"results": [], "error": str(e)}
             
             # 执行搜索
             logger.info(f"Executing search with top_k: {top_k}")
             
             try:
-                # 首先获取集合的维度信息（如果可能）
-                collection_dimension = None
-                try:
-                    # 尝试从样本元数据中获取维度信息
-                    if sample_metadata and "vector_dimension" in sample_metadata:
-                        collection_dimension = sample_metadata.get("vector_dimension")
-                        logger.info(f"Found collection dimension from metadata: {collection_dimension}")
-                    # 如果无法从元数据获取，使用默认值
-                    if not collection_dimension:
-                        # 根据模型设置默认维度
-                        if "mpnet" in embedding_model.lower():
-                            collection_dimension = 768
-                        elif "minilm" in embedding_model.lower():
-                            collection_dimension = 384
-                        else:
-                            collection_dimension = 768  # 大多数模型是768维
-                        logger.info(f"Using default dimension for model {embedding_model}: {collection_dimension}")
-                except Exception as e:
-                    logger.warning(f"Error determining collection dimension: {str(e)}")
-                    collection_dimension = 768  # 默认使用较大维度
-                
-                # 检查当前查询向量的维度
-                current_dimension = len(query_embedding)
-                logger.info(f"Current query embedding dimension: {current_dimension}")
-                logger.info(f"Required collection dimension: {collection_dimension}")
-                
-                # 如果维度不匹配，重新创建查询向量
-                if collection_dimension and current_dimension != collection_dimension:
-                    logger.warning(f"Dimension mismatch: query={current_dimension}, collection={collection_dimension}")
-                    
-                    # 选择合适维度的模型
-                    new_model = None
-                    
-                    # 检测是否包含中文字符
-                    has_chinese = any('\u4e00' <= ch <= '\u9fff' for ch in query)
-                    if has_chinese:
-                        logger.info("Query contains Chinese characters")
-                    
-                    # 根据维度和语言选择合适的模型
-                    if collection_dimension == 768:
-                        if has_chinese:
-                            # 使用支持中文的768维模型
-                            new_model = "distiluse-base-multilingual-cased-v1" # 或 "distiluse-base-multilingual-cased-v2"
-                        else:
-                            new_model = "all-mpnet-base-v2"  # 768维
-                    elif collection_dimension == 384:
-                        if has_chinese:
-                            # 使用支持中文的384维模型
-                            new_model = "paraphrase-multilingual-MiniLM-L12-v2" 
-                        else:
-                            new_model = "all-MiniLM-L6-v2"  # 384维
-                    else:
-                        logger.warning(f"Unknown collection dimension: {collection_dimension}, trying to proceed anyway")
-                    
-                    if new_model:
-                        logger.info(f"Recreating embedding with model: {new_model} (dimension: {collection_dimension})")
-                        try:
-                            query_embedding = self.embedding_service.create_single_embedding(
-                                query,
-                                provider=EmbeddingProvider.HUGGINGFACE.value,
-                                model=new_model
-                            )
-                            logger.info(f"New query embedding created with dimension: {len(query_embedding)}")
-                            
-                            # 再次验证维度
-                            if len(query_embedding) != collection_dimension:
-                                logger.warning(f"Still dimension mismatch after trying model {new_model}. " +
-                                             f"Got {len(query_embedding)}, need {collection_dimension}")
-                                
-                                # 尝试所有可能的模型，直到找到匹配维度的
-                                fallback_models = [
-                                    "all-mpnet-base-v2",                 # 768维
-                                    "distiluse-base-multilingual-cased", # 512维
-                                    "all-MiniLM-L12-v2",                 # 384维
-                                    "all-MiniLM-L6-v2",                  # 384维
-                                    "paraphrase-multilingual-MiniLM-L12-v2" # 384维
-                                ]
-                                
-                                for fallback_model in fallback_models:
-                                    if fallback_model == new_model:
-                                        continue  # 跳过已尝试的模型
-                                    
-                                    logger.info(f"Trying fallback model: {fallback_model}")
-                                    try:
-                                        fallback_embedding = self.embedding_service.create_single_embedding(
-                                            query,
-                                            provider=EmbeddingProvider.HUGGINGFACE.value,
-                                            model=fallback_model
-                                        )
-                                        
-                                        if len(fallback_embedding) == collection_dimension:
-                                            logger.info(f"Found matching dimension with fallback model {fallback_model}")
-                                            query_embedding = fallback_embedding
-                                            break
-                                        else:
-                                            logger.info(f"Fallback model {fallback_model} dimension: " +
-                                                      f"{len(fallback_embedding)}, need: {collection_dimension}")
-                                    except Exception as fallback_error:
-                                        logger.warning(f"Error with fallback model {fallback_model}: {str(fallback_error)}")
-                        except Exception as e:
-                            logger.error(f"Error creating dimension-matched embedding: {str(e)}")
-                            # 继续使用原始向量，让Chroma处理错误
-                    
-                    # 最后检查维度是否匹配
-                    if len(query_embedding) != collection_dimension:
-                        logger.error(f"Failed to create embedding with matching dimension. " +
-                                   f"Using dimension {len(query_embedding)}, but collection requires {collection_dimension}")
-                        # 这里不返回错误，而是让Chroma API处理，因为这是最清晰的错误信息来源
-                
-                # 增加n_results以确保有足够的结果
-                expanded_top_k = top_k * 3
-                logger.info(f"Increasing n_results to {expanded_top_k} for more candidates")
+                # 过滤条件下推为where子句，无需扩大n_results再在Python中过滤
+                where = SearchFilters(filters, word_count_threshold=word_count_threshold).to_chroma_where()
                 
                 # 查询参数，添加更多调试信息
-                logger.info(f"Final query params: embedding dims={len(query_embedding)}, n_results={expanded_top_k}")
+                logger.info(f"Final query params: embedding dims={len(query_embedding)}, n_results={top_k}, where={where}")
                 
-                # 执行不带过滤条件的搜索
-                results = collection.query(
+                # 执行带过滤条件的搜索
+                results = await run_io(
+                    collection.query,
                     query_embeddings=[query_embedding],
-                    n_results=expanded_top_k,
+                    n_results=top_k,
+                    where=where,
                     include=["metadatas", "documents", "distances"]
                 )
                 
@@ -747,7 +2334,6 @@ class SearchService:
                 else:
                     logger.warning("No results returned from Chroma")
                 
-                # 如果需要过滤结果，我们将在后处理中进行
                 logger.info(f"Successfully executed search, processing results")
             except Exception as e:
                 logger.error(f"Error executing search: {str(e)}")
@@ -760,101 +2346,7 @@ class SearchService:
                 }
             
             # 处理结果
-            processed_results = []
-            if results and len(results["ids"]) > 0 and len(results["ids"][0]) > 0:
-                documents = results["documents"][0]
-                metadatas = results["metadatas"][0]
-                distances = results["distances"][0]
-                
-                logger.info(f"Raw search results count: {len(documents)}")
-                logger.info(f"Original threshold: {threshold}, Original word_count_threshold: {word_count_threshold}")
-                
-                # 如果结果为空，可能是阈值太高，降低阈值
-                if threshold > 0.2:
-                    actual_threshold = 0.2
-                    logger.info(f"Reducing threshold to {actual_threshold} to find more results")
-                else:
-                    actual_threshold = threshold
-                
-                # 如果word_count_threshold设置太高，可能导致无结果，降低它
-                actual_word_threshold = 0
-                logger.info(f"Ignoring word count threshold for Chroma results")
-                
-                for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
-                    # 计算余弦相似度（Chroma返回的是距离，需要转换为相似度）
-                    # 相似度 = 1 - 距离
-                    similarity = 1.0 - distance
-                    
-                    # 获取词数并确保其是数字
-                    word_count = metadata.get("word_count", 0)
-                    if isinstance(word_count, str):
-                        try:
-                            word_count = int(word_count)
-                        except (ValueError, TypeError):
-                            word_count = 0
-                    
-                    logger.info(f"Result {i+1} - Score: {similarity}, Word Count: {word_count}, Content: {doc[:100]}...")
-                    
-                    # 应用更宽松的过滤条件
-                    if similarity >= actual_threshold:
-                        processed_results.append({
-                            "text": doc,
-                            "score": float(similarity),
-                            "metadata": {
-                                "source": metadata.get("document_name", ""),
-                                "page": metadata.get("page_number", ""),
-                                "chunk": metadata.get("chunk_id", 0),
-                                "total_chunks": metadata.get("total_chunks", 0),
-                                "page_range": metadata.get("page_range", ""),
-                                "embedding_provider": metadata.get("embedding_provider", ""),
-                                "embedding_model": metadata.get("embedding_model", ""),
-                                "embedding_timestamp": metadata.get("embedding_timestamp", "")
-                            }
-                        })
-                        logger.info(f"Added result {i+1} to processed results (score: {similarity})")
-                    else:
-                        logger.info(f"Skipped result {i+1} due to low score: {similarity} < {actual_threshold}")
-                
-                logger.info(f"Total processed results after filtering: {len(processed_results)}")
-                
-                # 如果过滤后仍然没有结果，尝试返回至少一个最佳匹配
-                if not processed_results and len(documents) > 0:
-                    logger.warning("No results pass threshold filter, adding best match regardless of score")
-                    best_idx = 0
-                    for i, distance in enumerate(distances):
-                        if distance < distances[best_idx]:
-                            best_idx = i
-                    
-                    doc = documents[best_idx]
-                    metadata = metadatas[best_idx]
-                    similarity = 1.0 - distances[best_idx]
-                    
-                    processed_results.append({
-                        "text": doc,
-                        "score": float(similarity),
-                        "metadata": {
-                            "source": metadata.get("document_name", ""),
-                            "page": metadata.get("page_number", ""),
-                            "chunk": metadata.get("chunk_id", 0),
-                            "total_chunks": metadata.get("total_chunks", 0),
-                            "page_range": metadata.get("page_range", ""),
-                            "embedding_provider": metadata.get("embedding_provider", ""),
-                            "embedding_model": metadata.get("embedding_model", ""),
-                            "embedding_timestamp": metadata.get("embedding_timestamp", ""),
-                            "note": "Best match (below threshold)"
-                        }
-                    })
-                    logger.info(f"Added best match with score {similarity} despite being below threshold")
-            else:
-                if not results:
-                    logger.warning("No results returned from Chroma search")
-                elif len(results["ids"]) == 0:
-                    logger.warning("Results returned but ids array is empty")
-                elif len(results["ids"][0]) == 0:
-                    logger.warning("Results returned but first ids array is empty")
-                    
-                # 记录完整的结果结构，帮助调试
-                logger.info(f"Raw results structure: {results}")
+            processed_results = await run_io(self._process_chroma_results, results, threshold, collection_id)
             
             response_data = {"results": processed_results}
             
@@ -876,6 +2368,185 @@ class SearchService:
                 "error": f"Search failed: {str(e)}"
             }
 
+    def _get_chroma_client(self):
+        """
+        创建Chroma持久化客户端
+        
+        Returns:
+            chromadb.PersistentClient: Chroma客户端
+        """
+        import chromadb
+        from chromadb.config import Settings
+        
+        vector_store = VectorStoreService()
+        chroma_path = vector_store._get_absolute_path(CHROMA_CONFIG["uri"])
+        logger.info(f"Connecting to Chroma at {chroma_path}")
+        return chromadb.PersistentClient(
+            path=chroma_path,
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+    def _open_chroma_collection_with_config(self, client, collection_id: str) -> tuple:
+        """
+        打开Chroma集合并读取其嵌入配置和度量类型，供多集合搜索使用
+        
+        Args:
+            client: Chroma客户端
+            collection_id (str): 集合ID
+            
+        Returns:
+            tuple: (集合, 嵌入配置, 度量类型)
+        """
+        collection = client.get_collection(name=collection_id)
+        embedding_config = self._get_chroma_embedding_config(collection)
+        metric = (collection.metadata or {}).get("hnsw:space", "l2")
+        return collection, embedding_config, metric
+
+    def _get_chroma_embedding_config(self, collection) -> Dict[str, Any]:
+        """
+        读取Chroma集合的嵌入配置：优先使用集合目录中的缓存，未缓存时从样本中读取并写入缓存
+        
+        Args:
+            collection: Chroma集合
+            
+        Returns:
+            Dict[str, Any]: 包含embedding_provider、embedding_model和vector_dimension的字典
+            
+        Raises:
+            ValueError: 集合为空
+        """
+        cached = self._cached_embedding_config(VectorDBProvider.CHROMA.value, collection.name)
+        if cached:
+            return cached
+        logger.info("Querying sample item for embedding configuration")
+        sample_items = collection.peek(limit=1)
+        if not sample_items or len(sample_items["metadatas"]) == 0:
+            raise ValueError(f"Collection {collection.name} is empty")
+        # 精简集合的行元数据不含嵌入配置，使用集合元数据中记录的一份
+        sample_metadata = {**(collection.metadata or {}), **(sample_items["metadatas"][0] or {})}
+        vector_dim = sample_metadata.get("vector_dimension")
+        sample_embeddings = sample_items.get("embeddings")
+        if not vector_dim and sample_embeddings is not None and len(sample_embeddings):
+            vector_dim = len(sample_embeddings[0])
+        # 行元数据未记录嵌入模型时，按向量维度在模型登记表中确定，无法唯一确定时报错
+        embedding_config = model_registry.resolve(
+            sample_metadata.get("embedding_provider"),
+            sample_metadata.get("embedding_model"),
+            int(vector_dim) if vector_dim else None
+        )
+        self._remember_embedding_config(VectorDBProvider.CHROMA.value, collection.name, embedding_config)
+        return embedding_config
+
+    def _chroma_search_collection(self,
+                                  collection,
+                                  query_embedding: List[float],
+                                  top_k: int = 3,
+                                  threshold: float = 0.5,
+                                  word_count_threshold: int = 30,
+                                  filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        在Chroma集合中执行向量搜索并处理结果
+        
+        Args:
+            collection: Chroma集合
+            query_embedding (List[float]): 查询向量
+            top_k (int): 返回的最大结果数量
+            threshold (float): 相似度阈值
+            word_count_threshold (int): 文本字数阈值
+            filters (Dict[str, Any]): 结构化过滤条件
+            
+        Returns:
+            List[Dict[str, Any]]: 处理后的搜索结果
+        """
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k,
+            where=SearchFilters(filters, word_count_threshold=word_count_threshold).to_chroma_where(),
+            include=["metadatas", "documents", "distances"]
+        )
+        return self._process_chroma_results(results, threshold, collection.name)
+
+    def _process_chroma_results(self,
+                                results: Dict[str, Any],
+                                threshold: float,
+                                collection_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        将Chroma查询结果转换为统一的搜索结果格式
+        
+        Args:
+            results (Dict[str, Any]): Chroma query返回的原始结果
+            threshold (float): 相似度阈值
+            collection_id (str): 集合ID，精简集合的块文本按它从块文本存储读取
+            
+        Returns:
+            List[Dict[str, Any]]: 处理后的搜索结果
+        """
+        processed_results = []
+        if results and len(results["ids"]) > 0 and len(results["ids"][0]) > 0:
+            ids = results["ids"][0]
+            documents = results["documents"][0]
+            metadatas = results["metadatas"][0]
+            distances = results["distances"][0]
+            # 查询时include了embeddings才返回候选向量（用于MMR）
+            embeddings = results.get("embeddings")
+            embeddings = embeddings[0] if embeddings is not None and len(embeddings) > 0 else None
+
+            logger.info(f"Raw search results count: {len(documents)}")
+            logger.info(f"Threshold: {threshold}")
+
+            # Chroma没有范围搜索，结果按距离升序返回：逐条扫描到第一个低于阈值的结果为止
+            for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
+                # 计算余弦相似度（Chroma返回的是距离，需要转换为相似度）
+                # 相似度 = 1 - 距离
+                similarity = 1.0 - distance
+
+                # 获取词数并确保其是数字
+                word_count = metadata.get("word_count", 0)
+                if isinstance(word_count, str):
+                    try:
+                        word_count = int(word_count)
+                    except (ValueError, TypeError):
+                        word_count = 0
+
+                logger.info(f"Result {i+1} - Score: {similarity}, Word Count: {word_count}, Content: {(doc or '')[:100]}...")
+
+                if similarity < threshold:
+                    logger.info(f"Stopped at result {i+1} due to low score: {similarity} < {threshold}")
+                    break
+                processed_results.append({
+                    **({"row_id": int(ids[i])} if doc is None and collection_id else {}),
+                    **({"vector": [float(x) for x in embeddings[i]]} if embeddings is not None else {}),
+                    "text": doc,
+                    "score": float(similarity),
+                    "metadata": {
+                        "source": metadata.get("document_name", ""),
+                        "page": metadata.get("page_number", ""),
+                        "chunk": metadata.get("chunk_id", 0),
+                        "total_chunks": metadata.get("total_chunks", 0),
+                        "page_range": metadata.get("page_range", ""),
+                        "embedding_provider": metadata.get("embedding_provider", ""),
+                        "embedding_model": metadata.get("embedding_model", ""),
+                        "embedding_timestamp": metadata.get("embedding_timestamp", "")
+                    }
+                })
+                logger.info(f"Added result {i+1} to processed results (score: {similarity})")
+
+            logger.info(f"Total processed results after filtering: {len(processed_results)}")
+        else:
+            if not results:
+                logger.warning("No results returned from Chroma search")
+            elif len(results["ids"]) == 0:
+                logger.warning("Results returned but ids array is empty")
+            elif len(results["ids"][0]) == 0:
+                logger.warning("Results returned but first ids array is empty")
+
+            # 记录完整的结果结构，帮助调试
+            logger.info(f"Raw results structure: {results}")
+        
+        if collection_id:
+            self._hydrate_chunk_text(VectorDBProvider.CHROMA.value, collection_id, processed_results)
+        return processed_results
+
     def _sanitize_collection_name(self, name: str) -> str:
         """
         清理和标准化集合名称，确保它适用于数据库
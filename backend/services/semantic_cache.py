@@ -0,0 +1,289 @@
+import json
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+from utils.config import SEMANTIC_CACHE_CONFIG
+
+
+class SemanticQueryCache:
+    """
+    语义查询缓存：保存最近查询的向量和响应，新查询与同一集合版本、同一搜索参数下某个已缓存查询的
+    余弦距离不超过阈值时直接返回其响应
+
+    近邻查找使用随机超平面LSH：每张表把向量投影到若干超平面上得到签名，候选为任一表中签名相同的条目，
+    再对候选精确计算余弦相似度。命中按一定比例抽样审计（重新执行真实搜索并比较结果），用于估计误命中率
+    """
+
+    def __init__(self, enabled: bool = SEMANTIC_CACHE_CONFIG["enabled"],
+                 max_distance: float = SEMANTIC_CACHE_CONFIG["max_distance"],
+                 max_entries: int = SEMANTIC_CACHE_CONFIG["max_entries"],
+                 ttl_seconds: float = SEMANTIC_CACHE_CONFIG["ttl_seconds"],
+                 lsh_tables: int = SEMANTIC_CACHE_CONFIG["lsh_tables"],
+                 lsh_bits: int = SEMANTIC_CACHE_CONFIG["lsh_bits"],
+                 audit_rate: float = SEMANTIC_CACHE_CONFIG["audit_rate"],
+                 audit_min_overlap: float = SEMANTIC_CACHE_CONFIG["audit_min_overlap"],
+                 audit_log_size: int = SEMANTIC_CACHE_CONFIG["audit_log_size"]):
+        """
+        初始化语义查询缓存
+
+        Args:
+            enabled (bool): 是否启用
+            max_distance (float): 命中的最大余弦距离（1 - 余弦相似度）
+            max_entries (int): 最大条目数，超出时淘汰最久未使用的条目
+            ttl_seconds (float): 条目有效期（秒）
+            lsh_tables (int): LSH表数，越多召回越高
+            lsh_bits (int): 每张表的超平面数，越多每个桶越小
+            audit_rate (float): 命中后抽样审计的比例
+            audit_min_overlap (float): 审计时缓存结果与真实结果的重合度低于此值即记为误命中
+            audit_log_size (int): 保留的最近审计记录数
+        """
+        self.enabled = enabled
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self.audit_rate = audit_rate
+        self.audit_min_overlap = audit_min_overlap
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[tuple, set] = {}
+        self._planes: Dict[int, np.ndarray] = {}
+        self._recent_embeddings: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._next_id = 0
+        self._rng = np.random.default_rng()
+        self._audits = deque(maxlen=audit_log_size)
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "audits": 0, "false_hits": 0}
+
+    def _signatures(self, vector: np.ndarray) -> List[tuple]:
+        """
+        计算向量在每张LSH表中的签名，超平面按维度生成一次，调用方需持有锁
+        """
+        dim = vector.shape[0]
+        planes = self._planes.get(dim)
+        if planes is None:
+            planes = np.random.default_rng(dim).standard_normal((self.lsh_tables * self.lsh_bits, dim)).astype(np.float32)
+            self._planes[dim] = planes
+        bits = (planes @ vector > 0).reshape(self.lsh_tables, self.lsh_bits)
+        return [(table, dim, row.tobytes()) for table, row in enumerate(bits)]
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        """
+        转换为单位长度的float32向量
+        """
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    def lookup(self, namespace: str, version: Any, query_embedding: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """
+        查找与查询向量足够接近的已缓存查询
+
+        Args:
+            namespace (str): 命名空间（提供商、集合和除查询外的搜索参数）
+            version (Any): 集合的当前版本
+            query_embedding (Sequence[float]): 查询向量
+
+        Returns:
+            Optional[Dict[str, Any]]: 命中时返回 {"entry_id", "query", "distance", "response"}，
+                response为副本；未命中时返回None
+        """
+        if not self.enabled:
+            return None
+        vector = self._unit(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for signature in self._signatures(vector):
+                candidates.update(self._buckets.get((namespace,) + signature, ()))
+            best_id, best_similarity = None, -1.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry["version"] != version or now >= entry["expires_at"]:
+                    self._stats["stale"] += 1
+                    self._remove(entry_id)
+                    continue
+                if entry["vector"].shape != vector.shape:
+                    continue
+                similarity = float(entry["vector"] @ vector)
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            if best_id is None or 1.0 - best_similarity > self.max_distance:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._stats["hits"] += 1
+            entry = self._entries[best_id]
+            return {
+                "entry_id": best_id,
+                "query": entry["query"],
+                "distance": round(1.0 - best_similarity, 6),
+                "response": json.loads(entry["payload"])
+            }
+
+    def put(self, namespace: str, version: Any, query: str, query_embedding: Sequence[float], response: Dict[str, Any]):
+        """
+        缓存查询的向量和响应
+
+        Args:
+            namespace (str): 命名空间
+            version (Any): 搜索开始前读取的集合版本
+            query (str): 查询文本
+            query_embedding (Sequence[float]): 查询向量
+            response (Dict[str, Any]): 搜索响应
+        """
+        if not self.enabled:
+            return
+        vector = self._unit(query_embedding)
+        payload = json.dumps(response, ensure_ascii=False, default=str)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            signatures = [(namespace,) + signature for signature in self._signatures(vector)]
+            self._entries[entry_id] = {
+                "namespace": namespace,
+                "version": version,
+                "query": query,
+                "vector": vector,
+                "signatures": signatures,
+                "payload": payload,
+                "expires_at": time.monotonic() + self.ttl_seconds
+            }
+            for signature in signatures:
+                self._buckets.setdefault(signature, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, entry_id: int):
+        """
+        删除一个条目（如审计发现误命中）
+        """
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        """
+        删除条目及其桶索引，调用方需持有锁
+        """
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for signature in entry["signatures"]:
+            bucket = self._buckets.get(signature)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[signature]
+
+    def remember_embedding(self, provider: str, model: str, query: str, embedding: List[float]):
+        """
+        记住最近查询文本的向量，同一请求中缓存查找和真实搜索不必重复嵌入
+
+        Args:
+            provider (str): 嵌入提供商
+            model (str): 嵌入模型
+            query (str): 查询文本
+            embedding (List[float]): 查询向量
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            key = (provider, model, query)
+            self._recent_embeddings[key] = embedding
+            self._recent_embeddings.move_to_end(key)
+            while len(self._recent_embeddings) > self.max_entries:
+                self._recent_embeddings.popitem(last=False)
+
+    def recent_embedding(self, provider: str, model: str, query: str) -> Optional[List[float]]:
+        """
+        取出最近计算过的查询向量
+
+        Returns:
+            Optional[List[float]]: 查询向量，没有时返回None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            embedding = self._recent_embeddings.get((provider, model, query))
+            if embedding is not None:
+                self._recent_embeddings.move_to_end((provider, model, query))
+            return embedding
+
+    def should_audit(self) -> bool:
+        """
+        按审计比例抽样决定是否审计本次命中
+        """
+        with self._lock:
+            return bool(self.audit_rate) and self._rng.random() < self.audit_rate
+
+    def record_audit(self, query: str, cached_query: str, distance: float,
+                     cached_results: List[Dict[str, Any]], fresh_results: List[Dict[str, Any]]) -> bool:
+        """
+        记录一次审计：比较缓存结果与真实结果（按来源和块编号）的重合度
+
+        Args:
+            query (str): 本次查询
+            cached_query (str): 命中的已缓存查询
+            distance (float): 两者的余弦距离
+            cached_results (List[Dict[str, Any]]): 返回给调用方的缓存结果
+            fresh_results (List[Dict[str, Any]]): 重新执行搜索得到的结果
+
+        Returns:
+            bool: 是否为误命中
+        """
+        def keys(results: List[Dict[str, Any]]) -> set:
+            return {(r.get("metadata", {}).get("source"), r.get("metadata", {}).get("chunk")) for r in results}
+
+        cached_keys, fresh_keys = keys(cached_results), keys(fresh_results)
+        union = cached_keys | fresh_keys
+        overlap = len(cached_keys & fresh_keys) / len(union) if union else 1.0
+        false_hit = overlap < self.audit_min_overlap
+        with self._lock:
+            self._stats["audits"] += 1
+            self._stats["false_hits"] += 1 if false_hit else 0
+            self._audits.append({
+                "query": query,
+                "cached_query": cached_query,
+                "distance": distance,
+                "overlap": round(overlap, 4),
+                "false_hit": false_hit,
+                "audited_at": time.time()
+            })
+        return false_hit
+
+    def clear(self):
+        """
+        清空缓存（统计信息和审计记录保留）
+        """
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._recent_embeddings.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 命中率、误命中率（按审计样本估计）、条目数和最近的审计记录
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_distance": self.max_distance,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "false_hit_rate": round(self._stats["false_hits"] / self._stats["audits"], 4) if self._stats["audits"] else 0.0,
+                **self._stats,
+                "recent_audits": list(self._audits)
+            }
+
+
+# 创建全局语义查询缓存实例
+semantic_cache = SemanticQueryCache()
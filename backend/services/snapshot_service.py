@@ -0,0 +1,565 @@
+import os
+import json
+import time
+import zipfile
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+import logging
+import numpy as np
+from pymilvus import utility
+from pymilvus import Collection, DataType, FieldSchema, CollectionSchema
+from services.vector_store_service import VectorStoreService
+from services.catalog_service import collection_catalog
+from services.doc_store_service import chunk_text_store
+from services.lexical_index_service import lexical_index
+from utils.milvus_connection import milvus_connection, is_milvus_lite
+from utils.sidecar_client import sidecar_enabled, get_sidecar_client
+from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG, SNAPSHOT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotService:
+    """
+    集合快照服务：将集合的向量、标量字段和索引参数导出为可移植的二进制包，
+    并在其他节点上批量导入重建集合
+
+    快照包为zip文件，包含：
+    - manifest.json：集合结构、索引参数、集合目录条目和各列的存储格式
+    - vectors.npy：float32向量矩阵
+    - columns/<字段>.npy 或 columns/<字段>.json：按列存储的标量字段（数值列为npy，其余为JSON数组），
+      精简集合在块文本存储中的字段存为 _chunk_<字段> 列
+    """
+
+    def __init__(self):
+        """
+        初始化快照服务
+        """
+        self.vector_store = VectorStoreService()
+        self.snapshot_dir = self.vector_store._get_absolute_path(SNAPSHOT_CONFIG["uri"])
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def export_snapshot(self, provider: str, collection_name: str, output_path: str = None) -> Dict[str, Any]:
+        """
+        导出集合快照
+
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            output_path: 快照文件路径，默认写入快照目录
+
+        返回:
+            快照信息字典，包含路径、行数和文件大小
+        """
+        provider = str(provider).lower().strip()
+        if provider == VectorDBProvider.MILVUS.value and sidecar_enabled():
+            # 数据文件由sidecar独占，由sidecar读取集合并写出快照
+            return get_sidecar_client().call(
+                "export_snapshot", collection_name=collection_name,
+                output_path=os.path.abspath(output_path) if output_path else None
+            )
+        start = time.perf_counter()
+        if provider == VectorDBProvider.MILVUS.value:
+            manifest, vectors, columns = self._read_milvus_collection(collection_name)
+        elif provider == VectorDBProvider.CHROMA.value:
+            manifest, vectors, columns = self._read_chroma_collection(collection_name)
+        else:
+            raise ValueError(f"Unsupported vector database provider: {provider}")
+        if chunk_text_store.exists(provider, collection_name):
+            columns.update(self._read_chunk_text(provider, collection_name, self._row_ids(provider, columns)))
+
+        catalog_entry = collection_catalog.get(provider, collection_name)
+        manifest.update({
+            "format_version": SNAPSHOT_CONFIG["format_version"],
+            "provider": provider,
+            "collection_name": collection_name,
+            "exported_at": datetime.now().isoformat(),
+            "count": int(vectors.shape[0]),
+            "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "catalog": {k: v for k, v in catalog_entry.items() if k not in ("created_at", "updated_at")},
+            "columns": {}
+        })
+
+        if output_path is None:
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            output_path = os.path.join(self.snapshot_dir, f"{provider}_{collection_name}_{timestamp}.zip")
+        tmp_path = f"{output_path}.tmp"
+
+        # 向量矩阵不压缩，导入时可直接按块读取；列数据较小，使用压缩
+        with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as bundle:
+            with bundle.open("vectors.npy", "w", force_zip64=True) as f:
+                np.save(f, vectors)
+            for name, values in columns.items():
+                manifest["columns"][name] = self._write_column(bundle, name, values)
+            bundle.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        os.replace(tmp_path, output_path)
+
+        info = {
+            "path": output_path,
+            "snapshot_name": os.path.basename(output_path),
+            "provider": provider,
+            "collection_name": collection_name,
+            "count": manifest["count"],
+            "size_bytes": os.path.getsize(output_path),
+            "elapsed_seconds": round(time.perf_counter() - start, 3)
+        }
+        logger.info(f"Exported snapshot: {info}")
+        return info
+
+    def import_snapshot(self, snapshot_path: str, collection_name: str = None, overwrite: bool = False) -> Dict[str, Any]:
+        """
+        从快照导入并重建集合
+
+        参数:
+            snapshot_path: 快照文件路径
+            collection_name: 目标集合名称，默认使用快照中的集合名称
+            overwrite: 目标集合已存在时是否删除后重建
+
+        返回:
+            导入结果信息字典
+        """
+        start = time.perf_counter()
+        with zipfile.ZipFile(snapshot_path, "r") as bundle:
+            manifest = json.loads(bundle.read("manifest.json"))
+            if manifest.get("provider") == VectorDBProvider.MILVUS.value and sidecar_enabled():
+                # 数据文件由sidecar独占，由sidecar重建集合
+                return get_sidecar_client().call(
+                    "import_snapshot", snapshot_path=os.path.abspath(snapshot_path),
+                    collection_name=collection_name, overwrite=overwrite
+                )
+            if manifest.get("format_version") != SNAPSHOT_CONFIG["format_version"]:
+                raise ValueError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+            with bundle.open("vectors.npy") as f:
+                vectors = np.load(f)
+            columns = {
+                name: self._read_column(bundle, name, fmt)
+                for name, fmt in manifest["columns"].items()
+            }
+
+        provider = manifest["provider"]
+        collection_name = collection_name or manifest["collection_name"]
+        if provider == VectorDBProvider.MILVUS.value:
+            self._write_milvus_collection(collection_name, manifest, vectors, columns, overwrite)
+        elif provider == VectorDBProvider.CHROMA.value:
+            self._write_chroma_collection(collection_name, manifest, vectors, columns, overwrite)
+        else:
+            raise ValueError(f"Unsupported vector database provider: {provider}")
+        # 覆盖导入时旧集合的块文本一并替换
+        chunk_text_store.drop(provider, collection_name)
+        self._write_chunk_text(provider, collection_name, self._row_ids(provider, columns), columns)
+        lexical_index.drop(provider, collection_name)
+        self._rebuild_lexical_index(provider, collection_name, columns, (manifest.get("catalog") or {}).get("embedding"))
+
+        # 旧集合缓存的嵌入配置不再适用，快照中没有记录时清除，首次搜索时重新取样；
+        # 导入的集合总是未分片且全部分区已加载，分片和分区释放信息不随快照复制
+        catalog_fields = {"embedding": None, "shards": None, "released_partitions": []}
+        catalog_fields.update({
+            k: v for k, v in (manifest.get("catalog") or {}).items()
+            if k not in ("provider", "collection_name", "shards", "released_partitions")
+        })
+        collection_catalog.update(provider, collection_name, **catalog_fields)
+        collection_catalog.bump_version(provider, collection_name)
+
+        info = {
+            "provider": provider,
+            "collection_name": collection_name,
+            "count": int(vectors.shape[0]),
+            "elapsed_seconds": round(time.perf_counter() - start, 3)
+        }
+        logger.info(f"Imported snapshot {snapshot_path}: {info}")
+        return info
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """
+        列出快照目录中的快照文件
+
+        返回:
+            快照信息列表，按修改时间倒序
+        """
+        snapshots = []
+        for name in os.listdir(self.snapshot_dir):
+            if not name.endswith(".zip"):
+                continue
+            path = os.path.join(self.snapshot_dir, name)
+            snapshots.append({
+                "snapshot_name": name,
+                "size_bytes": os.path.getsize(path),
+                "modified_at": datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            })
+        return sorted(snapshots, key=lambda s: s["modified_at"], reverse=True)
+
+    def get_snapshot_path(self, snapshot_name: str) -> str:
+        """
+        获取快照目录中快照文件的路径
+
+        参数:
+            snapshot_name: 快照文件名
+
+        返回:
+            快照文件路径
+
+        Raises:
+            FileNotFoundError: 快照不存在或文件名不合法
+        """
+        if os.path.basename(snapshot_name) != snapshot_name:
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+        path = os.path.join(self.snapshot_dir, snapshot_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot not found: {snapshot_name}")
+        return path
+
+    @staticmethod
+    def _write_column(bundle: zipfile.ZipFile, name: str, values: List[Any]) -> str:
+        """
+        写入一列数据：全为整数或浮点数的列存为npy，其余存为JSON数组
+
+        返回:
+            列的存储格式（npy或json）
+        """
+        if values and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            array = np.asarray(values, dtype=np.int64)
+        elif values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            array = np.asarray(values, dtype=np.float64)
+        else:
+            bundle.writestr(f"columns/{name}.json", json.dumps(values, ensure_ascii=False),
+                            compress_type=zipfile.ZIP_DEFLATED)
+            return "json"
+        with bundle.open(f"columns/{name}.npy", "w", force_zip64=True) as f:
+            np.save(f, array)
+        return "npy"
+
+    @staticmethod
+    def _read_column(bundle: zipfile.ZipFile, name: str, fmt: str) -> List[Any]:
+        """
+        读取一列数据
+
+        返回:
+            列值列表
+        """
+        if fmt == "npy":
+            with bundle.open(f"columns/{name}.npy") as f:
+                return np.load(f).tolist()
+        return json.loads(bundle.read(f"columns/{name}.json"))
+
+    @staticmethod
+    def _row_ids(provider: str, columns: Dict[str, List[Any]]) -> List[int]:
+        """
+        获取各行的稳定块ID（块文本存储的键）
+
+        返回:
+            行ID列表，集合没有稳定块ID时返回空列表
+        """
+        if provider == VectorDBProvider.CHROMA.value:
+            try:
+                return [int(row_id) for row_id in columns.get("_id", [])]
+            except ValueError:
+                return []
+        return columns.get("id", [])
+
+    @staticmethod
+    def _read_chunk_text(provider: str, collection_name: str, row_ids: List[int]) -> Dict[str, List[Any]]:
+        """
+        读取精简集合在块文本存储中的字段，按行顺序组织为 _chunk_<字段> 列
+
+        返回:
+            列数据字典
+        """
+        batch_size = SNAPSHOT_CONFIG["batch_size"]
+        fields = VectorStoreService.CHUNK_TEXT_FIELDS
+        columns = {f"_chunk_{field}": [] for field in fields}
+        for start in range(0, len(row_ids), batch_size):
+            batch = row_ids[start:start + batch_size]
+            records = chunk_text_store.get(provider, collection_name, batch)
+            for row_id in batch:
+                record = records.get(int(row_id), {})
+                for field in fields:
+                    columns[f"_chunk_{field}"].append(record.get(field, ""))
+        return columns
+
+    @staticmethod
+    def _write_chunk_text(provider: str, collection_name: str, row_ids: List[int], columns: Dict[str, List[Any]]):
+        """
+        把快照中的 _chunk_<字段> 列写回块文本存储，快照不含这些列时不做任何事
+        """
+        fields = [field for field in VectorStoreService.CHUNK_TEXT_FIELDS if f"_chunk_{field}" in columns]
+        if not fields or not row_ids:
+            return
+        batch_size = SNAPSHOT_CONFIG["batch_size"]
+        for start in range(0, len(row_ids), batch_size):
+            chunk_text_store.put(provider, collection_name, {
+                int(row_ids[i]): {field: columns[f"_chunk_{field}"][i] for field in fields}
+                for i in range(start, min(start + batch_size, len(row_ids)))
+            })
+
+    @staticmethod
+    def _rebuild_lexical_index(provider: str, collection_name: str, columns: Dict[str, List[Any]],
+                               embedding: Optional[Dict[str, str]] = None):
+        """
+        按快照中的块内容重建集合的词法索引，每个文档一个段；快照不含块内容或稳定块ID时跳过
+        """
+        row_ids = SnapshotService._row_ids(provider, columns)
+        contents = next((columns[name] for name in ("_chunk_content", "content", "_document") if name in columns), None)
+        if not row_ids or contents is None:
+            logger.warning(f"Snapshot of {collection_name} has no chunk text, skipping lexical index rebuild")
+            return
+
+        def column(name: str, default: Any) -> List[Any]:
+            return [default if v is None else v for v in columns.get(name) or [default] * len(row_ids)]
+
+        document_names = column("document_name", "")
+        timestamps = column("_chunk_embedding_timestamp" if "_chunk_embedding_timestamp" in columns else "embedding_timestamp", "")
+        chunk_ids, total_chunks = column("chunk_id", 0), column("total_chunks", 0)
+        word_counts, page_numbers, page_ranges = column("word_count", 0), column("page_number", "0"), column("page_range", "")
+        providers, models = column("embedding_provider", ""), column("embedding_model", "")
+
+        documents: Dict[str, List[Dict[str, Any]]] = {}
+        embeddings: Dict[str, Dict[str, str]] = {}
+        for i, row_id in enumerate(row_ids):
+            document_name = str(document_names[i])
+            documents.setdefault(document_name, []).append({
+                "row_id": int(row_id),
+                "content": contents[i] or "",
+                "chunk_id": int(chunk_ids[i]),
+                "total_chunks": int(total_chunks[i]),
+                "word_count": int(word_counts[i]),
+                "page_number": str(page_numbers[i]),
+                "page_range": str(page_ranges[i]),
+                "embedding_timestamp": str(timestamps[i])
+            })
+            # 精简集合的嵌入配置只记录在集合目录中
+            embeddings.setdefault(document_name, embedding or {
+                "embedding_provider": providers[i], "embedding_model": models[i]
+            })
+        store_text = not chunk_text_store.exists(provider, collection_name)
+        for document_name, rows in documents.items():
+            lexical_index.index_document(
+                provider, collection_name, document_name, rows,
+                embedding=embeddings[document_name], store_text=store_text
+            )
+
+    def _read_milvus_collection(self, collection_name: str) -> tuple:
+        """
+        读取Milvus集合的结构、索引、向量和标量字段；分片集合依次读取各分片，
+        快照中合并为一个集合，导入时重建为未分片的集合；Milvus Lite和分片不支持分区，
+        行所属的分区按集合目录中的文档分区映射由document_name确定
+
+        返回:
+            (manifest, 向量矩阵, 列数据字典)
+        """
+        batch_size = SNAPSHOT_CONFIG["batch_size"]
+        entry = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_name)
+        document_partitions = entry.get("partitions", {})
+        native_partitions = not entry.get("shards") and not is_milvus_lite(MILVUS_CONFIG["uri"])
+        manifest = None
+        vectors = []
+        columns = {}
+        for connection in self.vector_store.collection_connections(collection_name):
+            with connection as alias:
+                if not utility.has_collection(collection_name, using=alias):
+                    continue
+                collection = Collection(collection_name, using=alias)
+                collection.load()
+                if manifest is None:
+                    fields = [
+                        {
+                            "name": f.name,
+                            "dtype": f.dtype.name,
+                            "is_primary": f.is_primary,
+                            "auto_id": f.auto_id,
+                            "params": f.params
+                        }
+                        for f in collection.schema.fields
+                    ]
+                    indexes = [
+                        {"field_name": idx.field_name, "index_name": idx.index_name, "params": idx.params}
+                        for idx in collection.indexes
+                    ]
+                    manifest = {"fields": fields, "indexes": indexes, "description": collection.schema.description}
+                    scalar_fields = [f["name"] for f in fields if f["dtype"] != "FLOAT_VECTOR"]
+                    columns = {name: [] for name in scalar_fields}
+                    columns["_partition"] = []
+                primary_field = collection.schema.primary_field.name
+
+                # 每个分区一个迭代器；不支持分区时用一个迭代器读取整个集合
+                partition_names = [p.name for p in collection.partitions] if native_partitions else [None]
+                for partition_name in partition_names:
+                    iterator = collection.query_iterator(
+                        batch_size=batch_size,
+                        expr=f"{primary_field} >= 0",
+                        output_fields=scalar_fields + ["vector"],
+                        partition_names=[partition_name] if partition_name else None
+                    )
+                    while True:
+                        batch = iterator.next()
+                        if not batch:
+                            break
+                        for row in batch:
+                            vectors.append(row["vector"])
+                            for name in scalar_fields:
+                                columns[name].append(row.get(name))
+                            columns["_partition"].append(
+                                partition_name or document_partitions.get(row.get("document_name"), "_default")
+                            )
+                    iterator.close()
+
+        if manifest is None:
+            raise ValueError(f"Collection {collection_name} not found")
+        return manifest, np.asarray(vectors, dtype=np.float32), columns
+
+    def _write_milvus_collection(self, collection_name: str, manifest: Dict[str, Any], vectors: np.ndarray,
+                                 columns: Dict[str, List[Any]], overwrite: bool):
+        """
+        按快照重建Milvus集合：创建schema和分区，分批写入数据，最后按快照中的参数建索引；
+        Milvus Lite不支持分区，所有行写入默认分区，文档仍可按document_name区分
+        """
+        batch_size = SNAPSHOT_CONFIG["batch_size"]
+        if collection_catalog.get(VectorDBProvider.MILVUS.value, collection_name).get("shards"):
+            # 同名的分片集合不在主数据文件中，需删除其分片文件
+            if not overwrite:
+                raise ValueError(f"Collection {collection_name} already exists")
+            self.vector_store.delete_collection(VectorDBProvider.MILVUS.value, collection_name)
+        with milvus_connection(MILVUS_CONFIG["uri"]):
+            if utility.has_collection(collection_name):
+                if not overwrite:
+                    raise ValueError(f"Collection {collection_name} already exists")
+                utility.drop_collection(collection_name)
+
+            field_schemas = []
+            for field in manifest["fields"]:
+                extra_params = {k: v for k, v in (field.get("params") or {}).items() if k in ("max_length", "dim")}
+                field_schemas.append(FieldSchema(
+                    name=field["name"],
+                    dtype=getattr(DataType, field["dtype"]),
+                    is_primary=field.get("is_primary", False),
+                    auto_id=field.get("auto_id", False),
+                    **extra_params
+                ))
+            schema = CollectionSchema(fields=field_schemas, description=manifest.get("description", ""))
+            collection = Collection(name=collection_name, schema=schema)
+
+            # 自增主键的集合导入时重新生成主键
+            write_fields = [
+                f["name"] for f in manifest["fields"]
+                if f["dtype"] != "FLOAT_VECTOR" and not (f.get("is_primary") and f.get("auto_id"))
+            ]
+            partitions = columns.get("_partition") or ["_default"] * len(vectors)
+            if is_milvus_lite(MILVUS_CONFIG["uri"]):
+                partitions = [None] * len(vectors)
+            for partition_name in dict.fromkeys(partitions):
+                if partition_name and not collection.has_partition(partition_name):
+                    collection.create_partition(partition_name)
+                rows = [i for i, p in enumerate(partitions) if p == partition_name]
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    entities = [
+                        {**{name: columns[name][i] for name in write_fields}, "vector": vectors[i].tolist()}
+                        for i in batch
+                    ]
+                    collection.insert(entities, partition_name=partition_name)
+            collection.flush()
+
+            # 先建向量索引，再建标量索引；Milvus Lite读出的索引参数带有字段维度（字符串），不属于建索引参数
+            for index in sorted(manifest.get("indexes", []), key=lambda idx: idx["field_name"] != "vector"):
+                collection.create_index(
+                    field_name=index["field_name"],
+                    index_params={k: v for k, v in index["params"].items() if k != "dim"},
+                    index_name=index["index_name"]
+                )
+            collection.load()
+
+    def _read_chroma_collection(self, collection_name: str) -> tuple:
+        """
+        读取Chroma集合的元数据、向量、文档和元数据字段
+
+        返回:
+            (manifest, 向量矩阵, 列数据字典)
+        """
+        batch_size = SNAPSHOT_CONFIG["batch_size"]
+        collection = self._get_chroma_client().get_collection(name=collection_name)
+        ids, vectors, documents, metadatas = [], [], [], []
+        offset = 0
+        while True:
+            batch = collection.get(
+                include=["embeddings", "metadatas", "documents"], limit=batch_size, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            ids.extend(batch["ids"])
+            vectors.extend(batch["embeddings"])
+            documents.extend(batch["documents"])
+            metadatas.extend(m or {} for m in batch["metadatas"])
+            offset += len(batch["ids"])
+
+        metadata_keys = sorted({key for metadata in metadatas for key in metadata})
+        columns = {"_id": ids, "_document": documents}
+        for key in metadata_keys:
+            columns[key] = [metadata.get(key) for metadata in metadatas]
+
+        manifest = {"metadata": collection.metadata or {}, "metadata_keys": metadata_keys}
+        return manifest, np.asarray(vectors, dtype=np.float32), columns
+
+    def _write_chroma_collection(self, collection_name: str, manifest: Dict[str, Any], vectors: np.ndarray,
+                                 columns: Dict[str, List[Any]], overwrite: bool):
+        """
+        按快照重建Chroma集合，集合元数据中的HNSW参数随集合一起恢复
+        """
+        batch_size = SNAPSHOT_CONFIG["batch_size"]
+        client = self._get_chroma_client()
+        if collection_name in [c.name for c in client.list_collections()]:
+            if not overwrite:
+                raise ValueError(f"Collection {collection_name} already exists")
+            client.delete_collection(collection_name)
+
+        collection = client.create_collection(name=collection_name, metadata=manifest.get("metadata") or None)
+        metadata_keys = manifest.get("metadata_keys", [])
+        for start in range(0, len(vectors), batch_size):
+            end = min(start + batch_size, len(vectors))
+            # 精简集合不在Chroma中保存文档内容
+            documents = columns["_document"][start:end]
+            collection.add(
+                ids=columns["_id"][start:end],
+                embeddings=vectors[start:end].tolist(),
+                documents=documents if any(d is not None for d in documents) else None,
+                metadatas=[
+                    {key: columns[key][i] for key in metadata_keys if columns[key][i] is not None}
+                    for i in range(start, end)
+                ]
+            )
+
+    def _get_chroma_client(self):
+        """
+        创建Chroma持久化客户端
+
+        返回:
+            Chroma客户端
+        """
+        import chromadb
+        from chromadb.config import Settings
+
+        chroma_path = self.vector_store._get_absolute_path(CHROMA_CONFIG["uri"])
+        os.makedirs(chroma_path, exist_ok=True)
+        return chromadb.PersistentClient(path=chroma_path, settings=Settings(anonymized_telemetry=False))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or import portable collection snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="export a collection to a snapshot bundle")
+    export_parser.add_argument("provider", choices=[p.value for p in VectorDBProvider])
+    export_parser.add_argument("collection_name")
+    export_parser.add_argument("--output", default=None)
+    import_parser = subparsers.add_parser("import", help="rebuild a collection from a snapshot bundle")
+    import_parser.add_argument("snapshot_path")
+    import_parser.add_argument("--collection-name", default=None)
+    import_parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service = SnapshotService()
+    if args.command == "export":
+        result = service.export_snapshot(args.provider, args.collection_name, args.output)
+    else:
+        result = service.import_snapshot(args.snapshot_path, args.collection_name, args.overwrite)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
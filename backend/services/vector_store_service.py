@@ -1,13 +1,23 @@
 import os
 from datetime import datetime
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 import logging
 from pathlib import Path
 import re
-from pymilvus import connections, utility
+import hashlib
+import threading
+from contextlib import ExitStack
+from collections import defaultdict
+from pymilvus import utility
 from pymilvus import Collection, DataType, FieldSchema, CollectionSchema
-from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG  # 更新导入
+from utils.config import VectorDBProvider, MILVUS_CONFIG, CHROMA_CONFIG, INDEXING_JOB_CONFIG, SHARD_CONFIG, DOC_STORE_CONFIG, NORMALIZATION_CONFIG  # 更新导入
+from services.catalog_service import collection_catalog
+from services.doc_store_service import chunk_text_store
+from services.lexical_index_service import lexical_index
+from utils.milvus_connection import milvus_connection, is_milvus_lite
+from utils.vector_math import normalize_vector
+from utils.sidecar_client import sidecar_enabled, get_sidecar_client
 
 logger = logging.getLogger(__name__)
 
@@ -69,10 +79,62 @@ class VectorDBConfig:
         """
         return self._config["index_params"].get(self.index_mode, {})
 
+class IndexingCancelled(Exception):
+    """
+    索引任务被取消
+    """
+    pass
+
+
+class IndexingProgress:
+    """
+    索引进度跟踪：按批次汇报已写入的块数量，并在批次之间检查取消请求
+    """
+    def __init__(self, total: int, callback: Callable[[int, int], None] = None,
+                 cancel_event: threading.Event = None):
+        """
+        初始化进度跟踪
+
+        参数:
+            total: 需要处理的块总数
+            callback: 进度回调，参数为(已处理数量, 总数)
+            cancel_event: 取消事件，被设置后在下一个批次前停止
+        """
+        self.total = total
+        self.processed = 0
+        self.callback = callback
+        self.cancel_event = cancel_event
+
+    def check_cancelled(self):
+        """
+        检查是否已请求取消
+
+        Raises:
+            IndexingCancelled: 已请求取消
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise IndexingCancelled()
+
+    def advance(self, count: int):
+        """
+        记录新处理的块并汇报进度
+
+        参数:
+            count: 新处理的块数量
+        """
+        self.processed += count
+        if self.callback:
+            self.callback(min(self.processed, self.total), self.total)
+
+
 class VectorStoreService:
     """
     向量存储服务类，提供向量数据的索引、查询和管理功能
     """
+    # 精简schema下移出向量库的字段：块级字段存入块文本存储，集合级字段在集合目录中只记录一份
+    CHUNK_TEXT_FIELDS = ("content", "embedding_timestamp")
+    COLLECTION_LEVEL_FIELDS = ("embedding_provider", "embedding_model")
+
     def __init__(self):
         """
         初始化向量存储服务
@@ -189,8 +251,7 @@ class VectorStoreService:
         返回:
             是否为Milvus Lite模式
         """
-        # Milvus Lite使用本地文件路径或sqlite://格式
-        return uri.endswith('.db') or 'sqlite://' in uri or not uri.startswith('http')
+        return is_milvus_lite(uri)
     
     def _get_compatible_index_type(self, config: VectorDBConfig) -> str:
         """
@@ -248,23 +309,56 @@ class VectorStoreService:
         if actual_index_type == "FLAT":
             return {}
         elif actual_index_type == "HNSW":
-            return {
-                "M": 16,
-                "efConstruction": 200
-            }
+            # 优先使用配置中的HNSW参数，缺失时使用默认值
+            params = {"M": 16, "efConstruction": 200}
+            params.update({k: v for k, v in config.get_index_params().items() if k in ("M", "efConstruction")})
+            return params
         elif actual_index_type == "AUTOINDEX":
             return {}
         else:
             # 降级情况，使用安全的默认参数
             return config.get_index_params()
-    
-    def index_embeddings(self, embedding_file: str, config: VectorDBConfig) -> Dict[str, Any]:
+
+    def _get_chroma_collection_metadata(self, config: VectorDBConfig) -> Dict[str, Any]:
+        """
+        根据配置生成Chroma集合的HNSW元数据（距离度量和索引参数）
+
+        参数:
+            config: 向量数据库配置对象
+
+        返回:
+            Chroma集合元数据字典
+        """
+        metadata = {"hnsw:space": "ip" if NORMALIZATION_CONFIG["normalize_vectors"] else "cosine"}
+        params = config.get_index_params()
+        if "M" in params:
+            metadata["hnsw:M"] = int(params["M"])
+        if "efConstruction" in params:
+            metadata["hnsw:construction_ef"] = int(params["efConstruction"])
+        if "efSearch" in params:
+            metadata["hnsw:search_ef"] = int(params["efSearch"])
+        return metadata
+
+    def index_embeddings(self, embedding_file: str, config: VectorDBConfig, tags: List[str] = None,
+                         collection_name: str = None, upsert: bool = False,
+                         progress_callback: Callable[[int, int], None] = None,
+                         cancel_event: threading.Event = None, shards: int = None) -> Dict[str, Any]:
         """
         将嵌入向量索引到向量数据库
         
         参数:
             embedding_file: 嵌入向量文件路径
             config: 向量数据库配置对象
+            tags: 集合标签，写入集合目录，用于多集合搜索时按标签选择集合
+            collection_name: 目标集合名称；指定时文档写入该集合中属于它的分区，
+                为None时为该文档新建集合
+            upsert: 增量模式，按稳定块ID与集合中已有的数据比较，只插入新增块、更新变化块、
+                删除已移除的块；未指定集合名称时使用不带时间戳的 {文件名}_{provider} 集合
+            progress_callback: 进度回调，每写完一批块调用一次，参数为(已处理块数, 总块数)
+            cancel_event: 取消事件，被设置后在当前批次写完时停止并抛出IndexingCancelled；
+                新建的集合会被删除，增量写入已完成的批次会保留，重新执行即可收敛
+            shards: 分片数（仅Milvus），指定时集合拆分为多个独立的Milvus Lite数据文件，
+                按块ID哈希分配；写入已有分片集合时须与其分片数一致
             
         返回:
             索引结果信息字典
@@ -272,6 +366,21 @@ class VectorStoreService:
         start_time = datetime.now()
         result = {"index_size": 0, "collection_name": ""}
         
+        if config.provider == VectorDBProvider.MILVUS.value and sidecar_enabled():
+            # 由独占Milvus数据文件的sidecar进程执行写入，进度只在完成时汇报
+            if cancel_event is not None and cancel_event.is_set():
+                raise IndexingCancelled()
+            logger.info(f"Forwarding indexing of {embedding_file} to vector store sidecar")
+            response = get_sidecar_client().call(
+                "index",
+                embedding_file=os.path.abspath(embedding_file),
+                index_mode=config.index_mode,
+                options={"tags": tags, "collection_name": collection_name, "upsert": upsert, "shards": shards}
+            )
+            if progress_callback:
+                progress_callback(response.get("total_vectors", 0), response.get("total_vectors", 0))
+            return response
+        
         try:
             logger.info(f"Starting indexing process for file: {embedding_file}")
             logger.info(f"Vector DB: {config.provider}, Index Mode: {config.index_mode}")
@@ -282,20 +391,68 @@ class VectorStoreService:
             # 读取embedding文件
             embeddings_data = self._load_embeddings(embedding_file)
             logger.info(f"Successfully loaded embeddings data with {len(embeddings_data.get('embeddings', []))} vectors")
+            normalized = NORMALIZATION_CONFIG["normalize_vectors"]
+            if normalized:
+                self._normalize_embeddings(embeddings_data)
+            progress = IndexingProgress(len(embeddings_data.get("embeddings", [])), progress_callback, cancel_event)
+            progress.check_cancelled()
             
             # 根据不同的数据库进行索引
-            if config.provider == VectorDBProvider.MILVUS.value:
-                result = self._index_to_milvus(embeddings_data, config)
+            existing_shards = collection_catalog.get(config.provider, collection_name).get("shards") if collection_name else None
+            if shards or existing_shards:
+                if config.provider != VectorDBProvider.MILVUS.value:
+                    raise ValueError("Sharded collections are only supported for Milvus")
+                result = self._index_to_milvus_shards(
+                    embeddings_data, config, collection_name, shards, upsert=upsert, progress=progress
+                )
+            elif config.provider == VectorDBProvider.MILVUS.value:
+                result = self._index_to_milvus(embeddings_data, config, collection_name, upsert=upsert, progress=progress)
             elif config.provider == VectorDBProvider.CHROMA.value:
                 try:
                     import chromadb
                 except ImportError:
                     raise ImportError("chromadb package is not installed. Please install it with 'pip install chromadb'")
                 
-                result = self._index_to_chroma(embeddings_data, config)
+                result = self._index_to_chroma(embeddings_data, config, collection_name, upsert=upsert, progress=progress)
             else:
                 raise ValueError(f"Unsupported vector database provider: {config.provider}")
             
+            # 在集合目录中登记集合，分区模式下同时记录文档到分区的映射
+            catalog_fields = {"document_name": embeddings_data.get("filename", "")}
+            entry = collection_catalog.get(config.provider, result.get("collection_name", ""))
+            if tags is not None or not entry:
+                catalog_fields["tags"] = list(tags or [])
+            if result.get("partition_name"):
+                partitions = dict(entry.get("partitions", {}))
+                partitions[embeddings_data.get("filename", "")] = result["partition_name"]
+                catalog_fields["partitions"] = partitions
+                # 写入后分区已重新加载，不再记为已释放
+                released = entry.get("released_partitions", [])
+                if result["partition_name"] in released:
+                    catalog_fields["released_partitions"] = [p for p in released if p != result["partition_name"]]
+            if result.get("shards"):
+                catalog_fields["shards"] = result["shards"]
+            if result.get("metric"):
+                catalog_fields["metric"] = result["metric"]
+            # 缓存集合的嵌入配置，搜索时不再从集合中取样；写入前已有其他模型数据的集合保留原有配置
+            embedding = self._embedding_config_of(embeddings_data)
+            existing_embedding = entry.get("embedding")
+            if result.get("was_empty", False) or not existing_embedding or self._same_embedding_model(existing_embedding, embedding):
+                catalog_fields["embedding"] = embedding
+            else:
+                logger.warning(
+                    f"Collection {result.get('collection_name', '')} already holds {existing_embedding.get('embedding_model')} "
+                    f"vectors; keeping its cached embedding config"
+                )
+            # 集合中的向量全部经过归一化时才标记，写入前已有未归一化数据的集合保持未归一化
+            catalog_fields["normalized"] = normalized and (result.get("was_empty", False) or entry.get("normalized", False))
+            collection_catalog.update(config.provider, result.get("collection_name", ""), **catalog_fields)
+            collection_catalog.bump_version(config.provider, result.get("collection_name", ""))
+            
+            # 为文档建立BM25倒排索引段，供混合检索使用
+            self._index_lexical(config.provider, result.get("collection_name", ""), embeddings_data,
+                                replace=result.get("was_empty", False))
+            
             end_time = datetime.now()
             processing_time = (end_time - start_time).total_seconds()
             
@@ -305,16 +462,80 @@ class VectorStoreService:
                 "total_vectors": len(embeddings_data["embeddings"]),
                 "index_size": result.get("index_size", 0),
                 "processing_time": processing_time,
-                "collection_name": result.get("collection_name", "")
+                "collection_name": result.get("collection_name", ""),
+                "partition_name": result.get("partition_name")
             }
+            if upsert:
+                response["changes"] = result.get("changes", {})
             
             logger.info(f"Indexing completed successfully: {response}")
             return response
             
+        except IndexingCancelled:
+            logger.info(f"Indexing of {embedding_file} cancelled")
+            raise
         except Exception as e:
             logger.error(f"Error in index_embeddings: {str(e)}", exc_info=True)
             raise
 
+    def _index_lexical(self, provider: str, collection_name: str, embeddings_data: Dict[str, Any], replace: bool = False):
+        """
+        为本次写入的文档建立（或替换）词法索引段；行ID与向量库中的稳定块ID一致
+        
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            embeddings_data: 嵌入向量数据
+            replace: 集合写入前为空时先清除同名集合残留的索引
+        """
+        if replace:
+            lexical_index.drop(provider, collection_name)
+        filename = embeddings_data.get("filename", "")
+        contents = [str(emb["metadata"].get("content", "")) for emb in embeddings_data.get("embeddings", [])]
+        rows = [
+            {
+                "row_id": row_id,
+                "content": content,
+                "chunk_id": int(emb["metadata"].get("chunk_id", 0)),
+                "total_chunks": int(emb["metadata"].get("total_chunks", 0)),
+                "word_count": int(emb["metadata"].get("word_count", 0)),
+                "page_number": str(emb["metadata"].get("page_number", 0)),
+                "page_range": str(emb["metadata"].get("page_range", "")),
+                "embedding_timestamp": str(emb["metadata"].get("embedding_timestamp", ""))
+            }
+            for emb, content, row_id in zip(
+                embeddings_data.get("embeddings", []), contents, self._stable_chunk_ids(filename, contents)
+            )
+        ]
+        lexical_index.index_document(
+            provider, collection_name, filename, rows,
+            embedding={
+                "embedding_provider": embeddings_data.get("embedding_provider", ""),
+                "embedding_model": embeddings_data.get("embedding_model", "")
+            },
+            # 精简集合的块文本已在块文本存储中
+            store_text=not chunk_text_store.exists(provider, collection_name)
+        )
+
+    def _normalize_embeddings(self, embeddings_data: Dict[str, Any]):
+        """
+        把嵌入数据中的向量原地归一化为单位长度，之后可以用内积代替余弦相似度
+        
+        参数:
+            embeddings_data: 嵌入向量数据
+        """
+        for emb in embeddings_data.get("embeddings", []):
+            emb["embedding"] = normalize_vector(emb.get("embedding", []))
+
+    def _default_milvus_metric(self) -> str:
+        """
+        新建Milvus集合使用的度量：向量已归一化时使用内积
+        
+        返回:
+            度量类型
+        """
+        return "IP" if NORMALIZATION_CONFIG["normalize_vectors"] else "COSINE"
+
     def _load_embeddings(self, file_path: str) -> Dict[str, Any]:
         """
         加载embedding文件，返回配置信息和embeddings
@@ -341,13 +562,20 @@ class VectorStoreService:
             logger.error(f"Error loading embeddings from {file_path}: {str(e)}")
             raise
     
-    def _index_to_milvus(self, embeddings_data: Dict[str, Any], config: VectorDBConfig) -> Dict[str, Any]:
+    def _index_to_milvus(self, embeddings_data: Dict[str, Any], config: VectorDBConfig,
+                         collection_name: str = None, upsert: bool = False,
+                         progress: Optional[IndexingProgress] = None) -> Dict[str, Any]:
         """
         将嵌入向量索引到Milvus数据库
         
         参数:
             embeddings_data: 嵌入向量数据
             config: 向量数据库配置对象
+            collection_name: 目标集合名称；指定时将文档写入该集合中属于它的分区（Milvus Lite不支持分区，
+                与Chroma一样以document_name字段区分文档），集合不存在时自动创建；
+                为None时按 {文件名}_{provider}_{时间戳} 新建集合
+            upsert: 增量模式，只写入与集合中已有数据相比发生变化的块
+            progress: 进度跟踪，为None时不汇报进度
             
         返回:
             索引结果信息字典
@@ -355,149 +583,863 @@ class VectorStoreService:
         try:
             # 使用 filename 作为 collection 名称前缀
             filename = embeddings_data.get("filename", "")
-            # 如果有 .pdf 后缀，移除它
-            base_name = filename.replace('.pdf', '') if filename else "doc"
-            
-            # 清理集合名称，明确指定为Milvus提供商
-            base_name = self._sanitize_collection_name(base_name, for_provider=VectorDBProvider.MILVUS.value)
+            progress = progress or IndexingProgress(len(embeddings_data.get("embeddings", [])))
             
-            # 获取embedding provider
-            embedding_provider = embeddings_data.get("embedding_provider", "unknown")
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            collection_name = f"{base_name}_{embedding_provider}_{timestamp}"
-            
-            # 再次确保最终的集合名称符合Milvus的要求
-            collection_name = self._sanitize_collection_name(collection_name, for_provider=VectorDBProvider.MILVUS.value)
+            # 指定目标集合时，每个文档写入自己的分区；Milvus Lite上分区只记录在集合目录中
+            use_partitions = bool(collection_name)
+            native_partitions = use_partitions and not self._is_milvus_lite(config.uri)
+            if use_partitions:
+                collection_name = self._sanitize_collection_name(collection_name, for_provider=VectorDBProvider.MILVUS.value)
+            else:
+                # 如果有 .pdf 后缀，移除它
+                base_name = filename.replace('.pdf', '') if filename else "doc"
+                
+                # 清理集合名称，明确指定为Milvus提供商
+                base_name = self._sanitize_collection_name(base_name, for_provider=VectorDBProvider.MILVUS.value)
+                
+                # 获取embedding provider
+                embedding_provider = embeddings_data.get("embedding_provider", "unknown")
+                if upsert:
+                    # 增量模式使用长期存在的集合，不带时间戳
+                    collection_name = f"{base_name}_{embedding_provider}"
+                else:
+                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+                    collection_name = f"{base_name}_{embedding_provider}_{timestamp}"
+                
+                # 再次确保最终的集合名称符合Milvus的要求
+                collection_name = self._sanitize_collection_name(collection_name, for_provider=VectorDBProvider.MILVUS.value)
             
             logger.info(f"Final Milvus collection name: {collection_name}")
             
-            # 连接到Milvus
-            logger.info(f"Connecting to Milvus with URI: {config.uri}")
-            connections.connect(
-                alias="default",
-                uri=config.uri,
-                timeout=30  # 增加超时时间
-            )
-            
             # 从顶层配置获取向量维度
             vector_dim = int(embeddings_data.get("vector_dimension"))
             if not vector_dim:
                 raise ValueError("Missing vector_dimension in embedding file")
             
-            logger.info(f"Creating collection with dimension: {vector_dim}")
-            
-            # 定义字段
-            fields = [
-                {"name": "id", "dtype": "INT64", "is_primary": True, "auto_id": True},
-                {"name": "content", "dtype": "VARCHAR", "max_length": 5000},
-                {"name": "document_name", "dtype": "VARCHAR", "max_length": 255},
-                {"name": "chunk_id", "dtype": "INT64"},
-                {"name": "total_chunks", "dtype": "INT64"},
-                {"name": "word_count", "dtype": "INT64"},
-                {"name": "page_number", "dtype": "VARCHAR", "max_length": 10},
-                {"name": "page_range", "dtype": "VARCHAR", "max_length": 10},
-                # {"name": "chunking_method", "dtype": "VARCHAR", "max_length": 50},
-                {"name": "embedding_provider", "dtype": "VARCHAR", "max_length": 50},
-                {"name": "embedding_model", "dtype": "VARCHAR", "max_length": 50},
-                {"name": "embedding_timestamp", "dtype": "VARCHAR", "max_length": 50},
-                {
-                    "name": "vector",
-                    "dtype": "FLOAT_VECTOR",
-                    "dim": vector_dim,
-                    "params": self._get_milvus_index_params(config)
-                }
-            ]
+            entities = self._prepare_milvus_entities(embeddings_data)
             
-            # 准备数据为列表格式
-            entities = []
-            for emb in embeddings_data["embeddings"]:
-                entity = {
-                    "content": str(emb["metadata"].get("content", "")),
-                    "document_name": embeddings_data.get("filename", ""),  # 使用 filename 而不是 document_name
-                    "chunk_id": int(emb["metadata"].get("chunk_id", 0)),
-                    "total_chunks": int(emb["metadata"].get("total_chunks", 0)),
-                    "word_count": int(emb["metadata"].get("word_count", 0)),
-                    "page_number": str(emb["metadata"].get("page_number", 0)),
-                    "page_range": str(emb["metadata"].get("page_range", "")),
-                    # "chunking_method": str(emb["metadata"].get("chunking_method", "")),
-                    "embedding_provider": embeddings_data.get("embedding_provider", ""),  # 从顶层配置获取
-                    "embedding_model": embeddings_data.get("embedding_model", ""),  # 从顶层配置获取
-                    "embedding_timestamp": str(emb["metadata"].get("embedding_timestamp", "")),
-                    "vector": [float(x) for x in emb.get("embedding", [])]
-                }
-                entities.append(entity)
-            
-            logger.info(f"Creating Milvus collection with sanitized name: {collection_name}")
-            
-            # 创建collection
-            # field_schemas = [
-            #     FieldSchema(name=field["name"], 
-            #                dtype=getattr(DataType, field["dtype"]),
-            #                is_primary="is_primary" in field and field["is_primary"],
-            #                auto_id="auto_id" in field and field["auto_id"],
-            #                max_length=field.get("max_length"),
-            #                dim=field.get("dim"),
-            #                params=field.get("params"))
-            #     for field in fields
-            # ]
-
-            field_schemas = []
-            for field in fields:
-                extra_params = {}
-                if field.get('max_length') is not None:
-                    extra_params['max_length'] = field['max_length']
-                if field.get('dim') is not None:
-                    extra_params['dim'] = field['dim']
-                if field.get('params') is not None:
-                    extra_params['params'] = field['params']
-                field_schema = FieldSchema(
-                    name=field["name"], 
-                    dtype=getattr(DataType, field["dtype"]),
-                    is_primary=field.get("is_primary", False),
-                    auto_id=field.get("auto_id", False),
-                    **extra_params
-                )
-                field_schemas.append(field_schema)
+            # 连接到Milvus
+            with milvus_connection(config.uri):
+                is_new_collection = not utility.has_collection(collection_name)
+                metric = None
+                if is_new_collection:
+                    collection = self._create_milvus_collection(collection_name, vector_dim, config)
+                    # 创建时即登记度量，搜索据此选择与索引一致的度量
+                    metric = self._default_milvus_metric()
+                    collection_catalog.update(VectorDBProvider.MILVUS.value, collection_name, metric=metric)
+                else:
+                    collection = Collection(collection_name)
+                    existing_dim = next(
+                        (f.params.get("dim") for f in collection.schema.fields if f.name == "vector"), None
+                    )
+                    if existing_dim and int(existing_dim) != vector_dim:
+                        raise ValueError(
+                            f"Dimension mismatch: collection {collection_name} has dimension {existing_dim}, "
+                            f"embeddings have dimension {vector_dim}"
+                        )
+                
+                # 早期集合使用自增主键，无法按稳定块ID比较
+                stable_ids = not collection.schema.auto_id
+                if upsert and not stable_ids:
+                    raise ValueError(
+                        f"Collection {collection_name} uses auto-generated ids and cannot be upserted; "
+                        f"re-index it into a new collection first"
+                    )
+                if not stable_ids:
+                    for entity in entities:
+                        entity.pop("id")
+                        entity.pop("row_hash")
+                
+                # 精简集合的块文本写入块文本存储，嵌入配置记录在集合目录中
+                slim = self._is_slim_milvus_collection(collection)
+                if slim:
+                    self._register_collection_embedding(VectorDBProvider.MILVUS.value, collection_name, embeddings_data)
+                
+                # 重新索引同一文档时替换该文档的分区（增量模式下保留分区，仅写入差异）
+                partition_name = self._document_partition_name(filename) if use_partitions else None
+                target_partition = partition_name if native_partitions else None
+                if use_partitions and not native_partitions and not is_new_collection and not upsert:
+                    logger.info(f"Replacing existing rows of {filename} in {collection_name}")
+                    expr = f"document_name == {json.dumps(filename, ensure_ascii=False)}"
+                    collection.load()
+                    if slim:
+                        self._forget_milvus_chunk_text(collection, expr)
+                    collection.delete(expr=expr)
+                if native_partitions:
+                    if collection.has_partition(partition_name) and not upsert:
+                        logger.info(f"Replacing existing partition {partition_name} of {collection_name}")
+                        if slim:
+                            self._forget_milvus_chunk_text(collection, "id >= 0", [partition_name])
+                        collection.partition(partition_name).release()
+                        collection.drop_partition(partition_name)
+                    if not collection.has_partition(partition_name):
+                        collection.create_partition(partition_name, description=f"Partition for {filename}")
+                
+                changes = None
+                try:
+                    if upsert and not is_new_collection:
+                        changes = self._upsert_milvus_rows(collection, entities, filename, target_partition, progress, slim=slim)
+                        index_size = changes["inserted"] + changes["updated"]
+                    else:
+                        # 分批插入数据，每批之间汇报进度并检查取消
+                        logger.info(f"Inserting {len(entities)} vectors" + (f" into partition {target_partition}" if target_partition else ""))
+                        index_size = self._write_in_batches(
+                            entities,
+                            lambda batch: collection.insert(self._milvus_rows(collection, batch, slim), partition_name=target_partition),
+                            progress
+                        )
+                        if upsert:
+                            changes = {"inserted": index_size, "updated": 0, "deleted": 0, "unchanged": 0}
+                except IndexingCancelled:
+                    if is_new_collection:
+                        logger.info(f"Dropping partially built collection {collection_name}")
+                        utility.drop_collection(collection_name)
+                        chunk_text_store.drop(VectorDBProvider.MILVUS.value, collection_name)
+                    raise
+                
+                # 创建索引
+                if is_new_collection:
+                    index_params = {
+                        "metric_type": metric,
+                        "index_type": self._get_milvus_index_type(config),
+                        "params": self._get_milvus_index_params(config)
+                    }
+                    collection.create_index(field_name="vector", index_params=index_params)
+                    self._create_milvus_scalar_indexes(collection)
+                
+                # 分区模式下只加载新写入的分区，其他文档的驻留状态保持不变
+                if native_partitions:
+                    collection.load(partition_names=[partition_name])
+                else:
+                    collection.load()
+            
+            return {
+                "index_size": index_size,
+                "collection_name": collection_name,
+                "partition_name": partition_name,
+                "changes": changes,
+                "metric": metric,
+                "was_empty": is_new_collection
+            }
+            
+        except Exception as e:
+            logger.error(f"Error indexing to Milvus: {str(e)}")
+            raise
 
-            schema = CollectionSchema(fields=field_schemas, description=f"Collection for {collection_name}")
-            collection = Collection(name=collection_name, schema=schema)
+    def _upsert_milvus_rows(self, collection: Collection, entities: List[Dict[str, Any]],
+                            document_name: str, partition_name: str = None,
+                            progress: Optional[IndexingProgress] = None, slim: bool = False) -> Dict[str, int]:
+        """
+        将文档的行数据与集合中已有的行按稳定块ID比较，批量写入差异
+        
+        参数:
+            collection: 目标集合（需使用稳定主键）
+            entities: 带id和row_hash的行数据
+            document_name: 文档名称，用于限定比较范围
+            partition_name: 文档所在分区，为None时在整个集合中按文档名查找
+            progress: 进度跟踪
+            slim: 集合是否使用精简schema，是则同步更新块文本存储
             
-            # 插入数据
-            logger.info(f"Inserting {len(entities)} vectors")
-            insert_result = collection.insert(entities)
+        返回:
+            插入、更新、删除和未变化的行数统计
+        """
+        progress = progress or IndexingProgress(len(entities))
+        partition_names = [partition_name] if partition_name else None
+        collection.load(partition_names=partition_names)
+        
+        # 读取该文档已有行的ID和内容摘要
+        existing = {}
+        iterator = collection.query_iterator(
+            batch_size=1000,
+            expr=f"document_name == {json.dumps(document_name, ensure_ascii=False)}",
+            output_fields=["id", "row_hash"],
+            partition_names=partition_names
+        )
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            existing.update((row["id"], row["row_hash"]) for row in batch)
+        iterator.close()
+        
+        new_rows = [e for e in entities if e["id"] not in existing]
+        changed_rows = [e for e in entities if e["id"] in existing and existing[e["id"]] != e["row_hash"]]
+        incoming_ids = {e["id"] for e in entities}
+        removed_ids = [row_id for row_id in existing if row_id not in incoming_ids]
+        
+        # 未变化的块直接计入进度，删除的块计入总数
+        progress.total = len(entities) + len(removed_ids)
+        progress.advance(len(entities) - len(new_rows) - len(changed_rows))
+        def delete_batch(batch):
+            collection.delete(expr=f"id in {batch}", partition_name=partition_name)
+            if slim:
+                chunk_text_store.delete(VectorDBProvider.MILVUS.value, collection.name, batch)
+        
+        self._write_in_batches(
+            new_rows, lambda batch: collection.insert(self._milvus_rows(collection, batch, slim), partition_name=partition_name),
+            progress
+        )
+        self._write_in_batches(
+            changed_rows, lambda batch: collection.upsert(self._milvus_rows(collection, batch, slim), partition_name=partition_name),
+            progress
+        )
+        self._write_in_batches(removed_ids, delete_batch, progress)
+        
+        changes = {
+            "inserted": len(new_rows),
+            "updated": len(changed_rows),
+            "deleted": len(removed_ids),
+            "unchanged": len(entities) - len(new_rows) - len(changed_rows)
+        }
+        logger.info(f"Upserted {document_name} into {collection.name}: {changes}")
+        return changes
+
+    def _write_in_batches(self, rows: List[Any], write_batch: Callable[[List[Any]], Any],
+                          progress: IndexingProgress) -> int:
+        """
+        分批写入数据，每批写入前检查取消请求，写入后汇报进度
+        
+        参数:
+            rows: 待写入的数据
+            write_batch: 写入一批数据的函数
+            progress: 进度跟踪
             
-            # 创建索引
-            index_params = {
-                "metric_type": "COSINE",
-                "index_type": self._get_milvus_index_type(config),
+        返回:
+            写入的数据条数
+        """
+        batch_size = INDEXING_JOB_CONFIG["batch_size"]
+        for start in range(0, len(rows), batch_size):
+            progress.check_cancelled()
+            batch = rows[start:start + batch_size]
+            write_batch(batch)
+            progress.advance(len(batch))
+        return len(rows)
+
+    def _prepare_milvus_entities(self, embeddings_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        将嵌入数据转换为Milvus行数据，并为每行分配稳定块ID和内容摘要
+        
+        参数:
+            embeddings_data: 嵌入向量数据
+            
+        返回:
+            行数据列表
+        """
+        entities = []
+        for emb in embeddings_data["embeddings"]:
+            entity = {
+                "id": 0,
+                "row_hash": "",
+                "content": str(emb["metadata"].get("content", "")),
+                "document_name": embeddings_data.get("filename", ""),  # 使用 filename 而不是 document_name
+                "chunk_id": int(emb["metadata"].get("chunk_id", 0)),
+                "total_chunks": int(emb["metadata"].get("total_chunks", 0)),
+                "word_count": int(emb["metadata"].get("word_count", 0)),
+                "page_number": str(emb["metadata"].get("page_number", 0)),
+                "page_range": str(emb["metadata"].get("page_range", "")),
+                # "chunking_method": str(emb["metadata"].get("chunking_method", "")),
+                "embedding_provider": embeddings_data.get("embedding_provider", ""),  # 从顶层配置获取
+                "embedding_model": embeddings_data.get("embedding_model", ""),  # 从顶层配置获取
+                "embedding_timestamp": str(emb["metadata"].get("embedding_timestamp", "")),
+                "vector": [float(x) for x in emb.get("embedding", [])]
+            }
+            entities.append(entity)
+        
+        chunk_ids = self._stable_chunk_ids(embeddings_data.get("filename", ""), [e["content"] for e in entities])
+        for entity, chunk_id in zip(entities, chunk_ids):
+            entity["id"] = chunk_id
+            entity["row_hash"] = self._row_hash(entity)
+        return entities
+
+    def _stable_chunk_ids(self, source: str, contents: List[str]) -> List[int]:
+        """
+        根据来源文档和块内容生成稳定的块ID，相同内容重复出现时以出现序号区分
+        
+        参数:
+            source: 来源文档名称
+            contents: 块内容列表
+            
+        返回:
+            非负的64位整数ID列表
+        """
+        seen = {}
+        chunk_ids = []
+        for content in contents:
+            occurrence = seen.get(content, 0)
+            seen[content] = occurrence + 1
+            digest = hashlib.sha1(f"{source}\x00{content}\x00{occurrence}".encode("utf-8")).hexdigest()
+            # 取60位，保证落在INT64正数范围内
+            chunk_ids.append(int(digest[:15], 16))
+        return chunk_ids
+
+    def _row_hash(self, row: Dict[str, Any]) -> str:
+        """
+        计算行内容摘要，用于判断已有块是否需要更新（忽略每次嵌入都会变化的时间戳）；
+        块序号和总块数不参与摘要，否则插入或删除一个块会使文档中其后所有的块都被重写，
+        未变化的块保留写入时的序号，词法索引的段随每次写入整体替换，其中的序号始终是最新的
+        
+        参数:
+            row: 行数据
+            
+        返回:
+            16位十六进制摘要
+        """
+        ignored = {"id", "row_hash", "vector", "embedding_timestamp", "chunk_id", "total_chunks"}
+        payload = json.dumps({k: v for k, v in row.items() if k not in ignored}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _is_slim_milvus_collection(self, collection: Collection) -> bool:
+        """
+        集合是否使用精简schema（块文本不在向量库中）
+        
+        参数:
+            collection: Milvus集合
+            
+        返回:
+            是否为精简集合
+        """
+        return "content" not in {f.name for f in collection.schema.fields}
+
+    def _milvus_rows(self, collection: Collection, rows: List[Dict[str, Any]], slim: bool) -> List[Dict[str, Any]]:
+        """
+        准备写入Milvus的一批行：精简集合先把块级字段写入块文本存储，再去掉块级和集合级字段
+        
+        参数:
+            collection: 目标集合
+            rows: 完整的行数据
+            slim: 集合是否使用精简schema
+            
+        返回:
+            可直接写入集合的行数据
+        """
+        if not slim:
+            return rows
+        chunk_text_store.put(
+            VectorDBProvider.MILVUS.value, collection.name,
+            {row["id"]: {field: row.get(field, "") for field in self.CHUNK_TEXT_FIELDS} for row in rows}
+        )
+        dropped = set(self.CHUNK_TEXT_FIELDS + self.COLLECTION_LEVEL_FIELDS)
+        return [{k: v for k, v in row.items() if k not in dropped} for row in rows]
+
+    def _forget_milvus_chunk_text(self, collection: Collection, expr: str, partition_names: List[str] = None):
+        """
+        从块文本存储中删除即将从精简集合中删除的行
+        
+        参数:
+            collection: Milvus集合
+            expr: 待删除行的过滤表达式
+            partition_names: 限定的分区
+        """
+        collection.load(partition_names=partition_names)
+        iterator = collection.query_iterator(
+            batch_size=INDEXING_JOB_CONFIG["batch_size"],
+            expr=expr,
+            output_fields=["id"],
+            partition_names=partition_names
+        )
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            chunk_text_store.delete(VectorDBProvider.MILVUS.value, collection.name, [row["id"] for row in batch])
+        iterator.close()
+
+    @staticmethod
+    def _embedding_config_of(embeddings_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        从嵌入向量数据中取出集合级的嵌入配置，搜索时据此创建查询向量而无需从集合中取样
+        
+        参数:
+            embeddings_data: 嵌入向量数据
+            
+        返回:
+            包含embedding_provider、embedding_model和vector_dimension的字典
+        """
+        vector_dim = embeddings_data.get("vector_dimension")
+        return {
+            "embedding_provider": embeddings_data.get("embedding_provider", ""),
+            "embedding_model": embeddings_data.get("embedding_model", ""),
+            "vector_dimension": int(vector_dim) if vector_dim else None
+        }
+
+    @staticmethod
+    def _same_embedding_model(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        """
+        两份嵌入配置是否为同一提供商的同一模型
+        """
+        return (a.get("embedding_provider"), a.get("embedding_model")) == (b.get("embedding_provider"), b.get("embedding_model"))
+
+    def _register_collection_embedding(self, provider: str, collection_name: str, embeddings_data: Dict[str, Any]):
+        """
+        在集合目录中记录精简集合的嵌入配置，同一集合只能写入同一嵌入模型的向量
+        
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            embeddings_data: 嵌入向量数据
+            
+        Raises:
+            ValueError: 集合已记录的嵌入配置与本次写入的不一致
+        """
+        embedding = self._embedding_config_of(embeddings_data)
+        existing = collection_catalog.get(provider, collection_name).get("embedding")
+        if existing and not self._same_embedding_model(existing, embedding):
+            raise ValueError(
+                f"Embedding mismatch: collection {collection_name} holds {existing['embedding_provider']}/"
+                f"{existing['embedding_model']} vectors, got {embedding['embedding_provider']}/{embedding['embedding_model']}"
+            )
+        if not existing:
+            # 写入数据前登记，搜索读到新行时即可取得嵌入配置
+            collection_catalog.update(provider, collection_name, embedding=embedding)
+
+    def _create_milvus_collection(self, collection_name: str, vector_dim: int, config: VectorDBConfig,
+                                  using: str = "default", slim: bool = None) -> Collection:
+        """
+        按标准schema创建Milvus集合
+        
+        参数:
+            collection_name: 集合名称
+            vector_dim: 向量维度
+            config: 向量数据库配置对象
+            using: 连接别名，分片集合使用各分片的连接
+            slim: 是否使用精简schema（不含块文本和每行的嵌入配置），默认按DOC_STORE_CONFIG
+            
+        返回:
+            新建的集合
+        """
+        if slim is None:
+            slim = DOC_STORE_CONFIG["slim_schema"]
+        logger.info(f"Creating collection with dimension: {vector_dim}")
+        
+        # 定义字段
+        fields = [
+            # 主键为稳定块ID（来源+内容摘要），支持增量更新
+            {"name": "id", "dtype": "INT64", "is_primary": True, "auto_id": False},
+            {"name": "row_hash", "dtype": "VARCHAR", "max_length": 16},
+            {"name": "content", "dtype": "VARCHAR", "max_length": 5000},
+            {"name": "document_name", "dtype": "VARCHAR", "max_length": 255},
+            {"name": "chunk_id", "dtype": "INT64"},
+            {"name": "total_chunks", "dtype": "INT64"},
+            {"name": "word_count", "dtype": "INT64"},
+            {"name": "page_number", "dtype": "VARCHAR", "max_length": 10},
+            {"name": "page_range", "dtype": "VARCHAR", "max_length": 10},
+            # {"name": "chunking_method", "dtype": "VARCHAR", "max_length": 50},
+            {"name": "embedding_provider", "dtype": "VARCHAR", "max_length": 50},
+            {"name": "embedding_model", "dtype": "VARCHAR", "max_length": 50},
+            {"name": "embedding_timestamp", "dtype": "VARCHAR", "max_length": 50},
+            {
+                "name": "vector",
+                "dtype": "FLOAT_VECTOR",
+                "dim": vector_dim,
                 "params": self._get_milvus_index_params(config)
             }
-            collection.create_index(field_name="vector", index_params=index_params)
-            collection.load()
+        ]
+        
+        if slim:
+            dropped = set(self.CHUNK_TEXT_FIELDS + self.COLLECTION_LEVEL_FIELDS)
+            fields = [field for field in fields if field["name"] not in dropped]
+        
+        logger.info(f"Creating Milvus collection with sanitized name: {collection_name}")
+
+        field_schemas = []
+        for field in fields:
+            extra_params = {}
+            if field.get('max_length') is not None:
+                extra_params['max_length'] = field['max_length']
+            if field.get('dim') is not None:
+                extra_params['dim'] = field['dim']
+            if field.get('params') is not None:
+                extra_params['params'] = field['params']
+            field_schema = FieldSchema(
+                name=field["name"], 
+                dtype=getattr(DataType, field["dtype"]),
+                is_primary=field.get("is_primary", False),
+                auto_id=field.get("auto_id", False),
+                **extra_params
+            )
+            field_schemas.append(field_schema)
+
+        schema = CollectionSchema(fields=field_schemas, description=f"Collection for {collection_name}")
+        return Collection(name=collection_name, schema=schema, using=using)
+
+    def _shard_uri(self, collection_name: str, generation: int, shard: int) -> str:
+        """
+        获取分片数据文件的绝对路径
+        
+        参数:
+            collection_name: 集合名称
+            generation: 分片代数，每次重新分片后加一，避免新旧分片文件冲突
+            shard: 分片序号
             
-            return {
-                "index_size": len(insert_result.primary_keys),
-                "collection_name": collection_name
+        返回:
+            分片数据文件路径
+        """
+        uri = self._get_absolute_path(
+            SHARD_CONFIG["uri_template"].format(collection=collection_name, generation=generation, shard=shard)
+        )
+        os.makedirs(os.path.dirname(uri), exist_ok=True)
+        return uri
+
+    def shard_connection(self, collection_name: str, shard_info: Dict[str, Any], shard: int):
+        """
+        获取分片的共享连接，每个分片使用独立的连接别名
+        
+        参数:
+            collection_name: 集合名称
+            shard_info: 集合目录中的分片信息
+            shard: 分片序号
+            
+        返回:
+            连接上下文管理器，进入后得到连接别名
+        """
+        generation = shard_info.get("generation", 0)
+        return milvus_connection(
+            self._shard_uri(collection_name, generation, shard),
+            alias=f"shard_{collection_name}_g{generation}_{shard}"
+        )
+
+    def collection_connections(self, collection_name: str) -> List[Any]:
+        """
+        获取Milvus集合所在的全部连接：分片集合为各分片（含已释放的分片）的连接，否则为主数据文件的连接；
+        空分片中可能没有集合，调用方需先检查has_collection
+        
+        参数:
+            collection_name: 集合名称
+            
+        返回:
+            连接上下文管理器列表，进入后得到连接别名
+        """
+        shard_info = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_name).get("shards")
+        if not shard_info:
+            return [milvus_connection(MILVUS_CONFIG["uri"])]
+        return [self.shard_connection(collection_name, shard_info, shard) for shard in range(shard_info["count"])]
+
+    def _index_to_milvus_shards(self, embeddings_data: Dict[str, Any], config: VectorDBConfig,
+                                collection_name: str = None, num_shards: int = None, upsert: bool = False,
+                                progress: Optional[IndexingProgress] = None) -> Dict[str, Any]:
+        """
+        将嵌入向量按块ID哈希写入分片集合，每个分片是独立的Milvus Lite数据文件
+        
+        参数:
+            embeddings_data: 嵌入向量数据
+            config: 向量数据库配置对象
+            collection_name: 集合名称，为None时使用 {文件名}_{provider}
+            num_shards: 分片数，写入已有分片集合时可省略
+            upsert: 增量模式，只写入与分片中已有数据相比发生变化的块；
+                非增量模式下先删除该文档在各分片中的旧数据
+            progress: 进度跟踪
+            
+        返回:
+            索引结果信息字典，包含分片信息
+        """
+        filename = embeddings_data.get("filename", "")
+        progress = progress or IndexingProgress(len(embeddings_data.get("embeddings", [])))
+        if not collection_name:
+            base_name = filename.replace('.pdf', '') if filename else "doc"
+            collection_name = f"{base_name}_{embeddings_data.get('embedding_provider', 'unknown')}"
+        collection_name = self._sanitize_collection_name(collection_name, for_provider=VectorDBProvider.MILVUS.value)
+        
+        shard_info = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_name).get("shards")
+        is_new_collection = not shard_info
+        if shard_info:
+            if num_shards and int(num_shards) != shard_info["count"]:
+                raise ValueError(
+                    f"Collection {collection_name} has {shard_info['count']} shards; rebalance it before "
+                    f"writing with {num_shards} shards"
+                )
+        else:
+            if not num_shards or not 1 <= int(num_shards) <= SHARD_CONFIG["max_shards"]:
+                raise ValueError(f"shards must be between 1 and {SHARD_CONFIG['max_shards']}")
+            shard_info = {
+                "count": int(num_shards), "generation": 0, "index_mode": config.index_mode, "released": [],
+                "metric": self._default_milvus_metric()
             }
+        
+        vector_dim = int(embeddings_data.get("vector_dimension"))
+        # 所有分片共用一个查询向量搜索，集合只能包含同一嵌入模型的向量
+        self._register_collection_embedding(VectorDBProvider.MILVUS.value, collection_name, embeddings_data)
+        entities = self._prepare_milvus_entities(embeddings_data)
+        shard_rows = defaultdict(list)
+        for entity in entities:
+            shard_rows[entity["id"] % shard_info["count"]].append(entity)
+        
+        changes = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        # 每个分片都要处理：增量模式下文档在某个分片中可能只剩需要删除的旧块
+        for shard in range(shard_info["count"]):
+            rows = shard_rows.get(shard, [])
+            with self.shard_connection(collection_name, shard_info, shard) as alias:
+                shard_changes = self._write_milvus_shard(
+                    collection_name, alias, rows, vector_dim, config, filename, upsert, progress,
+                    metric=shard_info.get("metric", "COSINE")
+                )
+            for key in changes:
+                changes[key] += shard_changes.get(key, 0)
+        
+        logger.info(f"Indexed {filename} into {shard_info['count']} shards of {collection_name}: {changes}")
+        return {
+            "index_size": changes["inserted"] + changes["updated"],
+            "collection_name": collection_name,
+            "partition_name": None,
+            "changes": changes if upsert else None,
+            "shards": shard_info,
+            # 早期分片集合没有记录度量，均使用COSINE
+            "metric": shard_info.get("metric", "COSINE"),
+            "was_empty": is_new_collection
+        }
+
+    def _write_milvus_shard(self, collection_name: str, alias: str, rows: List[Dict[str, Any]], vector_dim: int,
+                            config: VectorDBConfig, document_name: str, upsert: bool,
+                            progress: IndexingProgress, metric: str = "COSINE") -> Dict[str, int]:
+        """
+        将一个文档落在某个分片中的行写入该分片
+        
+        返回:
+            插入、更新、删除和未变化的行数统计
+        """
+        is_new_collection = not utility.has_collection(collection_name, using=alias)
+        if is_new_collection:
+            if not rows:
+                return {}
+            collection = self._create_milvus_collection(collection_name, vector_dim, config, using=alias)
+        else:
+            collection = Collection(collection_name, using=alias)
+        
+        slim = self._is_slim_milvus_collection(collection)
+        if upsert and not is_new_collection:
+            sub_progress = IndexingProgress(len(rows), cancel_event=progress.cancel_event)
+            changes = self._upsert_milvus_rows(collection, rows, document_name, None, sub_progress, slim=slim)
+            progress.advance(len(rows))
+        else:
+            deleted = 0
+            if not is_new_collection:
+                collection.load()
+                expr = f"document_name == {json.dumps(document_name, ensure_ascii=False)}"
+                if slim:
+                    self._forget_milvus_chunk_text(collection, expr)
+                deleted = collection.delete(expr=expr).delete_count
+            self._write_in_batches(rows, lambda batch: collection.insert(self._milvus_rows(collection, batch, slim)), progress)
+            changes = {"inserted": len(rows), "updated": 0, "deleted": deleted, "unchanged": 0}
+        
+        if is_new_collection:
+            collection.create_index(field_name="vector", index_params={
+                "metric_type": metric,
+                "index_type": self._get_milvus_index_type(config),
+                "params": self._get_milvus_index_params(config)
+            })
+            self._create_milvus_scalar_indexes(collection)
+        collection.load()
+        return changes
+
+    def get_shard_info(self, collection_name: str) -> List[Dict[str, Any]]:
+        """
+        获取分片集合各分片的状态
+        
+        参数:
+            collection_name: 集合名称
             
-        except Exception as e:
-            logger.error(f"Error indexing to Milvus: {str(e)}")
-            raise
+        返回:
+            分片状态列表，包含数据文件、实体数量和是否参与搜索
+        """
+        shard_info = self._require_shard_info(collection_name)
+        shards = []
+        for shard in range(shard_info["count"]):
+            with self.shard_connection(collection_name, shard_info, shard) as alias:
+                exists = utility.has_collection(collection_name, using=alias)
+                shards.append({
+                    "shard": shard,
+                    "uri": self._shard_uri(collection_name, shard_info.get("generation", 0), shard),
+                    "num_entities": Collection(collection_name, using=alias).num_entities if exists else 0,
+                    "loaded": shard not in shard_info.get("released", [])
+                })
+        return shards
+
+    def set_shards_loaded(self, collection_name: str, shards: List[int], loaded: bool) -> Dict[str, Any]:
+        """
+        加载或释放分片；释放的分片不占用内存，搜索时会被跳过
+        
+        参数:
+            collection_name: 集合名称
+            shards: 分片序号列表
+            loaded: True为加载，False为释放
+            
+        返回:
+            更新后的分片信息
+        """
+        shard_info = self._require_shard_info(collection_name)
+        invalid = [s for s in shards if not 0 <= s < shard_info["count"]]
+        if invalid:
+            raise ValueError(f"Invalid shard ids: {invalid}")
+        
+        released = set(shard_info.get("released", []))
+        for shard in shards:
+            with self.shard_connection(collection_name, shard_info, shard) as alias:
+                if not utility.has_collection(collection_name, using=alias):
+                    continue
+                collection = Collection(collection_name, using=alias)
+                if loaded:
+                    collection.load()
+                    released.discard(shard)
+                else:
+                    collection.release()
+                    released.add(shard)
+        
+        shard_info = {**shard_info, "released": sorted(released)}
+        collection_catalog.update(VectorDBProvider.MILVUS.value, collection_name, shards=shard_info)
+        collection_catalog.bump_version(VectorDBProvider.MILVUS.value, collection_name)
+        return shard_info
+
+    def rebalance_shards(self, collection_name: str, num_shards: int) -> Dict[str, Any]:
+        """
+        重新分片：把所有行按新的分片数重新分配到新一代分片文件，完成后切换目录并删除旧分片
+        
+        参数:
+            collection_name: 集合名称
+            num_shards: 新的分片数
+            
+        返回:
+            新的分片信息和迁移的行数
+        """
+        if not 1 <= int(num_shards) <= SHARD_CONFIG["max_shards"]:
+            raise ValueError(f"shards must be between 1 and {SHARD_CONFIG['max_shards']}")
+        old_info = self._require_shard_info(collection_name)
+        new_info = {
+            "count": int(num_shards),
+            "generation": old_info.get("generation", 0) + 1,
+            "index_mode": old_info.get("index_mode", "hnsw"),
+            "released": [],
+            "metric": old_info.get("metric", "COSINE")
+        }
+        config = VectorDBConfig(provider=VectorDBProvider.MILVUS.value, index_mode=new_info["index_mode"])
+        
+        moved = 0
+        # 迁移期间保持所有新分片的连接，新分片集合在第一次写入时创建
+        with ExitStack() as stack:
+            new_aliases = [
+                stack.enter_context(self.shard_connection(collection_name, new_info, shard))
+                for shard in range(new_info["count"])
+            ]
+            targets = {}
+            for old_shard in range(old_info["count"]):
+                with self.shard_connection(collection_name, old_info, old_shard) as old_alias:
+                    if not utility.has_collection(collection_name, using=old_alias):
+                        continue
+                    collection = Collection(collection_name, using=old_alias)
+                    collection.load()
+                    vector_dim = next(int(f.params["dim"]) for f in collection.schema.fields if f.name == "vector")
+                    iterator = collection.query_iterator(
+                        batch_size=INDEXING_JOB_CONFIG["batch_size"],
+                        expr="id >= 0",
+                        output_fields=[f.name for f in collection.schema.fields]
+                    )
+                    while True:
+                        batch = iterator.next()
+                        if not batch:
+                            break
+                        shard_rows = defaultdict(list)
+                        for row in batch:
+                            shard_rows[row["id"] % new_info["count"]].append(row)
+                        for new_shard, rows in shard_rows.items():
+                            if new_shard not in targets:
+                                targets[new_shard] = self._create_milvus_collection(
+                                    collection_name, vector_dim, config, using=new_aliases[new_shard],
+                                    slim=self._is_slim_milvus_collection(collection)
+                                )
+                            targets[new_shard].insert(rows)
+                        moved += len(batch)
+                    iterator.close()
+            
+            for target in targets.values():
+                target.create_index(field_name="vector", index_params={
+                    "metric_type": new_info["metric"],
+                    "index_type": self._get_milvus_index_type(config),
+                    "params": self._get_milvus_index_params(config)
+                })
+                self._create_milvus_scalar_indexes(target)
+                target.load()
         
-        finally:
+        collection_catalog.update(VectorDBProvider.MILVUS.value, collection_name, shards=new_info)
+        collection_catalog.bump_version(VectorDBProvider.MILVUS.value, collection_name)
+        self._drop_shard_files(collection_name, old_info)
+        logger.info(f"Rebalanced {collection_name} from {old_info['count']} to {new_info['count']} shards ({moved} rows)")
+        return {"collection_name": collection_name, "shards": new_info, "moved_rows": moved}
+
+    def _drop_shard_files(self, collection_name: str, shard_info: Dict[str, Any]):
+        """
+        删除分片集合的所有分片及其数据文件
+        
+        参数:
+            collection_name: 集合名称
+            shard_info: 分片信息
+        """
+        for shard in range(shard_info["count"]):
+            with self.shard_connection(collection_name, shard_info, shard) as alias:
+                if utility.has_collection(collection_name, using=alias):
+                    utility.drop_collection(collection_name, using=alias)
+            uri = self._shard_uri(collection_name, shard_info.get("generation", 0), shard)
+            try:
+                os.remove(uri)
+            except OSError as e:
+                logger.warning(f"Could not remove shard file {uri}: {str(e)}")
+
+    def _require_shard_info(self, collection_name: str) -> Dict[str, Any]:
+        """
+        获取集合的分片信息
+
+        Raises:
+            ValueError: 集合不是分片集合
+        """
+        shard_info = collection_catalog.get(VectorDBProvider.MILVUS.value, collection_name).get("shards")
+        if not shard_info:
+            raise ValueError(f"Collection {collection_name} is not sharded")
+        return shard_info
+
+    def _document_partition_name(self, document_name: str) -> str:
+        """
+        根据文档名生成稳定的分区名称（Milvus分区名只允许字母、数字和下划线）
+        
+        参数:
+            document_name: 文档名称
+            
+        返回:
+            分区名称
+        """
+        digest = hashlib.sha1(document_name.encode("utf-8")).hexdigest()[:8]
+        readable = re.sub(r'[^a-zA-Z0-9_]', '_', document_name)
+        readable = re.sub(r'_+', '_', readable).strip('_')[:40]
+        return f"doc_{readable}_{digest}" if readable else f"doc_{digest}"
+
+    def _create_milvus_scalar_indexes(self, collection: Collection):
+        """
+        为过滤字段创建标量索引，使搜索时的过滤表达式无需逐行扫描
+        
+        参数:
+            collection: Milvus集合
+        """
+        for field_name, index_type in MILVUS_CONFIG.get("scalar_indexes", {}).items():
             try:
-                connections.disconnect("default")
-                logger.info("Successfully disconnected from Milvus")
+                collection.create_index(
+                    field_name=field_name,
+                    index_params={"index_type": index_type},
+                    index_name=f"{field_name}_idx"
+                )
+                logger.info(f"Created {index_type} scalar index on {field_name}")
             except Exception as e:
-                logger.error(f"Error disconnecting from Milvus: {str(e)}")
+                # 部分部署（如旧版Milvus Lite）不支持标量索引，退化为无索引过滤
+                logger.warning(f"Could not create scalar index on {field_name}: {str(e)}")
 
-    def _index_to_chroma(self, embeddings_data: Dict[str, Any], config: VectorDBConfig) -> Dict[str, Any]:
+    def _index_to_chroma(self, embeddings_data: Dict[str, Any], config: VectorDBConfig,
+                         collection_name: str = None, upsert: bool = False,
+                         progress: Optional[IndexingProgress] = None) -> Dict[str, Any]:
         """
         将嵌入向量索引到Chroma数据库
         
         参数:
             embeddings_data: 嵌入向量数据
             config: 向量数据库配置对象
+            collection_name: 目标集合名称；指定时文档写入该集合，以document_name元数据作为分片，
+                重新索引同一文档时替换其原有数据；为None时新建带时间戳的集合
+            upsert: 增量模式，只写入与集合中已有数据相比发生变化的块
+            progress: 进度跟踪，为None时不汇报进度
             
         返回:
             索引结果信息字典
@@ -505,6 +1447,7 @@ class VectorStoreService:
         try:
             # 使用 filename 作为 collection 名称前缀
             filename = embeddings_data.get("filename", "")
+            progress = progress or IndexingProgress(len(embeddings_data.get("embeddings", [])))
             base_name = filename.replace('.pdf', '') if filename else "doc"
             
             # 获取embedding provider
@@ -512,7 +1455,11 @@ class VectorStoreService:
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
             
             # 构建集合名称并使用Chroma特定的清理方法
-            raw_collection_name = f"{base_name}_{embedding_provider}_{timestamp}"
+            use_partitions = bool(collection_name)
+            if not collection_name and upsert:
+                # 增量模式使用长期存在的集合，不带时间戳
+                collection_name = f"{base_name}_{embedding_provider}"
+            raw_collection_name = collection_name or f"{base_name}_{embedding_provider}_{timestamp}"
             # 为Chroma特别处理集合名称
             collection_name = self._sanitize_chroma_collection_name(raw_collection_name)
             
@@ -541,30 +1488,57 @@ class VectorStoreService:
                 settings=Settings(anonymized_telemetry=False)
             )
             
-            # 检查是否已存在该集合，如果存在则删除（防止错误）
-            try:
-                existing_collections = client.list_collections()
-                existing_collection_names = [c.name for c in existing_collections]
+            collection_metadata = {
+                "description": f"Collection for {base_name}",
+                "document_name": embeddings_data.get("filename", ""),
+                "embedding_model": embeddings_data.get("embedding_model", ""),
+                "embedding_provider": embedding_provider,
+                "vector_dimension": embeddings_data.get("vector_dimension", 0),
+                "created_at": datetime.now().isoformat(),
+                # 只在新建集合时生效：块文本存入块文本存储，行元数据不含嵌入配置
+                "doc_store": DOC_STORE_CONFIG["slim_schema"],
+                **self._get_chroma_collection_metadata(config)
+            }
+            
+            is_new_collection = not (use_partitions or upsert)
+            if not is_new_collection:
+                # 共享集合：复用已有集合，非增量模式下删除该文档此前写入的数据
+                collection = client.get_or_create_collection(name=collection_name, metadata=collection_metadata)
+                existing_dim = (collection.metadata or {}).get("vector_dimension")
+                if existing_dim and int(existing_dim) != int(embeddings_data.get("vector_dimension", 0)):
+                    raise ValueError(
+                        f"Dimension mismatch: collection {collection_name} has dimension {existing_dim}, "
+                        f"embeddings have dimension {embeddings_data.get('vector_dimension')}"
+                    )
+                if not upsert:
+                    if (collection.metadata or {}).get("doc_store"):
+                        stale_ids = collection.get(where={"document_name": filename}, include=[])["ids"]
+                        chunk_text_store.delete(VectorDBProvider.CHROMA.value, collection_name, stale_ids)
+                    collection.delete(where={"document_name": filename})
+            else:
+                # 检查是否已存在该集合，如果存在则删除（防止错误）
+                try:
+                    existing_collections = client.list_collections()
+                    existing_collection_names = [c.name for c in existing_collections]
                 
-                if collection_name in existing_collection_names:
-                    logger.warning(f"Collection {collection_name} already exists, deleting it")
-                    client.delete_collection(collection_name)
-            except Exception as e:
-                logger.warning(f"Error checking existing collections: {str(e)}")
-            
-            # 创建集合
-            logger.info(f"Creating Chroma collection: {collection_name}")
-            collection = client.create_collection(
-                name=collection_name,
-                metadata={
-                    "description": f"Collection for {base_name}",
-                    "document_name": embeddings_data.get("filename", ""),
-                    "embedding_model": embeddings_data.get("embedding_model", ""),
-                    "embedding_provider": embedding_provider,
-                    "vector_dimension": embeddings_data.get("vector_dimension", 0),
-                    "created_at": datetime.now().isoformat()
-                }
-            )
+                    if collection_name in existing_collection_names:
+                        logger.warning(f"Collection {collection_name} already exists, deleting it")
+                        client.delete_collection(collection_name)
+                except Exception as e:
+                    logger.warning(f"Error checking existing collections: {str(e)}")
+            
+                # 创建集合
+                logger.info(f"Creating Chroma collection: {collection_name}")
+                collection = client.create_collection(
+                    name=collection_name,
+                    metadata=collection_metadata
+                )
+            
+            # 写入前集合为空时，集合中的向量全部来自本次写入
+            was_empty = is_new_collection or collection.count() == 0
+            slim = bool((collection.metadata or {}).get("doc_store"))
+            if slim:
+                self._register_collection_embedding(VectorDBProvider.CHROMA.value, collection_name, embeddings_data)
             
             # 准备数据
             ids = []
@@ -574,10 +1548,6 @@ class VectorStoreService:
             
             # 处理嵌入向量
             for i, emb in enumerate(embeddings_data["embeddings"]):
-                # 准备ID - 确保ID是字符串且格式正确
-                entry_id = f"doc_{i+1:05d}"
-                ids.append(entry_id)
-                
                 # 准备向量
                 embedding = [float(x) for x in emb.get("embedding", [])]
                 embeddings.append(embedding)
@@ -620,26 +1590,139 @@ class VectorStoreService:
                 # 准备文档内容
                 documents.append(str(emb["metadata"].get("content", "")))
             
-            # 添加数据到集合
-            logger.info(f"Adding {len(ids)} items to Chroma collection {collection_name}")
-            collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                documents=documents
-            )
+            # 准备ID - 稳定块ID的字符串形式，元数据中记录内容摘要用于增量比较
+            ids = [str(chunk_id) for chunk_id in self._stable_chunk_ids(filename, documents)]
+            for metadata, document in zip(metadatas, documents):
+                metadata["row_hash"] = self._row_hash({**metadata, "content": document})
             
-            logger.info(f"Successfully added {len(ids)} items to Chroma collection {collection_name}")
+            changes = None
+            try:
+                if upsert:
+                    changes = self._upsert_chroma_rows(
+                        collection, filename, ids, embeddings, metadatas, documents, progress, slim=slim
+                    )
+                    index_size = changes["inserted"] + changes["updated"]
+                else:
+                    # 分批添加数据到集合，每批之间汇报进度并检查取消
+                    logger.info(f"Adding {len(ids)} items to Chroma collection {collection_name}")
+                    index_size = self._write_in_batches(
+                        list(range(len(ids))),
+                        lambda batch: collection.add(
+                            **self._chroma_rows(collection, batch, ids, embeddings, metadatas, documents, slim)
+                        ),
+                        progress
+                    )
+                    logger.info(f"Successfully added {len(ids)} items to Chroma collection {collection_name}")
+            except IndexingCancelled:
+                if is_new_collection:
+                    logger.info(f"Deleting partially built Chroma collection {collection_name}")
+                    client.delete_collection(collection_name)
+                    chunk_text_store.drop(VectorDBProvider.CHROMA.value, collection_name)
+                raise
             
             return {
-                "index_size": len(embeddings_data["embeddings"]),
-                "collection_name": collection_name
+                "index_size": index_size,
+                "collection_name": collection_name,
+                "partition_name": self._document_partition_name(filename) if use_partitions else None,
+                "changes": changes,
+                "metric": str((collection.metadata or {}).get("hnsw:space", "l2")).upper(),
+                "was_empty": was_empty
             }
             
         except Exception as e:
             logger.error(f"Error indexing to Chroma: {str(e)}", exc_info=True)
             raise
 
+    def _chroma_rows(self, collection, indices: List[int], ids: List[str], embeddings: List[List[float]],
+                     metadatas: List[Dict[str, Any]], documents: List[str], slim: bool) -> Dict[str, Any]:
+        """
+        准备写入Chroma的一批数据：精简集合先把块级字段写入块文本存储，
+        写入集合的元数据不含嵌入配置，也不保存文档内容
+        
+        参数:
+            collection: Chroma集合
+            indices: 本批数据的下标
+            ids: 稳定块ID列表
+            embeddings: 向量列表
+            metadatas: 元数据列表
+            documents: 块内容列表
+            slim: 集合是否为精简集合
+            
+        返回:
+            collection.add/upsert的参数
+        """
+        rows = {
+            "ids": [ids[i] for i in indices],
+            "embeddings": [embeddings[i] for i in indices],
+            "metadatas": [metadatas[i] for i in indices],
+            "documents": [documents[i] for i in indices]
+        }
+        if not slim:
+            return rows
+        chunk_text_store.put(VectorDBProvider.CHROMA.value, collection.name, {
+            int(ids[i]): {"content": documents[i], "embedding_timestamp": metadatas[i].get("embedding_timestamp", "")}
+            for i in indices
+        })
+        dropped = set(self.CHUNK_TEXT_FIELDS + self.COLLECTION_LEVEL_FIELDS)
+        rows["metadatas"] = [{k: v for k, v in metadata.items() if k not in dropped} for metadata in rows["metadatas"]]
+        del rows["documents"]
+        return rows
+
+    def _upsert_chroma_rows(self, collection, document_name: str, ids: List[str], embeddings: List[List[float]],
+                            metadatas: List[Dict[str, Any]], documents: List[str],
+                            progress: Optional[IndexingProgress] = None, slim: bool = False) -> Dict[str, int]:
+        """
+        将文档的数据与Chroma集合中已有的数据按稳定块ID比较，批量写入差异
+        
+        参数:
+            collection: Chroma集合
+            document_name: 文档名称，用于限定比较范围
+            ids: 稳定块ID列表
+            embeddings: 向量列表
+            metadatas: 元数据列表（含row_hash）
+            documents: 块内容列表
+            progress: 进度跟踪
+            slim: 集合是否为精简集合，是则同步更新块文本存储
+            
+        返回:
+            插入、更新、删除和未变化的行数统计
+        """
+        progress = progress or IndexingProgress(len(ids))
+        existing_result = collection.get(where={"document_name": document_name}, include=["metadatas"])
+        existing = {
+            row_id: (metadata or {}).get("row_hash")
+            for row_id, metadata in zip(existing_result["ids"], existing_result["metadatas"])
+        }
+        
+        new_idx = [i for i, row_id in enumerate(ids) if row_id not in existing]
+        changed_idx = [i for i, row_id in enumerate(ids) if row_id in existing and existing[row_id] != metadatas[i]["row_hash"]]
+        incoming_ids = set(ids)
+        removed_ids = [row_id for row_id in existing if row_id not in incoming_ids]
+        
+        def pick(indices):
+            return self._chroma_rows(collection, indices, ids, embeddings, metadatas, documents, slim)
+        
+        def delete_batch(batch):
+            collection.delete(ids=batch)
+            if slim:
+                chunk_text_store.delete(VectorDBProvider.CHROMA.value, collection.name, [int(row_id) for row_id in batch])
+        
+        # 未变化的块直接计入进度，删除的块计入总数
+        progress.total = len(ids) + len(removed_ids)
+        progress.advance(len(ids) - len(new_idx) - len(changed_idx))
+        self._write_in_batches(new_idx, lambda batch: collection.add(**pick(batch)), progress)
+        self._write_in_batches(changed_idx, lambda batch: collection.upsert(**pick(batch)), progress)
+        self._write_in_batches(removed_ids, delete_batch, progress)
+        
+        changes = {
+            "inserted": len(new_idx),
+            "updated": len(changed_idx),
+            "deleted": len(removed_ids),
+            "unchanged": len(ids) - len(new_idx) - len(changed_idx)
+        }
+        logger.info(f"Upserted {document_name} into {collection.name}: {changes}")
+        return changes
+
     def _ensure_db_dirs(self):
         """
         确保所有数据库目录存在
@@ -664,6 +1747,8 @@ class VectorStoreService:
             if provider_str == VectorDBProvider.MILVUS.value.lower():
                 # Milvus处理逻辑
                 logger.info("Using Milvus to list collections")
+                if sidecar_enabled():
+                    return get_sidecar_client().call("list_collections")
                 return self._list_milvus_collections()
             elif provider_str == VectorDBProvider.CHROMA.value.lower():
                 # Chroma处理逻辑
@@ -679,54 +1764,64 @@ class VectorStoreService:
     def _list_milvus_collections(self) -> List[Dict[str, Any]]:
         """列出Milvus中的所有集合"""
         try:
-            logger.info(f"Connecting to Milvus at {MILVUS_CONFIG['uri']}")
-            connections.connect(alias="default", uri=MILVUS_CONFIG["uri"])
-            collections = []
+            with milvus_connection(MILVUS_CONFIG["uri"]):
+                collections = []
             
-            # 获取所有集合名称
-            try:
-                collection_names = utility.list_collections()
-                logger.info(f"Found {len(collection_names)} collections in Milvus")
+                # 获取所有集合名称
+                try:
+                    collection_names = utility.list_collections()
+                    logger.info(f"Found {len(collection_names)} collections in Milvus")
                 
-                # 获取每个集合的详细信息
-                for name in collection_names:
-                    try:
-                        collection = Collection(name)
-                        collection.load()
+                    # 获取每个集合的详细信息
+                    for name in collection_names:
+                        try:
+                            collection = Collection(name)
+                            collection.load()
                         
-                        # 获取实体数量
-                        entity_count = collection.num_entities
+                            # 获取实体数量
+                            entity_count = collection.num_entities
                         
-                        collections.append({
-                            "id": name,
-                            "name": name,
-                            "count": entity_count,
-                            "provider": VectorDBProvider.MILVUS.value
-                        })
-                    except Exception as e:
-                        logger.error(f"Error getting info for collection {name}: {str(e)}")
-                        collections.append({
-                            "id": name,
-                            "name": name,
-                            "count": 0,
-                            "provider": VectorDBProvider.MILVUS.value,
-                            "error": str(e)
-                        })
-            except Exception as e:
-                logger.error(f"Error listing Milvus collections: {str(e)}")
-                return []
+                            collections.append({
+                                "id": name,
+                                "name": name,
+                                "count": entity_count,
+                                "provider": VectorDBProvider.MILVUS.value
+                            })
+                        except Exception as e:
+                            logger.error(f"Error getting info for collection {name}: {str(e)}")
+                            collections.append({
+                                "id": name,
+                                "name": name,
+                                "count": 0,
+                                "provider": VectorDBProvider.MILVUS.value,
+                                "error": str(e)
+                            })
+                except Exception as e:
+                    logger.error(f"Error listing Milvus collections: {str(e)}")
+                    return []
+            
+            # 分片集合的数据在各自的分片文件中，从集合目录中补充
+            for entry in collection_catalog.list(VectorDBProvider.MILVUS.value):
+                if not entry.get("shards"):
+                    continue
+                name = entry["collection_name"]
+                try:
+                    count = sum(shard["num_entities"] for shard in self.get_shard_info(name))
+                except Exception as e:
+                    logger.error(f"Error getting shard info for collection {name}: {str(e)}")
+                    count = 0
+                collections.append({
+                    "id": name,
+                    "name": name,
+                    "count": count,
+                    "provider": VectorDBProvider.MILVUS.value,
+                    "shards": entry["shards"]["count"]
+                })
                 
             return collections
         except Exception as e:
             logger.error(f"Error connecting to Milvus: {str(e)}")
             return []
-        finally:
-            # 确保断开连接
-            try:
-                connections.disconnect("default")
-                logger.info("Disconnected from Milvus")
-            except Exception as disconnect_error:
-                logger.error(f"Error disconnecting from Milvus: {str(disconnect_error)}")
     
     def _list_chroma_collections(self) -> List[Dict[str, Any]]:
         """列出Chroma中的所有集合"""
@@ -796,16 +1891,27 @@ class VectorStoreService:
             logger.info(f"Attempting to delete collection: {collection_name} from provider: {provider}")
             
             if provider == VectorDBProvider.MILVUS.value:
+                shard_info = collection_catalog.get(provider, collection_name).get("shards")
+                if shard_info:
+                    self._drop_shard_files(collection_name, shard_info)
+                    collection_catalog.remove(provider, collection_name)
+                    chunk_text_store.drop(provider, collection_name)
+                    lexical_index.drop(provider, collection_name)
+                    logger.info(f"Successfully deleted sharded Milvus collection: {collection_name}")
+                    return True
+                if sidecar_enabled():
+                    return get_sidecar_client().call("delete_collection", collection_name=collection_name)
                 try:
-                    connections.connect(alias="default", uri=MILVUS_CONFIG["uri"])
-                    utility.drop_collection(collection_name)
+                    with milvus_connection(MILVUS_CONFIG["uri"]):
+                        utility.drop_collection(collection_name)
+                    collection_catalog.remove(provider, collection_name)
+                    chunk_text_store.drop(provider, collection_name)
+                    lexical_index.drop(provider, collection_name)
                     logger.info(f"Successfully deleted Milvus collection: {collection_name}")
                     return True
                 except Exception as e:
                     logger.error(f"Error deleting Milvus collection {collection_name}: {str(e)}")
                     raise
-                finally:
-                    connections.disconnect("default")
                     
             elif provider == VectorDBProvider.CHROMA.value:
                 try:
@@ -839,6 +1945,9 @@ class VectorStoreService:
                     # 删除集合
                     logger.info(f"Deleting Chroma collection: {collection_name}")
                     client.delete_collection(name=collection_name)
+                    collection_catalog.remove(provider, collection_name)
+                    chunk_text_store.drop(provider, collection_name)
+                    lexical_index.drop(provider, collection_name)
                     logger.info(f"Successfully deleted Chroma collection: {collection_name}")
                     return True
                     
@@ -871,21 +1980,48 @@ class VectorStoreService:
         logger.info(f"Getting collection info for provider: {provider}, collection: {collection_name}")
         
         if provider == VectorDBProvider.MILVUS.value:
+            if sidecar_enabled():
+                # 数据文件由sidecar独占，不能在本进程再次打开
+                return get_sidecar_client().call("collection_info", collection_name=collection_name)
             try:
-                connections.connect(alias="default", uri=MILVUS_CONFIG["uri"])
-                collection = Collection(collection_name)
-                info = {
-                    "name": collection_name,
-                    "num_entities": collection.num_entities,
-                    "schema": collection.schema.to_dict()
-                }
+                with milvus_connection(MILVUS_CONFIG["uri"]):
+                    collection = Collection(collection_name)
+                    partitions = collection_catalog.get(provider, collection_name).get("partitions", {})
+                    partition_documents = {v: k for k, v in partitions.items()}
+                    if self._is_milvus_lite(MILVUS_CONFIG["uri"]):
+                        # Milvus Lite不支持分区，按document_name统计目录中每个文档的行数
+                        collection.load()
+                        partition_info = [
+                            {
+                                "name": partition_name,
+                                "document_name": document_name,
+                                "num_entities": collection.query(
+                                    expr=f"document_name == {json.dumps(document_name, ensure_ascii=False)}",
+                                    output_fields=["count(*)"]
+                                )[0]["count(*)"]
+                            }
+                            for document_name, partition_name in partitions.items()
+                        ]
+                    else:
+                        partition_info = [
+                            {
+                                "name": p.name,
+                                "document_name": partition_documents.get(p.name),
+                                "num_entities": p.num_entities
+                            }
+                            for p in collection.partitions
+                        ]
+                    info = {
+                        "name": collection_name,
+                        "num_entities": collection.num_entities,
+                        "schema": collection.schema.to_dict(),
+                        "partitions": partition_info
+                    }
                 logger.info(f"Successfully retrieved Milvus collection info: {collection_name}")
                 return info
             except Exception as e:
                 logger.error(f"Error getting Milvus collection info: {str(e)}")
                 raise
-            finally:
-                connections.disconnect("default")
                 
         elif provider == VectorDBProvider.CHROMA.value:
             try:
@@ -945,4 +2081,57 @@ class VectorStoreService:
         
         else:
             logger.error(f"Unsupported vector database provider: {provider}")
-            raise ValueError(f"Unsupported vector database provider: {provider}")
\ No newline at end of file
+            raise ValueError(f"Unsupported vector database provider: {provider}")
+    def set_documents_loaded(self, provider: str, collection_name: str, documents: List[str], loaded: bool) -> Dict[str, Any]:
+        """
+        以分区为粒度加载或释放集合中指定文档的数据
+        
+        参数:
+            provider: 向量数据库提供商
+            collection_name: 集合名称
+            documents: 文档名称列表
+            loaded: True为加载到内存，False为从内存释放
+            
+        返回:
+            操作结果字典，包含处理的分区和未找到分区的文档
+        """
+        if provider != VectorDBProvider.MILVUS.value:
+            # Chroma没有独立的加载/释放概念，文档分片始终随集合一起可用
+            raise ValueError(f"Partition load/release is not supported for provider: {provider}")
+        if self._is_milvus_lite(MILVUS_CONFIG["uri"]):
+            # Milvus Lite不支持分区，文档以document_name字段区分，始终随集合一起加载
+            raise ValueError("Partition load/release is not supported on Milvus Lite")
+        if sidecar_enabled():
+            # 分区驻留在sidecar进程的内存中，只能由sidecar加载或释放
+            return get_sidecar_client().call(
+                "set_documents_loaded", collection_name=collection_name, documents=list(documents), loaded=loaded
+            )
+        
+        partitions = collection_catalog.get(provider, collection_name).get("partitions", {})
+        partition_names = [partitions[d] for d in documents if d in partitions]
+        missing = [d for d in documents if d not in partitions]
+        
+        with milvus_connection(MILVUS_CONFIG["uri"]):
+            collection = Collection(collection_name)
+            if partition_names:
+                if loaded:
+                    collection.load(partition_names=partition_names)
+                else:
+                    for partition_name in partition_names:
+                        collection.partition(partition_name).release()
+        
+        # 记录已释放的分区，未按文档过滤的搜索只加载和搜索其余分区
+        released = set(collection_catalog.get(provider, collection_name).get("released_partitions", []))
+        released = released - set(partition_names) if loaded else released | set(partition_names)
+        collection_catalog.update(provider, collection_name, released_partitions=sorted(released))
+        # 可搜索的分区变了，已缓存的搜索结果失效
+        collection_catalog.bump_version(provider, collection_name)
+        
+        action = "Loaded" if loaded else "Released"
+        logger.info(f"{action} partitions {partition_names} of collection {collection_name}")
+        return {
+            "collection_name": collection_name,
+            "partitions": partition_names,
+            "missing_documents": missing,
+            "loaded": loaded
+        }
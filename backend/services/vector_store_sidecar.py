@@ -0,0 +1,251 @@
+import os
+import json
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import List, Dict, Any, Tuple
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+from services.search_service import SearchService
+from services.snapshot_service import SnapshotService
+from services.retention_service import RetentionService
+from services.index_tuning_service import IndexTuningService
+from utils.milvus_connection import milvus_connection
+from utils.sidecar_client import HEADER, encode_message
+from utils.config import VectorDBProvider, MILVUS_CONFIG, SIDECAR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class VectorStoreSidecar:
+    """
+    向量库sidecar：独占Milvus Lite数据文件，通过Unix socket为多个API worker进程提供搜索和写入
+
+    同一时间窗口内到达的搜索请求按（集合、top_k、过滤条件）分组，每组合并为一次多向量的Milvus搜索
+    """
+
+    def __init__(self, socket_path: str,
+                 batch_window_ms: float = SIDECAR_CONFIG["batch_window_ms"],
+                 max_batch_size: int = SIDECAR_CONFIG["max_batch_size"]):
+        """
+        初始化sidecar
+
+        参数:
+            socket_path: 监听的Unix socket路径
+            batch_window_ms: 搜索请求的合批等待时间（毫秒）
+            max_batch_size: 单次合批的最大搜索请求数
+        """
+        self.socket_path = socket_path
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.search_service = SearchService()
+        self.vector_store = VectorStoreService()
+        self._search_queue: asyncio.Queue = None
+
+    async def serve(self):
+        """
+        启动sidecar并一直运行
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+
+        self._search_queue = asyncio.Queue()
+        # sidecar生命周期内保持Milvus连接
+        with ExitStack() as stack:
+            stack.enter_context(milvus_connection(MILVUS_CONFIG["uri"]))
+            batcher = asyncio.ensure_future(self._batch_loop())
+            server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+            logger.info(f"Vector store sidecar listening on {self.socket_path}")
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                batcher.cancel()
+                if os.path.exists(self.socket_path):
+                    os.remove(self.socket_path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        处理一个客户端连接：按顺序读取请求并返回响应
+        """
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (size,) = HEADER.unpack(header)
+                request = json.loads((await reader.readexactly(size)).decode("utf-8"))
+                try:
+                    result = await self._dispatch(request.get("op"), request.get("params") or {})
+                    response = {"ok": True, "result": result}
+                except Exception as e:
+                    logger.error(f"Sidecar {request.get('op')} failed: {str(e)}")
+                    response = {"ok": False, "error": str(e), "error_type": type(e).__name__}
+                writer.write(encode_message(response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, op: str, params: Dict[str, Any]) -> Any:
+        """
+        执行一个操作
+
+        参数:
+            op: 操作名称
+            params: 操作参数
+
+        返回:
+            操作结果
+        """
+        if op == "ping":
+            return {"pid": os.getpid()}
+        if op == "search":
+            future = asyncio.get_running_loop().create_future()
+            await self._search_queue.put((params, future))
+            return await future
+        if op == "search_batch":
+            # 调用方已把多个查询合成一批，不再经过合批窗口
+            return await asyncio.to_thread(self._search_group, [
+                {**params, "query_embedding": embedding} for embedding in params["query_embeddings"]
+            ])
+        if op == "query_chunks":
+            return await asyncio.to_thread(
+                self.search_service._milvus_query_chunks, params["collection_id"], params["expr"]
+            )
+        if op == "collection_config":
+            _, embedding_config, metric = await asyncio.to_thread(
+                self.search_service._open_milvus_collection_with_config,
+                params["collection_id"], params.get("filters")
+            )
+            return {"embedding_config": embedding_config, "metric": metric}
+        if op == "list_collections":
+            return await asyncio.to_thread(self.vector_store._list_milvus_collections)
+        if op == "delete_collection":
+            return await asyncio.to_thread(
+                self.vector_store.delete_collection, VectorDBProvider.MILVUS.value, params["collection_name"]
+            )
+        if op == "collection_info":
+            return await asyncio.to_thread(
+                self.vector_store.get_collection_info, VectorDBProvider.MILVUS.value, params["collection_name"]
+            )
+        if op == "set_documents_loaded":
+            return await asyncio.to_thread(
+                self.vector_store.set_documents_loaded, VectorDBProvider.MILVUS.value,
+                params["collection_name"], params["documents"], params["loaded"]
+            )
+        if op == "compact":
+            return await asyncio.to_thread(RetentionService()._compact_milvus)
+        if op == "export_snapshot":
+            return await asyncio.to_thread(
+                SnapshotService().export_snapshot, VectorDBProvider.MILVUS.value,
+                params["collection_name"], params.get("output_path")
+            )
+        if op == "import_snapshot":
+            return await asyncio.to_thread(
+                SnapshotService().import_snapshot, params["snapshot_path"],
+                params.get("collection_name"), bool(params.get("overwrite", False))
+            )
+        if op == "tune_index":
+            return await asyncio.to_thread(
+                IndexTuningService().tune, VectorDBProvider.MILVUS.value, params["collection_name"],
+                sample_queries=params.get("sample_queries"), top_k=params.get("top_k"),
+                target_recall=params.get("target_recall"), grid=params.get("grid"),
+                apply=bool(params.get("apply", False))
+            )
+        if op == "benchmark_metrics":
+            return await asyncio.to_thread(
+                IndexTuningService().benchmark_metrics, VectorDBProvider.MILVUS.value, params["collection_name"],
+                sample_queries=params.get("sample_queries"), top_k=params.get("top_k")
+            )
+        if op == "index":
+            config = VectorDBConfig(provider=VectorDBProvider.MILVUS.value, index_mode=params["index_mode"])
+            return await asyncio.to_thread(
+                self.vector_store.index_embeddings, params["embedding_file"], config, **params.get("options", {})
+            )
+        raise ValueError(f"Unsupported sidecar operation: {op}")
+
+    async def _batch_loop(self):
+        """
+        收集一个时间窗口内的搜索请求，分组后并发执行
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._search_queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._search_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = defaultdict(list)
+            for params, future in batch:
+                key = (
+                    params["collection_id"],
+                    int(params.get("top_k", 3)),
+                    int(params.get("word_count_threshold", 30)),
+                    json.dumps(params.get("filters") or {}, sort_keys=True),
+                    bool(params.get("with_vectors", False))
+                )
+                groups[key].append((params, future))
+            for group in groups.values():
+                asyncio.ensure_future(self._run_search_group(group))
+
+    async def _run_search_group(self, group: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """
+        用一次多向量搜索执行一组请求，并把结果分发给各请求
+        """
+        try:
+            results = await asyncio.to_thread(self._search_group, [params for params, _ in group])
+            for (_, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _search_group(self, requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        在工作线程中执行合批搜索
+
+        参数:
+            requests: 同组的搜索请求参数
+
+        返回:
+            与请求一一对应的搜索结果
+        """
+        first = requests[0]
+        filters = first.get("filters")
+        partition_names = self.search_service._resolve_milvus_partitions(first["collection_id"], filters)
+        collection = self.search_service._open_milvus_collection(first["collection_id"], partition_names)
+        logger.info(f"Running batched search of {len(requests)} queries on {first['collection_id']}")
+        return self.search_service._milvus_search_collection_batch(
+            collection,
+            [params["query_embedding"] for params in requests],
+            top_k=int(first.get("top_k", 3)),
+            thresholds=[float(params.get("threshold", 0.5)) for params in requests],
+            word_count_threshold=int(first.get("word_count_threshold", 30)),
+            filters=filters,
+            with_vectors=bool(first.get("with_vectors", False))
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the vector store sidecar that owns the Milvus Lite store")
+    parser.add_argument("--socket", default=SIDECAR_CONFIG["socket_path"] or "03-vector-store/vector_store.sock")
+    parser.add_argument("--batch-window-ms", type=float, default=SIDECAR_CONFIG["batch_window_ms"])
+    parser.add_argument("--max-batch-size", type=int, default=SIDECAR_CONFIG["max_batch_size"])
+    args = parser.parse_args()
+
+    # sidecar进程自身直接访问Milvus，不能再把请求转发给自己
+    SIDECAR_CONFIG["socket_path"] = ""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(VectorStoreSidecar(args.socket, args.batch_window_ms, args.max_batch_size).serve())
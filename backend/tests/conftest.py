@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+
+import pytest
+
+# 服务模块以backend为根导入（from services... / from utils...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fake_vector(text, dimension=8):
+    """
+    由文本确定的测试向量，相同文本得到相同向量
+    """
+    seed = sum(ord(c) for c in text)
+    return [float((seed * (d + 3)) % 17 + 1) for d in range(dimension)]
+
+
+@pytest.fixture
+def vector_store_dir(tmp_path, monkeypatch):
+    """
+    把Milvus Lite数据文件、集合目录、块文本存储、词法索引和模型登记表都指向临时目录，
+    并清空这些全局实例在内存中的缓存
+    """
+    from utils.config import MILVUS_CONFIG
+    from services.catalog_service import collection_catalog
+    from services.doc_store_service import chunk_text_store
+    from services.lexical_index_service import lexical_index
+    from services.model_registry import model_registry
+    from services.search_cache import search_cache
+    from services.vector_store_service import VectorStoreService
+
+    store_dir = tmp_path / "03-vector-store"
+    store_dir.mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(MILVUS_CONFIG, "uri", str(store_dir / "milvus.db"))
+    monkeypatch.setattr(collection_catalog, "uri", str(store_dir / "collection_catalog.json"))
+    monkeypatch.setattr(collection_catalog, "_cache", None)
+    monkeypatch.setattr(chunk_text_store, "uri", str(store_dir / "doc_store"))
+    monkeypatch.setattr(chunk_text_store, "_readers", {})
+    monkeypatch.setattr(lexical_index, "uri", str(store_dir / "lexical_index"))
+    monkeypatch.setattr(lexical_index, "_segments", {})
+    monkeypatch.setattr(model_registry, "uri", str(store_dir / "model_registry.json"))
+    monkeypatch.setattr(model_registry, "_entries", None)
+    monkeypatch.setattr(VectorStoreService, "_get_absolute_path", lambda self, path: str(tmp_path / path))
+    search_cache.clear()
+    return tmp_path
+
+
+@pytest.fixture
+def embedding_file(tmp_path):
+    """
+    生成嵌入文件的工厂：每个块的向量由块内容确定，同一内容在不同文件中得到相同的向量
+    """
+    def make(filename, contents, dimension=8, name=None, pages=None):
+        embeddings = []
+        pages = pages or [i + 1 for i in range(len(contents))]
+        for i, (content, page) in enumerate(zip(contents, pages)):
+            embeddings.append({
+                "embedding": fake_vector(content, dimension),
+                "metadata": {
+                    "content": content,
+                    "chunk_id": i + 1,
+                    "total_chunks": len(contents),
+                    "word_count": len(content.split()),
+                    "page_number": page,
+                    "page_range": str(page),
+                    "embedding_timestamp": "2024-01-01T00:00:00"
+                }
+            })
+        path = tmp_path / (name or f"{filename}_embedded.json")
+        path.write_text(json.dumps({
+            "filename": filename,
+            "embedding_provider": "huggingface",
+            "embedding_model": "test-model",
+            "vector_dimension": dimension,
+            "embeddings": embeddings
+        }), encoding="utf-8")
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def fake_query_embedding(monkeypatch):
+    """
+    查询向量按fake_vector由查询文本生成，不加载嵌入模型；查询与某个块的内容相同时该块得分最高
+    """
+    from services.search_service import SearchService
+    from utils.vector_math import normalize_vector
+
+    def create_query_embedding(self, query, provider, model, vector_dimension=None):
+        return normalize_vector(fake_vector(query, vector_dimension or 8))
+
+    monkeypatch.setattr(SearchService, "_create_query_embedding", create_query_embedding)
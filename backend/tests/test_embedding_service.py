@@ -0,0 +1,40 @@
+import pytest
+
+from conftest import fake_vector
+from services.embedding_service import EmbeddingService, EmbeddingConfig
+from services.model_registry import model_registry
+from utils.vector_math import normalize_vector
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return normalize_vector(fake_vector(text))
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def service(vector_store_dir, monkeypatch):
+    service = EmbeddingService()
+    monkeypatch.setattr(service.embedding_factory, "create_embedding_function", lambda config: FakeEmbeddings())
+    return service
+
+
+def test_query_embeddings_do_not_register_model(service):
+    assert len(service.create_single_embedding("vector search", "huggingface", "test-model")) == 8
+    assert len(service.create_query_embeddings(["a", "b"], "huggingface", "test-model")) == 2
+    assert model_registry.get("huggingface", "test-model") is None
+
+
+def test_document_embeddings_register_model(service):
+    chunk = {
+        "content": "vector search",
+        "metadata": {"chunk_id": 1, "page_number": 1, "page_range": "1", "word_count": 2}
+    }
+    results, _ = service.create_embeddings(
+        {"chunks": [chunk], "metadata": {"filename": "a.pdf"}}, EmbeddingConfig("huggingface", "test-model")
+    )
+    assert len(results) == 1
+    entry = model_registry.get("huggingface", "test-model")
+    assert entry["dimension"] == 8 and entry["normalized"]
@@ -0,0 +1,60 @@
+import math
+
+import pandas as pd
+import pytest
+
+from services.evaluation_service import EvaluationService
+
+
+def test_perfect_ranking():
+    scores = EvaluationService.score_query([3, 4], [3, 4], top_k=2)
+    assert scores == {"recall": 1.0, "precision": 1.0, "hit": 1.0, "mrr": 1.0, "ndcg": pytest.approx(1.0)}
+
+
+def test_first_relevant_at_rank_two():
+    scores = EvaluationService.score_query([9, 3, 8], [3, 4], top_k=3)
+    assert scores["recall"] == 0.5
+    assert scores["precision"] == pytest.approx(1 / 3)
+    assert scores["hit"] == 1.0
+    assert scores["mrr"] == 0.5
+    ideal = 1.0 + 1.0 / math.log2(3)
+    assert scores["ndcg"] == pytest.approx((1.0 / math.log2(3)) / ideal)
+
+
+def test_duplicate_pages_count_once_for_ndcg_and_recall():
+    scores = EvaluationService.score_query([3, 3, 3], [3], top_k=3)
+    assert scores["recall"] == 1.0
+    assert scores["ndcg"] == pytest.approx(1.0)
+    # precision仍按命中结果占比计算（兼容原 score_hit）
+    assert scores["precision"] == 1.0
+
+
+def test_results_beyond_top_k_are_ignored():
+    scores = EvaluationService.score_query([1, 2, 3], [3], top_k=2)
+    assert scores == {"recall": 0.0, "precision": 0.0, "hit": 0.0, "mrr": 0.0, "ndcg": 0.0}
+
+
+def test_no_results_and_missing_pages():
+    assert EvaluationService.score_query([], [1], top_k=5)["precision"] == 0.0
+    scores = EvaluationService.score_query([None, 1], [1], top_k=5)
+    assert scores["mrr"] == 0.5
+
+
+def test_page_of_tolerates_missing_or_invalid_pages():
+    assert EvaluationService._page_of({"metadata": {"page": "7"}}) == 7
+    assert EvaluationService._page_of({"metadata": {"page": "7-8"}}) is None
+    assert EvaluationService._page_of({"metadata": {}}) is None
+    assert EvaluationService._page_of({}) is None
+
+
+def test_parse_cases_skips_unlabelled_rows():
+    df = pd.DataFrame({
+        "Q": ["what is milvus", "how to index", "no label", "bad label"],
+        "LABEL": ["[3, 4]", "5", "[]", "[x]"],
+    })
+    assert EvaluationService.parse_cases(df) == [
+        {"query": "what is milvus [3, 4]", "expected_pages": [3, 4]},
+        {"query": "how to index 5", "expected_pages": [5]},
+    ]
+    with pytest.raises(ValueError):
+        EvaluationService.parse_cases(pd.DataFrame({"Q": ["q"]}))
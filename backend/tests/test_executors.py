@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.executors import run_inference, run_io, io_context, EventLoopMonitor
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+def test_inference_and_io_run_on_separate_pools():
+    async def main():
+        return await run_inference(thread_name), await run_io(thread_name)
+
+    inference_thread, io_thread = asyncio.run(main())
+    assert inference_thread.startswith("inference")
+    assert io_thread.startswith("io")
+
+
+def test_io_context_enters_and_exits_on_io_threads():
+    class Recorder:
+        def __init__(self):
+            self.calls = []
+
+        def __enter__(self):
+            self.calls.append(("enter", thread_name()))
+            return self
+
+        def __exit__(self, exc_type, exc, tb):
+            self.calls.append(("exit", thread_name(), exc_type))
+            return False
+
+    recorder = Recorder()
+
+    async def main():
+        async with io_context(recorder) as value:
+            assert value is recorder
+            raise KeyError("boom")
+
+    with pytest.raises(KeyError):
+        asyncio.run(main())
+    assert [call[0] for call in recorder.calls] == ["enter", "exit"]
+    assert all(call[1].startswith("io") for call in recorder.calls)
+    assert recorder.calls[1][2] is KeyError
+
+
+def test_loop_monitor_measures_blocking():
+    monitor = EventLoopMonitor(interval_ms=5, window=100)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.02)
+        # 阻塞事件循环
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+        stats = monitor.stats()
+        monitor.stop()
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats["running"] is True
+    assert stats["samples"] > 0
+    assert stats["max_ms"] >= 50
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from pymilvus import utility
+
+from services.index_tuning_service import IndexTuningService
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+from utils.milvus_connection import milvus_connection
+
+
+def milvus_collections():
+    with milvus_connection():
+        return sorted(utility.list_collections())
+
+
+def test_tuning_on_milvus_lite_skips_hnsw_and_leaves_no_candidates(vector_store_dir, embedding_file):
+    contents = [f"chunk number {i} about topic {i % 7}" for i in range(40)]
+    result = VectorStoreService().index_embeddings(
+        embedding_file("manual.pdf", contents), VectorDBConfig(provider="milvus", index_mode="flat")
+    )
+
+    report = IndexTuningService().tune("milvus", result["collection_name"], sample_queries=5, top_k=3)
+
+    assert {c["index_type"] for c in report["candidates"]} == {"FLAT", "IVF_FLAT", "AUTOINDEX"}
+    assert report["recommended"]["recall"] == 1.0
+    assert milvus_collections() == [result["collection_name"]]
+
+
+def test_failed_candidate_build_drops_the_temp_collection(vector_store_dir):
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32)
+    with pytest.raises(Exception):
+        # Milvus Lite不能构建HNSW
+        IndexTuningService()._build_milvus_candidate("manual_tune_1", vectors, "HNSW", {"M": 8, "efConstruction": 64})
+    assert milvus_collections() == []
+
+
+def test_lite_grid_rejects_grids_without_buildable_types():
+    grid = {"HNSW": {"M": [8]}, "FLAT": {}}
+    assert IndexTuningService._lite_grid(grid) == {"FLAT": {}}
+    with pytest.raises(ValueError):
+        IndexTuningService._lite_grid({"HNSW": {"M": [8]}})
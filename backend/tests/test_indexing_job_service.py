@@ -0,0 +1,48 @@
+import pytest
+
+from services.indexing_job_service import IndexingJobManager
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+from utils.config import INDEXING_JOB_CONFIG
+
+CONTENTS = [f"chunk number {i}" for i in range(6)]
+
+
+class CancelAfterFirstBatch(IndexingJobManager):
+    """
+    写完第一批后请求取消
+    """
+
+    def _update(self, job_id, **fields):
+        super()._update(job_id, **fields)
+        if fields.get("progress", {}).get("processed"):
+            self.cancel(job_id)
+
+
+@pytest.fixture
+def config(vector_store_dir, monkeypatch):
+    monkeypatch.setitem(INDEXING_JOB_CONFIG, "batch_size", 2)
+    return VectorDBConfig(provider="milvus", index_mode="flat")
+
+
+def test_job_completes_with_progress(config, embedding_file):
+    manager = IndexingJobManager(max_workers=1)
+    job = manager.submit(embedding_file("manual.pdf", CONTENTS), config, collection_name="knowledge_base")
+    assert job["status"] in ("pending", "running", "completed")
+
+    job = manager.wait(job["job_id"])
+    assert job["status"] == "completed"
+    assert job["progress"] == {"processed": 6, "total": 6, "percent": 100.0}
+    assert job["result"]["collection_name"] == "knowledge_base"
+    assert manager.list()[0]["job_id"] == job["job_id"]
+    manager.shutdown()
+
+
+def test_cancelled_job_drops_the_new_collection(config, embedding_file):
+    manager = CancelAfterFirstBatch(max_workers=1)
+    job = manager.wait(manager.submit(embedding_file("manual.pdf", CONTENTS), config,
+                                      collection_name="knowledge_base")["job_id"])
+    assert job["status"] == "cancelled"
+    assert job["progress"]["processed"] == 2
+    assert job["result"] is None
+    assert VectorStoreService().list_collections("milvus") == []
+    manager.shutdown()
@@ -0,0 +1,115 @@
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from services.lexical_index_service import LexicalIndex, tokenize, _varint_encode, _varint_decode
+from services.search_filters import SearchFilters
+
+
+@pytest.mark.parametrize("values", [
+    [],
+    [0],
+    [127, 128, 255, 16383, 16384],
+    [0, 1, 2 ** 21, 2 ** 35, 2 ** 56 + 3],
+])
+def test_varint_round_trip(values):
+    encoded, nbytes = _varint_encode(np.array(values, dtype=np.int64))
+    assert encoded.dtype == np.uint8
+    assert int(nbytes.sum()) == len(encoded)
+    assert _varint_decode(encoded).tolist() == values
+
+
+def test_varint_round_trip_random():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.integers(0, 128, 500), rng.integers(0, 2 ** 40, 500)])
+    encoded, nbytes = _varint_encode(values)
+    # 小于128的值只占一个字节
+    assert (nbytes[:500] == 1).all()
+    assert _varint_decode(encoded).tolist() == values.tolist()
+
+
+def test_tokenize_keeps_identifiers_and_cjk_bigrams():
+    assert tokenize("Model X-200 v1.2") == ["model", "x-200", "x", "200", "v1.2", "v1", "2"]
+    assert tokenize("向量检索") == ["向量", "量检", "检索"]
+
+
+VOCABULARY = ["milvus", "vector", "index", "search", "bm25", "chunk", "query", "score", "hnsw", "shard", "cache", "rerank"]
+
+
+def _corpus(seed: int = 7):
+    rng = random.Random(seed)
+    documents = {}
+    row_id = 0
+    for d in range(4):
+        rows = []
+        for chunk_id in range(rng.randint(5, 30)):
+            words = [rng.choice(VOCABULARY[:rng.randint(3, len(VOCABULARY))]) for _ in range(rng.randint(3, 40))]
+            rows.append({"row_id": row_id, "content": " ".join(words), "chunk_id": chunk_id, "word_count": len(words)})
+            row_id += 1
+        documents[f"doc{d}.pdf"] = rows
+    return documents
+
+
+def _brute_force_bm25(documents, query, k1, b):
+    rows = [(name, row) for name, doc_rows in documents.items() for row in doc_rows]
+    counts = {row["row_id"]: Counter(tokenize(row["content"])) for _, row in rows}
+    lengths = {row_id: sum(c.values()) for row_id, c in counts.items()}
+    avg_len = max(sum(lengths.values()) / len(rows), 1.0)
+    scores = {}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(1 for c in counts.values() if term in c)
+        if not df:
+            continue
+        idf = math.log(1 + (len(rows) - df + 0.5) / (df + 0.5))
+        for row_id, c in counts.items():
+            tf = c.get(term, 0)
+            if tf:
+                weight = tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[row_id] / avg_len))
+                scores[row_id] = scores.get(row_id, 0.0) + idf * weight
+    return scores
+
+
+@pytest.fixture
+def index(tmp_path):
+    lexical = LexicalIndex(uri=str(tmp_path))
+    documents = _corpus()
+    for name, rows in documents.items():
+        lexical.index_document("milvus", "coll", name, rows, embedding={"embedding_provider": "p", "embedding_model": "m"})
+    return lexical, documents
+
+
+@pytest.mark.parametrize("query", ["milvus", "vector search", "bm25 chunk rerank cache", "hnsw shard query score index"])
+@pytest.mark.parametrize("top_k", [1, 5, 20])
+def test_search_matches_brute_force_bm25(index, query, top_k):
+    lexical, documents = index
+    expected = _brute_force_bm25(documents, query, lexical.k1, lexical.b)
+    hits = lexical.search("milvus", "coll", query, top_k=top_k)
+
+    assert len(hits) == min(top_k, len(expected))
+    expected_scores = sorted(expected.values(), reverse=True)[:top_k]
+    assert [h["score"] for h in hits] == pytest.approx(expected_scores)
+    for hit in hits:
+        assert hit["score"] == pytest.approx(expected[hit["row_id"]])
+        assert hit["embedding_model"] == "m"
+
+
+def test_search_respects_document_and_metadata_filters(index):
+    lexical, documents = index
+    filters = SearchFilters({"document_name": "doc2.pdf", "word_count": {"gte": 10}})
+    hits = lexical.search("milvus", "coll", "vector search index", top_k=50, filters=filters)
+
+    allowed = {row["row_id"]: row for row in documents["doc2.pdf"] if row["word_count"] >= 10}
+    expected = {k: v for k, v in _brute_force_bm25(documents, "vector search index", lexical.k1, lexical.b).items() if k in allowed}
+    assert {h["row_id"] for h in hits} == set(expected)
+    assert all(h["document_name"] == "doc2.pdf" for h in hits)
+
+
+def test_reindexing_a_document_replaces_its_segment(index):
+    lexical, _ = index
+    lexical.index_document("milvus", "coll", "doc0.pdf", [{"row_id": 999, "content": "unique token zebra"}])
+    hits = lexical.search("milvus", "coll", "zebra", top_k=5)
+    assert [h["row_id"] for h in hits] == [999]
+    assert lexical.search("milvus", "coll", "", top_k=5) == []
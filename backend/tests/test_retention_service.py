@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from services import vector_store_service as vector_store_module
+from services.retention_service import RetentionService
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+
+
+class FrozenDatetime(datetime):
+    current = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def test_dry_run_reports_superseded_items_without_deleting(vector_store_dir, embedding_file, monkeypatch):
+    # 集合名中的时间戳取自索引时间
+    monkeypatch.setattr(vector_store_module, "datetime", FrozenDatetime)
+    service = VectorStoreService()
+    config = VectorDBConfig(provider="milvus", index_mode="flat")
+    for day in (1, 2, 3):
+        FrozenDatetime.current = datetime(2024, 1, day)
+        service.index_embeddings(embedding_file("manual.pdf", ["alpha beta", "gamma delta"], name=f"m{day}.json"), config)
+    # 带保护标签的旧集合不会被回收
+    FrozenDatetime.current = datetime(2023, 12, 31)
+    service.index_embeddings(embedding_file("manual.pdf", ["alpha beta"], name="pinned.json"), config, tags=["pinned"])
+
+    embedded_dir = vector_store_dir / "02-embedded-docs"
+    embedded_dir.mkdir()
+    for day in range(1, 6):
+        (embedded_dir / f"manual_huggingface_2024010{day}000000.json").write_text(json.dumps({}))
+
+    report = RetentionService().run(dry_run=True)
+
+    assert report["dry_run"] is True
+    assert report["compaction"] == {}
+    assert [c["name"] for c in report["deleted_collections"]] == ["manual_huggingface_20240101000000"]
+    assert report["deleted_collections"][0]["provider"] == "milvus"
+    assert sorted(f["path"] for f in report["deleted_files"]) == [
+        "02-embedded-docs/manual_huggingface_20240101000000.json",
+        "02-embedded-docs/manual_huggingface_20240102000000.json"
+    ]
+    assert report["reclaimed_bytes"]["artifacts"] == 4
+    assert report["reclaimed_bytes"]["vector_store"] == 0
+    # 什么都没有删除
+    assert len(list(embedded_dir.iterdir())) == 5
+    assert len(service.list_collections("milvus")) == 4
@@ -0,0 +1,65 @@
+import time
+
+from services.search_cache import SearchResultCache
+
+
+def _cache(**kwargs):
+    options = dict(ttl_seconds=60, max_entries=100, max_memory_mb=1, enabled=True)
+    options.update(kwargs)
+    return SearchResultCache(**options)
+
+
+def test_hit_returns_a_copy_of_the_response():
+    cache = _cache()
+    key = cache.make_key("milvus", "coll", "query", top_k=3)
+    cache.put(key, 1, {"results": [{"text": "a"}]})
+
+    response = cache.get(key, 1)
+    assert response == {"results": [{"text": "a"}]}
+    response["results"].clear()
+    assert cache.get(key, 1) == {"results": [{"text": "a"}]}
+    assert cache.stats()["hits"] == 2
+
+
+def test_version_change_invalidates_entry():
+    cache = _cache()
+    key = cache.make_key("milvus", "coll", "query", top_k=3)
+    cache.put(key, 1, {"results": []})
+
+    assert cache.get(key, 2) is None
+    stats = cache.stats()
+    assert stats["stale"] == 1 and stats["entries"] == 0
+    # 失效的条目已删除，回到旧版本也不会命中
+    assert cache.get(key, 1) is None
+
+
+def test_expired_entry_is_a_miss():
+    cache = _cache(ttl_seconds=0.01)
+    key = cache.make_key("milvus", "coll", "query")
+    cache.put(key, 1, {"results": []})
+    time.sleep(0.02)
+    assert cache.get(key, 1) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_make_key_is_order_independent_and_parameter_sensitive():
+    assert SearchResultCache.make_key("milvus", "c", "q", top_k=3, threshold=0.5) == \
+        SearchResultCache.make_key("milvus", "c", "q", threshold=0.5, top_k=3)
+    assert SearchResultCache.make_key("milvus", "c", "q", top_k=3) != SearchResultCache.make_key("milvus", "c", "q", top_k=4)
+
+
+def test_lru_eviction_by_entry_count():
+    cache = _cache(max_entries=2)
+    cache.put("a", 1, {"v": "a"})
+    cache.put("b", 1, {"v": "b"})
+    assert cache.get("a", 1) is not None
+    cache.put("c", 1, {"v": "c"})
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None and cache.get("c", 1) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_cache_never_hits():
+    cache = _cache(enabled=False)
+    cache.put("a", 1, {"v": "a"})
+    assert cache.get("a", 1) is None
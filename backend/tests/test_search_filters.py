@@ -0,0 +1,66 @@
+import pytest
+from services.search_filters import SearchFilters
+
+
+def test_scalar_list_and_operator_specs_to_milvus_expr():
+    filters = SearchFilters({
+        "document_name": "manual.pdf",
+        "page_number": [3, "4"],
+        "word_count": {"gte": 30, "lt": 500},
+    })
+    assert filters.to_milvus_expr() == (
+        'document_name == "manual.pdf" and page_number in ["3", "4"] '
+        "and word_count >= 30 and word_count < 500"
+    )
+
+
+def test_word_count_threshold_becomes_gte_condition():
+    assert SearchFilters(word_count_threshold=30).to_milvus_expr() == "word_count >= 30"
+    assert SearchFilters().to_milvus_expr() == ""
+    assert SearchFilters().is_empty()
+
+
+def test_nin_and_string_literals_are_escaped():
+    expr = SearchFilters({"document_name": {"nin": ['a" or id >= 0 or "']}}).to_milvus_expr()
+    assert expr == 'document_name not in ["a\\" or id >= 0 or \\""]'
+
+
+@pytest.mark.parametrize("filters", [
+    {"source": "x"},
+    {"word_count": {"between": [1, 2]}},
+    {"document_name": {"gt": "a"}},
+])
+def test_invalid_filters_raise(filters):
+    with pytest.raises(ValueError):
+        SearchFilters(filters)
+
+
+def test_matches_agrees_with_expr_semantics():
+    filters = SearchFilters({"document_name": ["a.pdf", "b.pdf"], "word_count": {"gte": 30}})
+    assert filters.matches({"document_name": "a.pdf", "word_count": 30})
+    assert filters.matches({"document_name": "b.pdf", "word_count": "120"})
+    assert not filters.matches({"document_name": "c.pdf", "word_count": 100})
+    assert not filters.matches({"document_name": "a.pdf", "word_count": 29})
+    # 缺少被过滤的字段视为不满足
+    assert not filters.matches({"document_name": "a.pdf"})
+
+
+def test_matches_ne_and_nin():
+    filters = SearchFilters({"page_number": {"ne": 1, "nin": [2, 3]}})
+    assert filters.matches({"page_number": "4"})
+    assert not filters.matches({"page_number": "1"})
+    assert not filters.matches({"page_number": "3"})
+
+
+def test_values_for_intersects_eq_and_in_conditions():
+    filters = SearchFilters({"document_name": {"in": ["a", "b", "c"], "eq": "b"}})
+    assert filters.values_for("document_name") == ["b"]
+    assert SearchFilters({"word_count": {"gte": 1}}).values_for("document_name") is None
+
+
+def test_to_chroma_where():
+    assert SearchFilters().to_chroma_where() is None
+    assert SearchFilters({"document_name": "a"}).to_chroma_where() == {"document_name": {"$eq": "a"}}
+    assert SearchFilters({"document_name": "a"}, word_count_threshold=5).to_chroma_where() == {
+        "$and": [{"document_name": {"$eq": "a"}}, {"word_count": {"$gte": 5}}]
+    }
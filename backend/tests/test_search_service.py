@@ -0,0 +1,129 @@
+import asyncio
+
+import numpy as np
+
+from conftest import fake_vector
+from services.search_service import SearchService
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+
+CONTENTS = [f"section {name}" for name in
+            ("one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten")]
+
+
+def index_manual(embedding_file, collection_name="knowledge_base"):
+    config = VectorDBConfig(provider="milvus", index_mode="flat")
+    return VectorStoreService().index_embeddings(embedding_file("manual.pdf", CONTENTS), config,
+                                                 collection_name=collection_name)
+
+
+def cosine(a, b):
+    a, b = np.array(a), np.array(b)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_range_search_returns_every_hit_above_threshold(vector_store_dir, embedding_file, fake_query_embedding):
+    index_manual(embedding_file)
+    query = "section three"
+    scores = {c: cosine(fake_vector(query), fake_vector(c)) for c in CONTENTS}
+    # 阈值取在两档分数之间，不受float32分数舍入影响
+    levels = sorted(set(round(score, 6) for score in scores.values()), reverse=True)
+    threshold = (levels[2] + levels[3]) / 2
+    expected = {c for c, score in scores.items() if score >= threshold}
+    assert len(expected) > 1
+
+    response = asyncio.run(SearchService().search(
+        "milvus", query, "knowledge_base", top_k=1, threshold=threshold, word_count_threshold=0, range_search=True
+    ))
+    assert "error" not in response
+    assert {hit["text"] for hit in response["results"]} == expected
+    assert all(hit["score"] >= threshold - 1e-6 for hit in response["results"])
+
+
+def test_neighbor_windows_are_merged(vector_store_dir, embedding_file):
+    index_manual(embedding_file)
+    hits = [
+        {"text": CONTENTS[chunk - 1], "score": score,
+         "metadata": {"source": "manual.pdf", "chunk": chunk, "total_chunks": 10, "page": chunk}}
+        for chunk, score in ((3, 0.9), (9, 0.8), (5, 0.7))
+    ]
+    response = asyncio.run(SearchService()._expand_neighbors("milvus", "knowledge_base", hits, 1))
+
+    # 块3和块5的窗口 [2, 4]、[4, 6] 重叠，合并为一段；块9的窗口 [8, 10] 单独成段
+    contexts = response["contexts"]
+    assert [(c["chunk_range"], c["hit_chunks"], c["score"]) for c in contexts] == [
+        ([2, 6], [3, 5], 0.9),
+        ([8, 10], [9], 0.8)
+    ]
+    assert [chunk["text"] for chunk in contexts[0]["chunks"]] == CONTENTS[1:6]
+    assert [chunk["is_hit"] for chunk in contexts[0]["chunks"]] == [False, True, False, True, False]
+    # 重叠的块4只读取一次
+    assert response["neighbors"]["requested"] == response["neighbors"]["fetched"] == 5
+
+
+def test_search_stream_emits_stages_then_results(vector_store_dir, embedding_file, fake_query_embedding):
+    index_manual(embedding_file)
+
+    async def collect(**params):
+        return [event async for event in SearchService().search_stream(**params)]
+
+    events = asyncio.run(collect(provider="milvus", query="section three", collection_id="knowledge_base",
+                                 top_k=3, threshold=0.0, word_count_threshold=0))
+    assert [event["event"] for event in events] == ["embedded", "candidates", "result", "result", "result", "done"]
+    assert [event["rank"] for event in events[2:5]] == [1, 2, 3]
+    assert events[2]["result"]["text"] == "section three"
+    assert "results" not in events[-1]
+
+    events = asyncio.run(collect(provider="milvus", query="section three", collection_id="missing_collection"))
+    assert events[-1]["event"] == "error"
+
+
+def test_fan_out_merges_collections_by_score(vector_store_dir, embedding_file, fake_query_embedding):
+    config = VectorDBConfig(provider="milvus", index_mode="flat")
+    service = VectorStoreService()
+    service.index_embeddings(embedding_file("fruit.pdf", ["apples grow on trees", "apple pie recipe"]), config,
+                             collection_name="fruit_kb")
+    service.index_embeddings(embedding_file("bread.pdf", ["banana bread", "rye loaf"]), config,
+                             collection_name="bread_kb")
+
+    response = asyncio.run(SearchService().search_collections(
+        "milvus", "banana bread", ["fruit_kb", "bread_kb", "missing_kb"], top_k=3, threshold=0.0, word_count_threshold=0
+    ))
+
+    results = response["results"]
+    assert len(results) == 3
+    assert results[0]["text"] == "banana bread"
+    assert results[0]["metadata"]["collection_id"] == "bread_kb"
+    assert {hit["metadata"]["collection_id"] for hit in results} == {"fruit_kb", "bread_kb"}
+    scores = [hit["normalized_score"] for hit in results]
+    assert scores == sorted(scores, reverse=True)
+    stats = {stat["collection_id"]: stat for stat in response["collections"]}
+    assert stats["fruit_kb"]["hits"] == stats["bread_kb"]["hits"] == 2
+    assert "error" in stats["missing_kb"]
+
+
+def test_batch_search_answers_each_query(vector_store_dir, embedding_file, fake_query_embedding, monkeypatch):
+    index_manual(embedding_file)
+    search_service = SearchService()
+    calls = []
+
+    def create_query_embeddings(texts, provider, model):
+        calls.append(list(texts))
+        return [fake_vector(text) for text in texts]
+
+    monkeypatch.setattr(search_service.embedding_service, "create_query_embeddings", create_query_embeddings)
+    queries = ["section three", "section ten", "section one"]
+
+    response = asyncio.run(search_service.search_batch(
+        "milvus", queries, "knowledge_base", top_k=2, threshold=0.0, word_count_threshold=0
+    ))
+
+    # 所有查询一次嵌入
+    assert calls == [queries]
+    assert [entry["query"] for entry in response["results"]] == queries
+    for entry in response["results"]:
+        single = asyncio.run(search_service.search(
+            "milvus", entry["query"], "knowledge_base", top_k=2, threshold=0.0, word_count_threshold=0
+        ))
+        assert [round(hit["score"], 5) for hit in entry["results"]] == [round(hit["score"], 5) for hit in single["results"]]
+        assert entry["results"][0]["text"] == entry["query"]
+    assert {"open_ms", "embedding_ms", "search_ms"} <= set(response["timings"])
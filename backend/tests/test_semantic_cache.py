@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from services.semantic_cache import SemanticQueryCache
+
+
+def _cache(**kwargs):
+    options = dict(enabled=True, max_distance=0.05, max_entries=100, ttl_seconds=60,
+                   lsh_tables=8, lsh_bits=4, audit_rate=0.0, audit_min_overlap=0.5, audit_log_size=10)
+    options.update(kwargs)
+    return SemanticQueryCache(**options)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(3)
+    base = rng.normal(size=32)
+    near = base + rng.normal(scale=1e-3, size=32)
+    far = rng.normal(size=32)
+    return base.tolist(), near.tolist(), far.tolist()
+
+
+def test_near_query_hits_and_far_query_misses(vectors):
+    base, near, far = vectors
+    cache = _cache()
+    cache.put("ns", 1, "what is milvus", base, {"results": [{"text": "a"}]})
+
+    match = cache.lookup("ns", 1, near)
+    assert match is not None
+    assert match["query"] == "what is milvus"
+    assert match["distance"] <= 0.05
+    assert match["response"] == {"results": [{"text": "a"}]}
+    assert cache.lookup("ns", 1, far) is None
+
+
+def test_version_change_invalidates_entry(vectors):
+    base, near, _ = vectors
+    cache = _cache()
+    cache.put("ns", 1, "q", base, {"results": []})
+
+    assert cache.lookup("ns", 2, near) is None
+    stats = cache.stats()
+    assert stats["stale"] == 1 and stats["entries"] == 0
+    assert cache.lookup("ns", 1, near) is None
+
+
+def test_namespaces_are_isolated(vectors):
+    base, _, _ = vectors
+    cache = _cache()
+    cache.put("top_k=3", 1, "q", base, {"results": []})
+    assert cache.lookup("top_k=5", 1, base) is None
+
+
+def test_invalidate_and_eviction(vectors):
+    base, near, far = vectors
+    cache = _cache(max_entries=1)
+    cache.put("ns", 1, "q1", base, {"results": []})
+    cache.put("ns", 1, "q2", far, {"results": []})
+    # 超出条目数时淘汰最早的条目
+    assert cache.lookup("ns", 1, near) is None
+    match = cache.lookup("ns", 1, far)
+    assert match is not None
+    cache.invalidate(match["entry_id"])
+    assert cache.lookup("ns", 1, far) is None
+
+
+def test_record_audit_flags_low_overlap():
+    cache = _cache()
+    cached = [{"metadata": {"source": "a", "chunk": 1}}, {"metadata": {"source": "a", "chunk": 2}}]
+    assert not cache.record_audit("q", "q'", 0.01, cached, cached)
+    assert cache.record_audit("q", "q'", 0.01, cached, [{"metadata": {"source": "b", "chunk": 1}}])
+    assert cache.stats()["false_hit_rate"] == 0.5
+
+
+def test_remembered_embeddings(vectors):
+    base, _, _ = vectors
+    cache = _cache()
+    cache.remember_embedding("huggingface", "m", "q", base)
+    assert cache.recent_embedding("huggingface", "m", "q") == base
+    assert cache.recent_embedding("huggingface", "other", "q") is None
+    assert _cache(enabled=False).lookup("ns", 1, base) is None
@@ -0,0 +1,20 @@
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+
+
+def test_rebalance_keeps_every_row(vector_store_dir, embedding_file):
+    service = VectorStoreService()
+    config = VectorDBConfig(provider="milvus", index_mode="flat")
+    contents = [f"chunk number {i}" for i in range(10)]
+    service.index_embeddings(embedding_file("manual.pdf", contents), config, collection_name="sharded_kb", shards=2)
+    shards = service.get_shard_info("sharded_kb")
+    assert len(shards) == 2
+    assert sum(s["num_entities"] for s in shards) == 10
+
+    rebalanced = service.rebalance_shards("sharded_kb", 3)
+    assert rebalanced["moved_rows"] == 10
+    shards = service.get_shard_info("sharded_kb")
+    assert len(shards) == 3
+    assert all(s["uri"].endswith(f"sharded_kb_g1_{s['shard']:02d}.db") for s in shards)
+    assert sum(s["num_entities"] for s in shards) == 10
+    # 旧一代的分片文件已删除
+    assert not list((vector_store_dir / "03-vector-store" / "shards").glob("sharded_kb_g0_*.db"))
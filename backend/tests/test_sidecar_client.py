@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import pytest
+
+from utils.sidecar_client import HEADER, VectorStoreSidecarClient, SidecarError, encode_message
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket路径有长度限制，不使用pytest较长的tmp_path
+    directory = tempfile.mkdtemp(prefix="sidecar")
+    path = os.path.join(directory, "s.sock")
+    yield path
+    if os.path.exists(path):
+        os.remove(path)
+    os.rmdir(directory)
+
+
+def recv_exact(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("closed")
+        data += chunk
+    return data
+
+
+def serve_raw(path, handlers):
+    """
+    按顺序接受连接，每个连接读取一条请求后交给对应的handler处理；返回收到的请求列表
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    received = []
+
+    def run():
+        for handler in handlers:
+            conn, _ = server.accept()
+            with conn:
+                (size,) = HEADER.unpack(recv_exact(conn, HEADER.size))
+                request = json.loads(recv_exact(conn, size).decode("utf-8"))
+                received.append(request)
+                handler(conn, request)
+        server.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return received, thread
+
+
+def hang_up(conn, request):
+    pass
+
+
+def reply(conn, request):
+    conn.sendall(encode_message({"ok": True, "result": request["op"]}))
+
+
+def test_encode_message_prefixes_utf8_length():
+    message = encode_message({"op": "search", "params": {"query": "向量"}})
+    (size,) = HEADER.unpack(message[:HEADER.size])
+    assert size == len(message) - HEADER.size
+    assert json.loads(message[HEADER.size:].decode("utf-8")) == {"op": "search", "params": {"query": "向量"}}
+
+
+def test_sidecar_dispatches_framed_requests(vector_store_dir, socket_path):
+    from services.vector_store_sidecar import VectorStoreSidecar
+
+    sidecar = VectorStoreSidecar(socket_path)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_unix_server(sidecar._handle_client, path=socket_path))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        client = VectorStoreSidecarClient(socket_path, timeout=5)
+        assert client.call("ping") == {"pid": os.getpid()}
+        with pytest.raises(ValueError, match="Unsupported sidecar operation"):
+            client.call("no_such_op")
+        # 错误响应后连接仍可继续使用
+        assert client.call("list_collections") == []
+        client._close()
+    finally:
+        async def shutdown():
+            server.close()
+            await server.wait_closed()
+            # 等待连接处理协程读到EOF后退出
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_write_op_is_not_resent_after_delivery(socket_path):
+    received, thread = serve_raw(socket_path, [hang_up, reply])
+    client = VectorStoreSidecarClient(socket_path, timeout=5)
+    with pytest.raises(SidecarError):
+        client.call("delete_collection", collection_id="knowledge_base")
+    # 只读操作在连接断开后重连重试
+    client.call("ping")
+    assert [r["op"] for r in received] == ["delete_collection", "ping"]
+    client._close()
+    thread.join(timeout=5)
+
+
+def test_read_only_op_is_retried_after_hang_up(socket_path):
+    received, thread = serve_raw(socket_path, [hang_up, reply])
+    client = VectorStoreSidecarClient(socket_path, timeout=5)
+    assert client.call("collection_info", collection_id="knowledge_base") == "collection_info"
+    assert [r["op"] for r in received] == ["collection_info", "collection_info"]
+    client._close()
+    thread.join(timeout=5)
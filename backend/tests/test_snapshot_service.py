@@ -0,0 +1,34 @@
+import json
+import zipfile
+
+from services.catalog_service import collection_catalog
+from services.lexical_index_service import lexical_index
+from services.snapshot_service import SnapshotService
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+
+
+def test_milvus_snapshot_round_trip_on_milvus_lite(vector_store_dir, embedding_file):
+    service = VectorStoreService()
+    config = VectorDBConfig(provider="milvus", index_mode="flat")
+    service.index_embeddings(embedding_file("a.pdf", ["first chunk", "second chunk"]), config,
+                             collection_name="knowledge_base")
+    service.index_embeddings(embedding_file("b.pdf", ["third chunk"]), config, collection_name="knowledge_base")
+
+    snapshots = SnapshotService()
+    exported = snapshots.export_snapshot("milvus", "knowledge_base")
+    assert exported["count"] == 3
+
+    imported = snapshots.import_snapshot(exported["path"], collection_name="restored_kb")
+    assert imported["count"] == 3
+    info = service.get_collection_info("milvus", "restored_kb")
+    assert info["num_entities"] == 3
+    assert {p["document_name"]: p["num_entities"] for p in info["partitions"]} == {"a.pdf": 2, "b.pdf": 1}
+    assert collection_catalog.get("milvus", "restored_kb")["embedding"]["embedding_model"] == "test-model"
+
+    assert lexical_index.exists("milvus", "restored_kb")
+
+    # 精简集合的块文本随快照恢复，再次导出的快照与原快照内容一致
+    reexported = snapshots.export_snapshot("milvus", "restored_kb")
+    with zipfile.ZipFile(reexported["path"]) as bundle:
+        contents = json.loads(bundle.read("columns/_chunk_content.json"))
+    assert sorted(contents) == ["first chunk", "second chunk", "third chunk"]
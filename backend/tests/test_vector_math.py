@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.vector_math import mmr_select, normalize_vector
+
+
+def _cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def _reference_mmr(query, candidates, k, lambda_mult):
+    selected = []
+    for _ in range(min(k, len(candidates))):
+        best, best_score = None, -math.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max((_cosine(candidate, candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * _cosine(candidate, query) - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+def test_lambda_one_orders_by_relevance():
+    query = [1.0, 0.0]
+    candidates = [[0.0, 1.0], [1.0, 0.1], [1.0, 1.0], [1.0, 0.0]]
+    selected, scores = mmr_select(query, candidates, k=4, lambda_mult=1.0)
+    assert selected == [3, 1, 2, 0]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_near_duplicates_are_skipped():
+    query = [1.0, 0.0, 0.0]
+    candidates = [[1.0, 0.05, 0.0], [1.0, 0.06, 0.0], [0.7, 0.0, 0.7]]
+    selected, _ = mmr_select(query, candidates, k=2, lambda_mult=0.5)
+    # 第二条与第一条几乎相同，多样性让位给相关性略低但不重复的候选
+    assert selected == [0, 2]
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.3, 0.7])
+def test_matches_reference_implementation(lambda_mult):
+    rng = np.random.default_rng(1)
+    query = rng.normal(size=16)
+    candidates = rng.normal(size=(30, 16))
+    selected, _ = mmr_select(query, candidates, k=10, lambda_mult=lambda_mult)
+    assert selected == _reference_mmr(query, candidates, 10, lambda_mult)
+
+
+def test_edge_cases():
+    assert mmr_select([1.0, 0.0], [], k=3, lambda_mult=0.5) == ([], [])
+    assert mmr_select([1.0, 0.0], [[1.0, 0.0]], k=0, lambda_mult=0.5) == ([], [])
+    selected, _ = mmr_select([1.0, 0.0], [[1.0, 0.0], [0.0, 1.0]], k=5, lambda_mult=0.5)
+    assert sorted(selected) == [0, 1]
+
+
+def test_normalize_vector():
+    assert normalize_vector([3.0, 4.0]) == pytest.approx([0.6, 0.8])
+    assert normalize_vector([0.0, 0.0]) == [0.0, 0.0]
+    unit = [0.6, 0.8]
+    assert normalize_vector(unit) == unit
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from pymilvus import Collection
+
+from services.search_service import SearchService
+from services.vector_store_service import VectorStoreService, VectorDBConfig
+from utils.milvus_connection import milvus_connection
+
+
+def index(embedding_file, **kwargs):
+    config = VectorDBConfig(provider="milvus", index_mode="flat")
+    return VectorStoreService().index_embeddings(embedding_file, config, **kwargs)
+
+
+def test_filter_fields_get_scalar_indexes_on_milvus_lite(vector_store_dir, embedding_file):
+    result = index(embedding_file("manual.pdf", ["alpha beta", "gamma delta epsilon"]))
+
+    with milvus_connection():
+        indexes = {i.field_name: i.params["index_type"] for i in Collection(result["collection_name"]).indexes}
+    assert indexes["word_count"] == "INVERTED"
+    assert indexes["document_name"] == "INVERTED"
+    assert indexes["page_number"] == "INVERTED"
+
+
+def test_documents_share_a_named_collection_on_milvus_lite(vector_store_dir, embedding_file, fake_query_embedding):
+    service = VectorStoreService()
+    index(embedding_file("a.pdf", ["apples grow on trees", "apple pie recipe"]), collection_name="knowledge_base")
+    result = index(embedding_file("b.pdf", ["bananas are yellow", "banana bread"]), collection_name="knowledge_base")
+    # 重新索引同一文档时替换其原有的行
+    index(embedding_file("a.pdf", ["apples grow on trees", "apple pie recipe"], name="a_again.json"), collection_name="knowledge_base")
+
+    assert result["collection_name"] == "knowledge_base"
+    assert result["partition_name"] == service._document_partition_name("b.pdf")
+    info = service.get_collection_info("milvus", "knowledge_base")
+    assert info["num_entities"] == 4
+    assert {p["document_name"]: p["num_entities"] for p in info["partitions"]} == {"a.pdf": 2, "b.pdf": 2}
+    with pytest.raises(ValueError, match="Milvus Lite"):
+        service.set_documents_loaded("milvus", "knowledge_base", ["a.pdf"], loaded=False)
+
+    response = asyncio.run(SearchService().search(
+        "milvus", "banana bread", "knowledge_base", top_k=4, threshold=0.0, word_count_threshold=0,
+        filters={"document_name": "a.pdf"}
+    ))
+    assert "error" not in response
+    assert {hit["metadata"]["source"] for hit in response["results"]} == {"a.pdf"}
+    assert len(response["results"]) == 2
+
+
+def test_upsert_into_named_collection_writes_only_the_delta(vector_store_dir, embedding_file):
+    contents = ["intro text", "setup steps", "usage notes", "closing words"]
+    first = index(embedding_file("guide.pdf", contents, pages=[1, 1, 2, 2]),
+                  collection_name="knowledge_base", upsert=True)
+    assert first["changes"] == {"inserted": 4, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    # 插入一个块、删除最后一个块：其余块的序号变化不算作更新
+    second = index(
+        embedding_file("guide.pdf", ["intro text", "new warning", "setup steps", "usage notes"],
+                       pages=[1, 1, 1, 2], name="guide_v2.json"),
+        collection_name="knowledge_base", upsert=True
+    )
+    assert second["changes"] == {"inserted": 1, "updated": 0, "deleted": 1, "unchanged": 3}
+
+    # 内容不变、页码变化的块按更新处理
+    third = index(
+        embedding_file("guide.pdf", ["intro text", "new warning", "setup steps", "usage notes"],
+                       pages=[1, 1, 1, 3], name="guide_v3.json"),
+        collection_name="knowledge_base", upsert=True
+    )
+    assert third["changes"] == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 3}
+    assert VectorStoreService().get_collection_info("milvus", "knowledge_base")["num_entities"] == 4
@@ -93,6 +93,12 @@ MILVUS_CONFIG = {
             "M": 16,
             "efConstruction": 200
         }
+    },
+    # 标量字段索引，用于加速过滤条件下推（Milvus Lite只支持INVERTED，不支持STL_SORT）
+    "scalar_indexes": {
+        "word_count": "INVERTED",
+        "document_name": "INVERTED",
+        "page_number": "INVERTED"
     }
 } 
 
@@ -112,4 +118,201 @@ CHROMA_CONFIG = {
         },
         "standard": {}         # 标准索引不需要额外参数
     }
-}
\ No newline at end of file
+}
+
+# 集合目录配置：记录每个集合的推荐索引参数等集合级信息
+CATALOG_CONFIG = {
+    "uri": "03-vector-store/collection_catalog.json"
+}
+
+
+# 索引参数自动调优配置
+TUNING_CONFIG = {
+    "sample_queries": 100,      # 采样的查询向量数量
+    "top_k": 10,                # 计算recall@k时的k
+    "target_recall": 0.95,      # 推荐配置需要达到的最低召回率
+    "max_vectors": 200000,      # 参与调优的最大向量数
+    "lite_index_types": ["FLAT", "IVF_FLAT", "AUTOINDEX"],     # Milvus Lite能构建的索引类型，网格中的其他类型被跳过
+    "grids": {
+        "milvus": {
+            "HNSW": {
+                "M": [8, 16, 32],
+                "efConstruction": [64, 128, 256],
+                "ef": [32, 64, 128]      # 搜索参数
+            },
+            "IVF_FLAT": {
+                "nlist": [64, 256],
+                "nprobe": [8, 32]        # 搜索参数
+            },
+            "AUTOINDEX": {},
+            "FLAT": {}
+        },
+        "chroma": {
+            "HNSW": {
+                "M": [8, 16, 32],
+                "efConstruction": [64, 128, 256],
+                "efSearch": [32, 64, 128]
+            }
+        }
+    }
+}
+
+
+# 后台索引任务配置
+INDEXING_JOB_CONFIG = {
+    "max_workers": 2,           # 索引工作线程数，与处理搜索请求的线程池相互独立
+    "batch_size": 1000,         # 每批写入的块数量，也是进度更新和取消检查的粒度
+    "max_finished_jobs": 100    # 保留的已结束任务数量，超出后丢弃最早结束的任务
+}
+
+
+# 集合快照配置
+SNAPSHOT_CONFIG = {
+    "uri": "03-vector-store/snapshots",   # 快照文件目录
+    "batch_size": 1000,                    # 导出读取和导入写入的批大小
+    "format_version": 1
+}
+
+
+# 保留与垃圾回收策略：每个来源只保留最新的N份带时间戳的产物
+RETENTION_CONFIG = {
+    "artifacts": {                      # 目录 -> 每个来源保留的文件数
+        "01-loaded-docs": 5,
+        "01-chunked-docs": 5,
+        "02-embedded-docs": 3,
+        "04-search-results": 50,
+        "05-generation-results": 50
+    },
+    "collections_keep_latest": 2,       # 每个 {文件名}_{provider} 保留的时间戳集合数
+    "protected_tags": ["pinned"],       # 带有这些标签的集合不会被回收
+    "compact": True                     # 回收后压缩向量库（Milvus compact、Chroma VACUUM）
+}
+
+
+# 向量库sidecar配置：设置 VECTOR_STORE_SIDECAR_SOCKET 后，API进程通过Unix socket
+# 把Milvus的搜索和写入交给独占Milvus Lite数据文件的sidecar进程，多个API worker即可共享同一索引
+SIDECAR_CONFIG = {
+    "socket_path": os.getenv("VECTOR_STORE_SIDECAR_SOCKET", ""),
+    "batch_window_ms": 5,       # 搜索请求的合批等待时间
+    "max_batch_size": 32,       # 单次合批的最大搜索请求数
+    "timeout": 300              # 客户端等待响应的超时时间（秒），需覆盖较大的索引写入
+}
+
+
+# 分片集合配置：每个分片是独立的Milvus Lite数据文件，按块ID哈希分配
+SHARD_CONFIG = {
+    "uri_template": "03-vector-store/shards/{collection}_g{generation}_{shard:02d}.db",
+    "max_shards": 64
+}
+
+
+# 块文本存储配置：块文本和行级嵌入时间戳压缩后存放在向量库之外，搜索后只为最终的top_k读取
+DOC_STORE_CONFIG = {
+    "uri": "03-vector-store/doc_store",
+    "compression_level": 6,
+    "slim_schema": True         # 新建集合不在向量库中保存块文本和每行的嵌入配置
+}
+
+
+# 向量归一化配置：索引时把向量归一化为单位长度，新集合改用内积度量（Milvus IP、Chroma ip），
+# 搜索时不再为每次比较计算范数
+NORMALIZATION_CONFIG = {
+    "normalize_vectors": True,
+    "tolerance": 1e-3           # 范数与1的偏差在此范围内视为已归一化
+}
+
+
+# 词法索引配置：索引时为每个集合建立BM25倒排索引（中日韩文本按字二元组切分，拉丁文本按词切分），
+# 混合检索时与向量检索的排名按倒数排名融合（RRF）
+LEXICAL_INDEX_CONFIG = {
+    "uri": "03-vector-store/lexical_index",
+    "k1": 1.2,
+    "b": 0.75,
+    "rrf_k": 60,                    # RRF平滑常数，score = sum(1 / (rrf_k + rank))
+    "candidate_multiplier": 4       # 每一路召回 top_k * 倍数 个候选参与融合
+}
+
+
+# 重排序配置：向量（或混合）检索多取候选，用常驻内存的本地交叉编码器对（查询, 块）打分后取top_k
+RERANK_CONFIG = {
+    "model": "BAAI/bge-reranker-base",
+    "device": None,                 # None 时由sentence-transformers自动选择
+    "max_length": 512,              # 查询与块拼接后的最大token数
+    "candidate_multiplier": 4,      # 未指定候选数时取 top_k * 倍数 个候选
+    "max_candidates": 100,          # 候选数上限，所有未命中缓存的对在一次前向计算中打分
+    "cache_size": 20000             # 分数缓存的条目数（按模型、查询和块内容的摘要缓存）
+}
+
+
+# 搜索结果缓存配置：按（提供商、集合、查询、top_k、阈值、过滤条件等）缓存搜索响应，
+# 条目记录写入时的集合版本，集合被索引、增量更新或删除后不再命中
+SEARCH_CACHE_CONFIG = {
+    "enabled": True,
+    "ttl_seconds": 300,
+    "max_entries": 2000,
+    "max_memory_mb": 64             # 按序列化后的响应大小计算
+}
+
+
+# 检索评估配置：查询按批嵌入和搜索，多个批次在并发上限内同时执行
+EVALUATION_CONFIG = {
+    "output_dir": "06-evaluation-result",
+    "batch_size": 32,               # 每批查询共用一次嵌入调用和一次多向量搜索
+    "concurrency": 4                # 同时执行的批次数上限
+}
+
+
+# 嵌入模型登记表配置：记录每个模型的向量维度、最大token数和输出是否归一化，
+# 搜索在加载模型前据此确认模型与集合维度一致
+MODEL_REGISTRY_CONFIG = {
+    "uri": "03-vector-store/model_registry.json",
+    "hf_cache_folder": "./huggingface_cache"    # 与嵌入服务加载HuggingFace模型时使用的缓存目录一致
+}
+
+
+# MMR多样化配置：多取候选及其向量，按 lambda * 相关性 - (1 - lambda) * 与已选结果的最大相似度 选出top_k
+MMR_CONFIG = {
+    "lambda": 0.5,                  # 1为只按相关性排序，越小越追求多样性
+    "candidate_multiplier": 4,      # 未指定候选数时取 top_k * 倍数 个候选
+    "max_candidates": 100
+}
+
+
+# 语义查询缓存配置：新查询的向量与同一集合版本、同一搜索参数下某个已缓存查询足够接近时直接返回其结果；
+# 结果是近似的，默认关闭
+SEMANTIC_CACHE_CONFIG = {
+    "enabled": False,
+    "max_distance": 0.05,           # 命中的最大余弦距离（1 - 余弦相似度）
+    "max_entries": 5000,
+    "ttl_seconds": 300,
+    "lsh_tables": 4,                # 随机超平面LSH的表数
+    "lsh_bits": 12,                 # 每张表的超平面数
+    "audit_rate": 0.05,             # 命中后重新执行真实搜索以核对结果的抽样比例
+    "audit_min_overlap": 0.5,       # 缓存结果与真实结果的重合度（Jaccard）低于此值记为误命中
+    "audit_log_size": 100
+}
+
+
+# 邻近块扩展配置：为每个命中补充同一文档中前后各n个块作为生成上下文，重叠或相邻的窗口合并为一段
+NEIGHBOR_CONFIG = {
+    "max_window": 5                 # 每侧最多扩展的块数
+}
+
+
+# 范围搜索配置：相似度阈值下推到向量库（Milvus的radius），引擎只返回阈值以上的结果；
+# range_search时不按top_k截断，返回阈值以上的全部结果，最多max_results个
+RANGE_SEARCH_CONFIG = {
+    "pushdown": True,               # 索引类型不支持范围搜索时可关闭，改为取top_k后在Python中过滤
+    "max_results": 100,
+    "radius_margin": 1e-6           # radius比阈值低的量：Milvus的radius不含边界，分数等于阈值的结果仍应返回
+}
+
+
+# 执行器配置：搜索管线中CPU密集的模型推理与阻塞的数据库I/O分别在专用线程池中执行，事件循环只负责调度
+EXECUTOR_CONFIG = {
+    "inference_workers": int(os.getenv("INFERENCE_WORKERS", "0")),    # 0为按CPU核数
+    "io_workers": int(os.getenv("IO_WORKERS", "32")),
+    "max_concurrent_searches": int(os.getenv("MAX_CONCURRENT_SEARCHES", "64")),    # 同时执行的搜索上限，超出的请求排队
+    "loop_lag_interval_ms": 100,    # 事件循环延迟的采样间隔
+    "loop_lag_window": 600          # 保留的采样数
+}
@@ -0,0 +1,202 @@
+import os
+import sys
+import asyncio
+import functools
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from .config import EXECUTOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 模型推理（查询嵌入、交叉编码器重排序、向量运算）使用按CPU核数定大小的线程池，
+# 推理库在计算时释放GIL，线程数超过核数只会互相争抢；数据库和文件I/O使用单独的较大线程池，
+# 慢推理不会占满I/O线程，反之亦然
+_executors_lock = threading.Lock()
+_inference_executor: Optional[ThreadPoolExecutor] = None
+_io_executor: Optional[ThreadPoolExecutor] = None
+_search_slots: Optional[asyncio.Semaphore] = None
+
+
+def inference_workers() -> int:
+    """
+    推理线程池的大小，未配置时为CPU核数
+    """
+    return EXECUTOR_CONFIG["inference_workers"] or os.cpu_count() or 1
+
+
+def _get_executor(kind: str) -> ThreadPoolExecutor:
+    """
+    获取（首次使用时创建）指定类型的线程池
+    """
+    global _inference_executor, _io_executor
+    with _executors_lock:
+        if kind == "inference":
+            if _inference_executor is None:
+                _inference_executor = ThreadPoolExecutor(max_workers=inference_workers(), thread_name_prefix="inference")
+            return _inference_executor
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=EXECUTOR_CONFIG["io_workers"], thread_name_prefix="io")
+        return _io_executor
+
+
+async def run_inference(func: Callable, *args, **kwargs) -> Any:
+    """
+    在推理线程池中执行CPU密集的调用
+
+    参数:
+        func: 同步函数
+        *args, **kwargs: 函数参数
+
+    返回:
+        函数的返回值
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_executor("inference"), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_io(func: Callable, *args, **kwargs) -> Any:
+    """
+    在I/O线程池中执行阻塞的数据库或文件调用
+
+    参数:
+        func: 同步函数
+        *args, **kwargs: 函数参数
+
+    返回:
+        函数的返回值
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_executor("io"), functools.partial(func, *args, **kwargs)
+    )
+
+
+@asynccontextmanager
+async def io_context(context):
+    """
+    在I/O线程池中进入和退出同步上下文管理器（如milvus_connection），上下文内的各阶段可分别在不同线程池中执行
+
+    参数:
+        context: 同步上下文管理器
+
+    返回:
+        上下文管理器进入后的值
+    """
+    value = await run_io(context.__enter__)
+    try:
+        yield value
+    except BaseException:
+        if not await run_io(context.__exit__, *sys.exc_info()):
+            raise
+    else:
+        await run_io(context.__exit__, None, None, None)
+
+
+def search_slots() -> asyncio.Semaphore:
+    """
+    限制同时执行的搜索数的信号量，超出的请求在事件循环上等待而不占用线程
+    """
+    global _search_slots
+    if _search_slots is None:
+        _search_slots = asyncio.Semaphore(EXECUTOR_CONFIG["max_concurrent_searches"])
+    return _search_slots
+
+
+def shutdown_executors():
+    """
+    关闭线程池，等待已提交的任务完成
+    """
+    global _inference_executor, _io_executor
+    with _executors_lock:
+        for executor in (_inference_executor, _io_executor):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        _inference_executor = _io_executor = None
+
+
+class EventLoopMonitor:
+    """
+    事件循环延迟监控：按固定间隔休眠，实际唤醒时间比预期晚的部分即为事件循环被阻塞的时长
+    """
+
+    def __init__(self, interval_ms: float = EXECUTOR_CONFIG["loop_lag_interval_ms"],
+                 window: int = EXECUTOR_CONFIG["loop_lag_window"]):
+        """
+        初始化监控
+
+        参数:
+            interval_ms: 采样间隔（毫秒）
+            window: 保留的最近采样数
+        """
+        self.interval = interval_ms / 1000.0
+        self._samples = deque(maxlen=window)
+        self._max_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        在当前事件循环中启动采样任务
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        """
+        停止采样任务
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        """
+        采样循环
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(loop.time() - expected, 0.0) * 1000
+            self._samples.append(lag_ms)
+            self._max_lag_ms = max(self._max_lag_ms, lag_ms)
+            if lag_ms > 10 * self.interval * 1000:
+                logger.warning(f"Event loop was blocked for {lag_ms:.1f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取延迟统计
+
+        返回:
+            最近窗口内延迟的均值、p50/p95/p99和最大值（毫秒），启动以来的最大值，以及线程池配置
+        """
+        samples = sorted(self._samples)
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(int(p / 100 * len(samples)), len(samples) - 1)], 2)
+
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": len(samples),
+            "mean_ms": round(sum(samples) / len(samples), 2) if samples else 0.0,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "max_ms": round(samples[-1], 2) if samples else 0.0,
+            "max_since_start_ms": round(self._max_lag_ms, 2),
+            "executors": {
+                "inference_workers": inference_workers(),
+                "io_workers": EXECUTOR_CONFIG["io_workers"],
+                "max_concurrent_searches": EXECUTOR_CONFIG["max_concurrent_searches"]
+            }
+        }
+
+
+# 创建全局事件循环监控实例
+event_loop_monitor = EventLoopMonitor()
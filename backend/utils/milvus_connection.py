@@ -0,0 +1,61 @@
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict
+from pymilvus import connections
+from .config import MILVUS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 每个别名的引用计数：并发请求共享同一个连接，最后一个使用者退出时才断开
+_connection_lock = threading.Lock()
+_connection_refs: Dict[str, int] = {}
+
+
+@contextmanager
+def milvus_connection(uri: str = None, alias: str = "default"):
+    """
+    获取共享的Milvus连接
+
+    同一别名的并发使用者复用同一个连接，避免某个请求在finally中断开连接时
+    影响其他仍在使用该连接的请求
+
+    参数:
+        uri: 数据库URI，默认使用MILVUS_CONFIG中的URI
+        alias: 连接别名
+
+    返回:
+        连接别名
+    """
+    uri = uri or MILVUS_CONFIG["uri"]
+    with _connection_lock:
+        if _connection_refs.get(alias, 0) == 0:
+            logger.info(f"Connecting to Milvus at {uri} (alias: {alias})")
+            connections.connect(alias=alias, uri=uri, timeout=30)
+        _connection_refs[alias] = _connection_refs.get(alias, 0) + 1
+    try:
+        yield alias
+    finally:
+        with _connection_lock:
+            _connection_refs[alias] -= 1
+            if _connection_refs[alias] == 0:
+                try:
+                    connections.disconnect(alias)
+                    logger.info(f"Disconnected from Milvus (alias: {alias})")
+                except Exception as e:
+                    logger.error(f"Error disconnecting from Milvus: {str(e)}")
+
+
+def is_milvus_lite(uri: str = None) -> bool:
+    """
+    是否为Milvus Lite（本地文件）部署；Milvus Lite不支持分区，按文档的数据只能以document_name字段区分
+
+    参数:
+        uri: 数据库URI，默认使用MILVUS_CONFIG中的URI
+
+    返回:
+        是否为Milvus Lite
+    """
+    uri = uri or MILVUS_CONFIG["uri"]
+    # Milvus Lite使用本地文件路径或sqlite://格式
+    return uri.endswith('.db') or 'sqlite://' in uri or not uri.startswith('http')
@@ -0,0 +1,156 @@
+import json
+import socket
+import struct
+import threading
+import logging
+from typing import Any, Dict
+from .config import SIDECAR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 消息格式：4字节大端长度前缀 + UTF-8 JSON
+HEADER = struct.Struct(">I")
+
+# 只读操作：请求发出后连接断开时可以安全地重发
+READ_ONLY_OPS = frozenset({
+    "ping", "search", "search_batch", "query_chunks", "collection_config", "list_collections", "collection_info"
+})
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """
+    编码一条消息
+
+    参数:
+        message: 消息字典
+
+    返回:
+        带长度前缀的字节串
+    """
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(payload)) + payload
+
+
+def sidecar_enabled() -> bool:
+    """
+    当前进程是否通过sidecar访问Milvus
+    """
+    return bool(SIDECAR_CONFIG["socket_path"])
+
+
+class SidecarError(RuntimeError):
+    """
+    sidecar返回的错误
+    """
+    pass
+
+
+class VectorStoreSidecarClient:
+    """
+    向量库sidecar的同步客户端，每个线程持有自己的连接，便于在线程池中并发调用
+    """
+
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        """
+        初始化客户端
+
+        参数:
+            socket_path: sidecar的Unix socket路径，默认使用SIDECAR_CONFIG
+            timeout: 等待响应的超时时间（秒）
+        """
+        self.socket_path = socket_path or SIDECAR_CONFIG["socket_path"]
+        self.timeout = timeout or SIDECAR_CONFIG["timeout"]
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        """
+        获取当前线程的连接，不存在时新建
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _close(self):
+        """
+        关闭当前线程的连接
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+            finally:
+                self._local.conn = None
+
+    def _recv_exact(self, conn: socket.socket, size: int) -> bytes:
+        """
+        读取指定长度的数据
+        """
+        chunks = []
+        while size:
+            chunk = conn.recv(size)
+            if not chunk:
+                raise ConnectionError("Sidecar closed the connection")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def call(self, op: str, **params) -> Any:
+        """
+        调用sidecar操作
+
+        参数:
+            op: 操作名称（ping、search、search_batch、query_chunks、collection_config、list_collections、
+                index、delete_collection、collection_info、set_documents_loaded、compact、
+                export_snapshot、import_snapshot、tune_index、benchmark_metrics）
+            params: 操作参数
+
+        返回:
+            操作结果
+
+        Raises:
+            ValueError: sidecar端参数校验失败
+            SidecarError: sidecar端执行失败
+        """
+        request = encode_message({"op": op, "params": params})
+        # 连接可能因sidecar重启而失效，重连后重试一次；请求已完整发出后sidecar可能已经执行了操作，
+        # 此时只重试只读操作，写入类操作不能执行两次
+        for attempt in range(2):
+            sent = False
+            try:
+                conn = self._connection()
+                conn.sendall(request)
+                sent = True
+                (size,) = HEADER.unpack(self._recv_exact(conn, HEADER.size))
+                response = json.loads(self._recv_exact(conn, size).decode("utf-8"))
+                break
+            except (ConnectionError, BrokenPipeError, FileNotFoundError, socket.timeout) as e:
+                self._close()
+                retryable = not sent or op in READ_ONLY_OPS
+                if attempt == 1 or isinstance(e, socket.timeout) or not retryable:
+                    raise SidecarError(f"Vector store sidecar unavailable at {self.socket_path}: {str(e)}")
+                logger.warning(f"Sidecar connection failed, reconnecting: {str(e)}")
+
+        if not response.get("ok"):
+            if response.get("error_type") == "ValueError":
+                raise ValueError(response.get("error"))
+            raise SidecarError(response.get("error"))
+        return response.get("result")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sidecar_client() -> VectorStoreSidecarClient:
+    """
+    获取全局sidecar客户端
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = VectorStoreSidecarClient()
+        return _client
@@ -0,0 +1,64 @@
+import math
+from typing import List, Sequence, Tuple
+import numpy as np
+from .config import NORMALIZATION_CONFIG
+
+
+def normalize_vector(vector: Sequence[float]) -> List[float]:
+    """
+    将向量归一化为单位长度，已归一化或零向量原样返回
+
+    参数:
+        vector: 向量
+
+    返回:
+        归一化后的向量
+    """
+    vector = [float(x) for x in vector]
+    norm = math.sqrt(math.fsum(x * x for x in vector))
+    if norm == 0.0 or abs(norm - 1.0) <= NORMALIZATION_CONFIG["tolerance"]:
+        return vector
+    return [x / norm for x in vector]
+
+
+def mmr_select(query_vector: Sequence[float], candidate_vectors: Sequence[Sequence[float]],
+               k: int, lambda_mult: float) -> Tuple[List[int], List[float]]:
+    """
+    最大边际相关（MMR）选择：每一步选出 lambda * 与查询的相似度 - (1 - lambda) * 与已选结果的最大相似度 最大的候选
+
+    候选两两之间的余弦相似度由一次矩阵乘法得到，之后每一步只做向量化的取最大值更新
+
+    参数:
+        query_vector: 查询向量
+        candidate_vectors: 候选向量
+        k: 选择的数量
+        lambda_mult: 相关性权重，1为只按相关性排序，0为只追求多样性
+
+    返回:
+        (按选择顺序排列的候选下标, 对应的MMR分数)
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if candidates.ndim != 2 or candidates.shape[0] == 0 or k <= 0:
+        return [], []
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    candidates = candidates / np.where(norms == 0, 1.0, norms)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    if query_norm > 0:
+        query = query / query_norm
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    max_similarity = np.full(candidates.shape[0], -np.inf, dtype=np.float32)
+    available = np.ones(candidates.shape[0], dtype=bool)
+    selected, scores = [], []
+    for _ in range(min(k, candidates.shape[0])):
+        redundancy = max_similarity if selected else 0.0
+        mmr = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        mmr = np.where(available, mmr, -np.inf)
+        index = int(np.argmax(mmr))
+        selected.append(index)
+        scores.append(float(mmr[index]))
+        available[index] = False
+        np.maximum(max_similarity, similarity[index], out=max_similarity)
+    return selected, scores